@@ -0,0 +1,254 @@
+"""
+========================================================
+asyncio OCR 接口
+========================================================
+
+功能说明：
+    供 asyncio 服务（Web 后端等）嵌入使用，推理不阻塞事件循环：
+        - await ocr.ocr_file(path)：识别整个文件，返回各页结果
+        - async for page in ocr.iter_pages(path)：逐页识别，每页完成即返回
+        - 推理在专用线程池中执行，max_concurrency 限制同时推理的页数；
+          每个并发槽位持有独立的模型实例（同一实例不会被多个线程同时调用）
+        - 支持取消：取消 asyncio 任务或置位 cancel_event 后在页边界停止，
+          正在执行的那一页完成后模型自动归还
+
+    同步接口 ocr_engine.process_file 保持不变；两者输出的目录结构相同。
+
+用法：
+    async with AsyncOCR(det_model_path, rec_model_path, max_concurrency=2) as ocr:
+        pages = await ocr.ocr_file('a.pdf', output_dir='output/a')
+        async for page_index, res in ocr.iter_pages('b.pdf'):
+            print(page_index, res['rec_texts'])
+
+运行方式（示例）：
+    python async_ocr.py a.pdf b.png --concurrency 2
+========================================================
+"""
+
+import os
+import sys
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from layout import save_ordered_outputs
+from page_source import DEFAULT_PDF_DPI, as_page_source, count_pages, iter_pages, source_path
+
+
+def save_page_outputs(res, output_dir, page_num):
+    """
+    按 process_file 的目录结构保存一页结果
+
+    Returns:
+        页结果目录
+    """
+    page_dir = os.path.join(output_dir, f"page_{page_num:03d}_result")
+    os.makedirs(page_dir, exist_ok=True)
+    res.save_to_img(page_dir)
+    res.save_to_json(page_dir)
+    txt_path = os.path.join(page_dir, f"page_{page_num:03d}_result.txt")
+    save_ordered_outputs(res, page_dir, txt_path)
+    return page_dir
+
+
+class AsyncOCR:
+    """
+    asyncio OCR 服务
+
+    Args:
+        det_model_path: 检测模型路径
+        rec_model_path: 识别模型路径
+        max_concurrency: 同时推理的最大页数（即模型实例数，按需创建）
+        dpi: PDF 渲染分辨率
+        ocr_factory: 创建模型实例的函数，默认 ocr_engine.init_ocr_model
+        **ocr_options: 传给 ocr_factory 的参数
+    """
+
+    def __init__(self, det_model_path, rec_model_path, max_concurrency=1, dpi=DEFAULT_PDF_DPI,
+                 ocr_factory=None, **ocr_options):
+        if ocr_factory is None:
+            from ocr_engine import init_ocr_model as ocr_factory
+        self.max_concurrency = max(1, max_concurrency)
+        self.dpi = dpi
+        self._factory = functools.partial(ocr_factory, det_model_path, rec_model_path, **ocr_options)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency,
+                                            thread_name_prefix='ocr-infer')
+        # 渲染 / 写文件等轻量阻塞操作使用单独的线程池，不占用推理槽位；
+        # 并发文档的 PDF 渲染由 page_source.PDFIUM_LOCK 串行化
+        self._io_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='ocr-io')
+        self._models = None
+        self._created = 0
+        self._create_lock = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def close(self):
+        """等待正在执行的推理完成并释放线程池"""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._executor.shutdown)
+        await loop.run_in_executor(None, self._io_executor.shutdown)
+
+    async def warmup(self):
+        """预先创建全部模型实例（否则在首次使用时按需创建）"""
+        models = [await self._acquire() for _ in range(self.max_concurrency)]
+        for ocr in models:
+            self._models.put_nowait(ocr)
+
+    async def _acquire(self):
+        """获取一个空闲模型实例，未达到并发上限时创建新实例"""
+        if self._models is None:
+            self._models = asyncio.Queue()
+            self._create_lock = asyncio.Lock()
+        if self._models.empty():
+            async with self._create_lock:
+                if self._models.empty() and self._created < self.max_concurrency:
+                    self._created += 1
+                    loop = asyncio.get_running_loop()
+                    try:
+                        return await loop.run_in_executor(self._executor, self._factory)
+                    except BaseException:
+                        self._created -= 1
+                        raise
+        return await self._models.get()
+
+    async def predict_image(self, img):
+        """
+        识别一张 BGR 图像
+
+        Returns:
+            识别结果（PaddleOCR 结果对象或 PageResult）
+        """
+        ocr = await self._acquire()
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._executor, ocr.predict, img)
+        try:
+            results = await asyncio.shield(future)
+        except asyncio.CancelledError:
+            # 线程中的推理无法中断：等这一页完成后再归还模型
+            future.add_done_callback(lambda _: self._models.put_nowait(ocr))
+            raise
+        except BaseException:
+            self._models.put_nowait(ocr)
+            raise
+        self._models.put_nowait(ocr)
+        return results[0]
+
+    async def iter_pages(self, source, output_dir=None, cancel_event=None):
+        """
+        逐页识别，每页完成即返回
+
+        Args:
+            source: 文件路径，或内存输入（上传内容的 bytes、文件对象、mmap、
+                BGR 图像数组或逐页图像数组列表），无需先写临时文件
+            output_dir: 提供时按 process_file 的目录结构保存每页结果
+            cancel_event: asyncio.Event，置位后在页边界停止
+
+        Yields:
+            (页索引, 识别结果)
+        """
+        loop = asyncio.get_running_loop()
+        input_path = source_path(source)
+        source = as_page_source(source)
+        total = await loop.run_in_executor(self._io_executor, count_pages, source)
+        pages = iter_pages(source, self.dpi)
+        pending_next = None
+        try:
+            while cancel_event is None or not cancel_event.is_set():
+                pending_next = loop.run_in_executor(self._io_executor, next, pages, None)
+                item = await asyncio.shield(pending_next)
+                pending_next = None
+                if item is None:
+                    break
+                page_index, img = item
+                res = await self.predict_image(img)
+                res['page_index'] = page_index if total > 1 else None
+                if input_path is not None:
+                    res['input_path'] = input_path
+                if output_dir is not None:
+                    await loop.run_in_executor(self._io_executor, save_page_outputs,
+                                               res, output_dir, page_index + 1)
+                yield page_index, res
+        finally:
+            if pending_next is not None:
+                # 渲染线程仍在读取下一页，读取结束后再关闭文件
+                pending_next.add_done_callback(lambda _: pages.close())
+            else:
+                pages.close()
+
+    async def ocr_file(self, source, output_dir=None, cancel_event=None):
+        """
+        识别整个文件
+
+        Args:
+            source: 文件路径或内存输入（见 iter_pages）
+            output_dir: 提供时按 process_file 的目录结构保存每页结果
+            cancel_event: asyncio.Event，置位后在页边界停止
+
+        Returns:
+            各页识别结果列表
+        """
+        if output_dir is not None:
+            os.makedirs(output_dir, exist_ok=True)
+        return [res async for _, res in self.iter_pages(source, output_dir, cancel_event)]
+
+
+async def ocr_file(source, det_model_path, rec_model_path, output_dir=None, **ocr_options):
+    """
+    一次性识别单个文件（每次调用都会加载模型；服务中应复用 AsyncOCR 实例）
+
+    Returns:
+        各页识别结果列表
+    """
+    async with AsyncOCR(det_model_path, rec_model_path, **ocr_options) as ocr:
+        return await ocr.ocr_file(source, output_dir)
+
+
+async def _demo(paths, concurrency, output_root):
+    """并发识别多个文件并逐页打印"""
+    import time
+    from ocr_tuner import DEFAULT_DET_MODEL, DEFAULT_REC_MODEL
+
+    async with AsyncOCR(DEFAULT_DET_MODEL, DEFAULT_REC_MODEL, max_concurrency=concurrency) as ocr:
+        start = time.perf_counter()
+
+        async def run(path):
+            stem = os.path.splitext(os.path.basename(path))[0]
+            output_dir = os.path.join(output_root, stem) if output_root else None
+            async for page_index, res in ocr.iter_pages(path, output_dir):
+                print(f"[{time.perf_counter() - start:6.2f}s] {os.path.basename(path)} "
+                      f"第 {page_index + 1} 页: {len(res.get('rec_texts', []))} 行")
+
+        # 事件循环保持响应：心跳任务在识别期间持续运行
+        async def heartbeat():
+            while True:
+                await asyncio.sleep(1.0)
+                print(f"[{time.perf_counter() - start:6.2f}s] 事件循环响应正常")
+
+        beat = asyncio.create_task(heartbeat())
+        try:
+            await asyncio.gather(*(run(path) for path in paths))
+        finally:
+            beat.cancel()
+        print(f"\n全部完成，用时 {time.perf_counter() - start:.2f}s")
+
+
+def main():
+    """主函数"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='asyncio OCR 接口示例')
+    parser.add_argument('inputs', nargs='+', help='PDF 或图片路径')
+    parser.add_argument('--concurrency', type=int, default=1, help='同时推理的最大页数')
+    parser.add_argument('--output', default=None, help='结果输出根目录（默认不保存）')
+
+    args = parser.parse_args()
+    asyncio.run(_demo(args.inputs, args.concurrency, args.output))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
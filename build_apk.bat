@@ -56,10 +56,11 @@ if not exist "testmodel\PP-OCRv5_mobile_rec_infer" (
     exit /b 1
 )
 
-REM 准备模型文件
+REM 准备模型文件（set MODEL_VARIANT=int8 时打包量化模型）
+if "%MODEL_VARIANT%"=="" set MODEL_VARIANT=float
 echo.
-echo [1/4] 准备模型文件...
-python prepare_models.py
+echo [1/4] 准备模型文件 (变体: %MODEL_VARIANT%)...
+python prepare_models.py --variant %MODEL_VARIANT%
 if %ERRORLEVEL% NEQ 0 (
     echo [错误] 模型文件准备失败
     pause
@@ -75,6 +76,15 @@ if not exist "buildozer.spec" (
     exit /b 1
 )
 
+REM INT8 变体通过 ONNX Runtime 推理，用环境变量覆盖 spec 中的 requirements
+if /i "%MODEL_VARIANT%"=="int8" (
+    for /f "tokens=1,* delims==" %%a in ('findstr /b /c:"requirements" buildozer.spec') do set REQUIREMENTS=%%b
+    set REQUIREMENTS=!REQUIREMENTS: =!
+    if "!REQUIREMENTS:onnxruntime=!"=="!REQUIREMENTS!" set REQUIREMENTS=!REQUIREMENTS!,onnxruntime
+    set APP_REQUIREMENTS=!REQUIREMENTS!
+    echo INT8 变体: requirements = !APP_REQUIREMENTS!
+)
+
 REM 编译 APK
 echo.
 echo [3/4] 开始编译 APK...
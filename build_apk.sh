@@ -52,10 +52,11 @@ if [ ! -d "testmodel/PP-OCRv5_mobile_rec_infer" ]; then
     exit 1
 fi
 
-# 准备模型文件
+# 准备模型文件（MODEL_VARIANT=int8 时打包量化模型）
+MODEL_VARIANT=${MODEL_VARIANT:-float}
 echo ""
-echo "[1/4] 准备模型文件..."
-python3 prepare_models.py
+echo "[1/4] 准备模型文件 (变体: $MODEL_VARIANT)..."
+python3 prepare_models.py --variant "$MODEL_VARIANT"
 if [ $? -ne 0 ]; then
     echo "[错误] 模型文件准备失败"
     exit 1
@@ -69,6 +70,17 @@ if [ ! -f "buildozer.spec" ]; then
     exit 1
 fi
 
+# INT8 变体通过 ONNX Runtime 推理，用环境变量覆盖 spec 中的 requirements
+if [ "$MODEL_VARIANT" = "int8" ]; then
+    REQUIREMENTS=$(sed -n 's/^requirements *= *//p' buildozer.spec)
+    case ",$REQUIREMENTS," in
+        *,onnxruntime,*) ;;
+        *) REQUIREMENTS="$REQUIREMENTS,onnxruntime" ;;
+    esac
+    export APP_REQUIREMENTS="$REQUIREMENTS"
+    echo "INT8 变体: requirements = $APP_REQUIREMENTS"
+fi
+
 # 编译 APK
 echo ""
 echo "[3/4] 开始编译 APK..."
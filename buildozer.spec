@@ -49,11 +49,12 @@ python.version = 3.9
 # (str) Python 实现类型
 python.implementation = cpython
 
-# (list) 包含的文件和目录
-source.include_dirs = testmodel
+# (list) 排除的目录（模型只通过下方 android.assets 打包 models/，
+#        testmodel/ 中的浮点模型、ONNX 和 _int8 目录不进入 APK）
+source.exclude_dirs = testmodel,models,tuning,output,bin
 
 # (str) 包含的文件扩展名
-source.include_exts = py,png,jpg,kv,atlas,json,yml,yaml,pdiparams
+source.include_exts = py,png,jpg,kv,atlas,json,yml,yaml
 
 # (str) 应用源代码目录
 source.dir = .
@@ -61,8 +62,9 @@ source.dir = .
 # (list) Python 依赖
 requirements = python3,kivy,pillow,numpy,opencv-python-headless,paddleocr,paddlepaddle,plyer,pyjnius
 
-# (list) Android assets（模型文件）
-android.assets = testmodel/PP-OCRv5_mobile_det_infer:models/PP-OCRv5_mobile_det_infer,testmodel/PP-OCRv5_mobile_rec_infer:models/PP-OCRv5_mobile_rec_infer
+# (list) Android assets（模型文件，由 prepare_models.py 按所选变体准备到 models/）
+# INT8 变体: MODEL_VARIANT=int8 ./build_apk.sh（脚本通过 APP_REQUIREMENTS 追加 onnxruntime）
+android.assets = models/PP-OCRv5_mobile_det_infer:models/PP-OCRv5_mobile_det_infer,models/PP-OCRv5_mobile_rec_infer:models/PP-OCRv5_mobile_rec_infer
 
 # (str) 应用图标（使用默认）
 # icon.filename = assets/icon.png
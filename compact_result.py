@@ -0,0 +1,448 @@
+"""
+========================================================
+紧凑的文档识别结果
+========================================================
+
+功能说明：
+    ocr.predict 的每页结果对象保存多边形列表、文本列表、分数和整页图像，
+    大文档逐页累积这些对象时内存远超数据本身。DocumentResult 只保留
+    结构化数据，并用连续数组存储：
+        - polys:        (N, 4, 2) float32，全部文本框的四点坐标
+        - scores:       (N,) float32
+        - 文本:         所有行的 UTF-8 编码拼成一个缓冲区，text_offsets (N+1,) 记录边界
+        - page_offsets: (P+1,) 每页文本框的起止索引
+        - page_index / page_sizes: 每页的页码与识别图像尺寸
+
+    按页切片（doc[10:20]、doc.page(3).polys）返回共享底层数组的视图，不复制数据；
+    save / load 使用 .npz 直接写出数组，无需逐个对象序列化。
+    PageRecord 使用 __slots__，只记录视图范围，文本按需解码。
+
+运行方式（内存对比基准）：
+    python compact_result.py --pages 1000 --boxes 40
+========================================================
+"""
+
+import sys
+
+import numpy as np
+
+
+def _as_quads(polys):
+    """多边形列表转为 (n, 4, 2) float32（非四点多边形取外接矩形）"""
+    if isinstance(polys, np.ndarray) and polys.ndim == 3 and polys.shape[1:] == (4, 2):
+        return polys.astype(np.float32, copy=False)
+    quads = np.empty((len(polys), 4, 2), dtype=np.float32)
+    for i, poly in enumerate(polys):
+        pts = np.asarray(poly, dtype=np.float32).reshape(-1, 2)
+        if len(pts) == 4:
+            quads[i] = pts
+        else:
+            (x0, y0), (x1, y1) = pts.min(axis=0), pts.max(axis=0)
+            quads[i] = ((x0, y0), (x1, y0), (x1, y1), (x0, y1))
+    return quads
+
+
+class _GrowableArray:
+    """按容量倍增追加的数组（均摊 O(1)，只在扩容时复制）"""
+
+    __slots__ = ('data', 'size')
+
+    def __init__(self, shape_tail=(), dtype=np.float32, capacity=256):
+        self.data = np.empty((capacity,) + tuple(shape_tail), dtype=dtype)
+        self.size = 0
+
+    def extend(self, values):
+        n = len(values)
+        if self.size + n > len(self.data):
+            capacity = max(len(self.data) * 2, self.size + n)
+            grown = np.empty((capacity,) + self.data.shape[1:], dtype=self.data.dtype)
+            grown[:self.size] = self.data[:self.size]
+            self.data = grown
+        self.data[self.size:self.size + n] = values
+        self.size += n
+
+    def view(self):
+        return self.data[:self.size]
+
+
+class PageRecord:
+    """
+    单页结果视图（不复制数据）
+
+    Attributes:
+        page_index: 页索引（从 0 开始）
+        size: 识别图像 (宽, 高)，未知时为 (0, 0)
+        polys: (n, 4, 2) 文本框视图
+        scores: (n,) 分数视图
+    """
+
+    __slots__ = ('_doc', '_page', 'page_index', 'size', '_start', '_end')
+
+    def __init__(self, doc, page):
+        self._doc = doc
+        self._page = page
+        self.page_index = int(doc.page_index[page])
+        self.size = tuple(int(v) for v in doc.page_sizes[page])
+        self._start = int(doc.page_offsets[page])
+        self._end = int(doc.page_offsets[page + 1])
+
+    def __len__(self):
+        return self._end - self._start
+
+    def __repr__(self):
+        return f"PageRecord(page_index={self.page_index}, boxes={len(self)})"
+
+    @property
+    def polys(self):
+        return self._doc.polys[self._start:self._end]
+
+    @property
+    def scores(self):
+        return self._doc.scores[self._start:self._end]
+
+    @property
+    def texts(self):
+        return list(self._doc.iter_texts(self._start, self._end))
+
+    def to_dict(self):
+        """转为与 PaddleOCR 结果字段一致的字典（rec_texts / rec_polys / rec_scores）"""
+        return {'page_index': self.page_index, 'rec_texts': self.texts,
+                'rec_polys': self.polys, 'rec_scores': self.scores}
+
+
+class DocumentResult:
+    """
+    文档级紧凑识别结果
+
+    用法：
+        doc = DocumentResult('a.pdf')
+        for res in ocr.predict_iter(input='a.pdf'):
+            doc.add_result(res)
+        doc.page(0).texts          # 第 1 页文本
+        doc[10:20]                 # 第 11~20 页（零复制视图）
+        doc.save('a_result.npz')
+        doc = DocumentResult.load('a_result.npz')
+    """
+
+    def __init__(self, source=None):
+        self.source = source
+        self._polys = _GrowableArray((4, 2), np.float32)
+        self._scores = _GrowableArray((), np.float32)
+        self._text_offsets = _GrowableArray((), np.int64)
+        self._text_offsets.extend([0])
+        self._text = bytearray()
+        self._page_offsets = _GrowableArray((), np.int64, capacity=64)
+        self._page_offsets.extend([0])
+        self._page_index = _GrowableArray((), np.int32, capacity=64)
+        self._page_sizes = _GrowableArray((2,), np.int32, capacity=64)
+        self._frozen = None
+
+    # ------------------------------------------------------------------
+    # 构建
+    # ------------------------------------------------------------------
+
+    def add_page(self, texts, polys, scores=None, page_index=None, size=(0, 0)):
+        """
+        追加一页
+
+        Args:
+            texts: 文本行列表
+            polys: 对应的文本框多边形
+            scores: 识别分数（缺省为 1.0）
+            page_index: 页索引（缺省为当前页数）
+            size: 识别图像 (宽, 高)
+        """
+        if self._frozen is not None:
+            raise ValueError("切片视图或已加载的结果不可追加")
+        n = len(texts)
+        if len(polys) != n:
+            raise ValueError(f"文本数 {n} 与文本框数 {len(polys)} 不一致")
+        self._polys.extend(_as_quads(polys) if n else np.empty((0, 4, 2), np.float32))
+        self._scores.extend(np.ones(n, np.float32) if scores is None
+                            else np.asarray(scores, dtype=np.float32))
+
+        ends = np.empty(n, dtype=np.int64)
+        for i, text in enumerate(texts):
+            self._text += str(text).encode('utf-8')
+            ends[i] = len(self._text)
+        self._text_offsets.extend(ends)
+
+        self._page_offsets.extend([self._polys.size])
+        self._page_index.extend([self._page_index.size if page_index is None else page_index])
+        self._page_sizes.extend([size])
+
+    def add_result(self, res, page_index=None):
+        """
+        追加一页 PaddleOCR 结果（只保留文本、文本框和分数，图像不保留）
+
+        Args:
+            res: ocr.predict 的单页结果
+            page_index: 页索引（缺省取 res['page_index'] 或当前页数）
+        """
+        if page_index is None:
+            page_index = res.get('page_index')
+        size = (0, 0)
+        preprocess = res.get('doc_preprocessor_res')
+        image = preprocess.get('output_img') if preprocess else None
+        if image is not None:
+            size = (image.shape[1], image.shape[0])
+        polys = res.get('rec_polys')
+        self.add_page(res.get('rec_texts', []), [] if polys is None else polys,
+                      res.get('rec_scores'), page_index, size)
+
+    # ------------------------------------------------------------------
+    # 访问
+    # ------------------------------------------------------------------
+
+    def _arrays(self):
+        if self._frozen is not None:
+            return self._frozen
+        return {
+            'polys': self._polys.view(),
+            'scores': self._scores.view(),
+            'text_offsets': self._text_offsets.view(),
+            'text': self._text,
+            'page_offsets': self._page_offsets.view(),
+            'page_index': self._page_index.view(),
+            'page_sizes': self._page_sizes.view(),
+        }
+
+    @property
+    def polys(self):
+        return self._arrays()['polys']
+
+    @property
+    def scores(self):
+        return self._arrays()['scores']
+
+    @property
+    def text_offsets(self):
+        return self._arrays()['text_offsets']
+
+    @property
+    def page_offsets(self):
+        return self._arrays()['page_offsets']
+
+    @property
+    def page_index(self):
+        return self._arrays()['page_index']
+
+    @property
+    def page_sizes(self):
+        return self._arrays()['page_sizes']
+
+    def __len__(self):
+        return len(self.page_index)
+
+    def __repr__(self):
+        return f"DocumentResult(pages={len(self)}, boxes={self.box_count})"
+
+    @property
+    def box_count(self):
+        offsets = self.page_offsets
+        return int(offsets[-1] - offsets[0])
+
+    def text(self, box):
+        """按全局文本框索引取文本"""
+        arrays = self._arrays()
+        offsets = arrays['text_offsets']
+        return arrays['text'][offsets[box]:offsets[box + 1]].decode('utf-8')
+
+    def page(self, page):
+        """第 page 个页面记录（按在本结果中的顺序）"""
+        if page < 0:
+            page += len(self)
+        if not 0 <= page < len(self):
+            raise IndexError(page)
+        return PageRecord(self, page)
+
+    def __iter__(self):
+        for page in range(len(self)):
+            yield PageRecord(self, page)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step != 1:
+                raise ValueError(f"只支持连续页切片（步长为 1），得到步长 {step}")
+            return self.pages(start, stop)
+        return self.page(key)
+
+    def pages(self, start, stop):
+        """
+        第 start~stop-1 页的视图，与本结果共享底层数组
+
+        start >= stop 时返回空视图（page_offsets 保留一个元素，box_count 为 0）。
+
+        Returns:
+            DocumentResult（只读）
+        """
+        stop = max(start, stop)
+        arrays = self._arrays()
+        view = DocumentResult(self.source)
+        view._frozen = dict(arrays,
+                            page_offsets=arrays['page_offsets'][start:stop + 1],
+                            page_index=arrays['page_index'][start:stop],
+                            page_sizes=arrays['page_sizes'][start:stop])
+        return view
+
+    def iter_texts(self, start=None, stop=None):
+        """
+        按顺序逐行返回文本
+
+        Args:
+            start, stop: 全局文本框索引范围，缺省为本结果包含的全部文本框
+        """
+        arrays = self._arrays()
+        page_offsets = arrays['page_offsets']
+        start = int(page_offsets[0]) if start is None else start
+        stop = int(page_offsets[-1]) if stop is None else stop
+        text = arrays['text']
+        offsets = arrays['text_offsets'][start:stop + 1].tolist()
+        for begin, end in zip(offsets, offsets[1:]):
+            yield text[begin:end].decode('utf-8')
+
+    # ------------------------------------------------------------------
+    # 序列化
+    # ------------------------------------------------------------------
+
+    def save(self, path):
+        """
+        保存为 .npz（切片视图只保存所含页面）
+
+        Args:
+            path: 输出路径
+        """
+        arrays = self._arrays()
+        box_start, box_end = int(self.page_offsets[0]), int(self.page_offsets[-1])
+        text_offsets = arrays['text_offsets'][box_start:box_end + 1]
+        text_start, text_end = int(text_offsets[0]), int(text_offsets[-1])
+        np.savez(path,
+                 polys=arrays['polys'][box_start:box_end],
+                 scores=arrays['scores'][box_start:box_end],
+                 text_offsets=text_offsets - text_start,
+                 text=np.frombuffer(arrays['text'], dtype=np.uint8)[text_start:text_end],
+                 page_offsets=self.page_offsets - box_start,
+                 page_index=self.page_index,
+                 page_sizes=self.page_sizes,
+                 source=np.array(self.source or ''))
+
+    @classmethod
+    def load(cls, path):
+        """
+        读取 save 保存的结果（只读）
+
+        Returns:
+            DocumentResult
+        """
+        with np.load(path) as data:
+            doc = cls(str(data['source']) or None)
+            doc._frozen = {
+                'polys': data['polys'],
+                'scores': data['scores'],
+                'text_offsets': data['text_offsets'],
+                'text': data['text'].tobytes(),
+                'page_offsets': data['page_offsets'],
+                'page_index': data['page_index'],
+                'page_sizes': data['page_sizes'],
+            }
+        return doc
+
+
+# ---------------------------------------------------------------------------
+# 内存对比基准
+# ---------------------------------------------------------------------------
+
+def _synthetic_page(rng, boxes):
+    """构造与 PaddleOCR 单页结果结构相同的数据（不含图像）"""
+    polys = [rng.integers(0, 2000, (4, 2)).astype(np.int16) for _ in range(boxes)]
+    texts = [''.join(chr(0x4e00 + int(c)) for c in rng.integers(0, 3000, rng.integers(4, 20)))
+             for _ in range(boxes)]
+    scores = rng.random(boxes).astype(np.float32)
+    return {'rec_texts': texts, 'rec_polys': polys, 'dt_polys': list(polys),
+            'rec_scores': scores, 'rec_boxes': np.stack(polys).reshape(boxes, -1)[:, :4]}
+
+
+def benchmark(pages=1000, boxes=40, seed=0):
+    """
+    用 tracemalloc 比较逐页累积 PaddleOCR 结构与 DocumentResult 的内存占用
+
+    Returns:
+        {'list_bytes', 'compact_bytes', 'npz_bytes'}
+    """
+    import os
+    import tempfile
+    import tracemalloc
+
+    rng = np.random.default_rng(seed)
+    page_data = [_synthetic_page(rng, boxes) for _ in range(8)]
+
+    def measure(build):
+        tracemalloc.start()
+        start = tracemalloc.take_snapshot()
+        kept = build()
+        used = sum(stat.size_diff for stat in
+                   tracemalloc.take_snapshot().compare_to(start, 'filename'))
+        tracemalloc.stop()
+        del kept
+        return used
+
+    def build_lists():
+        # 与 process_pdf 累积 result / all_text 的方式一致：每页一份独立对象
+        results = []
+        for page in range(pages):
+            data = page_data[page % len(page_data)]
+            results.append({
+                # 每页的字符串都是新解码出的独立对象
+                'rec_texts': [text.encode('utf-8').decode('utf-8') for text in data['rec_texts']],
+                'rec_polys': [poly.copy() for poly in data['rec_polys']],
+                'dt_polys': [poly.copy() for poly in data['dt_polys']],
+                'rec_scores': data['rec_scores'].copy(),
+                'rec_boxes': data['rec_boxes'].copy(),
+            })
+        return results
+
+    def build_compact():
+        doc = DocumentResult()
+        for page in range(pages):
+            data = page_data[page % len(page_data)]
+            doc.add_page(data['rec_texts'], data['rec_polys'], data['rec_scores'], page)
+        return doc
+
+    list_bytes = measure(build_lists)
+    compact_bytes = measure(build_compact)
+
+    doc = build_compact()
+    fd, path = tempfile.mkstemp(suffix='.npz')
+    os.close(fd)
+    try:
+        doc.save(path)
+        npz_bytes = os.path.getsize(path)
+    finally:
+        os.remove(path)
+    return {'list_bytes': list_bytes, 'compact_bytes': compact_bytes, 'npz_bytes': npz_bytes}
+
+
+def main():
+    """主函数"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='DocumentResult 内存对比基准')
+    parser.add_argument('--pages', type=int, default=1000, help='页数')
+    parser.add_argument('--boxes', type=int, default=40, help='每页文本框数')
+
+    args = parser.parse_args()
+
+    stats = benchmark(args.pages, args.boxes)
+    mb = 1024 * 1024
+    print(f"{args.pages} 页 × {args.boxes} 个文本框（不含整页图像）：")
+    print(f"  逐页结果对象:   {stats['list_bytes'] / mb:8.2f} MB")
+    print(f"  DocumentResult: {stats['compact_bytes'] / mb:8.2f} MB "
+          f"({stats['list_bytes'] / max(stats['compact_bytes'], 1):.1f}x)")
+    print(f"  .npz 文件:      {stats['npz_bytes'] / mb:8.2f} MB")
+    print("  注：PaddleOCR 结果对象还保留整页图像，144 DPI 的 A4 页约 6 MB/页")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,379 @@
+"""
+========================================================
+预加载模型的 fork 工作进程池（写时复制共享权重）
+========================================================
+
+功能说明：
+    RecyclingPool 默认以 spawn 启动工作进程，每个进程各自导入 PaddleOCR、
+    加载 PP-OCRv5 模型并预热：N 个进程就有 N 份权重，启动和回收替换都要
+    重复几秒到十几秒的加载时间。ForkServer 改为：
+        - 父进程导入全部依赖、加载模型并用一页合成图片预热一次，
+          随后 gc.freeze() 把已有对象移出垃圾回收，避免子进程的 GC
+          扫描改写对象头、破坏共享页
+        - 工作进程从这个父进程 fork 出来，只读的模型权重以写时复制方式
+          在进程间共享，子进程不再加载模型
+        - 回收替换（max_pages / max_rss_mb）的新进程同样从预热好的父进程
+          fork，替换几乎没有启动开销
+        - 报告每个工作进程的启动耗时（fork 到初始化完成）和 PSS / USS
+          （按比例分摊 / 私有内存，RSS 会重复计入共享页，见 low_memory.read_process_pss）
+
+    fork 安全：推理库的线程池（OpenMP / MKL）在父进程中启动后，fork 出的子进程
+    只继承调用 fork 的线程，部分运行时在子进程中再次推理会死锁。
+    每个工作进程初始化时先做一次探测推理，wait_ready() 超时即说明出现了这种
+    情况，可改用 warmup=False（父进程只加载不推理）或 cpu_threads=1。
+
+    仅支持提供 os.fork 的平台（Linux / macOS），Windows 请继续使用 RecyclingPool。
+
+运行方式：
+    python fork_server.py --workers 4              # fork 模式：启动耗时与 PSS
+    python fork_server.py --workers 4 --compare    # 与 spawn 模式（每进程加载模型）对比
+
+用法：
+    from fork_server import ForkServer, preloaded_ocr
+
+    server = ForkServer(det, rec, processes=4)
+    server.wait_ready(120)
+    server.apply_async(task, (path,), callback=on_done)   # task 中用 preloaded_ocr()
+    server.close()
+    server.join()
+========================================================
+"""
+
+import os
+import gc
+import sys
+import time
+import signal
+
+import numpy as np
+
+from low_memory import read_process_pss
+from worker_pool import RecyclingPool, WorkerError
+
+
+# 预热页尺寸（与实际扫描页相近，让推理库按真实规模分配缓冲区）
+WARMUP_SIZE = (1240, 1754)
+# 探测推理用的小图尺寸
+PROBE_SIZE = (320, 96)
+DEFAULT_READY_TIMEOUT = 120.0
+
+# 本进程中的预加载模型（fork 出的子进程直接继承）
+_server_state = {}
+
+
+def _warmup_page():
+    """生成一页合成文字图片用于预热（BGR，与实际输入一致）"""
+    import cv2
+    from soak_test import _text_page
+
+    width, height = WARMUP_SIZE
+    return cv2.cvtColor(_text_page(np.random.default_rng(0), width, height), cv2.COLOR_GRAY2BGR)
+
+
+def preload(det_model_path, rec_model_path, warmup=True, **ocr_options):
+    """
+    在当前进程中加载（并预热）模型，供随后 fork 的子进程共享
+
+    Args:
+        det_model_path: 检测模型路径
+        rec_model_path: 识别模型路径
+        warmup: 是否用一页合成图片预热（触发推理库的惰性初始化）
+        **ocr_options: 传给 init_ocr_model 的参数
+
+    Returns:
+        {'load_seconds', 'warmup_seconds', 'pid'}
+    """
+    from ocr_engine import init_ocr_model
+
+    start = time.perf_counter()
+    ocr = init_ocr_model(det_model_path, rec_model_path, **ocr_options)
+    load_seconds = time.perf_counter() - start
+
+    warmup_seconds = None
+    if warmup:
+        page = _warmup_page()
+        start = time.perf_counter()
+        ocr.predict(page)
+        warmup_seconds = time.perf_counter() - start
+
+    probe = np.full((PROBE_SIZE[1], PROBE_SIZE[0], 3), 255, dtype=np.uint8)
+    probe[40:56, 20:300] = 0
+    _server_state.update(ocr=ocr, probe=probe, pid=os.getpid())
+
+    # 之后 fork 的子进程里 GC 不再扫描这些对象，对象头所在的页保持共享
+    gc.collect()
+    if hasattr(gc, 'freeze'):
+        gc.freeze()
+    info = {'load_seconds': round(load_seconds, 3),
+            'warmup_seconds': round(warmup_seconds, 3) if warmup_seconds is not None else None,
+            'pid': os.getpid()}
+    _server_state['info'] = info
+    return info
+
+
+def preloaded_ocr():
+    """
+    返回本进程中已预加载的模型（fork 继承自父进程，或本进程调用过 preload）
+
+    Returns:
+        模型对象，未预加载时返回 None
+    """
+    return _server_state.get('ocr')
+
+
+def _init_forked_worker(probe, initializer, initargs):
+    """fork 出的工作进程初始化：探测推理是否可用，再执行调用方的 initializer"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if probe and preloaded_ocr() is not None:
+        preloaded_ocr().predict(_server_state['probe'])
+    if initializer is not None:
+        initializer(*initargs)
+
+
+def _mb(value):
+    return round(value / 1048576, 1)
+
+
+def _memory_entry(pid):
+    pss = read_process_pss(pid)
+    if pss is None:
+        return {'pid': pid}
+    return {'pid': pid, 'pss_mb': _mb(pss['pss']), 'uss_mb': _mb(pss['uss']),
+            'rss_mb': _mb(pss['rss']), 'shared_mb': _mb(pss['shared'])}
+
+
+class ForkServer:
+    """
+    从预热好的父进程 fork 工作进程的进程池（接口与 RecyclingPool 一致）
+
+    Args:
+        det_model_path: 检测模型路径
+        rec_model_path: 识别模型路径
+        processes: 工作进程数
+        initializer: 工作进程初始化函数（模型已就绪，可用 preloaded_ocr() 取得）
+        initargs: initializer 参数
+        warmup: 父进程加载后是否预热
+        probe: 工作进程初始化时是否做一次探测推理（检查 fork 后推理是否可用）
+        max_pages: 单个进程累计页数上限，None 表示不限
+        max_rss_mb: 单个进程 RSS 上限（MB），None 表示不限
+        **ocr_options: 传给 init_ocr_model 的参数
+    """
+
+    def __init__(self, det_model_path, rec_model_path, processes=1, initializer=None,
+                 initargs=(), warmup=True, probe=True, max_pages=None, max_rss_mb=None,
+                 **ocr_options):
+        if not hasattr(os, 'fork'):
+            raise RuntimeError("当前平台不支持 fork，请使用 RecyclingPool（spawn）")
+        self.preload_info = preload(det_model_path, rec_model_path, warmup=warmup,
+                                    **ocr_options)
+        print(f"[成功] 父进程已加载模型（加载 {self.preload_info['load_seconds']:.2f}s"
+              + (f"，预热 {self.preload_info['warmup_seconds']:.2f}s" if warmup else "")
+              + "），开始 fork 工作进程")
+        self.pool = RecyclingPool(processes, initializer=_init_forked_worker,
+                                  initargs=(probe, initializer, initargs),
+                                  max_pages=max_pages, max_rss_mb=max_rss_mb, context='fork')
+
+    def wait_ready(self, timeout=DEFAULT_READY_TIMEOUT):
+        """
+        等待全部工作进程完成初始化
+
+        Raises:
+            WorkerError: 初始化失败，或超时（此时已结束全部工作进程）
+        """
+        if not self.pool.wait_ready(timeout):
+            self.pool.terminate()
+            raise WorkerError(
+                f"工作进程 {timeout:.0f}s 内未就绪：推理库线程池在 fork 后可能死锁，"
+                f"可尝试 warmup=False 或 cpu_threads=1")
+
+    def apply_async(self, func, args=(), callback=None, error_callback=None):
+        """提交任务（见 RecyclingPool.apply_async）"""
+        self.pool.apply_async(func, args, callback=callback, error_callback=error_callback)
+
+    def pids(self):
+        return self.pool.pids()
+
+    def memory(self):
+        """
+        父进程和各工作进程的 PSS / USS（仅 Linux）
+
+        Returns:
+            {'parent': {...}, 'workers': [{...}], 'total_pss_mb'}
+        """
+        parent = _memory_entry(os.getpid())
+        workers = [_memory_entry(pid) for pid in self.pool.pids()]
+        total = sum(entry.get('pss_mb', 0) for entry in [parent] + workers)
+        return {'parent': parent, 'workers': workers, 'total_pss_mb': round(total, 1)}
+
+    def stats(self):
+        """进程池统计（启动耗时、页数、回收）加上预加载耗时和内存"""
+        stats = self.pool.stats()
+        stats['mode'] = 'fork'
+        stats['preload'] = self.preload_info
+        stats['memory'] = self.memory()
+        return stats
+
+    def close(self):
+        self.pool.close()
+
+    def join(self):
+        self.pool.join()
+
+    def terminate(self):
+        self.pool.terminate()
+
+
+# ----------------------------------------------------------------------
+# 基准测试：spawn（每进程加载模型）与 fork（共享预加载模型）对比
+# ----------------------------------------------------------------------
+
+def _preload_in_worker(det_model_path, rec_model_path, warmup, ocr_options):
+    """spawn 模式的工作进程初始化：在子进程中各自加载模型"""
+    preload(det_model_path, rec_model_path, warmup=warmup, **ocr_options)
+
+
+def _bench_task(seed):
+    """识别一页合成图片"""
+    import cv2
+    from soak_test import _text_page
+
+    page = cv2.cvtColor(_text_page(np.random.default_rng(seed)), cv2.COLOR_GRAY2BGR)
+    start = time.perf_counter()
+    preloaded_ocr().predict(page)
+    return {'pages': 1, 'seconds': time.perf_counter() - start}
+
+
+def _run_bench_pages(pool, pages):
+    done = []
+    errors = []
+    for seed in range(pages):
+        pool.apply_async(_bench_task, (seed,), callback=done.append,
+                         error_callback=errors.append)
+    deadline = time.monotonic() + 600
+    while len(done) + len(errors) < pages and time.monotonic() < deadline:
+        time.sleep(0.05)
+    if errors:
+        raise errors[0]
+    return done
+
+
+def _memory_of(pids):
+    entries = [_memory_entry(pid) for pid in pids]
+    return {'workers': entries,
+            'pss_mb_per_worker': round(sum(e.get('pss_mb', 0) for e in entries)
+                                       / max(1, len(entries)), 1),
+            'uss_mb_per_worker': round(sum(e.get('uss_mb', 0) for e in entries)
+                                       / max(1, len(entries)), 1)}
+
+
+def benchmark(det_model_path, rec_model_path, workers=2, pages=8, mode='fork',
+              warmup=True, **ocr_options):
+    """
+    测量一种启动方式的工作进程启动耗时和内存
+
+    Args:
+        mode: 'fork'（ForkServer）或 'spawn'（RecyclingPool，每进程加载模型）
+        pages: 就绪后识别的合成页数（测量推理后 PSS 的增长）
+
+    Returns:
+        结果字典
+    """
+    start = time.perf_counter()
+    if mode == 'fork':
+        server = ForkServer(det_model_path, rec_model_path, processes=workers,
+                            warmup=warmup, **ocr_options)
+        pool = server.pool
+        server.wait_ready()
+    else:
+        server = None
+        pool = RecyclingPool(workers, initializer=_preload_in_worker,
+                             initargs=(det_model_path, rec_model_path, warmup, ocr_options))
+        if not pool.wait_ready(DEFAULT_READY_TIMEOUT * workers):
+            pool.terminate()
+            raise WorkerError("spawn 工作进程未就绪")
+    ready_seconds = time.perf_counter() - start
+
+    stats = pool.stats()
+    spawn_ms = [w['spawn_ms'] for w in stats['workers']]
+    pids = pool.pids()
+    idle = _memory_of(pids)
+    start = time.perf_counter()
+    done = _run_bench_pages(pool, pages)
+    run_seconds = time.perf_counter() - start
+    # 进程池关闭后工作进程即退出，先采样内存
+    busy = _memory_of(pids)
+    parent = _memory_entry(os.getpid())
+    pool.close()
+    pool.join()
+
+    result = {
+        'mode': mode,
+        'workers': workers,
+        'ready_seconds': round(ready_seconds, 3),
+        'spawn_ms': spawn_ms,
+        'spawn_ms_mean': round(sum(spawn_ms) / len(spawn_ms), 1),
+        'preload': server.preload_info if server is not None else None,
+        'parent': parent,
+        'idle': idle,
+        'after_pages': busy,
+        'pages': len(done),
+        'pages_per_second': round(len(done) / run_seconds, 2) if run_seconds else None,
+    }
+    total = busy['pss_mb_per_worker'] * workers + (parent.get('pss_mb', 0) if mode == 'fork' else 0)
+    result['total_pss_mb'] = round(total, 1)
+    return result
+
+
+def print_benchmark(results):
+    """打印对比表"""
+    print()
+    print(f"{'模式':<8}{'进程':>5}{'就绪(s)':>10}{'启动ms/进程':>14}"
+          f"{'PSS/进程':>12}{'USS/进程':>12}{'总PSS(MB)':>12}{'页/秒':>9}")
+    for r in results:
+        print(f"{r['mode']:<8}{r['workers']:>5}{r['ready_seconds']:>10.2f}"
+              f"{r['spawn_ms_mean']:>14.1f}{r['after_pages']['pss_mb_per_worker']:>12.1f}"
+              f"{r['after_pages']['uss_mb_per_worker']:>12.1f}{r['total_pss_mb']:>12.1f}"
+              f"{(r['pages_per_second'] or 0):>9.2f}")
+    print("（PSS 把共享页按进程数分摊；fork 模式的总 PSS 含父进程）")
+
+
+def main():
+    """主函数"""
+    import json
+    import argparse
+    from ocr_tuner import DEFAULT_DET_MODEL, DEFAULT_REC_MODEL
+
+    parser = argparse.ArgumentParser(description='预加载模型的 fork 工作进程池基准')
+    parser.add_argument('--workers', type=int, default=2, help='工作进程数')
+    parser.add_argument('--pages', type=int, default=8, help='就绪后识别的合成页数')
+    parser.add_argument('--compare', action='store_true', help='同时测量 spawn 模式')
+    parser.add_argument('--no-warmup', action='store_true', help='父进程只加载不预热')
+    parser.add_argument('--output', default=None, help='结果 JSON 路径')
+    parser.add_argument('--det', default=DEFAULT_DET_MODEL, help='检测模型路径')
+    parser.add_argument('--rec', default=DEFAULT_REC_MODEL, help='识别模型路径')
+    args = parser.parse_args()
+
+    if not hasattr(os, 'fork'):
+        print("错误: 当前平台不支持 fork")
+        return 1
+    for model_path in (args.det, args.rec):
+        if not os.path.exists(model_path):
+            print(f"错误: 模型不存在: {model_path}")
+            return 1
+
+    results = []
+    # 先测 spawn：fork 模式会在本进程中加载模型，放在后面不影响 spawn 的测量
+    for mode in (['spawn', 'fork'] if args.compare else ['fork']):
+        print(f"\n=== {mode} 模式 ===")
+        results.append(benchmark(args.det, args.rec, args.workers, args.pages, mode,
+                                 warmup=not args.no_warmup))
+    print_benchmark(results)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"[成功] 结果已保存: {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
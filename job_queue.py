@@ -0,0 +1,768 @@
+"""
+========================================================
+多节点分片识别：基于 SQLite 的作业队列
+========================================================
+
+功能说明：
+    夜间积压的文档一台机器处理不完时，多台机器共享一个 SQLite 作业库
+    （放在共享目录上），无需额外的消息中间件：
+        - 提交：每个文档登记为一个作业，大文档按 chunk_pages 拆成页范围任务
+        - 租约：工作节点在事务中领取一个任务并获得租约（lease_seconds），
+          处理期间由心跳线程定期续约；单个任务超过 task_timeout 后停止续约
+        - 重新分配：节点崩溃或失联时租约过期，任务被其他节点重新领取；
+          超过 max_attempts 次仍失败的任务使整个作业失败
+        - 防止重复提交：完成结果只在租约令牌仍匹配时写入，
+          被重新分配后迟到的结果会被丢弃
+        - 有序汇总：一个作业的全部任务完成后，按页序把各任务结果合并为
+          document.txt 和 document_result.npz（见 compact_result.py）；
+          汇总前在事务中把作业标记为 assembling，同一作业只由一个节点汇总，
+          汇总节点崩溃时超过 lease_seconds 后由其他节点接手
+
+    每页的结果目录（page_XXX_result）先写入本次租约专属的暂存目录
+    （<输出目录>/.staging/），结果提交被接受后再改名到作业的输出目录，
+    页码按整个文档编号。超时或租约被重新分配的节点在下一页开始前停止识别，
+    它写出的内容不会与接手节点的结果混在一起。作业库和输出目录需放在
+    各节点都能访问的共享存储上。
+    作业库使用回滚日志而不是 WAL（WAL 依赖共享内存，不能跨主机使用），
+    共享文件系统需支持 POSIX 文件锁。
+
+运行方式：
+    # 协调：提交文档、查看进度
+    python job_queue.py submit /shared/jobs.db 大文档.pdf 传真.tif --output /shared/output
+    python job_queue.py status /shared/jobs.db
+
+    # 每台机器启动一个或多个工作节点
+    python job_queue.py worker /shared/jobs.db
+
+    # 本机用多个工作进程模拟多个节点（提交并等待全部完成）
+    python job_queue.py run a.pdf b.pdf --workers 3 --chunk-pages 10
+========================================================
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import shutil
+import socket
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+
+# 大文档每个任务包含的页数
+DEFAULT_CHUNK_PAGES = 20
+# 租约时长（秒），心跳间隔为其 1/4
+DEFAULT_LEASE_SECONDS = 120
+# 单个任务的最长处理时间（秒），超过后停止续约，任务会被重新分配
+DEFAULT_TASK_TIMEOUT = 3600
+# 任务最多尝试次数
+DEFAULT_MAX_ATTEMPTS = 3
+# 工作节点空闲时的轮询间隔（秒）
+POLL_INTERVAL = 2.0
+# 每次租约的页结果暂存目录（位于作业输出目录下）
+STAGING_DIR = '.staging'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id      INTEGER PRIMARY KEY,
+    path        TEXT NOT NULL,
+    output_dir  TEXT NOT NULL,
+    pages       INTEGER NOT NULL,
+    status      TEXT NOT NULL DEFAULT 'pending',
+    submitted   REAL NOT NULL,
+    finished    REAL,
+    error       TEXT
+);
+CREATE TABLE IF NOT EXISTS tasks (
+    task_id       INTEGER PRIMARY KEY,
+    job_id        INTEGER NOT NULL REFERENCES jobs(job_id),
+    start_page    INTEGER NOT NULL,
+    stop_page     INTEGER NOT NULL,
+    status        TEXT NOT NULL DEFAULT 'pending',
+    worker        TEXT,
+    lease_token   TEXT,
+    lease_expires REAL,
+    attempts      INTEGER NOT NULL DEFAULT 0,
+    reassigned    INTEGER NOT NULL DEFAULT 0,
+    result        TEXT,
+    error         TEXT,
+    updated       REAL
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks(status, job_id, start_page);
+CREATE TABLE IF NOT EXISTS workers (
+    worker      TEXT PRIMARY KEY,
+    host        TEXT,
+    pid         INTEGER,
+    started     REAL,
+    heartbeat   REAL,
+    tasks_done  INTEGER NOT NULL DEFAULT 0,
+    pages_done  INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+
+class JobStore:
+    """
+    SQLite 作业库
+
+    每个 JobStore 持有一个连接，只在创建它的线程中使用；
+    心跳线程另建自己的 JobStore。
+
+    Args:
+        db_path: 作业库路径（多节点时放在共享存储上）
+        lease_seconds: 租约时长
+        max_attempts: 任务最多尝试次数
+    """
+
+    def __init__(self, db_path, lease_seconds=DEFAULT_LEASE_SECONDS,
+                 max_attempts=DEFAULT_MAX_ATTEMPTS):
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        # 自行管理事务：领取任务用 BEGIN IMMEDIATE 抢写锁，避免两个节点领到同一任务
+        self.conn = sqlite3.connect(db_path, timeout=60, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=DELETE')
+        self.conn.executescript(_SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    @contextmanager
+    def _transaction(self):
+        self.conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield self.conn
+        except BaseException:
+            self.conn.execute('ROLLBACK')
+            raise
+        self.conn.execute('COMMIT')
+
+    # ------------------------------------------------------------------
+    # 协调端
+    # ------------------------------------------------------------------
+
+    def submit(self, path, output_dir, chunk_pages=DEFAULT_CHUNK_PAGES):
+        """
+        登记一个文档，按页范围拆分任务
+
+        Args:
+            path: 文档路径（各节点都能访问的路径）
+            output_dir: 该文档的输出目录
+            chunk_pages: 每个任务的页数
+
+        Returns:
+            作业 ID
+        """
+        from page_source import count_pages
+
+        path = os.path.abspath(path)
+        pages = count_pages(path)
+        chunk_pages = max(1, chunk_pages)
+        with self._transaction() as conn:
+            job_id = conn.execute(
+                'INSERT INTO jobs (path, output_dir, pages, submitted) VALUES (?, ?, ?, ?)',
+                (path, os.path.abspath(output_dir), pages, time.time())).lastrowid
+            conn.executemany(
+                'INSERT INTO tasks (job_id, start_page, stop_page) VALUES (?, ?, ?)',
+                [(job_id, start, min(pages, start + chunk_pages))
+                 for start in range(0, pages, chunk_pages)])
+        return job_id
+
+    def job(self, job_id):
+        row = self.conn.execute(
+            'SELECT job_id, path, output_dir, pages, status, submitted, finished, error '
+            'FROM jobs WHERE job_id = ?', (job_id,)).fetchone()
+        if row is None:
+            return None
+        keys = ('job_id', 'path', 'output_dir', 'pages', 'status', 'submitted', 'finished',
+                'error')
+        return dict(zip(keys, row))
+
+    def status(self):
+        """作业、任务、工作节点的汇总"""
+        jobs = dict(self.conn.execute('SELECT status, COUNT(*) FROM jobs GROUP BY status'))
+        tasks = dict(self.conn.execute('SELECT status, COUNT(*) FROM tasks GROUP BY status'))
+        now = time.time()
+        expired = self.conn.execute(
+            "SELECT COUNT(*) FROM tasks WHERE status = 'leased' AND lease_expires < ?",
+            (now,)).fetchone()[0]
+        reassigned = self.conn.execute('SELECT COALESCE(SUM(reassigned), 0) FROM tasks').fetchone()[0]
+        workers = [
+            {'worker': w, 'host': host, 'pid': pid, 'tasks_done': done, 'pages_done': pages,
+             'last_seen': round(now - heartbeat, 1)}
+            for w, host, pid, heartbeat, done, pages in self.conn.execute(
+                'SELECT worker, host, pid, heartbeat, tasks_done, pages_done FROM workers '
+                'ORDER BY worker')]
+        return {'jobs': jobs, 'tasks': tasks, 'expired_leases': expired,
+                'reassigned': reassigned, 'workers': workers}
+
+    def unfinished(self):
+        """未完成（既未完成也未失败）的作业数"""
+        return self.conn.execute(
+            "SELECT COUNT(*) FROM jobs WHERE status IN ('pending', 'assembling')").fetchone()[0]
+
+    # ------------------------------------------------------------------
+    # 工作端
+    # ------------------------------------------------------------------
+
+    def register_worker(self, worker):
+        now = time.time()
+        self.conn.execute(
+            'INSERT INTO workers (worker, host, pid, started, heartbeat) VALUES (?, ?, ?, ?, ?) '
+            'ON CONFLICT(worker) DO UPDATE SET host = excluded.host, pid = excluded.pid, '
+            'started = excluded.started, heartbeat = excluded.heartbeat',
+            (worker, socket.gethostname(), os.getpid(), now, now))
+
+    def claim(self, worker):
+        """
+        领取一个待处理或租约已过期的任务
+
+        Returns:
+            任务字典（含 lease_token），没有可领取的任务时返回 None
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            while True:
+                row = conn.execute(
+                    "SELECT t.task_id, t.job_id, t.start_page, t.stop_page, t.status, "
+                    "t.attempts, t.worker, j.path, j.output_dir, j.pages "
+                    "FROM tasks t JOIN jobs j ON j.job_id = t.job_id "
+                    "WHERE j.status = 'pending' AND (t.status = 'pending' OR "
+                    "(t.status = 'leased' AND t.lease_expires < ?)) "
+                    "ORDER BY t.job_id, t.start_page LIMIT 1", (now,)).fetchone()
+                if row is None:
+                    return None
+                (task_id, job_id, start, stop, status, attempts, previous, path, output_dir,
+                 pages) = row
+                expired = status == 'leased'
+                if expired and attempts >= self.max_attempts:
+                    # 最后一次尝试也没有按时完成
+                    self._fail_task(conn, task_id, job_id,
+                                    f"租约过期（节点 {previous}），已尝试 {attempts} 次")
+                    continue
+                token = uuid.uuid4().hex
+                conn.execute(
+                    "UPDATE tasks SET status = 'leased', worker = ?, lease_token = ?, "
+                    "lease_expires = ?, attempts = attempts + 1, "
+                    "reassigned = reassigned + ?, updated = ? WHERE task_id = ?",
+                    (worker, token, now + self.lease_seconds, int(expired), now, task_id))
+                if expired:
+                    print(f"[重新分配] 任务 {task_id}（{os.path.basename(path)} 第 "
+                          f"{start + 1}-{stop} 页）租约已过期，原节点 {previous}")
+                return {'task_id': task_id, 'job_id': job_id, 'start_page': start,
+                        'stop_page': stop, 'path': path, 'output_dir': output_dir,
+                        'pages': pages, 'lease_token': token, 'attempt': attempts + 1}
+
+    def heartbeat(self, worker, task=None):
+        """
+        续约当前任务并刷新节点心跳
+
+        Returns:
+            租约仍属于本节点时为 True（无任务时总为 True）
+        """
+        now = time.time()
+        self.conn.execute('UPDATE workers SET heartbeat = ? WHERE worker = ?', (now, worker))
+        if task is None:
+            return True
+        cursor = self.conn.execute(
+            "UPDATE tasks SET lease_expires = ?, updated = ? "
+            "WHERE task_id = ? AND lease_token = ? AND status = 'leased'",
+            (now + self.lease_seconds, now, task['task_id'], task['lease_token']))
+        return cursor.rowcount == 1
+
+    def complete(self, worker, task, pages):
+        """
+        提交任务结果
+
+        Args:
+            worker: 节点名
+            task: claim 返回的任务
+            pages: 逐页结果 [{'page_index', 'rec_texts', 'rec_polys', 'rec_scores',
+                'lines'}, ...]
+
+        Returns:
+            结果被接受时为 True；租约已被重新分配时为 False（结果丢弃）
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE tasks SET status = 'done', result = ?, lease_expires = NULL, "
+                "error = NULL, updated = ? "
+                "WHERE task_id = ? AND lease_token = ? AND status = 'leased'",
+                (json.dumps(pages, ensure_ascii=False), now, task['task_id'],
+                 task['lease_token']))
+            if cursor.rowcount != 1:
+                return False
+            conn.execute(
+                'UPDATE workers SET tasks_done = tasks_done + 1, pages_done = pages_done + ?, '
+                'heartbeat = ? WHERE worker = ?', (len(pages), now, worker))
+        return True
+
+    def fail(self, task, error):
+        """
+        任务处理失败：未达到尝试上限时放回队列，否则作业失败
+
+        Returns:
+            任务是否放回了队列
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT attempts FROM tasks WHERE task_id = ? AND lease_token = ? "
+                "AND status = 'leased'", (task['task_id'], task['lease_token'])).fetchone()
+            if row is None:
+                return False
+            if row[0] < self.max_attempts:
+                conn.execute(
+                    "UPDATE tasks SET status = 'pending', lease_token = NULL, "
+                    "lease_expires = NULL, error = ?, updated = ? WHERE task_id = ?",
+                    (error, now, task['task_id']))
+                return True
+            self._fail_task(conn, task['task_id'], task['job_id'], error)
+            return False
+
+    def _fail_task(self, conn, task_id, job_id, error):
+        now = time.time()
+        conn.execute(
+            "UPDATE tasks SET status = 'failed', lease_token = NULL, lease_expires = NULL, "
+            "error = ?, updated = ? WHERE task_id = ?", (error, now, task_id))
+        conn.execute(
+            "UPDATE jobs SET status = 'failed', finished = ?, error = ? "
+            "WHERE job_id = ? AND status = 'pending'", (now, error, job_id))
+
+    # ------------------------------------------------------------------
+    # 汇总
+    # ------------------------------------------------------------------
+
+    # 汇总中的作业：finished 列记录领取汇总的时间，超过 lease_seconds 视为汇总节点已失联
+    _ASSEMBLE_CLAIMABLE = ("(j.status = 'pending' OR (j.status = 'assembling' AND j.finished < ?)) "
+                           "AND NOT EXISTS (SELECT 1 FROM tasks t WHERE t.job_id = j.job_id "
+                           "AND t.status != 'done')")
+
+    def ready_jobs(self):
+        """全部任务已完成、尚未汇总（或汇总节点已失联）的作业 ID"""
+        return [row[0] for row in self.conn.execute(
+            f"SELECT j.job_id FROM jobs j WHERE {self._ASSEMBLE_CLAIMABLE}",
+            (time.time() - self.lease_seconds,))]
+
+    def _claim_assembly(self, job_id):
+        """在事务中领取作业的汇总，已被其他节点领取时返回 False"""
+        now = time.time()
+        with self._transaction() as conn:
+            cur = conn.execute(
+                f"UPDATE jobs SET status = 'assembling', finished = ? WHERE job_id = "
+                f"(SELECT j.job_id FROM jobs j WHERE j.job_id = ? AND {self._ASSEMBLE_CLAIMABLE})",
+                (now, job_id, now - self.lease_seconds))
+        return cur.rowcount == 1
+
+    def assemble(self, job_id):
+        """
+        按页序合并作业的各任务结果，写入 document.txt 和 document_result.npz
+
+        先在事务中领取汇总，同一作业只由一个节点汇总；临时文件名带节点唯一后缀，
+        写完后再替换。汇总失败时放回，由之后的节点重试。
+
+        Returns:
+            汇总后的作业字典；作业已由其他节点汇总（或正在汇总）时返回 None
+        """
+        if not self._claim_assembly(job_id):
+            return None
+        try:
+            self._write_document(job_id)
+        except BaseException:
+            with self._transaction() as conn:
+                conn.execute("UPDATE jobs SET status = 'pending', finished = NULL "
+                             "WHERE job_id = ? AND status = 'assembling'", (job_id,))
+            raise
+
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'done', finished = ? WHERE job_id = ? "
+                "AND status = 'assembling'", (time.time(), job_id))
+        return self.job(job_id)
+
+    def _write_document(self, job_id):
+        """写出 document.txt 和 document_result.npz"""
+        from compact_result import DocumentResult
+
+        job = self.job(job_id)
+        rows = self.conn.execute(
+            "SELECT start_page, result FROM tasks WHERE job_id = ? AND status = 'done' "
+            "ORDER BY start_page", (job_id,)).fetchall()
+        document = DocumentResult(job['path'])
+        page_texts = []
+        for _, result in rows:
+            for page in json.loads(result):
+                document.add_page(page['rec_texts'], page['rec_polys'], page['rec_scores'],
+                                  page['page_index'])
+                page_texts.append('\n'.join(page['lines']))
+
+        os.makedirs(job['output_dir'], exist_ok=True)
+        # 接手失联节点的汇总时，旧节点可能仍在写：临时文件名互不相同
+        suffix = f".{os.getpid()}-{uuid.uuid4().hex[:8]}.part"
+        txt_path = os.path.join(job['output_dir'], 'document.txt')
+        with open(txt_path + suffix, 'w', encoding='utf-8') as f:
+            f.write('\n\n'.join(page_texts))
+        os.replace(txt_path + suffix, txt_path)
+        npz_path = os.path.join(job['output_dir'], 'document_result.npz')
+        document.save(npz_path + suffix + '.npz')
+        os.replace(npz_path + suffix + '.npz', npz_path)
+
+
+def collect_pages(output_dir, start_page, stop_page):
+    """
+    读取 process_file 为页范围写出的各页 JSON 和按阅读顺序排列的文本
+
+    Returns:
+        [{'page_index', 'rec_texts', 'rec_polys', 'rec_scores', 'lines'}, ...]
+    """
+    import glob
+
+    pages = []
+    for page_index in range(start_page, stop_page):
+        page_dir = os.path.join(output_dir, f"page_{page_index + 1:03d}_result")
+        json_paths = glob.glob(os.path.join(page_dir, '*_res.json'))
+        if not json_paths:
+            raise FileNotFoundError(f"缺少第 {page_index + 1} 页的结果: {page_dir}")
+        with open(json_paths[0], 'r', encoding='utf-8') as f:
+            res = json.load(f)['res']
+        txt_path = os.path.join(page_dir, f"page_{page_index + 1:03d}_result.txt")
+        with open(txt_path, 'r', encoding='utf-8') as f:
+            lines = [line for line in f.read().split('\n') if line]
+        pages.append({'page_index': page_index, 'rec_texts': res.get('rec_texts', []),
+                      'rec_polys': res.get('rec_polys', []),
+                      'rec_scores': res.get('rec_scores', []), 'lines': lines})
+    return pages
+
+
+def staging_dir(task):
+    """本次租约的页结果暂存目录（与输出目录在同一文件系统，便于改名）"""
+    return os.path.join(task['output_dir'], STAGING_DIR,
+                        f"task{task['task_id']}-{task['lease_token'][:8]}")
+
+
+def publish_pages(staging, output_dir):
+    """
+    把暂存目录中的页结果目录改名到输出目录（替换旧结果），然后删除暂存目录
+
+    只在 complete 接受结果之后调用：同一任务只有一次尝试的结果会被发布。
+    """
+    for name in sorted(os.listdir(staging)):
+        src = os.path.join(staging, name)
+        dest = os.path.join(output_dir, name)
+        old = None
+        if os.path.exists(dest):
+            # 目录不能直接覆盖非空目录：先把旧结果移开
+            old = f"{dest}.{uuid.uuid4().hex[:8]}.old"
+            os.rename(dest, old)
+        os.rename(src, dest)
+        if old is not None:
+            shutil.rmtree(old, ignore_errors=True)
+    shutil.rmtree(staging, ignore_errors=True)
+    try:
+        # 其他任务仍在暂存时目录非空，保留
+        os.rmdir(os.path.dirname(staging))
+    except OSError:
+        pass
+
+
+class LeaseLost(Exception):
+    """租约超时或已被重新分配，停止处理当前任务"""
+
+
+class _Heartbeat(threading.Thread):
+    """后台续约线程：每 lease_seconds / 4 续约一次，超过 task_timeout 后停止"""
+
+    def __init__(self, db_path, worker, lease_seconds, task_timeout):
+        super().__init__(daemon=True, name='lease-heartbeat')
+        self.db_path = db_path
+        self.worker = worker
+        self.lease_seconds = lease_seconds
+        self.task_timeout = task_timeout
+        self.interval = max(0.5, lease_seconds / 4)
+        self._lock = threading.Lock()
+        self._task = None
+        self._task_started = 0.0
+        self._stop_event = threading.Event()
+        # 当前任务不再属于本节点（超时或被重新分配）时记录原因
+        self.lost = None
+
+    def set_task(self, task):
+        with self._lock:
+            self._task = task
+            self._task_started = time.time()
+            self.lost = None
+
+    def check(self, *_):
+        """process_file 的进度回调：每页开始前检查租约，已失去时抛出 LeaseLost"""
+        if self.lost is not None:
+            raise LeaseLost(self.lost)
+
+    def run(self):
+        store = JobStore(self.db_path, self.lease_seconds)
+        try:
+            while not self._stop_event.wait(self.interval):
+                with self._lock:
+                    task = self._task
+                    elapsed = time.time() - self._task_started
+                if task is not None and elapsed > self.task_timeout:
+                    # 任务超时：不再续约，租约到期后由其他节点重新领取
+                    with self._lock:
+                        if self._task is task:
+                            self.lost = f"处理超过 {self.task_timeout:g}s"
+                    task = None
+                try:
+                    if not store.heartbeat(self.worker, task):
+                        # 租约已被重新分配：本节点的结果提交时会被丢弃
+                        print(f"[警告] 任务 {task['task_id']} 的租约已失效")
+                        with self._lock:
+                            if self._task is task:
+                                self._task = None
+                                self.lost = "租约已被重新分配"
+                except sqlite3.OperationalError as e:
+                    print(f"[警告] 心跳写入失败: {e}")
+        finally:
+            store.close()
+
+    def stop(self):
+        self._stop_event.set()
+
+
+def run_worker(db_path, worker=None, det_model_path=None, rec_model_path=None,
+               lease_seconds=DEFAULT_LEASE_SECONDS, task_timeout=DEFAULT_TASK_TIMEOUT,
+               max_attempts=DEFAULT_MAX_ATTEMPTS, exit_when_idle=False, ocr_options=None):
+    """
+    工作节点主循环：领取任务 → 识别页范围 → 提交结果 → 汇总已完成的作业
+
+    Args:
+        db_path: 作业库路径
+        worker: 节点名，缺省为 主机名-PID
+        det_model_path / rec_model_path: 模型目录，缺省为本项目 testmodel 下的模型
+        lease_seconds: 租约时长
+        task_timeout: 单个任务最长处理时间
+        max_attempts: 任务最多尝试次数
+        exit_when_idle: 没有未完成的作业时退出（本机模拟时使用）
+        ocr_options: 传给 init_ocr_model 的其他参数
+
+    Returns:
+        本节点完成的任务数
+    """
+    import traceback
+    from ocr_engine import init_ocr_model, process_file
+
+    worker = worker or f"{socket.gethostname()}-{os.getpid()}"
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    det_model_path = det_model_path or os.path.join(base_dir, "testmodel",
+                                                    "PP-OCRv5_mobile_det_infer")
+    rec_model_path = rec_model_path or os.path.join(base_dir, "testmodel",
+                                                    "PP-OCRv5_mobile_rec_infer")
+
+    # 先加载模型再领取任务，模型加载失败的节点不会占用租约
+    ocr = init_ocr_model(det_model_path, rec_model_path, **(ocr_options or {}))
+    store = JobStore(db_path, lease_seconds, max_attempts)
+    store.register_worker(worker)
+    heartbeat = _Heartbeat(db_path, worker, lease_seconds, task_timeout)
+    heartbeat.start()
+    done = 0
+    try:
+        while True:
+            task = store.claim(worker)
+            if task is None:
+                for job_id in store.ready_jobs():
+                    _assemble(store, job_id)
+                if exit_when_idle and not store.unfinished():
+                    break
+                time.sleep(POLL_INTERVAL)
+                continue
+
+            heartbeat.set_task(task)
+            name = os.path.basename(task['path'])
+            page_range = (task['start_page'], task['stop_page'])
+            print(f"[{worker}] 领取任务 {task['task_id']}: {name} 第 "
+                  f"{page_range[0] + 1}-{page_range[1]} 页（第 {task['attempt']} 次尝试）")
+            # 每次尝试写入自己的暂存目录，与接手同一任务的节点互不干扰
+            staging = staging_dir(task)
+            try:
+                process_file(task['path'], ocr, staging, page_range=page_range,
+                             progress_callback=heartbeat.check)
+                heartbeat.check()
+                pages = collect_pages(staging, *page_range)
+            except LeaseLost as e:
+                heartbeat.set_task(None)
+                shutil.rmtree(staging, ignore_errors=True)
+                print(f"[{worker}] 任务 {task['task_id']} 已停止（{e}），结果丢弃")
+                continue
+            except Exception as e:
+                heartbeat.set_task(None)
+                shutil.rmtree(staging, ignore_errors=True)
+                requeued = store.fail(task, f"{type(e).__name__}: {e}\n{traceback.format_exc()}")
+                print(f"[{worker}] 任务 {task['task_id']} 失败: {e}"
+                      f"{'，已放回队列' if requeued else ''}")
+                continue
+            heartbeat.set_task(None)
+
+            if store.complete(worker, task, pages):
+                publish_pages(staging, task['output_dir'])
+                done += 1
+                if task['job_id'] in store.ready_jobs():
+                    _assemble(store, task['job_id'])
+            else:
+                shutil.rmtree(staging, ignore_errors=True)
+                print(f"[{worker}] 任务 {task['task_id']} 的租约已被重新分配，结果丢弃")
+    finally:
+        heartbeat.stop()
+        store.close()
+    return done
+
+
+def _assemble(store, job_id):
+    try:
+        job = store.assemble(job_id)
+    except Exception as e:
+        # 汇总失败不影响节点继续处理其他任务，作业已放回，之后重试
+        print(f"[警告] 作业 {job_id} 汇总失败: {type(e).__name__}: {e}")
+        return
+    if job is None:
+        return
+    print(f"[完成] {os.path.basename(job['path'])}（{job['pages']} 页，"
+          f"{job['finished'] - job['submitted']:.1f}s）→ "
+          f"{os.path.join(job['output_dir'], 'document.txt')}")
+
+
+def _worker_entry(db_path, worker, kwargs):
+    """本机模拟模式下的工作进程入口"""
+    import signal
+
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    run_worker(db_path, worker, exit_when_idle=True, **kwargs)
+
+
+def run_local(paths, workers=2, db_path=None, output_root="output",
+              chunk_pages=DEFAULT_CHUNK_PAGES, **worker_kwargs):
+    """
+    本机模拟多节点：提交文档，启动多个工作进程，等待全部作业结束
+
+    Returns:
+        作业字典列表
+    """
+    import multiprocessing
+
+    db_path = db_path or os.path.join(output_root, "jobs.db")
+    store = JobStore(db_path, worker_kwargs.get('lease_seconds', DEFAULT_LEASE_SECONDS),
+                     worker_kwargs.get('max_attempts', DEFAULT_MAX_ATTEMPTS))
+    job_ids = []
+    for path in paths:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        job_ids.append(store.submit(path, os.path.join(output_root, stem), chunk_pages))
+    print(f"已提交 {len(job_ids)} 个文档，{workers} 个工作进程")
+
+    ctx = multiprocessing.get_context('spawn')
+    processes = [ctx.Process(target=_worker_entry,
+                             args=(db_path, f"local-{i + 1}", worker_kwargs))
+                 for i in range(workers)]
+    start = time.perf_counter()
+    for process in processes:
+        process.start()
+    try:
+        while any(p.is_alive() for p in processes):
+            time.sleep(POLL_INTERVAL)
+            summary = store.status()
+            print(f"进度: 任务 {summary['tasks']}，重新分配 {summary['reassigned']}")
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
+        raise
+    for process in processes:
+        process.join()
+    print(f"总耗时 {time.perf_counter() - start:.1f}s")
+    jobs = [store.job(job_id) for job_id in job_ids]
+    store.close()
+    return jobs
+
+
+def print_status(summary):
+    print(f"作业: {summary['jobs']}")
+    print(f"任务: {summary['tasks']}（租约过期 {summary['expired_leases']}，"
+          f"累计重新分配 {summary['reassigned']}）")
+    for w in summary['workers']:
+        print(f"  {w['worker']:<24} {w['host']:<16} 完成 {w['tasks_done']} 个任务 / "
+              f"{w['pages_done']} 页，{w['last_seen']:.0f}s 前心跳")
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="基于 SQLite 的多节点分片识别")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('submit', help="提交文档")
+    p.add_argument('db', help="作业库路径")
+    p.add_argument('paths', nargs='+', help="文档路径")
+    p.add_argument('--output', default="output", help="输出根目录（每个文档一个子目录）")
+    p.add_argument('--chunk-pages', type=int, default=DEFAULT_CHUNK_PAGES,
+                   help=f"每个任务的页数（默认 {DEFAULT_CHUNK_PAGES}）")
+
+    p = sub.add_parser('status', help="查看进度")
+    p.add_argument('db', help="作业库路径")
+
+    for name, help_text in (('worker', "启动工作节点"), ('run', "本机多进程模拟多节点")):
+        p = sub.add_parser(name, help=help_text)
+        if name == 'worker':
+            p.add_argument('db', help="作业库路径")
+            p.add_argument('--name', help="节点名（默认 主机名-PID）")
+            p.add_argument('--exit-when-idle', action='store_true',
+                           help="没有未完成的作业时退出")
+        else:
+            p.add_argument('paths', nargs='+', help="文档路径")
+            p.add_argument('--db', help="作业库路径（默认 <output>/jobs.db）")
+            p.add_argument('--output', default="output", help="输出根目录")
+            p.add_argument('--workers', type=int, default=None,
+                           help="工作进程数（默认采用调优档案的拆分，无档案时为 2）")
+            p.add_argument('--chunk-pages', type=int, default=DEFAULT_CHUNK_PAGES,
+                           help=f"每个任务的页数（默认 {DEFAULT_CHUNK_PAGES}）")
+        p.add_argument('--lease-seconds', type=float, default=DEFAULT_LEASE_SECONDS,
+                       help=f"租约时长（默认 {DEFAULT_LEASE_SECONDS}s）")
+        p.add_argument('--task-timeout', type=float, default=DEFAULT_TASK_TIMEOUT,
+                       help=f"单个任务最长处理时间（默认 {DEFAULT_TASK_TIMEOUT}s）")
+        p.add_argument('--max-attempts', type=int, default=DEFAULT_MAX_ATTEMPTS,
+                       help=f"任务最多尝试次数（默认 {DEFAULT_MAX_ATTEMPTS}）")
+    args = parser.parse_args()
+
+    if args.command == 'submit':
+        store = JobStore(args.db)
+        for path in args.paths:
+            stem = os.path.splitext(os.path.basename(path))[0]
+            job_id = store.submit(path, os.path.join(args.output, stem), args.chunk_pages)
+            job = store.job(job_id)
+            print(f"作业 {job_id}: {path}（{job['pages']} 页）→ {job['output_dir']}")
+        store.close()
+        return 0
+    if args.command == 'status':
+        store = JobStore(args.db)
+        print_status(store.status())
+        store.close()
+        return 0
+
+    worker_kwargs = {'lease_seconds': args.lease_seconds, 'task_timeout': args.task_timeout,
+                     'max_attempts': args.max_attempts}
+    if args.command == 'worker':
+        run_worker(args.db, args.name, exit_when_idle=args.exit_when_idle, **worker_kwargs)
+        return 0
+
+    from ocr_tuner import resolve_workers
+
+    workers, ocr_options = resolve_workers(args.workers, default=2)
+    jobs = run_local(args.paths, workers, args.db, args.output, args.chunk_pages,
+                     ocr_options=ocr_options, **worker_kwargs)
+    failed = [job for job in jobs if job['status'] != 'done']
+    for job in failed:
+        reason = job['error'].splitlines()[0] if job['error'] else job['status']
+        print(f"[失败] {job['path']}: {reason}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
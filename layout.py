@@ -0,0 +1,457 @@
+"""
+========================================================
+版面分析：阅读顺序与行 / 段落 / 分栏重建
+========================================================
+
+功能说明：
+    rec_texts 按检测顺序排列，多栏页面和表格直接拼接会错乱。
+    本模块在文本框坐标数组上用 NumPy 计算阅读顺序：
+        - 分栏 / 分段：递归 XY 切分。对一组文本框求 x（或 y）方向投影的空隙，
+          空隙 ≥ col_gap 倍字高时按列切开（从左到右），
+          否则空隙 ≥ para_gap 倍字高时按段切开（从上到下）；
+          每层一次切出所有空隙，投影空隙用排序 + 累积最大值求得，不逐框比较。
+          横向切出的相邻横条若栏间空隙对齐则合并后再分栏，
+          两栏段落在同一高度断开时不会左右交错。
+          按列切开要求至少两栏各有 MIN_COLUMN_LINES 行，合并横条要求每条
+          在栏间空隙两侧各有 MIN_BAND_LINES 行：表单 / 发票中"姓名: 张三"
+          这类标签与值之间的空隙不会被当作分栏；行数再多，只要空隙两侧
+          逐行配对且一侧很窄（标签），同样按行读出
+        - 分行：段落内按中心 y 排序，相邻中心差超过 line_gap 倍字高处换行，
+          行内按 x 排序
+
+    结果写入 JSON（"layout" 字段）和 txt（按阅读顺序，段落间空一行）。
+
+    跨栏标题、页眉页脚会先被横向切开，不影响下面的分栏；
+    表格中列间距大于行间距、且行数达到 MIN_COLUMN_LINES 时按列读出。
+
+运行方式：
+    python layout.py output/page_001_result/xxx_res.json   # 按阅读顺序打印
+    python layout.py --benchmark --boxes 5000               # 性能测试
+========================================================
+"""
+
+import os
+import sys
+import glob
+import json
+
+import numpy as np
+
+
+# 以下阈值均为字高（文本框高度中位数）的倍数
+COLUMN_GAP = 1.0
+PARAGRAPH_GAP = 0.6
+LINE_GAP = 0.5
+# 按列切开时，至少两栏需达到的行数
+MIN_COLUMN_LINES = 3
+# 合并横条时，每条横条在栏间空隙两侧需达到的行数
+MIN_BAND_LINES = 2
+# 空隙两侧逐行配对的文本框比例达到此值、且较窄一侧的宽度中位数不足
+# MIN_COLUMN_WIDTH 倍字高时，视为表单的"标签 值"行而不是分栏
+ROW_PAIR_RATIO = 0.6
+MIN_COLUMN_WIDTH = 12
+
+
+def box_bounds(polys):
+    """
+    文本框多边形 → 外接矩形
+
+    Args:
+        polys: (N, K, 2) 数组或多边形列表
+
+    Returns:
+        (N, 4) float32 数组，每行 [x0, y0, x1, y1]
+    """
+    if isinstance(polys, np.ndarray) and polys.ndim == 3:
+        pts = polys.astype(np.float32, copy=False)
+    elif len(polys) and len({np.shape(p) for p in polys}) == 1:
+        pts = np.asarray(polys, dtype=np.float32).reshape(len(polys), -1, 2)
+    else:
+        return np.array([np.concatenate([np.min(np.reshape(p, (-1, 2)), axis=0),
+                                         np.max(np.reshape(p, (-1, 2)), axis=0)])
+                         for p in polys], dtype=np.float32).reshape(-1, 4)
+    return np.concatenate([pts.min(axis=1), pts.max(axis=1)], axis=1)
+
+
+def _projection_gaps(start, end, min_gap):
+    """
+    求一组区间投影中不小于 min_gap 的空隙
+
+    Returns:
+        (按起点排序的下标, 切分位置, 空隙区间 (k, 2))；
+        切分位置 i 表示排序后第 i 与 i+1 个之间有空隙
+    """
+    order = np.argsort(start, kind='stable')
+    reach = np.maximum.accumulate(end[order])
+    sorted_start = start[order]
+    cuts = np.flatnonzero(sorted_start[1:] - reach[:-1] >= min_gap)
+    return order, cuts, np.stack([reach[cuts], sorted_start[cuts + 1]], axis=1)
+
+
+def _shared_gutter(a, b, min_gap):
+    """两组栏间空隙是否有重叠不小于 min_gap 的部分"""
+    if not len(a) or not len(b):
+        return False
+    overlap = (np.minimum(a[:, None, 1], b[None, :, 1])
+               - np.maximum(a[:, None, 0], b[None, :, 0]))
+    return bool((overlap >= min_gap).any())
+
+
+def _line_count(box, line_gap):
+    """按中心 y 估计一组文本框的行数"""
+    center = np.sort((box[:, 1] + box[:, 3]) * 0.5)
+    return 1 + int(np.count_nonzero(np.diff(center) > line_gap))
+
+
+def _paired_rows(left, right, line_gap):
+    """
+    空隙两侧的文本框是否逐行配对（表单的"标签 值"行）
+
+    正文分栏的行同样可能对齐在同一高度，因此还要求较窄一侧足够窄：
+    标签只有几个字宽，正文栏的行宽通常远大于 MIN_COLUMN_WIDTH 倍字高。
+    两侧都要大部分有配对，短侧栏与长正文并排时不会被当作表单。
+    """
+    both = np.concatenate([left, right])
+    height = float(np.median(both[:, 3] - both[:, 1]))
+    width = min(float(np.median(left[:, 2] - left[:, 0])),
+                float(np.median(right[:, 2] - right[:, 0])))
+    if width >= MIN_COLUMN_WIDTH * height:
+        return False
+    centers = [np.sort((side[:, 1] + side[:, 3]) * 0.5) for side in (left, right)]
+    for own, other in (centers, centers[::-1]):
+        pos = np.searchsorted(other, own)
+        below = other[np.maximum(pos - 1, 0)]
+        above = other[np.minimum(pos, len(other) - 1)]
+        nearest = np.minimum(np.abs(own - below), np.abs(own - above))
+        if np.mean(nearest <= line_gap) < ROW_PAIR_RATIO:
+            return False
+    return True
+
+
+def _is_column_split(parts, bounds, line_gap, min_lines=MIN_COLUMN_LINES):
+    """
+    按列切出的各部分是否构成分栏
+
+    至少两栏达到 min_lines 行，且相邻两部分不是逐行配对的表单行。
+    """
+    if sum(_line_count(bounds[part], line_gap) >= min_lines for part in parts) < 2:
+        return False
+    return not any(_paired_rows(bounds[a], bounds[b], line_gap)
+                   for a, b in zip(parts, parts[1:]))
+
+
+def _merge_column_bands(parts, bounds, col_gap, line_gap):
+    """
+    合并栏间空隙对齐的相邻横条
+
+    两栏的段落恰好在同一高度断开时，横向切分会把两栏切成若干横条，
+    逐条读会左右交错；栏间空隙重叠的相邻横条合并后再按列切分。
+    空隙两侧不足 MIN_BAND_LINES 行的横条（如表单的一行"标签 值"）不参与合并。
+
+    Returns:
+        [(文本框下标, 是否为合并区域), ...]
+    """
+    merged = []
+    last_gutters = None
+    for part in parts:
+        box = bounds[part]
+        order, cuts, gutters = _projection_gaps(box[:, 0], box[:, 2], col_gap)
+        if cuts.size and not _is_column_split(np.split(part[order], cuts + 1), bounds,
+                                              line_gap, MIN_BAND_LINES):
+            gutters = gutters[:0]
+        if merged and last_gutters is not None and _shared_gutter(last_gutters, gutters, col_gap):
+            ids = np.concatenate([merged[-1][0], part])
+            box = bounds[ids]
+            merged[-1] = (ids, True)
+            last_gutters = _projection_gaps(box[:, 0], box[:, 2], col_gap)[2]
+        else:
+            merged.append((part, False))
+            last_gutters = gutters
+    return merged
+
+
+def _xy_cut(ids, bounds, col_gap, para_gap, line_gap, out, column=None, skip=None,
+            merge=True):
+    """
+    递归 XY 切分，按阅读顺序把段落 (文本框下标, 栏号) 追加到 out
+
+    Args:
+        ids: 当前区域的文本框下标
+        bounds: 全部文本框外接矩形
+        col_gap / para_gap / line_gap: 分栏 / 分段 / 分行空隙阈值（像素）
+        out: 输出列表
+        column: 当前所在栏号（尚未分栏时为 None）
+        skip: 刚切过的方向，子区域在该方向上不会再有空隙
+        merge: 横向切分后是否合并栏间空隙对齐的横条（合并区域内不再合并）
+    """
+    if len(ids) > 1:
+        box = bounds[ids]
+        if skip != 'x':
+            order, cuts, _ = _projection_gaps(box[:, 0], box[:, 2], col_gap)
+            parts = np.split(ids[order], cuts + 1) if cuts.size else None
+            if parts is not None and _is_column_split(parts, bounds, line_gap):
+                for j, part in enumerate(parts):
+                    _xy_cut(part, bounds, col_gap, para_gap, line_gap, out,
+                            j if column is None else column, 'x')
+                return
+        if skip != 'y':
+            order, cuts, _ = _projection_gaps(box[:, 1], box[:, 3], para_gap)
+            if cuts.size:
+                parts = np.split(ids[order], cuts + 1)
+                bands = (_merge_column_bands(parts, bounds, col_gap, line_gap) if merge
+                         else [(part, False) for part in parts])
+                for part, is_merged in bands:
+                    # 合并区域有共同的栏间空隙，下一层先尝试按列切开
+                    _xy_cut(part, bounds, col_gap, para_gap, line_gap, out, column,
+                            None if is_merged else 'y', merge=not is_merged)
+                return
+    out.append((ids, column or 0))
+
+
+def _split_lines(ids, bounds, line_gap):
+    """
+    段落内分行
+
+    Returns:
+        (按阅读顺序排列的文本框下标, 各行起始位置)
+    """
+    if len(ids) == 1:
+        return ids, np.zeros(1, dtype=np.intp)
+    box = bounds[ids]
+    center = (box[:, 1] + box[:, 3]) * 0.5
+    order = np.argsort(center, kind='stable')
+    line_id = np.concatenate([[0], np.cumsum(np.diff(center[order]) > line_gap)])
+    ordered = ids[order]
+    ordered = ordered[np.lexsort((bounds[ordered, 0], line_id))]
+    return ordered, np.concatenate([[0], np.flatnonzero(np.diff(line_id)) + 1])
+
+
+def _group_bounds(bounds, starts):
+    """按起始位置分组求外接矩形"""
+    return np.stack([np.minimum.reduceat(bounds[:, 0], starts),
+                     np.minimum.reduceat(bounds[:, 1], starts),
+                     np.maximum.reduceat(bounds[:, 2], starts),
+                     np.maximum.reduceat(bounds[:, 3], starts)], axis=1)
+
+
+def char_height(bounds):
+    """字高估计：横排文本框高度的中位数"""
+    if not len(bounds):
+        return 0.0
+    width = bounds[:, 2] - bounds[:, 0]
+    height = bounds[:, 3] - bounds[:, 1]
+    horizontal = height[width >= height]
+    return float(np.median(horizontal if horizontal.size else height))
+
+
+def analyze_layout(polys, texts=None, col_gap=COLUMN_GAP, para_gap=PARAGRAPH_GAP,
+                   line_gap=LINE_GAP):
+    """
+    计算一页的阅读顺序与行 / 段落 / 分栏结构
+
+    Args:
+        polys: rec_polys
+        texts: rec_texts（提供时每行附带拼接后的文本）
+        col_gap / para_gap / line_gap: 分栏 / 分段 / 分行阈值（字高的倍数）
+
+    Returns:
+        可 JSON 序列化的字典：
+        {
+            'reading_order': [文本框下标, ...],
+            'lines': [{'box_ids': [...], 'bbox': [x0, y0, x1, y1], 'text': ...}, ...],
+            'paragraphs': [{'line_ids': [...], 'column': 栏号, 'bbox': [...]}, ...],
+            'columns': 栏数,
+        }
+    """
+    bounds = box_bounds(polys if polys is not None else [])
+    layout = {'reading_order': [], 'lines': [], 'paragraphs': [], 'columns': 0}
+    if not len(bounds):
+        return layout
+
+    height = max(char_height(bounds), 1.0)
+    blocks = []
+    _xy_cut(np.arange(len(bounds)), bounds, col_gap * height, para_gap * height,
+            line_gap * height, blocks)
+
+    # 拼出全页阅读顺序，行 / 段落边界记为起始位置，外接矩形一次性分组归约
+    order, line_starts, para_starts, columns = [], [], [], []
+    n_boxes = n_lines = 0
+    for ids, column in blocks:
+        ordered, starts = _split_lines(ids, bounds, line_gap * height)
+        order.append(ordered)
+        line_starts.append(starts + n_boxes)
+        para_starts.append(n_lines)
+        columns.append(column)
+        n_boxes += len(ordered)
+        n_lines += len(starts)
+    order = np.concatenate(order)
+    line_starts = np.concatenate(line_starts)
+    ordered_bounds = bounds[order]
+    line_boxes = _group_bounds(ordered_bounds, line_starts).tolist()
+    para_boxes = _group_bounds(ordered_bounds, line_starts[para_starts]).tolist()
+
+    order = order.tolist()
+    line_ends = line_starts[1:].tolist() + [len(order)]
+    for start, end, bbox in zip(line_starts.tolist(), line_ends, line_boxes):
+        entry = {'box_ids': order[start:end], 'bbox': bbox}
+        if texts is not None:
+            entry['text'] = ' '.join(str(texts[i]) for i in entry['box_ids'])
+        layout['lines'].append(entry)
+    para_ends = para_starts[1:] + [n_lines]
+    for start, end, column, bbox in zip(para_starts, para_ends, columns, para_boxes):
+        layout['paragraphs'].append({'line_ids': list(range(start, end)),
+                                     'column': int(column), 'bbox': bbox})
+    layout['reading_order'] = order
+    layout['columns'] = max(columns) + 1
+    return layout
+
+
+def layout_text(layout, texts):
+    """
+    按阅读顺序组织文本：行内文本框以空格连接，段落之间空一行
+
+    Returns:
+        文本行列表（段落之间为空字符串）
+    """
+    out = []
+    for para in layout['paragraphs']:
+        if out:
+            out.append('')
+        for line_id in para['line_ids']:
+            line = layout['lines'][line_id]
+            out.append(line.get('text') or ' '.join(str(texts[i]) for i in line['box_ids']))
+    return out
+
+
+def add_layout_to_json(page_dir, layout, extra_fields=None):
+    """
+    把 layout 字段写入页目录中 save_to_json 生成的 *_res.json
+
+    Args:
+        page_dir: 页结果目录
+        layout: analyze_layout 的结果
+        extra_fields: 一并写入的其他字段（如 prefilter 预筛选结果）
+    """
+    for json_path in glob.glob(os.path.join(page_dir, '*_res.json')):
+        with open(json_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        target = data['res'] if isinstance(data.get('res'), dict) else data
+        target['layout'] = layout
+        if extra_fields:
+            target.update(extra_fields)
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=4)
+
+
+def save_ordered_outputs(res, page_dir, txt_path, extra_fields=None):
+    """
+    对一页结果做版面分析，把结构写入 JSON，按阅读顺序写 txt
+
+    需在 res.save_to_json(page_dir) 之后调用。extra_fields 中的字段
+    随 layout 一并写入 JSON。
+
+    Returns:
+        按阅读顺序排列的文本行（不含段落间空行）
+    """
+    texts = list(res.get('rec_texts', []))
+    layout = analyze_layout(res.get('rec_polys'), texts)
+    add_layout_to_json(page_dir, layout, extra_fields)
+    lines = layout_text(layout, texts)
+    with open(txt_path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines))
+    return [line for line in lines if line]
+
+
+def _synthetic_page(boxes, columns=2, seed=0):
+    """构造多栏页面：返回 (打乱顺序的文本框, 文本, 正确阅读顺序的文本)"""
+    rng = np.random.default_rng(seed)
+    per_column = boxes // columns
+    rows_per_para = 6
+    polys, labels = [], []
+    for col in range(columns):
+        x = 100 + col * 1100
+        for row in range(per_column):
+            y = 100 + row * 40 + (row // rows_per_para) * 30
+            w = rng.integers(600, 1000)
+            polys.append([[x, y], [x + w, y], [x + w, y + 30], [x, y + 30]])
+            labels.append(f"c{col}r{row}")
+    polys = np.asarray(polys, dtype=np.float32)
+    shuffle = rng.permutation(len(polys))
+    return polys[shuffle], [labels[i] for i in shuffle], labels
+
+
+def _synthetic_form(rows=5, seed=0):
+    """构造表单页面：每行"标签 值"，返回 (打乱顺序的文本框, 文本, 正确的行文本)"""
+    rng = np.random.default_rng(seed)
+    polys, labels, expected = [], [], []
+    for row in range(rows):
+        y = 100 + row * 40
+        label_w, value_w = rng.integers(80, 160), rng.integers(150, 600)
+        value_x = 100 + 160 + 60
+        polys.append([[100, y], [100 + label_w, y], [100 + label_w, y + 30], [100, y + 30]])
+        polys.append([[value_x, y], [value_x + value_w, y],
+                      [value_x + value_w, y + 30], [value_x, y + 30]])
+        labels += [f"label{row}:", f"value{row}"]
+        expected.append(f"label{row}: value{row}")
+    polys = np.asarray(polys, dtype=np.float32)
+    shuffle = rng.permutation(len(polys))
+    return polys[shuffle], [labels[i] for i in shuffle], expected
+
+
+def benchmark(boxes=5000, columns=2, repeat=5):
+    """
+    在合成的多栏页面上测试版面分析耗时并校验阅读顺序，
+    并校验表单页面按"标签 值"逐行读出
+
+    Returns:
+        {'boxes', 'ms', 'correct', 'form_correct', ...}
+    """
+    import time
+
+    polys, texts, expected = _synthetic_page(boxes, columns)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        layout = analyze_layout(polys, texts)
+        timings.append(time.perf_counter() - start)
+    ordered = [texts[i] for i in layout['reading_order']]
+
+    form_polys, form_texts, form_expected = _synthetic_form()
+    form_lines = layout_text(analyze_layout(form_polys, form_texts), form_texts)
+    return {'boxes': len(polys), 'ms': min(timings) * 1000, 'correct': ordered == expected,
+            'paragraphs': len(layout['paragraphs']), 'columns': layout['columns'],
+            'form_correct': form_lines == form_expected}
+
+
+def main():
+    """主函数"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='按阅读顺序重建识别结果')
+    parser.add_argument('json_files', nargs='*', help='save_to_json 生成的结果文件')
+    parser.add_argument('--benchmark', action='store_true', help='在合成页面上测试性能')
+    parser.add_argument('--boxes', type=int, default=5000, help='性能测试的文本框数')
+
+    args = parser.parse_args()
+
+    if args.benchmark:
+        stats = benchmark(args.boxes)
+        print(f"{stats['boxes']} 个文本框: {stats['ms']:.1f} ms, "
+              f"{stats['paragraphs']} 段, {stats['columns']} 栏, "
+              f"阅读顺序{'正确' if stats['correct'] else '错误'}，"
+              f"表单逐行{'正确' if stats['form_correct'] else '错误'}")
+        return 0 if stats['correct'] and stats['form_correct'] else 1
+
+    for json_path in args.json_files:
+        with open(json_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        res = data.get('res', data)
+        texts = res.get('rec_texts', [])
+        layout = analyze_layout(res.get('rec_polys', []), texts)
+        print(f"=== {json_path}（{layout['columns']} 栏, {len(layout['paragraphs'])} 段）===")
+        print('\n'.join(layout_text(layout, texts)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
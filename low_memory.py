@@ -0,0 +1,341 @@
+"""
+========================================================
+低内存处理模式
+========================================================
+
+功能说明：
+    面向内存较小的设备（Android 低端机），按内存预算逐页识别：
+        - 根据可用内存（/proc/meminfo 的 MemAvailable）计算每页像素上限，
+          超出时降低 PDF 渲染分辨率 / 图片解码分辨率
+        - 内存紧张时可视化图改为缩略图，进一步紧张时跳过
+        - 每页处理完成后释放中间结果并归还空闲内存（gc + malloc_trim）
+        - 进度回调报告真实的页进度
+
+    可通过人为设定内存上限在桌面端复现低内存行为：
+        - 参数 cap_mb，或环境变量 PPOCR_MEMORY_CAP_MB
+        - 设定上限后，可用内存 = min(系统可用内存, 上限 - 当前进程 RSS)
+
+运行方式（桌面测试）：
+    python low_memory.py 文件.pdf --cap-mb 600
+========================================================
+"""
+
+import os
+import gc
+import sys
+
+import cv2
+import numpy as np
+
+from layout import save_ordered_outputs
+from page_source import DEFAULT_PDF_DPI, count_pages, iter_pages, source_name
+
+
+MEMORY_CAP_ENV = 'PPOCR_MEMORY_CAP_MB'
+
+# 检测 + 识别处理一个像素大约占用的内存（渲染图、检测输入/特征图/概率图等，经验值）
+BYTES_PER_PIXEL = 64
+# 单页最多使用可用内存的比例，其余留给模型权重波动和系统
+PAGE_MEMORY_FRACTION = 0.5
+# 渲染的最小像素数，低于此值识别质量明显下降（约 A4 72 dpi）
+MIN_PAGE_PIXELS = 595 * 842
+# 可视化模式阈值（可用内存，MB）
+FULL_VIS_MIN_MB = 512
+THUMBNAIL_VIS_MIN_MB = 192
+THUMBNAIL_MAX_SIDE = 1024
+
+
+def read_meminfo_available():
+    """
+    读取系统可用内存
+
+    Returns:
+        可用字节数，无法读取时返回 None
+    """
+    try:
+        with open('/proc/meminfo', 'r') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def read_process_rss(pid=None):
+    """
+    读取进程的常驻内存 (RSS)
+
+    Args:
+        pid: 进程号，默认当前进程（其他进程只支持 Linux）
+
+    Returns:
+        RSS 字节数，无法读取时返回 None
+    """
+    try:
+        with open(f"/proc/{pid or 'self'}/statm", 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        if pid is not None:
+            return None
+    try:
+        import resource
+
+        # 非 Linux 平台退化为峰值 RSS（macOS 单位为字节，其余为 KB）
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+    except (ImportError, OSError):
+        return None
+
+
+def read_process_pss(pid=None):
+    """
+    读取进程的按比例分摊内存（仅 Linux，/proc/<pid>/smaps_rollup）
+
+    fork 出的工作进程与父进程共享未修改的内存页，RSS 会把共享页重复计入每个
+    进程；PSS 把共享页按共享进程数分摊，各进程 PSS 之和即实际占用。
+
+    Args:
+        pid: 进程号，默认当前进程
+
+    Returns:
+        {'rss', 'pss', 'uss', 'shared'}（字节；uss 为私有页），无法读取时返回 None
+    """
+    fields = {}
+    try:
+        with open(f"/proc/{pid or 'self'}/smaps_rollup", 'r') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[0].endswith(':') and parts[1].isdigit():
+                    fields[parts[0][:-1]] = int(parts[1]) * 1024
+    except OSError:
+        return None
+    if 'Pss' not in fields:
+        return None
+    uss = fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0)
+    return {'rss': fields.get('Rss', 0), 'pss': fields['Pss'], 'uss': uss,
+            'shared': fields.get('Shared_Clean', 0) + fields.get('Shared_Dirty', 0)}
+
+
+def release_memory():
+    """
+    释放上一页遗留的中间结果，并尽量把空闲堆内存归还给系统
+
+    推理框架的中间张量在 Python 对象释放后仍留在 glibc 的空闲链表中，
+    malloc_trim 可以让 RSS 真正下降（非 glibc 平台上静默跳过）。
+    """
+    gc.collect()
+    try:
+        import ctypes
+
+        libc = ctypes.CDLL(None)
+        libc.malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+    paddle = sys.modules.get('paddle')
+    if paddle is not None:
+        try:
+            if paddle.device.is_compiled_with_cuda():
+                paddle.device.cuda.empty_cache()
+        except Exception:
+            pass
+
+
+class MemoryBudget:
+    """
+    内存预算
+
+    用法：
+        budget = MemoryBudget(cap_mb=600)
+        budget.page_pixel_limit()   # 当前可渲染的每页像素上限
+        budget.visualization_mode() # 'full' / 'thumbnail' / 'skip'
+    """
+
+    def __init__(self, cap_mb=None, bytes_per_pixel=BYTES_PER_PIXEL,
+                 page_fraction=PAGE_MEMORY_FRACTION):
+        if cap_mb is None and os.environ.get(MEMORY_CAP_ENV):
+            cap_mb = float(os.environ[MEMORY_CAP_ENV])
+        self.cap_bytes = int(cap_mb * 1024 * 1024) if cap_mb else None
+        self.bytes_per_pixel = bytes_per_pixel
+        self.page_fraction = page_fraction
+
+    def available_bytes(self):
+        """
+        当前可用内存
+
+        Returns:
+            可用字节数；既无法读取系统内存又未设置上限时返回 None
+        """
+        available = read_meminfo_available()
+        if self.cap_bytes is not None:
+            rss = read_process_rss() or 0
+            capped = max(self.cap_bytes - rss, 0)
+            available = capped if available is None else min(available, capped)
+        return available
+
+    def page_pixel_limit(self):
+        """
+        根据当前可用内存计算每页像素上限
+
+        Returns:
+            像素数上限；无法获取内存信息时返回 None（不限制）
+        """
+        available = self.available_bytes()
+        if available is None:
+            return None
+        limit = int(available * self.page_fraction / self.bytes_per_pixel)
+        return max(limit, MIN_PAGE_PIXELS)
+
+    def visualization_mode(self):
+        """
+        根据当前可用内存选择可视化方式
+
+        Returns:
+            'full'（原尺寸）、'thumbnail'（缩略图）或 'skip'（不生成）
+        """
+        available = self.available_bytes()
+        if available is None:
+            return 'full'
+        available_mb = available / (1024 * 1024)
+        if available_mb >= FULL_VIS_MIN_MB:
+            return 'full'
+        if available_mb >= THUMBNAIL_VIS_MIN_MB:
+            return 'thumbnail'
+        return 'skip'
+
+
+def save_thumbnail_visualization(img, polys, save_path, max_side=THUMBNAIL_MAX_SIDE):
+    """
+    保存缩小后的可视化图（只画文本框，不生成原尺寸拼图）
+
+    Args:
+        img: 页面 BGR 图像
+        polys: 文本框多边形列表
+        save_path: 保存路径
+        max_side: 缩略图最长边
+    """
+    scale = min(1.0, max_side / max(img.shape[:2]))
+    thumb = cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    if len(polys):
+        pts = [np.round(np.asarray(p, dtype=np.float32) * scale).astype(np.int32) for p in polys]
+        cv2.polylines(thumb, pts, True, (0, 0, 255), 1)
+    ok, buf = cv2.imencode('.png', thumb)
+    if ok:
+        buf.tofile(save_path)
+
+
+def process_file_low_memory(file_path, ocr, output_dir, budget=None, progress_callback=None,
+                            dpi=DEFAULT_PDF_DPI, index=None):
+    """
+    按内存预算逐页识别文件（输出目录结构与普通模式一致）
+
+    Args:
+        file_path: PDF 或图片路径
+        ocr: PaddleOCR / OCRPipeline 实例
+        output_dir: 输出目录
+        budget: MemoryBudget 实例，默认按系统内存和 PPOCR_MEMORY_CAP_MB 创建
+        progress_callback: 进度回调 (消息, 已完成页数, 总页数)
+        dpi: PDF 期望渲染分辨率（内存不足时自动降低）
+        index: OCRIndex 实例，提供时逐页写入全文索引
+
+    Returns:
+        (结果目录, 所有文本行列表, 每页统计列表)
+    """
+    budget = budget or MemoryBudget()
+    os.makedirs(output_dir, exist_ok=True)
+    total = count_pages(file_path)
+    stem = source_name(file_path)
+
+    all_text = []
+    page_stats = []
+    first_result_dir = None
+
+    if progress_callback:
+        progress_callback("正在加载文件...", 0, total)
+    if index is not None:
+        index.remove_document(file_path)
+
+    for page_index, img in iter_pages(file_path, dpi, max_pixels=budget.page_pixel_limit):
+        page_num = page_index + 1
+        if progress_callback:
+            progress_callback(f"正在识别第 {page_num}/{total} 页...", page_index, total)
+
+        page_dir = os.path.join(output_dir, f"page_{page_num:03d}_result")
+        os.makedirs(page_dir, exist_ok=True)
+        if first_result_dir is None:
+            first_result_dir = page_dir
+
+        res = ocr.predict(img)[0]
+        res['input_path'] = file_path
+        res['page_index'] = page_index if total > 1 else None
+
+        res.save_to_json(page_dir)
+
+        vis_mode = budget.visualization_mode()
+        if vis_mode == 'full':
+            res.save_to_img(page_dir)
+        elif vis_mode == 'thumbnail':
+            vis_path = os.path.join(page_dir, f"page_{page_num:03d}_result_ocr_res_thumb.png")
+            save_thumbnail_visualization(img, res.get('rec_polys', []), vis_path)
+
+        texts = list(res.get('rec_texts', []))
+        txt_path = os.path.join(page_dir, f"page_{page_num:03d}_result.txt")
+        all_text.extend(save_ordered_outputs(res, page_dir, txt_path))
+        if index is not None:
+            index.add_page(file_path, page_num, texts, res.get('rec_polys'), page_dir)
+            index.commit()
+
+        page_stats.append({
+            'page': page_num,
+            'size': [int(img.shape[1]), int(img.shape[0])],
+            'visualization': vis_mode,
+            'rss_mb': round((read_process_rss() or 0) / (1024 * 1024), 1),
+        })
+
+        # 释放本页的图像和识别结果后再处理下一页
+        del res, img
+        release_memory()
+
+        if progress_callback:
+            progress_callback(f"已完成第 {page_num}/{total} 页", page_num, total)
+
+    print(f"[低内存模式] {stem}: {total} 页处理完成")
+    return first_result_dir, all_text, page_stats
+
+
+def main():
+    """主函数"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='低内存模式逐页识别（桌面端模拟内存上限）')
+    parser.add_argument('input', help='PDF 或图片路径')
+    parser.add_argument('--cap-mb', type=float, default=None,
+                        help=f'人为设定的内存上限 (MB)，默认读取 {MEMORY_CAP_ENV}')
+    parser.add_argument('--output', default='./output_low_memory', help='输出目录')
+    parser.add_argument('--dpi', type=int, default=DEFAULT_PDF_DPI, help='PDF 期望渲染分辨率')
+
+    args = parser.parse_args()
+
+    from pdf import init_ocr_model
+    from ocr_tuner import DEFAULT_DET_MODEL, DEFAULT_REC_MODEL
+
+    budget = MemoryBudget(cap_mb=args.cap_mb)
+    ocr = init_ocr_model(DEFAULT_DET_MODEL, DEFAULT_REC_MODEL)
+    release_memory()
+
+    def on_progress(message, done, total):
+        print(f"  [{done}/{total}] {message}")
+
+    _, all_text, page_stats = process_file_low_memory(
+        args.input, ocr, args.output, budget, on_progress, args.dpi)
+
+    print(f"\n{'页':>4} {'尺寸':>12} {'可视化':>10} {'RSS(MB)':>9}")
+    for stat in page_stats:
+        size = f"{stat['size'][0]}x{stat['size'][1]}"
+        print(f"{stat['page']:>4} {size:>12} {stat['visualization']:>10} {stat['rss_mb']:>9.1f}")
+    print(f"\n共识别 {len(all_text)} 行文字，结果保存在: {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
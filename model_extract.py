@@ -0,0 +1,230 @@
+"""
+========================================================
+模型文件解压模块（Android 首次启动）
+========================================================
+
+功能说明：
+    将 APK assets 中的模型文件解压到应用数据目录，由清单驱动：
+        - 读取 assets 中每个模型目录的 model_manifest.json
+          （由 prepare_models.py 生成：模型版本 + 各文件 sha256）
+        - 已安装且校验通过的文件直接跳过（按大小和修改时间缓存哈希）
+        - 其余文件流式复制到临时文件，校验后原子重命名
+        - 模型目录的全部文件就绪后才写入清单，
+          因此中途中断或模型升级都会在下次启动时自动修复
+
+    本模块不依赖 Kivy，可在 Linux 上用任意目录模拟 assets 进行测试。
+
+运行方式（桌面测试）：
+    python prepare_models.py
+    python model_extract.py --assets ./models --dest /tmp/ppocr_models
+========================================================
+"""
+
+import os
+import sys
+import threading
+
+from prepare_models import (MANIFEST_FILE, MODELS_CONFIG, OPTIONAL_MODEL_FILES,
+                            REQUIRED_MODEL_FILES, ONNX_MODEL_FILE, HashCache,
+                            copy_verified, load_manifest, sha256_file, write_json_atomic)
+
+
+def _fallback_manifest(asset_dir, model_name):
+    """
+    assets 中没有清单时（旧版打包），按现有文件临时生成清单
+    """
+    files = {}
+    candidates = REQUIRED_MODEL_FILES + OPTIONAL_MODEL_FILES + [ONNX_MODEL_FILE]
+    for filename in candidates:
+        path = os.path.join(asset_dir, filename)
+        if os.path.exists(path):
+            files[filename] = {'size': os.path.getsize(path), 'sha256': sha256_file(path)}
+    return {'model': model_name, 'version': '0', 'files': files}
+
+
+def plan_model_extraction(asset_dir, dest_dir, model_name):
+    """
+    计算单个模型需要解压的文件
+
+    Returns:
+        (asset 清单, 需要复制的文件名列表, 是否已是最新)
+    """
+    manifest = load_manifest(asset_dir) or _fallback_manifest(asset_dir, model_name)
+    installed = load_manifest(dest_dir)
+
+    cache = HashCache(dest_dir) if os.path.isdir(dest_dir) else None
+    pending = []
+    for filename, expected in manifest['files'].items():
+        path = os.path.join(dest_dir, filename)
+        if cache is None or not os.path.exists(path) or os.path.getsize(path) != expected['size']:
+            pending.append(filename)
+            continue
+        if cache.hash(dest_dir, filename)[0] != expected['sha256']:
+            pending.append(filename)
+    if cache is not None:
+        cache.save()
+
+    up_to_date = not pending and installed is not None and installed.get('files') == manifest['files']
+    return manifest, pending, up_to_date
+
+
+def extract_model(asset_dir, dest_dir, model_name, progress_callback=None, cancel_event=None):
+    """
+    解压单个模型目录
+
+    Args:
+        asset_dir: assets 中的模型目录
+        dest_dir: 目标模型目录
+        model_name: 模型名
+        progress_callback: 进度回调 (模型名, 文件名, 已完成文件数, 文件总数)
+        cancel_event: threading.Event，置位后在文件边界停止
+
+    Returns:
+        复制的文件数
+    """
+    manifest, pending, up_to_date = plan_model_extraction(asset_dir, dest_dir, model_name)
+    if up_to_date:
+        return 0
+
+    os.makedirs(dest_dir, exist_ok=True)
+
+    # 先删除旧清单：解压中断时目录会被视为未完成
+    installed_manifest = os.path.join(dest_dir, MANIFEST_FILE)
+    if os.path.exists(installed_manifest):
+        os.remove(installed_manifest)
+
+    cache = HashCache(dest_dir)
+    for done, filename in enumerate(pending):
+        if cancel_event is not None and cancel_event.is_set():
+            cache.save()
+            return done
+        if progress_callback:
+            progress_callback(model_name, filename, done, len(pending))
+        dst_file = os.path.join(dest_dir, filename)
+        expected = manifest['files'][filename]
+        copy_verified(os.path.join(asset_dir, filename), dst_file, expected['sha256'])
+        cache.update(filename, os.stat(dst_file), expected['sha256'])
+
+    # 删除模型升级后不再需要的旧文件
+    for filename in os.listdir(dest_dir):
+        if filename.startswith('inference.') and filename not in manifest['files']:
+            os.remove(os.path.join(dest_dir, filename))
+
+    cache.save()
+    write_json_atomic(installed_manifest, manifest)
+    return len(pending)
+
+
+def extract_models(asset_root, dest_root, model_names=None, progress_callback=None,
+                   cancel_event=None):
+    """
+    解压所有模型
+
+    Args:
+        asset_root: assets 中的 models 目录
+        dest_root: 应用数据目录（模型解压到其下同名子目录）
+        model_names: 模型名列表，默认为 MODELS_CONFIG 中的全部模型
+        progress_callback: 进度回调，见 extract_model
+        cancel_event: threading.Event
+
+    Returns:
+        {模型名: 解压后的模型目录}
+    """
+    model_names = model_names or list(MODELS_CONFIG.values())
+    model_dirs = {}
+    for model_name in model_names:
+        asset_dir = os.path.join(asset_root, model_name)
+        if not os.path.isdir(asset_dir):
+            raise FileNotFoundError(f"assets 中缺少模型: {asset_dir}")
+        dest_dir = os.path.join(dest_root, model_name)
+        extract_model(asset_dir, dest_dir, model_name, progress_callback, cancel_event)
+        model_dirs[model_name] = dest_dir
+    return model_dirs
+
+
+class ModelExtractor:
+    """
+    后台模型解压线程
+
+    用法：
+        extractor = ModelExtractor(asset_root, dest_root)
+        extractor.start()
+        ...
+        model_dirs = extractor.wait()  # 失败时抛出解压过程中的异常
+    """
+
+    def __init__(self, asset_root, dest_root, model_names=None, progress_callback=None,
+                 done_callback=None):
+        self.asset_root = asset_root
+        self.dest_root = dest_root
+        self.model_names = model_names
+        self.progress_callback = progress_callback
+        self.done_callback = done_callback
+        self.model_dirs = None
+        self.error = None
+        self._done = threading.Event()
+        self._cancel = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        try:
+            self.model_dirs = extract_models(self.asset_root, self.dest_root, self.model_names,
+                                             self.progress_callback, self._cancel)
+        except Exception as e:
+            self.error = e
+        finally:
+            self._done.set()
+            if self.done_callback:
+                self.done_callback(self.error)
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def wait(self, timeout=None):
+        """等待解压完成，返回 {模型名: 模型目录}"""
+        if not self._done.wait(timeout):
+            raise TimeoutError("模型解压超时")
+        if self.error is not None:
+            raise self.error
+        return self.model_dirs
+
+
+def main():
+    """主函数"""
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description='模型文件解压（模拟 Android 首次启动）')
+    parser.add_argument('--assets', required=True, help='模拟 assets 的 models 目录')
+    parser.add_argument('--dest', required=True, help='解压目标目录')
+
+    args = parser.parse_args()
+
+    def on_progress(model_name, filename, done, total):
+        print(f"  [{done + 1}/{total}] {model_name}/{filename}")
+
+    start = time.perf_counter()
+    extractor = ModelExtractor(args.assets, args.dest, progress_callback=on_progress).start()
+    try:
+        model_dirs = extractor.wait()
+    except Exception as e:
+        print(f"[失败] {e}")
+        return 1
+
+    print(f"[成功] 模型已就绪 ({time.perf_counter() - start:.2f}s)")
+    for model_name, model_dir in model_dirs.items():
+        print(f"  {model_name}: {model_dir}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
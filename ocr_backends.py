@@ -0,0 +1,546 @@
+"""
+========================================================
+OCR 推理后端
+========================================================
+
+功能说明：
+    为 ocr_pipeline.OCRPipeline 提供可替换的检测 / 识别推理后端：
+        - paddle: Paddle Inference（通过 paddleocr 的 TextDetection / TextRecognition）
+        - onnx:   ONNX Runtime，加载同一模型转换后的 inference.onnx，
+                  并在本模块中实现 DB 检测后处理与 CTC 解码
+
+    ONNX 模型转换：
+        python prepare_models.py --onnx
+
+运行方式（与 Paddle 后端的一致性及性能对比）：
+    python ocr_backends.py --compare ./samples
+========================================================
+"""
+
+import os
+import sys
+import json
+import time
+import subprocess
+
+import cv2
+import numpy as np
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DET_MODEL = os.path.join(BASE_DIR, "testmodel", "PP-OCRv5_mobile_det_infer")
+DEFAULT_REC_MODEL = os.path.join(BASE_DIR, "testmodel", "PP-OCRv5_mobile_rec_infer")
+
+ONNX_MODEL_FILE = 'inference.onnx'
+BACKENDS = ('paddle', 'onnx')
+
+# PP-OCRv5 检测默认参数（与 PaddleOCR 3.x 流水线默认值一致）
+DET_LIMIT_SIDE_LEN = 64
+DET_LIMIT_TYPE = 'min'
+DET_MAX_SIDE_LIMIT = 4000
+DET_MEAN = np.array([0.485, 0.456, 0.406], dtype=np.float32)
+DET_STD = np.array([0.229, 0.224, 0.225], dtype=np.float32)
+
+# 产线（PaddleOCR / init_ocr_model）的检测参数名 → 检测后端参数名，两种后端含义一致
+DET_OPTION_KEYS = {
+    'text_det_limit_side_len': 'limit_side_len',
+    'text_det_limit_type': 'limit_type',
+    'text_det_max_side_limit': 'max_side_limit',
+    'text_det_thresh': 'thresh',
+    'text_det_box_thresh': 'box_thresh',
+    'text_det_unclip_ratio': 'unclip_ratio',
+}
+# ONNX Runtime 后端支持的推理参数（MKLDNN 等 Paddle 专有参数对其无效）
+ONNX_OPTION_KEYS = ('cpu_threads', 'providers')
+
+
+def load_model_config(model_dir):
+    """读取模型目录下的 inference.yml"""
+    import yaml
+
+    with open(os.path.join(model_dir, 'inference.yml'), 'r', encoding='utf-8') as f:
+        return yaml.safe_load(f)
+
+
+def create_onnx_session(model_path, cpu_threads=None, providers=None):
+    """
+    创建 ONNX Runtime 推理会话
+
+    Args:
+        model_path: .onnx 模型文件
+        cpu_threads: 算子内并行线程数
+        providers: 执行提供者列表，默认仅 CPU
+    """
+    import onnxruntime as ort
+
+    if not os.path.exists(model_path):
+        raise FileNotFoundError(
+            f"ONNX 模型不存在: {model_path}\n请先运行 python prepare_models.py --onnx 进行转换")
+
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    if cpu_threads:
+        options.intra_op_num_threads = int(cpu_threads)
+    return ort.InferenceSession(model_path, sess_options=options,
+                                providers=providers or ['CPUExecutionProvider'])
+
+
+# ==================== Paddle 后端 ====================
+
+class PaddleDetBackend:
+    """
+    Paddle Inference 检测后端
+
+    缩放参数显式传入：TextDetection 单独使用时按模型 inference.yml 的
+    resize_long 缩放，与 PaddleOCR 产线和 ONNX 后端不一致。
+    """
+
+    def __init__(self, model_dir, limit_side_len=DET_LIMIT_SIDE_LEN, limit_type=DET_LIMIT_TYPE,
+                 **options):
+        from paddleocr import TextDetection
+
+        self.model = TextDetection(model_name="PP-OCRv5_mobile_det", model_dir=model_dir,
+                                   limit_side_len=limit_side_len, limit_type=limit_type, **options)
+
+    def detect(self, img):
+        """
+        检测文本框
+
+        Returns:
+            N×4×2 文本框数组
+        """
+        res = next(iter(self.model.predict(input=img, batch_size=1)))
+        return np.asarray(res['dt_polys'])
+
+
+class PaddleRecBackend:
+    """Paddle Inference 识别后端"""
+
+    def __init__(self, model_dir, **options):
+        from paddleocr import TextRecognition
+
+        self.model = TextRecognition(model_name="PP-OCRv5_mobile_rec", model_dir=model_dir, **options)
+
+    def recognize(self, batch):
+        """
+        识别一批已统一尺寸的文本行图像
+
+        Returns:
+            [(文本, 置信度), ...]
+        """
+        results = self.model.predict(input=batch, batch_size=len(batch))
+        return [(res['rec_text'], float(res['rec_score'])) for res in results]
+
+
+# ==================== ONNX Runtime 后端 ====================
+
+def _get_mini_boxes(contour):
+    """最小外接矩形，顶点按 左上、右上、右下、左下 排列"""
+    bounding_box = cv2.minAreaRect(contour)
+    points = sorted(list(cv2.boxPoints(bounding_box)), key=lambda p: p[0])
+    if points[1][1] > points[0][1]:
+        index_1, index_4 = 0, 1
+    else:
+        index_1, index_4 = 1, 0
+    if points[3][1] > points[2][1]:
+        index_2, index_3 = 2, 3
+    else:
+        index_2, index_3 = 3, 2
+    box = np.array([points[index_1], points[index_2], points[index_3], points[index_4]])
+    return box, min(bounding_box[1])
+
+
+def _box_score_fast(pred, box):
+    """文本框内概率图均值"""
+    h, w = pred.shape[:2]
+    box = box.copy()
+    xmin = int(np.clip(np.floor(box[:, 0].min()), 0, w - 1))
+    xmax = int(np.clip(np.ceil(box[:, 0].max()), 0, w - 1))
+    ymin = int(np.clip(np.floor(box[:, 1].min()), 0, h - 1))
+    ymax = int(np.clip(np.ceil(box[:, 1].max()), 0, h - 1))
+    mask = np.zeros((ymax - ymin + 1, xmax - xmin + 1), dtype=np.uint8)
+    box[:, 0] -= xmin
+    box[:, 1] -= ymin
+    cv2.fillPoly(mask, box.reshape(1, -1, 2).astype(np.int32), 1)
+    return cv2.mean(pred[ymin:ymax + 1, xmin:xmax + 1], mask)[0]
+
+
+def _unclip_rect(box, unclip_ratio):
+    """
+    按 DB 算法外扩文本框
+
+    DB 使用 pyclipper 对矩形做圆角偏移 distance = 面积 × ratio / 周长，
+    随后再取最小外接矩形；对矩形而言其结果恰为各边外扩 distance，
+    因此这里直接按闭式计算，无需 pyclipper / shapely。
+    """
+    rect = cv2.minAreaRect(box.astype(np.float32))
+    (cx, cy), (w, h), angle = rect
+    area = w * h
+    length = 2 * (w + h)
+    if length <= 0:
+        return None
+    distance = area * unclip_ratio / length
+    return cv2.boxPoints(((cx, cy), (w + 2 * distance, h + 2 * distance), angle))
+
+
+def _order_points_clockwise(pts):
+    rect = np.zeros((4, 2), dtype=np.float32)
+    s = pts.sum(axis=1)
+    rect[0] = pts[np.argmin(s)]
+    rect[2] = pts[np.argmax(s)]
+    tmp = np.delete(pts, (np.argmin(s), np.argmax(s)), axis=0)
+    diff = np.diff(np.array(tmp), axis=1)
+    rect[1] = tmp[np.argmin(diff)]
+    rect[3] = tmp[np.argmax(diff)]
+    return rect
+
+
+def db_postprocess(pred, src_shape, thresh=0.3, box_thresh=0.6,
+                   unclip_ratio=1.5, max_candidates=1000, min_size=3):
+    """
+    DB 检测后处理（与 PaddleOCR DBPostProcess 的 quad 模式一致）
+
+    Args:
+        pred: H×W 概率图
+        src_shape: 原图 (高, 宽)
+
+    Returns:
+        N×4×2 int 文本框数组（原图坐标）
+    """
+    height, width = pred.shape
+    dest_h, dest_w = src_shape[:2]
+    bitmap = (pred > thresh).astype(np.uint8)
+    contours, _ = cv2.findContours(bitmap * 255, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
+
+    boxes = []
+    for contour in contours[:max_candidates]:
+        points, sside = _get_mini_boxes(contour)
+        if sside < min_size:
+            continue
+        if _box_score_fast(pred, points.reshape(-1, 2)) < box_thresh:
+            continue
+        expanded = _unclip_rect(points, unclip_ratio)
+        if expanded is None:
+            continue
+        box, sside = _get_mini_boxes(expanded.reshape(-1, 1, 2))
+        if sside < min_size + 2:
+            continue
+        box[:, 0] = np.clip(np.round(box[:, 0] / width * dest_w), 0, dest_w)
+        box[:, 1] = np.clip(np.round(box[:, 1] / height * dest_h), 0, dest_h)
+        boxes.append(box.astype(np.int32))
+
+    # 与 PaddleOCR 一致：顺时针排序、裁剪到图像范围、过滤过小文本框
+    filtered = []
+    for box in boxes:
+        box = _order_points_clockwise(box.astype(np.float32))
+        box[:, 0] = np.clip(box[:, 0], 0, dest_w - 1)
+        box[:, 1] = np.clip(box[:, 1], 0, dest_h - 1)
+        rect_w = int(np.linalg.norm(box[0] - box[1]))
+        rect_h = int(np.linalg.norm(box[0] - box[3]))
+        if rect_w <= 3 or rect_h <= 3:
+            continue
+        filtered.append(box.astype(np.int32))
+    if not filtered:
+        return np.zeros((0, 4, 2), dtype=np.int32)
+    return np.stack(filtered)
+
+
+def det_resize(img, limit_side_len=DET_LIMIT_SIDE_LEN, limit_type=DET_LIMIT_TYPE,
+               max_side_limit=DET_MAX_SIDE_LIMIT):
+    """检测输入缩放（边长取 32 的倍数）"""
+    h, w = img.shape[:2]
+    if limit_type == 'max':
+        ratio = limit_side_len / max(h, w) if max(h, w) > limit_side_len else 1.0
+    else:
+        ratio = limit_side_len / min(h, w) if min(h, w) < limit_side_len else 1.0
+    resize_h, resize_w = int(h * ratio), int(w * ratio)
+    if max(resize_h, resize_w) > max_side_limit:
+        ratio = max_side_limit / max(resize_h, resize_w)
+        resize_h, resize_w = int(resize_h * ratio), int(resize_w * ratio)
+    resize_h = max(int(round(resize_h / 32) * 32), 32)
+    resize_w = max(int(round(resize_w / 32) * 32), 32)
+    return cv2.resize(img, (resize_w, resize_h))
+
+
+def det_preprocess(img, limit_side_len=DET_LIMIT_SIDE_LEN, limit_type=DET_LIMIT_TYPE,
+                   max_side_limit=DET_MAX_SIDE_LIMIT):
+    """检测输入预处理：缩放、归一化、HWC→NCHW"""
+    resized = det_resize(img, limit_side_len, limit_type, max_side_limit)
+    x = (resized.astype(np.float32) / 255.0 - DET_MEAN) / DET_STD
+    return x.transpose(2, 0, 1)[None]
+
+
+def rec_preprocess(batch):
+    """识别输入预处理：归一化到 [-1, 1]、NHWC→NCHW（输入须已统一尺寸）"""
+    x = np.stack(batch).astype(np.float32)
+    x = (x / 255.0 - 0.5) / 0.5
+    return x.transpose(0, 3, 1, 2)
+
+
+class OnnxDetBackend:
+    """
+    ONNX Runtime 检测后端
+
+    Args:
+        model_dir: 模型目录（需包含 inference.onnx 与 inference.yml）
+        cpu_threads: 推理线程数
+        limit_side_len / limit_type / max_side_limit: 输入缩放参数
+        thresh / box_thresh / unclip_ratio: DB 后处理参数（默认取 inference.yml）
+    """
+
+    def __init__(self, model_dir, cpu_threads=None, providers=None,
+                 limit_side_len=DET_LIMIT_SIDE_LEN, limit_type=DET_LIMIT_TYPE,
+                 max_side_limit=DET_MAX_SIDE_LIMIT, thresh=None, box_thresh=None,
+                 unclip_ratio=None, model_file=ONNX_MODEL_FILE, **_):
+        post = load_model_config(model_dir).get('PostProcess', {})
+        self.session = create_onnx_session(os.path.join(model_dir, model_file), cpu_threads, providers)
+        self.input_name = self.session.get_inputs()[0].name
+        self.limit_side_len = limit_side_len
+        self.limit_type = limit_type
+        self.max_side_limit = max_side_limit
+        self.thresh = post.get('thresh', 0.3) if thresh is None else thresh
+        self.box_thresh = post.get('box_thresh', 0.6) if box_thresh is None else box_thresh
+        self.unclip_ratio = post.get('unclip_ratio', 1.5) if unclip_ratio is None else unclip_ratio
+        self.max_candidates = post.get('max_candidates', 1000)
+
+    def detect(self, img):
+        """
+        检测文本框
+
+        Returns:
+            N×4×2 文本框数组
+        """
+        x = det_preprocess(img, self.limit_side_len, self.limit_type, self.max_side_limit)
+        pred = self.session.run(None, {self.input_name: x})[0]
+        return db_postprocess(pred[0, 0], img.shape, self.thresh, self.box_thresh,
+                              self.unclip_ratio, self.max_candidates)
+
+
+def ctc_decode(probs, characters):
+    """
+    CTC 贪心解码（去重并去除 blank）
+
+    Args:
+        probs: N×T×C 概率
+        characters: 字符表，下标 0 为 blank
+
+    Returns:
+        [(文本, 置信度), ...]
+    """
+    indices = probs.argmax(axis=2)
+    confidences = probs.max(axis=2)
+    results = []
+    for idx, conf in zip(indices, confidences):
+        keep = np.ones(len(idx), dtype=bool)
+        keep[1:] = idx[1:] != idx[:-1]
+        keep &= idx != 0
+        text = ''.join(characters[i] for i in idx[keep])
+        score = float(conf[keep].mean()) if keep.any() else 0.0
+        results.append((text, score))
+    return results
+
+
+class OnnxRecBackend:
+    """
+    ONNX Runtime 识别后端
+
+    Args:
+        model_dir: 模型目录（需包含 inference.onnx 与 inference.yml）
+        cpu_threads: 推理线程数
+    """
+
+    def __init__(self, model_dir, cpu_threads=None, providers=None,
+                 model_file=ONNX_MODEL_FILE, **_):
+        post = load_model_config(model_dir).get('PostProcess', {})
+        # 与 PaddleOCR CTCLabelDecode 一致：blank + 字符表 + 空格
+        self.characters = ['blank'] + list(post.get('character_dict', [])) + [' ']
+        self.session = create_onnx_session(os.path.join(model_dir, model_file), cpu_threads, providers)
+        self.input_name = self.session.get_inputs()[0].name
+
+    def recognize(self, batch):
+        """
+        识别一批已统一尺寸的文本行图像（高度为识别输入高度）
+
+        Returns:
+            [(文本, 置信度), ...]
+        """
+        x = rec_preprocess(batch)
+        probs = self.session.run(None, {self.input_name: x})[0]
+        return ctc_decode(probs, self.characters)
+
+
+def split_backend_options(backend, options):
+    """
+    把推理参数分配给检测 / 识别后端
+
+    产线检测参数（text_det_*）换算为检测后端参数，只传给检测后端；
+    其余参数两个后端共用，ONNX 后端只接受 ONNX_OPTION_KEYS。
+
+    Returns:
+        (检测后端参数, 识别后端参数, 被忽略的参数名列表)
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"未知的推理后端: {backend}（可选: {', '.join(BACKENDS)}）")
+    det_options, common, ignored = {}, {}, []
+    for key, value in options.items():
+        if key in DET_OPTION_KEYS:
+            det_options[DET_OPTION_KEYS[key]] = value
+        elif backend == 'paddle' or key in ONNX_OPTION_KEYS:
+            common[key] = value
+        else:
+            ignored.append(key)
+    return dict(common, **det_options), common, ignored
+
+
+def create_backends(backend, det_model_path, rec_model_path, **options):
+    """
+    创建检测 / 识别后端
+
+    Args:
+        backend: 'paddle' 或 'onnx'
+        det_model_path: 检测模型目录
+        rec_model_path: 识别模型目录
+        options: 推理参数（cpu_threads、enable_mkldnn、text_det_limit_side_len 等）
+
+    Returns:
+        (检测后端, 识别后端)
+    """
+    # MKLDNN 等 Paddle 专有参数（如调优档案中的参数）对 ONNX Runtime 无效，直接忽略
+    det_options, rec_options, _ = split_backend_options(backend, options)
+    if backend == 'paddle':
+        return (PaddleDetBackend(det_model_path, **det_options),
+                PaddleRecBackend(rec_model_path, **rec_options))
+    return (OnnxDetBackend(det_model_path, **det_options),
+            OnnxRecBackend(rec_model_path, **rec_options))
+
+
+# ==================== 一致性与性能对比 ====================
+
+def _probe_startup(backend, det_model_path, rec_model_path):
+    """在全新子进程中测量 导入 + 模型加载 耗时"""
+    code = (
+        "import time, json, sys\n"
+        "t0 = time.perf_counter()\n"
+        f"sys.path.insert(0, {BASE_DIR!r})\n"
+        "import ocr_backends\n"
+        "if sys.argv[1] == 'paddle':\n"
+        "    import paddleocr\n"
+        "else:\n"
+        "    import onnxruntime\n"
+        "t1 = time.perf_counter()\n"
+        "ocr_backends.create_backends(sys.argv[1], sys.argv[2], sys.argv[3])\n"
+        "t2 = time.perf_counter()\n"
+        "print(json.dumps({'import_s': t1 - t0, 'load_s': t2 - t1}))\n"
+    )
+    proc = subprocess.run([sys.executable, '-c', code, backend, det_model_path, rec_model_path],
+                          capture_output=True, text=True)
+    if proc.returncode != 0:
+        print(f"  [失败] {backend} 启动测试出错:\n{proc.stderr[-500:]}")
+        return None
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def compare_backends(image_paths, det_model_path, rec_model_path, iou_thresh=0.5):
+    """
+    在同一批图片上比较 paddle 与 onnx 后端的输出一致性与延迟
+
+    Returns:
+        汇总结果字典
+    """
+    from ocr_metrics import match_boxes, char_error_rate
+    from ocr_pipeline import OCRPipeline
+    from page_source import iter_pages
+
+    summary = {'startup': {}, 'latency_ms': {}, 'parity': {}}
+
+    print("\n[1/3] 启动耗时（导入 + 模型加载，独立子进程）")
+    for backend in BACKENDS:
+        summary['startup'][backend] = _probe_startup(backend, det_model_path, rec_model_path)
+        info = summary['startup'][backend]
+        if info:
+            print(f"  {backend:<6s} 导入 {info['import_s']:.2f}s  加载 {info['load_s']:.2f}s")
+
+    print("\n[2/3] 逐页推理")
+    pipelines = {b: OCRPipeline(det_model_path, rec_model_path, backend=b) for b in BACKENDS}
+    outputs = {b: [] for b in BACKENDS}
+    timings = {b: [] for b in BACKENDS}
+    for path in image_paths:
+        for page_index, img in iter_pages(path):
+            for backend, pipeline in pipelines.items():
+                pipeline.predict_image(img)  # 预热，避免首次推理开销影响计时
+                start = time.perf_counter()
+                res = pipeline.predict_image(img)
+                timings[backend].append((time.perf_counter() - start) * 1000)
+                outputs[backend].append(res)
+            print(f"  {os.path.basename(path)}#{page_index + 1}: "
+                  + "  ".join(f"{b} {timings[b][-1]:.1f} ms" for b in BACKENDS))
+
+    for backend in BACKENDS:
+        values = sorted(timings[backend])
+        summary['latency_ms'][backend] = {
+            'mean': sum(values) / len(values) if values else 0.0,
+            'p50': values[len(values) // 2] if values else 0.0,
+        }
+
+    print("\n[3/3] 输出一致性")
+    ref_boxes = matched = exact = 0
+    cer_sum = 0.0
+    for ref, cand in zip(outputs['paddle'], outputs['onnx']):
+        matches = match_boxes(cand['rec_polys'], ref['rec_polys'], iou_thresh)
+        ref_boxes += len(ref['rec_polys'])
+        matched += len(matches)
+        for c, r, _ in matches:
+            exact += cand['rec_texts'][c] == ref['rec_texts'][r]
+            cer_sum += char_error_rate(cand['rec_texts'][c], ref['rec_texts'][r])
+    summary['parity'] = {
+        'ref_boxes': ref_boxes,
+        'box_recall': matched / ref_boxes if ref_boxes else 1.0,
+        'text_exact_rate': exact / matched if matched else 1.0,
+        'mean_cer': cer_sum / matched if matched else 0.0,
+    }
+    return summary
+
+
+def main():
+    """主函数"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='OCR 推理后端一致性与性能对比')
+    parser.add_argument('--compare', required=True, help='对比用图片 / PDF 目录')
+    parser.add_argument('--det', default=DEFAULT_DET_MODEL, help='检测模型路径')
+    parser.add_argument('--rec', default=DEFAULT_REC_MODEL, help='识别模型路径')
+    parser.add_argument('--min-box-recall', type=float, default=0.98, help='文本框召回率下限 (默认: 0.98)')
+    parser.add_argument('--max-cer', type=float, default=0.01, help='平均字符错误率上限 (默认: 0.01)')
+    parser.add_argument('--output', help='将结果保存为 JSON')
+
+    args = parser.parse_args()
+
+    paths = [os.path.join(args.compare, n) for n in sorted(os.listdir(args.compare))
+             if os.path.isfile(os.path.join(args.compare, n))]
+    if not paths:
+        print(f"错误: 目录为空: {args.compare}")
+        return 1
+
+    print("=" * 60)
+    print("Paddle Inference vs ONNX Runtime")
+    print("=" * 60)
+    summary = compare_backends(paths, args.det, args.rec)
+
+    parity = summary['parity']
+    print(f"  参考文本框: {parity['ref_boxes']}  召回率: {parity['box_recall']:.4f}")
+    print(f"  文本完全一致率: {parity['text_exact_rate']:.4f}  平均 CER: {parity['mean_cer']:.4f}")
+    for backend, lat in summary['latency_ms'].items():
+        print(f"  {backend:<6s} 平均 {lat['mean']:.1f} ms/页  P50 {lat['p50']:.1f} ms/页")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+
+    passed = parity['box_recall'] >= args.min_box_recall and parity['mean_cer'] <= args.max_cer
+    print("\n" + "=" * 60)
+    print("[通过] 输出一致" if passed else "[失败] 输出差异超出阈值")
+    return 0 if passed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,233 @@
+"""
+========================================================
+OCR 识别核心：模型初始化与文件识别（不依赖图形界面）
+========================================================
+
+功能说明：
+    init_ocr_model / process_file / open_file 供图形界面（pdftool.py）
+    和无界面服务共用：热文件夹（watch_folder.py）、多节点作业队列
+    （job_queue.py）、fork 工作进程（fork_server.py）、浸泡测试
+    （soak_test.py）等。本模块不导入 tkinter，可在没有 Tk 的精简
+    Python 环境（如 slim 容器镜像）中运行。
+
+用法：
+    from ocr_engine import init_ocr_model, process_file
+
+    ocr = init_ocr_model(det_model_path, rec_model_path)
+    first_dir, lines = process_file('scan.pdf', ocr, 'output/scan')
+========================================================
+"""
+
+import os
+import sys
+import subprocess
+from paddleocr import PaddleOCR
+from ocr_tuner import load_tuning_profile
+from layout import save_ordered_outputs
+from page_source import (LARGE_IMAGE_PIXELS, as_page_source, count_pages, iter_pages,
+                         source_name, source_path)
+from prepare_models import get_default_variant, resolve_model_dir
+
+
+def open_file(file_path):
+    """跨平台打开文件"""
+    try:
+        if sys.platform == 'win32':
+            os.startfile(file_path)
+        elif sys.platform == 'darwin':  # macOS
+            subprocess.call(['open', file_path])
+        else:  # Linux
+            subprocess.call(['xdg-open', file_path])
+    except Exception as e:
+        print(f"无法打开文件 {file_path}: {e}")
+
+
+def init_ocr_model(det_model_path, rec_model_path, rec_bucketing=False, backend='paddle',
+                   variant=None, **ocr_options):
+    """
+    初始化 PaddleOCR 模型
+
+    自动读取本机调优档案（见 ocr_tuner.py），ocr_options 中的参数优先。
+    rec_bucketing=True 时改用 ocr_pipeline.OCRPipeline，由本项目按宽度分桶
+    驱动识别阶段（可额外传入 max_padded_width、bucket_growth 等参数）。
+    backend='onnx' 时使用 ONNX Runtime 推理（见 ocr_backends.py，隐含 rec_bucketing）。
+    variant='int8' 时加载 prepare_models.py --quantize 生成的量化模型
+    （默认取环境变量 PPOCR_MODEL_VARIANT）。
+    """
+    print("正在初始化 OCR 模型...")
+    variant = variant or get_default_variant()
+    if variant != 'float':
+        det_model_path = resolve_model_dir(det_model_path, variant)
+        rec_model_path = resolve_model_dir(rec_model_path, variant)
+        # 量化模型仅提供 ONNX 格式
+        backend = 'onnx'
+        print(f"模型变体: {variant}")
+    options = load_tuning_profile(det_model_path, rec_model_path)
+    options.update(ocr_options)
+    if options:
+        print(f"推理参数: {options}")
+
+    if rec_bucketing or backend != 'paddle':
+        from ocr_pipeline import OCRPipeline
+        ocr = OCRPipeline(det_model_path, rec_model_path, backend=backend, **options)
+        print(f"OCR 模型初始化完成（分桶识别流水线，{backend} 后端）")
+        return ocr
+
+    # 模型名称与方向分类 / 文档矫正开关可由 ocr_options 覆盖（见 ocr_eval.py）
+    pipeline_options = {
+        'text_detection_model_name': "PP-OCRv5_mobile_det",
+        'text_recognition_model_name': "PP-OCRv5_mobile_rec",
+        'use_doc_orientation_classify': False,
+        'use_doc_unwarping': False,
+        'use_textline_orientation': False,
+    }
+    pipeline_options.update(options)
+    ocr = PaddleOCR(
+        text_detection_model_dir=det_model_path,
+        text_recognition_model_dir=rec_model_path,
+        **pipeline_options
+    )
+    print("OCR 模型初始化完成")
+    return ocr
+
+
+def process_file(file_path, ocr, output_dir="output", progress_callback=None, index=None,
+                 searchable_pdf=None, prefilter=None, page_range=None, preprocess=None):
+    """
+    处理文件（PDF 或图片），进行 OCR 识别
+
+    Args:
+        file_path: 文件路径，或内存输入（bytes、文件对象、mmap、BGR 图像数组或
+            逐页图像数组列表，见 page_source.as_page_source），无需先写临时文件
+        ocr: PaddleOCR 实例
+        output_dir: 输出目录
+        progress_callback: 进度回调函数
+        index: OCRIndex 实例，提供时逐页写入全文索引（见 ocr_index.py）
+        searchable_pdf: 可搜索 PDF 输出路径，提供时逐页写入带不可见文字层的 PDF
+            （见 pdf_writer.py）
+        prefilter: text_prefilter.TextPrefilter 实例，提供时先在缩小的页面上判断
+            是否含文字，无文字页（照片、图表、空白页）跳过识别，判断结果写入
+            每页 JSON 的 prefilter 字段
+        page_range: (起始页, 结束页) 页索引半开区间，只识别其中的页（用于把大文档
+            拆给多个节点，见 job_queue.py）；结果目录和页码仍按整个文档编号
+        preprocess: preprocess.PagePreprocessor 实例，提供时在检测前校正倾斜、
+            归一化对比度（可选二值化），文本框映射回原页面坐标，应用的校正和
+            耗时写入每页 JSON 的 preprocess 字段
+    """
+    os.makedirs(output_dir, exist_ok=True)
+
+    # 内存输入没有路径时，结果中的 input_path 记为显示名称
+    input_path = source_path(file_path)
+    label = input_path or source_name(file_path)
+    if (index is not None or searchable_pdf) and input_path is None:
+        raise ValueError("写入全文索引或生成可搜索 PDF 需要文件路径（或带 name 的文件对象）")
+    source = as_page_source(file_path)
+    print(f"正在处理文件: {label}")
+
+    if progress_callback:
+        progress_callback("正在加载文件...")
+
+    # 逐页（PDF 页 / TIFF、GIF 帧）读取并识别，任意时刻只持有一页图像
+    total = count_pages(source)
+
+    # 重新识别时替换该文件已有的索引记录（只识别部分页时由 add_page 逐页替换）；
+    # 索引逐页提交，识别期间不持有 SQLite 写锁，多个进程可共用同一个索引库
+    if index is not None and page_range is None:
+        index.remove_document(input_path)
+        index.commit()
+
+    builder = None
+    if searchable_pdf and page_range is not None:
+        raise ValueError("生成可搜索 PDF 需要识别整个文档，不能指定 page_range")
+    if searchable_pdf:
+        from pdf_writer import SearchablePDFBuilder
+
+        builder = SearchablePDFBuilder(input_path, searchable_pdf)
+
+    all_text = []
+    first_result_dir = None
+    skipped_pages = 0
+
+    pages = iter_pages(source, max_pixels=LARGE_IMAGE_PIXELS, page_range=page_range)
+    try:
+        for page_index, img in pages:
+            page_num = page_index + 1
+            if progress_callback:
+                progress_callback(f"正在处理第 {page_num}/{total} 页...")
+
+            decision = prefilter.check(img) if prefilter is not None else None
+            correction = None
+            if decision is not None and not decision['has_text']:
+                print(f"第 {page_num} 页判定为无文字（{decision['reason']}，"
+                      f"置信度 {decision['confidence']:.2f}），跳过识别")
+                skipped_pages += 1
+                res = prefilter.skipped_result(img, decision, input_path=label,
+                                               page_index=page_index if total > 1 else None)
+            else:
+                if preprocess is not None:
+                    # 检测预处理后的页面，文本框再映射回原页面坐标
+                    processed, correction = preprocess.apply(img)
+                    res = ocr.predict(processed)[0]
+                    del processed
+                    preprocess.restore(res, correction, original=img)
+                else:
+                    res = ocr.predict(img)[0]
+                res['input_path'] = label
+                res['page_index'] = page_index if total > 1 else None
+            page_size = (img.shape[1], img.shape[0])
+            if builder is not None:
+                builder.add_page(page_index, page_size, res.get('rec_texts', []),
+                                 res.get('rec_polys'))
+            del img
+
+            # 为每页创建单独的文件夹
+            page_dir = os.path.join(output_dir, f"page_{page_num:03d}_result")
+            os.makedirs(page_dir, exist_ok=True)
+
+            # 保存第一次的结果目录（用于后续自动打开）
+            if first_result_dir is None:
+                first_result_dir = page_dir
+
+            # 保存可视化图像
+            res.save_to_img(page_dir)
+
+            # 保存 JSON 结果
+            res.save_to_json(page_dir)
+
+            # 保存文本结果（按阅读顺序，版面结构写入 JSON）
+            # page_size 为识别时的图像尺寸（文本框坐标系），结果查看器据此缩放文本框
+            texts = res.get('rec_texts', [])
+            txt_path = os.path.join(page_dir, f"page_{page_num:03d}_result.txt")
+            extra = {'page_size': list(page_size)}
+            if decision is not None:
+                extra['prefilter'] = dict(decision, skipped=not decision['has_text'])
+            if correction is not None:
+                extra['preprocess'] = correction
+            ordered = save_ordered_outputs(res, page_dir, txt_path, extra)
+
+            if index is not None:
+                index.add_page(input_path, page_num, texts, res.get('rec_polys'), page_dir)
+                index.commit()
+
+            all_text.extend(ordered)
+    except BaseException:
+        # 识别中途失败：删除未完成的可搜索 PDF，关闭打开的源文档
+        if builder is not None:
+            builder.abort()
+        raise
+    finally:
+        pages.close()
+
+    if skipped_pages:
+        print(f"预筛选: 跳过 {skipped_pages}/{total} 页无文字页")
+    if preprocess is not None:
+        summary = preprocess.summary()
+        print(f"预处理: {summary['ms_per_page']:.1f} ms/页，校正倾斜 "
+              f"{summary['rotated']}/{summary['pages']} 页")
+
+    if builder is not None:
+        stats = builder.close()
+        print(f"可搜索 PDF: {searchable_pdf} ({stats['output_bytes'] / 1024:.1f} KB, "
+              f"输入 {stats['input_bytes'] / 1024:.1f} KB, 写入 {stats['write_seconds']:.2f}s)")
+
+    return first_result_dir, all_text
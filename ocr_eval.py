@@ -0,0 +1,495 @@
+"""
+========================================================
+识别精度 / 速度 Pareto 评估工具
+========================================================
+
+功能说明：
+    调整速度相关参数（检测边长、渲染 DPI、识别批大小、方向分类开关、
+    mobile / server 模型）时，需要同时知道它们在精度上的代价。本工具在本地
+    标注样本集（PPOCRLabel 的 Label.txt 格式，见 ocr_metrics.py）上运行一组
+    配置，对每组配置测量：
+        - 字符错误率 CER：预测框与标注框按 IoU 匹配后累计编辑距离，
+          漏检的标注框按整行删除、多检的预测框按整行插入计入
+        - 文本框召回率：IoU ≥ 0.5 匹配上的标注框比例
+        - 每秒页数：预热后单进程逐页 predict 的吞吐
+    并输出 Pareto 前沿（没有其他配置在 CER、召回率、速度上全部不差且至少
+    一项更好）：终端表格 + JSON。
+
+    每组配置在独立的 spawn 子进程中运行（推理库的全局设置互不影响）。
+    结果按 配置 + 样本集 + 模型文件 + 本机调优档案 的指纹缓存，再次运行时
+    只重新评估变化过的配置。
+
+配置网格（--grid JSON 文件）：
+    {
+        "base": {"text_recognition_batch_size": 6},
+        "axes": {
+            "text_det_limit_side_len": [736, 960, 1280],
+            "dpi": [108, 144],
+            "use_textline_orientation": [false, true],
+            "models": ["mobile", "server"]
+        }
+    }
+    或直接给出配置列表 {"configs": [{...}, {...}]}。
+    特殊键：
+        models：mobile / server，对应 testmodel/PP-OCRv5_<models>_det_infer 等目录
+        dpi：按 dpi / --corpus-dpi 缩放样本图片后识别，预测框再换算回原图坐标
+    其余键原样传给 init_ocr_model（如 text_det_limit_side_len、cpu_threads、
+    rec_bucketing、backend）；所选后端不支持的键（如 ONNX 后端的
+    use_textline_orientation）在评估开始前报错，避免相同的运行被当作不同配置。
+
+输出：
+    <输出目录>/eval_results.json   全部配置的指标与 Pareto 前沿
+    <输出目录>/eval_cache.json     结果缓存
+
+运行方式：
+    python ocr_eval.py ./samples
+    python ocr_eval.py ./samples --grid grid.json --output ocr_eval
+    python ocr_eval.py ./samples --limit 20 --rerun
+========================================================
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import itertools
+import multiprocessing as mp
+
+from ocr_tuner import BASE_DIR, DEFAULT_DET_MODEL, DEFAULT_REC_MODEL
+from page_source import DEFAULT_PDF_DPI
+
+
+RESULTS_FILE = 'eval_results.json'
+CACHE_FILE = 'eval_cache.json'
+# 缓存格式或指标定义变化时递增，使旧缓存失效
+CACHE_VERSION = 1
+IOU_THRESH = 0.5
+DEFAULT_TIMEOUT = 3600
+
+MODEL_FAMILIES = ('mobile', 'server')
+
+# init_ocr_model / OCRPipeline 自身使用、不传给推理后端的参数
+PIPELINE_KEYS = ('backend', 'variant', 'rec_bucketing', 'max_padded_width', 'max_batch_size',
+                 'bucket_growth', 'bucketing', 'text_rec_score_thresh',
+                 'text_recognition_batch_size')
+
+DEFAULT_GRID = {
+    'base': {},
+    'axes': {
+        'text_det_limit_side_len': [736, 960, 1280],
+        'dpi': [0.75, 1.0],                 # 默认网格中按 --corpus-dpi 的倍数给出
+        'use_textline_orientation': [False, True],
+        'models': list(MODEL_FAMILIES),
+    },
+}
+
+
+def model_dirs(family):
+    """mobile / server 对应的检测、识别模型目录"""
+    if family == 'mobile':
+        return DEFAULT_DET_MODEL, DEFAULT_REC_MODEL
+    return (os.path.join(BASE_DIR, "testmodel", f"PP-OCRv5_{family}_det_infer"),
+            os.path.join(BASE_DIR, "testmodel", f"PP-OCRv5_{family}_rec_infer"))
+
+
+def expand_grid(grid):
+    """
+    展开配置网格
+
+    Args:
+        grid: {'base': {...}, 'axes': {键: [取值, ...]}} 或 {'configs': [...]}
+
+    Returns:
+        配置字典列表
+    """
+    base = grid.get('base', {})
+    if 'configs' in grid:
+        return [dict(base, **config) for config in grid['configs']]
+    axes = grid.get('axes', {})
+    keys = list(axes)
+    return [dict(base, **dict(zip(keys, values)))
+            for values in itertools.product(*(axes[k] for k in keys))]
+
+
+def default_configs(corpus_dpi):
+    """默认网格：dpi 按样本集分辨率换算，缺少 server 模型时只评估 mobile"""
+    grid = json.loads(json.dumps(DEFAULT_GRID))
+    grid['axes']['dpi'] = [round(corpus_dpi * f) for f in grid['axes']['dpi']]
+    grid['axes']['models'] = [m for m in MODEL_FAMILIES
+                              if all(os.path.exists(d) for d in model_dirs(m))]
+    return expand_grid(grid)
+
+
+def format_config(config):
+    """配置的简短文字表示"""
+    return ' '.join(f"{k}={v}" for k, v in sorted(config.items())) or '(默认)'
+
+
+def _resolve(config, corpus_dpi):
+    """
+    把配置拆成模型目录、图片缩放系数和 init_ocr_model 参数
+
+    Returns:
+        (det_model_path, rec_model_path, scale, ocr_options)
+
+    Raises:
+        ValueError: 配置中有所选后端不支持（会被忽略）的参数
+    """
+    from ocr_backends import split_backend_options
+
+    options = dict(config)
+    family = options.pop('models', 'mobile')
+    det_model_path, rec_model_path = model_dirs(family)
+    det_model_path = options.pop('det', det_model_path)
+    rec_model_path = options.pop('rec', rec_model_path)
+    scale = options.pop('dpi', corpus_dpi) / corpus_dpi
+    # 模型名称仅 PaddleOCR 产线需要，分桶流水线 / ONNX 后端直接读目录
+    if family != 'mobile' and not options.get('rec_bucketing') \
+            and options.get('backend', 'paddle') == 'paddle':
+        options.setdefault('text_detection_model_name', f"PP-OCRv5_{family}_det")
+        options.setdefault('text_recognition_model_name', f"PP-OCRv5_{family}_rec")
+    # 量化模型只能用 ONNX 后端（见 init_ocr_model）
+    backend = options.get('backend', 'paddle')
+    if options.get('variant', 'float') != 'float':
+        backend = 'onnx'
+    if backend != 'paddle':
+        _, _, ignored = split_backend_options(
+            backend, {k: v for k, v in options.items() if k not in PIPELINE_KEYS})
+        if ignored:
+            raise ValueError(f"{backend} 后端不支持参数 {', '.join(sorted(ignored))}"
+                             f"（配置: {format_config(config)}）")
+    return det_model_path, rec_model_path, scale, options
+
+
+# ----------------------------------------------------------------------
+# 缓存指纹
+# ----------------------------------------------------------------------
+
+def _tree_fingerprint(paths):
+    """文件（或目录下全部文件）的路径、大小、修改时间摘要"""
+    digest = hashlib.sha1()
+    for path in paths:
+        if os.path.isdir(path):
+            files = sorted(os.path.join(root, name)
+                           for root, _, names in os.walk(path) for name in names)
+        else:
+            files = [path]
+        for name in files:
+            try:
+                st = os.stat(name)
+            except OSError:
+                continue
+            digest.update(f"{os.path.abspath(name)}|{st.st_size}|{st.st_mtime_ns}\n".encode())
+    return digest.hexdigest()
+
+
+def config_key(config, corpus_fingerprint, corpus_dpi):
+    """配置的缓存键：配置本身 + 样本集 + 模型文件 + 本机调优档案"""
+    from ocr_tuner import load_tuning_profile
+
+    det_model_path, rec_model_path, _, _ = _resolve(config, corpus_dpi)
+    payload = {
+        'version': CACHE_VERSION,
+        'config': config,
+        'corpus': corpus_fingerprint,
+        'corpus_dpi': corpus_dpi,
+        'models': _tree_fingerprint([det_model_path, rec_model_path]),
+        'tuning': load_tuning_profile(det_model_path, rec_model_path),
+        'iou_thresh': IOU_THRESH,
+    }
+    return hashlib.sha1(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def load_cache(path):
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        print(f"[警告] 缓存文件无法读取，已忽略: {path}")
+        return {}
+    return cache if isinstance(cache, dict) else {}
+
+
+def save_cache(path, cache):
+    from prepare_models import write_json_atomic
+
+    write_json_atomic(path, cache)
+
+
+# ----------------------------------------------------------------------
+# 评估
+# ----------------------------------------------------------------------
+
+def score_page(pred_polys, pred_texts, boxes, iou_thresh=IOU_THRESH):
+    """
+    单页指标
+
+    Args:
+        pred_polys: 预测框
+        pred_texts: 预测文本
+        boxes: 标注 [{'points', 'transcription'}, ...]
+
+    Returns:
+        {'gt_boxes', 'matched', 'errors', 'chars'}
+    """
+    from ocr_metrics import edit_distance, match_boxes
+
+    gt_polys = [b['points'] for b in boxes]
+    matches = match_boxes(pred_polys, gt_polys, iou_thresh)
+    matched_pred = {p for p, _, _ in matches}
+    matched_gt = {r for _, r, _ in matches}
+    errors = sum(edit_distance(pred_texts[p], boxes[r]['transcription']) for p, r, _ in matches)
+    # 漏检的整行删除，多检的整行插入
+    errors += sum(len(b['transcription']) for i, b in enumerate(boxes) if i not in matched_gt)
+    errors += sum(len(t) for i, t in enumerate(pred_texts) if i not in matched_pred)
+    return {'gt_boxes': len(gt_polys), 'matched': len(matches), 'errors': errors,
+            'chars': sum(len(b['transcription']) for b in boxes)}
+
+
+def evaluate_config(config, samples, corpus_dpi):
+    """
+    在当前进程中评估一组配置
+
+    Args:
+        config: 配置字典
+        samples: load_labeled_samples 的返回值
+        corpus_dpi: 样本图片的分辨率（dpi 配置按此换算缩放系数）
+
+    Returns:
+        指标字典
+    """
+    import cv2
+    import numpy as np
+    from ocr_engine import init_ocr_model
+    from page_source import read_image
+
+    det_model_path, rec_model_path, scale, options = _resolve(config, corpus_dpi)
+    start = time.perf_counter()
+    ocr = init_ocr_model(det_model_path, rec_model_path, **options)
+    load_seconds = time.perf_counter() - start
+
+    def prepare(path):
+        img = read_image(path)
+        if scale != 1.0:
+            interpolation = cv2.INTER_AREA if scale < 1.0 else cv2.INTER_CUBIC
+            img = cv2.resize(img, None, fx=scale, fy=scale, interpolation=interpolation)
+        return img
+
+    # 预热（首次推理包含大量一次性初始化开销）
+    ocr.predict(prepare(samples[0][0]))
+
+    totals = {'gt_boxes': 0, 'matched': 0, 'errors': 0, 'chars': 0}
+    predict_seconds = 0.0
+    for image_path, boxes in samples:
+        img = prepare(image_path)
+        start = time.perf_counter()
+        res = ocr.predict(img)[0]
+        predict_seconds += time.perf_counter() - start
+        polys = [np.asarray(p, dtype=np.float32) / scale for p in res['rec_polys']]
+        for key, value in score_page(polys, list(res['rec_texts']), boxes).items():
+            totals[key] += value
+
+    pages = len(samples)
+    return {
+        'cer': totals['errors'] / totals['chars'] if totals['chars'] else 0.0,
+        'box_recall': totals['matched'] / totals['gt_boxes'] if totals['gt_boxes'] else 1.0,
+        'pages_per_sec': pages / predict_seconds if predict_seconds > 0 else None,
+        'ms_per_page': predict_seconds * 1000 / pages if pages else None,
+        'load_seconds': load_seconds,
+        'pages': pages,
+        'gt_boxes': totals['gt_boxes'],
+        'chars': totals['chars'],
+    }
+
+
+def _eval_worker(config, samples, corpus_dpi, result_queue):
+    """评估子进程"""
+    try:
+        result_queue.put({'ok': True, 'metrics': evaluate_config(config, samples, corpus_dpi)})
+    except Exception as e:
+        import traceback
+
+        result_queue.put({'ok': False, 'error': f"{type(e).__name__}: {e}",
+                          'traceback': traceback.format_exc()})
+
+
+def run_isolated(config, samples, corpus_dpi, timeout=DEFAULT_TIMEOUT):
+    """
+    在独立的 spawn 子进程中评估一组配置
+
+    Returns:
+        指标字典；失败时返回 {'error': ...}
+    """
+    import queue
+
+    ctx = mp.get_context('spawn')
+    result_queue = ctx.Queue()
+    process = ctx.Process(target=_eval_worker, args=(config, samples, corpus_dpi, result_queue))
+    process.start()
+    deadline = time.time() + timeout
+    message = None
+    while message is None and time.time() < deadline:
+        try:
+            message = result_queue.get(timeout=1)
+        except queue.Empty:
+            if not process.is_alive() and result_queue.empty():
+                break
+    process.join(timeout=5)
+    if process.is_alive():
+        process.terminate()
+    if message is None:
+        return {'error': '超时或进程异常退出'}
+    if not message['ok']:
+        return {'error': message['error']}
+    return message['metrics']
+
+
+def pareto_front(results):
+    """
+    精度 / 速度 Pareto 前沿（CER 越低、召回率越高、速度越快越好）
+
+    Args:
+        results: [{'cer', 'box_recall', 'pages_per_sec', ...}, ...]（失败的配置被忽略）
+
+    Returns:
+        前沿上的结果列表，按速度降序
+    """
+    valid = [r for r in results if 'error' not in r and r.get('pages_per_sec')]
+
+    def dominates(a, b):
+        no_worse = (a['cer'] <= b['cer'] and a['box_recall'] >= b['box_recall']
+                    and a['pages_per_sec'] >= b['pages_per_sec'])
+        better = (a['cer'] < b['cer'] or a['box_recall'] > b['box_recall']
+                  or a['pages_per_sec'] > b['pages_per_sec'])
+        return no_worse and better
+
+    front = [r for r in valid if not any(dominates(other, r) for other in valid)]
+    return sorted(front, key=lambda r: r['pages_per_sec'], reverse=True)
+
+
+def run_grid(configs, samples, corpus_dpi, output_dir, rerun=False, timeout=DEFAULT_TIMEOUT,
+             corpus_fingerprint=None):
+    """
+    评估全部配置（命中缓存的配置直接复用结果）
+
+    Returns:
+        [{'config', 'key', 'cached', 指标...}, ...]
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    cache_path = os.path.join(output_dir, CACHE_FILE)
+    cache = {} if rerun else load_cache(cache_path)
+    if corpus_fingerprint is None:
+        corpus_fingerprint = _tree_fingerprint([path for path, _ in samples])
+
+    results = []
+    for number, config in enumerate(configs, 1):
+        key = config_key(config, corpus_fingerprint, corpus_dpi)
+        label = format_config(config)
+        if key in cache:
+            print(f"[{number}/{len(configs)}] {label}  （缓存）")
+            results.append(dict(cache[key], config=config, key=key, cached=True))
+            continue
+        print(f"[{number}/{len(configs)}] {label}")
+        metrics = run_isolated(config, samples, corpus_dpi, timeout)
+        if 'error' in metrics:
+            # 失败的配置不写入缓存，下次重试
+            print(f"    [失败] {metrics['error']}")
+        else:
+            print(f"    CER {metrics['cer']:.4f}  召回 {metrics['box_recall']:.4f}  "
+                  f"{metrics['pages_per_sec']:.2f} 页/秒")
+            cache[key] = metrics
+            save_cache(cache_path, cache)
+        results.append(dict(metrics, config=config, key=key, cached=False))
+    return results
+
+
+def print_table(results, front):
+    """打印全部配置，Pareto 前沿上的配置以 * 标记"""
+    front_keys = {r['key'] for r in front}
+    print("\n" + "=" * 100)
+    print(f"  {'CER':>8s}  {'召回率':>7s}  {'页/秒':>7s}  {'ms/页':>8s}  配置")
+    print("=" * 100)
+    ranked = sorted(results, key=lambda r: r.get('pages_per_sec') or 0, reverse=True)
+    for r in ranked:
+        mark = '*' if r['key'] in front_keys else ' '
+        if 'error' in r:
+            print(f"{mark} {'失败':>8s}  {'':>7s}  {'':>7s}  {'':>8s}  {format_config(r['config'])}")
+            continue
+        print(f"{mark} {r['cer']:>8.4f}  {r['box_recall']:>7.4f}  {r['pages_per_sec']:>7.2f}  "
+              f"{r['ms_per_page']:>8.1f}  {format_config(r['config'])}")
+    print("=" * 100)
+    print(f"* Pareto 前沿（{len(front)} / {len(results)} 组配置）")
+
+
+def main():
+    """主函数"""
+    import argparse
+    from ocr_metrics import load_labeled_samples
+
+    parser = argparse.ArgumentParser(description='识别精度 / 速度 Pareto 评估')
+    parser.add_argument('samples', help='标注样本目录（含 Label.txt）')
+    parser.add_argument('--grid', default=None, help='配置网格 JSON（默认内置网格）')
+    parser.add_argument('--output', default='ocr_eval', help='结果与缓存目录 (默认: ocr_eval)')
+    parser.add_argument('--corpus-dpi', type=float, default=DEFAULT_PDF_DPI,
+                        help=f'样本图片的分辨率 (默认: {DEFAULT_PDF_DPI})')
+    parser.add_argument('--limit', type=int, default=None, help='只使用前 N 个样本')
+    parser.add_argument('--rerun', action='store_true', help='忽略缓存，重新评估全部配置')
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT,
+                        help=f'单组配置超时秒数 (默认: {DEFAULT_TIMEOUT})')
+    args = parser.parse_args()
+
+    try:
+        samples = load_labeled_samples(args.samples)
+    except FileNotFoundError as e:
+        print(f"错误: {e}")
+        return 1
+    samples = [(path, boxes) for path, boxes in samples if os.path.exists(path)]
+    if args.limit:
+        samples = samples[:args.limit]
+    if not samples:
+        print(f"错误: 样本集中没有可用图片: {args.samples}")
+        return 1
+
+    if args.grid:
+        with open(args.grid, 'r', encoding='utf-8') as f:
+            configs = expand_grid(json.load(f))
+    else:
+        configs = default_configs(args.corpus_dpi)
+    if not configs:
+        print("错误: 配置网格为空")
+        return 1
+    try:
+        for config in configs:
+            _resolve(config, args.corpus_dpi)
+    except ValueError as e:
+        print(f"错误: {e}")
+        return 1
+
+    print("=" * 60)
+    print(f"样本: {len(samples)} 页  配置: {len(configs)} 组")
+    print("=" * 60)
+    results = run_grid(configs, samples, args.corpus_dpi, args.output, rerun=args.rerun,
+                       timeout=args.timeout)
+    front = pareto_front(results)
+    print_table(results, front)
+
+    from prepare_models import write_json_atomic
+
+    output_path = os.path.join(args.output, RESULTS_FILE)
+    write_json_atomic(output_path, {
+        'samples_dir': os.path.abspath(args.samples),
+        'pages': len(samples),
+        'corpus_dpi': args.corpus_dpi,
+        'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'results': results,
+        'pareto_front': front,
+    })
+    print(f"[成功] 结果已保存: {output_path}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,462 @@
+"""
+========================================================
+OCR 结果全文索引
+========================================================
+
+功能说明：
+    基于 SQLite 的磁盘倒排索引，在 process_file 逐页保存结果时增量写入：
+        - 中文/日文/韩文按字符二元组（bigram）切分，拉丁字母和数字按词切分
+        - 倒排表记录 词项 → (页, 文本框)，命中结果可以定位到文本框坐标
+        - 按 TF-IDF 对页面排序，同一文本框内连续命中查询串的额外加分
+        - 文档重新识别时先删除旧记录再写入（增量更新 / 删除）
+
+    倒排表以 (词项, 页, 文本框) 为主键的 WITHOUT ROWID 表存储，
+    查询只需按词项做 B 树范围扫描，不需要扫描全表。
+
+运行方式：
+    # 查询
+    python ocr_index.py 发票 金额
+    python ocr_index.py --db output/ocr_index.db "invoice 2024" --limit 10
+
+    # 从已有输出目录重建索引（读取 *_res.json）
+    python ocr_index.py --rebuild output
+========================================================
+"""
+
+import os
+import sys
+import json
+import math
+import sqlite3
+import time
+import unicodedata
+
+
+INDEX_FILE = 'ocr_index.db'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    doc_id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    indexed_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS pages (
+    page_id INTEGER PRIMARY KEY,
+    doc_id INTEGER NOT NULL,
+    page_no INTEGER NOT NULL,
+    result_dir TEXT,
+    UNIQUE (doc_id, page_no)
+);
+CREATE TABLE IF NOT EXISTS boxes (
+    box_id INTEGER PRIMARY KEY,
+    page_id INTEGER NOT NULL,
+    line_no INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    x0 REAL, y0 REAL, x1 REAL, y1 REAL
+);
+CREATE INDEX IF NOT EXISTS boxes_page ON boxes (page_id);
+CREATE TABLE IF NOT EXISTS terms (
+    term_id INTEGER PRIMARY KEY,
+    term TEXT NOT NULL UNIQUE,
+    df INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS postings (
+    term_id INTEGER NOT NULL,
+    page_id INTEGER NOT NULL,
+    box_id INTEGER NOT NULL,
+    tf INTEGER NOT NULL,
+    PRIMARY KEY (term_id, page_id, box_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS postings_page ON postings (page_id);
+"""
+
+
+def default_index_path(output_dir="output"):
+    """输出目录对应的索引文件路径"""
+    return os.path.join(output_dir, INDEX_FILE)
+
+
+def _is_cjk(ch):
+    """判断是否为需要按字切分的 CJK 字符"""
+    code = ord(ch)
+    return (0x4E00 <= code <= 0x9FFF or 0x3400 <= code <= 0x4DBF or
+            0x3040 <= code <= 0x30FF or 0xAC00 <= code <= 0xD7AF or
+            0x20000 <= code <= 0x2FA1F or 0xF900 <= code <= 0xFAFF)
+
+
+def tokenize(text, run_tails=False):
+    """
+    将文本切分为索引词项
+
+    Args:
+        text: 文本
+        run_tails: 是否额外输出每段连续 CJK 字符的最后一个字（写入索引时使用）。
+            单字查询按前缀匹配以该字开头的二元组，只出现在末尾的字
+            （如"发票"中的"票"）需要由这个单字词项命中
+
+    Returns:
+        词项列表（按出现顺序，可重复）：
+            - 连续 CJK 字符输出相邻二元组，单独一个字时输出该字
+            - 连续字母/数字输出小写词
+    """
+    text = unicodedata.normalize('NFKC', text).lower()
+    terms = []
+    run = []
+    word = []
+
+    def flush_run():
+        if len(run) == 1:
+            terms.append(run[0])
+        else:
+            terms.extend(run[i] + run[i + 1] for i in range(len(run) - 1))
+            if run_tails:
+                terms.append(run[-1])
+        run.clear()
+
+    def flush_word():
+        terms.append(''.join(word))
+        word.clear()
+
+    for ch in text:
+        if _is_cjk(ch):
+            if word:
+                flush_word()
+            run.append(ch)
+        elif ch.isalnum():
+            if run:
+                flush_run()
+            word.append(ch)
+        else:
+            if run:
+                flush_run()
+            if word:
+                flush_word()
+    if run:
+        flush_run()
+    if word:
+        flush_word()
+    return terms
+
+
+def _poly_rect(poly):
+    """多边形外接矩形 (x0, y0, x1, y1)"""
+    xs = [float(p[0]) for p in poly]
+    ys = [float(p[1]) for p in poly]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+class OCRIndex:
+    """
+    OCR 结果倒排索引
+
+    用法：
+        with OCRIndex('output/ocr_index.db') as index:
+            index.remove_document(path)
+            index.add_page(path, 1, texts, polys)
+        hits = OCRIndex('output/ocr_index.db').search('发票 金额')
+    """
+
+    def __init__(self, db_path):
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.db_path = db_path
+        # 允许在 GUI 后台线程中使用（同一时刻只有一个线程写入）；
+        # 多个进程同时写入时等待写锁而不是立即报错
+        self.conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(_SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        self.close()
+
+    def commit(self):
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    @staticmethod
+    def _doc_key(path):
+        return os.path.abspath(str(path))
+
+    def _doc_id(self, path, create=False):
+        key = self._doc_key(path)
+        row = self.conn.execute('SELECT doc_id FROM documents WHERE path = ?', (key,)).fetchone()
+        if row is not None:
+            if create:
+                self.conn.execute('UPDATE documents SET indexed_at = ? WHERE doc_id = ?',
+                                  (time.time(), row[0]))
+            return row[0]
+        if not create:
+            return None
+        cur = self.conn.execute('INSERT INTO documents (path, indexed_at) VALUES (?, ?)',
+                                (key, time.time()))
+        return cur.lastrowid
+
+    def _delete_pages(self, page_ids):
+        """删除页面及其文本框、倒排记录，并维护文档频率"""
+        for page_id in page_ids:
+            term_ids = [row[0] for row in self.conn.execute(
+                'SELECT DISTINCT term_id FROM postings WHERE page_id = ?', (page_id,))]
+            self.conn.executemany('UPDATE terms SET df = df - 1 WHERE term_id = ?',
+                                  [(t,) for t in term_ids])
+            self.conn.execute('DELETE FROM postings WHERE page_id = ?', (page_id,))
+            self.conn.execute('DELETE FROM boxes WHERE page_id = ?', (page_id,))
+            self.conn.execute('DELETE FROM pages WHERE page_id = ?', (page_id,))
+
+    def remove_document(self, path):
+        """
+        删除文档的全部索引记录（文档重新识别前调用）
+
+        Returns:
+            删除的页数
+        """
+        doc_id = self._doc_id(path)
+        if doc_id is None:
+            return 0
+        page_ids = [row[0] for row in self.conn.execute(
+            'SELECT page_id FROM pages WHERE doc_id = ?', (doc_id,))]
+        self._delete_pages(page_ids)
+        self.conn.execute('DELETE FROM documents WHERE doc_id = ?', (doc_id,))
+        return len(page_ids)
+
+    def rename_document(self, old_path, new_path):
+        """源文件移动后更新索引中的路径"""
+        if self._doc_key(new_path) != self._doc_key(old_path):
+            self.remove_document(new_path)
+        self.conn.execute('UPDATE documents SET path = ? WHERE path = ?',
+                          (self._doc_key(new_path), self._doc_key(old_path)))
+
+    def _term_ids(self, terms):
+        """获取词项 ID，不存在时创建"""
+        ids = {}
+        for term in terms:
+            self.conn.execute('INSERT OR IGNORE INTO terms (term) VALUES (?)', (term,))
+            ids[term] = self.conn.execute('SELECT term_id FROM terms WHERE term = ?',
+                                          (term,)).fetchone()[0]
+        return ids
+
+    def add_page(self, doc_path, page_no, texts, polys=None, result_dir=None):
+        """
+        写入（或替换）一页的识别结果
+
+        Args:
+            doc_path: 源文件路径
+            page_no: 页码（从 1 开始）
+            texts: 文本行列表（rec_texts）
+            polys: 对应的文本框多边形（rec_polys），可为 None
+            result_dir: 该页结果目录
+        """
+        doc_id = self._doc_id(doc_path, create=True)
+        row = self.conn.execute('SELECT page_id FROM pages WHERE doc_id = ? AND page_no = ?',
+                                (doc_id, page_no)).fetchone()
+        if row is not None:
+            self._delete_pages([row[0]])
+        page_id = self.conn.execute(
+            'INSERT INTO pages (doc_id, page_no, result_dir) VALUES (?, ?, ?)',
+            (doc_id, page_no, result_dir)).lastrowid
+
+        box_terms = []
+        for line_no, text in enumerate(texts):
+            rect = _poly_rect(polys[line_no]) if polys is not None and len(polys) > line_no else (None,) * 4
+            box_id = self.conn.execute(
+                'INSERT INTO boxes (page_id, line_no, text, x0, y0, x1, y1) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (page_id, line_no, str(text)) + tuple(rect)).lastrowid
+            counts = {}
+            for term in tokenize(str(text), run_tails=True):
+                counts[term] = counts.get(term, 0) + 1
+            box_terms.append((box_id, counts))
+
+        page_terms = {term for _, counts in box_terms for term in counts}
+        term_ids = self._term_ids(sorted(page_terms))
+        self.conn.executemany(
+            'INSERT INTO postings (term_id, page_id, box_id, tf) VALUES (?, ?, ?, ?)',
+            [(term_ids[term], page_id, box_id, tf)
+             for box_id, counts in box_terms for term, tf in counts.items()])
+        self.conn.executemany('UPDATE terms SET df = df + 1 WHERE term_id = ?',
+                              [(term_ids[term],) for term in page_terms])
+        return page_id
+
+    def _lookup_terms(self, term):
+        """
+        查询词项对应的 (term_id, df) 列表
+
+        单个 CJK 字只在位于连续 CJK 字符末尾时单独入索引，
+        因此同时按前缀匹配以该字开头的全部二元组。
+        """
+        rows = self.conn.execute('SELECT term_id, df FROM terms WHERE term = ? AND df > 0',
+                                 (term,)).fetchall()
+        if len(term) == 1 and _is_cjk(term):
+            rows += self.conn.execute(
+                'SELECT term_id, df FROM terms WHERE term > ? AND term < ? AND df > 0',
+                (term, term + '\U0010ffff')).fetchall()
+        return rows
+
+    def page_count(self):
+        return self.conn.execute('SELECT COUNT(*) FROM pages').fetchone()[0]
+
+    def search(self, query, limit=20):
+        """
+        查询索引
+
+        Args:
+            query: 查询文本（空格分隔的多个词条需同时出现在一页中）
+            limit: 返回的最大页数
+
+        Returns:
+            按得分降序的命中列表，每项为
+            {'path', 'page', 'score', 'result_dir', 'boxes': [{'text', 'box': [x0, y0, x1, y1]}, ...]}
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+        total_pages = max(self.page_count(), 1)
+
+        # 按文档频率从低到高求页面交集，稀有词项先过滤
+        term_rows = []
+        for term in terms:
+            rows = self._lookup_terms(term)
+            if not rows:
+                return []
+            term_rows.append((sum(df for _, df in rows), term, rows))
+        term_rows.sort(key=lambda item: item[0])
+
+        candidate_pages = None
+        page_scores = {}
+        page_boxes = {}
+        for df, term, rows in term_rows:
+            idf = math.log(1 + total_pages / max(df, 1))
+            matched = {}
+            for term_id, term_df in rows:
+                if candidate_pages is not None and len(candidate_pages) < term_df:
+                    # 候选页少于该词项的倒排页数时逐页点查，避免扫描高频词项的全部记录
+                    cursor = ((page_id, box_id, tf) for page_id in candidate_pages
+                              for box_id, tf in self.conn.execute(
+                                  'SELECT box_id, tf FROM postings WHERE term_id = ? AND page_id = ?',
+                                  (term_id, page_id)))
+                else:
+                    cursor = self.conn.execute(
+                        'SELECT page_id, box_id, tf FROM postings WHERE term_id = ?', (term_id,))
+                for page_id, box_id, tf in cursor:
+                    matched.setdefault(page_id, {})[box_id] = tf
+            candidate_pages = set(matched) if candidate_pages is None else candidate_pages & set(matched)
+            if not candidate_pages:
+                return []
+            for page_id in candidate_pages:
+                tf = sum(matched[page_id].values())
+                page_scores[page_id] = page_scores.get(page_id, 0.0) + (1 + math.log(tf)) * idf
+                page_boxes.setdefault(page_id, set()).update(matched[page_id])
+
+        # 查询串在单个文本框内完整出现时加分
+        phrase = unicodedata.normalize('NFKC', query).lower().strip()
+        ranked = sorted(candidate_pages, key=lambda p: -page_scores[p])[:max(limit * 4, limit)]
+        hits = []
+        for page_id in ranked:
+            box_ids = page_boxes[page_id]
+            placeholders = ','.join('?' * len(box_ids))
+            boxes = self.conn.execute(
+                f'SELECT box_id, text, x0, y0, x1, y1 FROM boxes WHERE box_id IN ({placeholders}) '
+                f'ORDER BY line_no', list(box_ids)).fetchall()
+            score = page_scores[page_id]
+            if any(phrase in unicodedata.normalize('NFKC', text).lower() for _, text, *_ in boxes):
+                score *= 1.5
+            path, page_no, result_dir = self.conn.execute(
+                'SELECT d.path, p.page_no, p.result_dir FROM pages p JOIN documents d '
+                'ON d.doc_id = p.doc_id WHERE p.page_id = ?', (page_id,)).fetchone()
+            hits.append({
+                'path': path,
+                'page': page_no,
+                'score': round(score, 4),
+                'result_dir': result_dir,
+                'boxes': [{'text': text, 'box': [x0, y0, x1, y1]}
+                          for _, text, x0, y0, x1, y1 in boxes],
+            })
+        hits.sort(key=lambda hit: -hit['score'])
+        return hits[:limit]
+
+
+def rebuild_from_outputs(index, output_dir):
+    """
+    从已有的输出目录（*_res.json）重建索引
+
+    Args:
+        index: OCRIndex 实例
+        output_dir: 输出根目录
+
+    Returns:
+        写入的页数
+    """
+    seen_docs = set()
+    count = 0
+    for root, _, files in os.walk(output_dir):
+        for filename in sorted(files):
+            if not filename.endswith('_res.json'):
+                continue
+            with open(os.path.join(root, filename), 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            data = data.get('res', data)
+            doc_path = data.get('input_path')
+            if not doc_path:
+                continue
+            if doc_path not in seen_docs:
+                index.remove_document(doc_path)
+                seen_docs.add(doc_path)
+            page_index = data.get('page_index')
+            page_no = (page_index or 0) + 1
+            index.add_page(doc_path, page_no, data.get('rec_texts', []),
+                           data.get('rec_polys'), result_dir=root)
+            count += 1
+    index.commit()
+    return count
+
+
+def main():
+    """主函数"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='OCR 结果全文检索')
+    parser.add_argument('query', nargs='*', help='查询文本')
+    parser.add_argument('--db', default=default_index_path(), help='索引文件路径')
+    parser.add_argument('--limit', type=int, default=20, help='最多返回的页数')
+    parser.add_argument('--rebuild', metavar='OUTPUT_DIR', help='从输出目录重建索引')
+    parser.add_argument('--json', action='store_true', help='以 JSON 输出命中结果')
+
+    args = parser.parse_args()
+
+    with OCRIndex(args.db) as index:
+        if args.rebuild:
+            start = time.perf_counter()
+            count = rebuild_from_outputs(index, args.rebuild)
+            print(f"[成功] 已索引 {count} 页 ({time.perf_counter() - start:.2f}s)")
+
+        if not args.query:
+            if not args.rebuild:
+                parser.print_help()
+            return 0
+
+        query = ' '.join(args.query)
+        start = time.perf_counter()
+        hits = index.search(query, limit=args.limit)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+    if args.json:
+        print(json.dumps(hits, ensure_ascii=False, indent=2))
+        return 0
+
+    print(f"查询: {query}    命中 {len(hits)} 页 ({elapsed_ms:.1f} ms)")
+    for hit in hits:
+        print(f"\n[{hit['score']:.2f}] {hit['path']}  第 {hit['page']} 页")
+        for box in hit['boxes'][:5]:
+            x0, y0, x1, y1 = box['box']
+            pos = f"({x0:.0f},{y0:.0f})-({x1:.0f},{y1:.0f})" if x0 is not None else ""
+            print(f"    {pos:>24}  {box['text']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
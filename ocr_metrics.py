@@ -0,0 +1,178 @@
+"""
+========================================================
+OCR 评估指标
+========================================================
+
+功能说明：
+    提供识别与检测结果比对所需的基础指标：
+        - 编辑距离 / 字符错误率 (CER)
+        - 文本框 IoU 与贪心匹配
+        - 标注样本集读取（PPOCRLabel 的 Label.txt 格式）
+
+标注样本集格式：
+    <样本目录>/Label.txt，每行为
+        图片相对路径\t[{"transcription": "文字", "points": [[x1, y1], ...]}, ...]
+    transcription 为 "###" 的文本框视为难例，不参与评估。
+========================================================
+"""
+
+import os
+import json
+
+import numpy as np
+
+
+LABEL_FILE = 'Label.txt'
+IGNORE_TRANSCRIPTION = '###'
+
+
+def load_labeled_samples(samples_dir, label_file=LABEL_FILE):
+    """
+    读取标注样本集
+
+    Args:
+        samples_dir: 样本目录
+        label_file: 标注文件名
+
+    Returns:
+        [(图片路径, [{'points': ..., 'transcription': ...}, ...]), ...]
+    """
+    label_path = os.path.join(samples_dir, label_file)
+    if not os.path.exists(label_path):
+        raise FileNotFoundError(f"标注文件不存在: {label_path}")
+
+    samples = []
+    with open(label_path, 'r', encoding='utf-8') as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.rstrip('\n')
+            if not line.strip():
+                continue
+            try:
+                rel_path, annotation = line.split('\t', 1)
+                boxes = json.loads(annotation)
+            except ValueError:
+                print(f"警告: {label_path}:{line_no} 格式错误，已跳过")
+                continue
+            # PPOCRLabel 保存的路径带有样本目录名前缀
+            image_path = os.path.join(samples_dir, rel_path)
+            if not os.path.exists(image_path):
+                image_path = os.path.join(samples_dir, os.path.basename(rel_path))
+            boxes = [b for b in boxes if b.get('transcription') != IGNORE_TRANSCRIPTION]
+            samples.append((image_path, boxes))
+    return samples
+
+
+def edit_distance(a, b):
+    """
+    计算两个字符串的 Levenshtein 编辑距离
+
+    Args:
+        a: 字符串
+        b: 字符串
+
+    Returns:
+        编辑距离
+    """
+    if a == b:
+        return 0
+    if len(a) < len(b):
+        a, b = b, a
+    if not b:
+        return len(a)
+
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1,
+                               current[j - 1] + 1,
+                               previous[j - 1] + (ca != cb)))
+        previous = current
+    return previous[-1]
+
+
+def char_error_rate(pred, ref):
+    """
+    字符错误率 = 编辑距离 / 参考文本长度
+
+    Args:
+        pred: 预测文本
+        ref: 参考文本
+
+    Returns:
+        CER（参考文本为空时，预测为空返回 0，否则返回 1）
+    """
+    if not ref:
+        return 0.0 if not pred else 1.0
+    return edit_distance(pred, ref) / len(ref)
+
+
+def polys_to_rects(polys):
+    """
+    将多边形转换为外接矩形
+
+    Args:
+        polys: N×K×2 多边形（或多边形列表）
+
+    Returns:
+        N×4 数组 (x0, y0, x1, y1)
+    """
+    if len(polys) == 0:
+        return np.zeros((0, 4), dtype=np.float32)
+    rects = []
+    for poly in polys:
+        pts = np.asarray(poly, dtype=np.float32).reshape(-1, 2)
+        rects.append((pts[:, 0].min(), pts[:, 1].min(), pts[:, 0].max(), pts[:, 1].max()))
+    return np.asarray(rects, dtype=np.float32)
+
+
+def rect_iou_matrix(rects_a, rects_b):
+    """
+    计算两组矩形的 IoU 矩阵
+
+    Returns:
+        len(a) × len(b) 数组
+    """
+    a = np.asarray(rects_a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(rects_b, dtype=np.float32).reshape(-1, 4)
+    if len(a) == 0 or len(b) == 0:
+        return np.zeros((len(a), len(b)), dtype=np.float32)
+
+    x0 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y0 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x1 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y1 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x1 - x0, 0, None) * np.clip(y1 - y0, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-6), 0.0)
+
+
+def match_boxes(pred_polys, ref_polys, iou_thresh=0.5):
+    """
+    按 IoU 从高到低贪心匹配预测框与参考框
+
+    Args:
+        pred_polys: 预测多边形
+        ref_polys: 参考多边形
+        iou_thresh: 匹配所需的最小 IoU
+
+    Returns:
+        [(预测下标, 参考下标, IoU), ...]
+    """
+    iou = rect_iou_matrix(polys_to_rects(pred_polys), polys_to_rects(ref_polys))
+    if iou.size == 0:
+        return []
+
+    pairs = np.argwhere(iou >= iou_thresh)
+    order = np.argsort(-iou[pairs[:, 0], pairs[:, 1]], kind='stable')
+    used_pred, used_ref = set(), set()
+    matches = []
+    for p, r in pairs[order].tolist():
+        if p in used_pred or r in used_ref:
+            continue
+        used_pred.add(p)
+        used_ref.add(r)
+        matches.append((p, r, float(iou[p, r])))
+    return matches
@@ -0,0 +1,493 @@
+"""
+========================================================
+自定义 OCR 识别流水线（检测 + 分桶批量识别）
+========================================================
+
+功能说明：
+    将检测与识别拆开执行，由本流水线负责识别阶段的批处理：
+        1. 检测模型输出文本框，按阅读顺序排序后裁剪文本行
+        2. 按宽高比对裁剪图排序，并划分宽度桶，
+           每个批次的填充总宽度不超过 max_padded_width
+        3. 逐批识别后恢复原始顺序
+
+    稠密页面上的文本行宽度差异很大，朴素批处理会把短行填充到
+    批内最长行的宽度，浪费大量识别计算；分桶后填充浪费被限制在
+    bucket_growth 倍以内。
+
+    predict() 返回的结果对象兼容 PaddleOCR 结果的常用接口
+    （get / save_to_json / save_to_img / print），
+    可直接用于 ocr_engine.process_file。
+
+运行方式（识别阶段基准测试）：
+    python ocr_pipeline.py --bench ./corpus --min-lines 80
+========================================================
+"""
+
+import os
+import sys
+import json
+import math
+import time
+
+import cv2
+import numpy as np
+
+from page_source import iter_pages, is_pdf, source_name
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 识别模型输入尺寸（PP-OCRv5 rec: [3, 48, 320]），宽度不足时填充到 320
+DEFAULT_REC_IMAGE_SHAPE = (3, 48, 320)
+# 识别模型支持的最大输入宽度
+MAX_REC_WIDTH = 3200
+
+# 每个批次填充后的总宽度上限（像素，batch_size × 批内最大宽度）
+DEFAULT_MAX_PADDED_WIDTH = 320 * 16
+# 单个桶内最大宽度与最小宽度之比
+DEFAULT_BUCKET_GROWTH = 1.5
+DEFAULT_MAX_BATCH_SIZE = 32
+
+
+def load_rec_image_shape(rec_model_path):
+    """
+    从 inference.yml 读取识别模型输入尺寸
+
+    Args:
+        rec_model_path: 识别模型目录
+
+    Returns:
+        (C, H, W)
+    """
+    yml_path = os.path.join(rec_model_path, 'inference.yml')
+    try:
+        import yaml
+        with open(yml_path, 'r', encoding='utf-8') as f:
+            config = yaml.safe_load(f)
+        for op in config['PreProcess']['transform_ops']:
+            if 'RecResizeImg' in op:
+                return tuple(op['RecResizeImg']['image_shape'])
+    except Exception:
+        pass
+    return DEFAULT_REC_IMAGE_SHAPE
+
+
+def rec_input_width(crop, rec_image_shape=DEFAULT_REC_IMAGE_SHAPE):
+    """计算裁剪图缩放到识别输入高度后的宽度"""
+    _, rec_h, min_w = rec_image_shape
+    h, w = crop.shape[:2]
+    width = int(math.ceil(rec_h * w / max(h, 1)))
+    return min(max(width, min_w), MAX_REC_WIDTH)
+
+
+def plan_rec_batches(widths, max_padded_width=DEFAULT_MAX_PADDED_WIDTH,
+                     max_batch_size=DEFAULT_MAX_BATCH_SIZE,
+                     bucket_growth=DEFAULT_BUCKET_GROWTH):
+    """
+    按宽度排序并划分识别批次
+
+    排序后顺序扫描，遇到以下任一情况即开启新批次：
+        - 当前宽度超过批内最小宽度的 bucket_growth 倍（换桶）
+        - 批大小达到 max_batch_size
+        - 批大小 × 当前宽度 超过 max_padded_width
+
+    Args:
+        widths: 每个裁剪图的识别输入宽度
+        max_padded_width: 每批填充后的总宽度上限
+        max_batch_size: 每批最多裁剪图数
+        bucket_growth: 桶内宽度比上限
+
+    Returns:
+        批次列表，每个批次为原始下标列表
+    """
+    widths = np.asarray(widths)
+    order = np.argsort(widths, kind='stable')
+
+    batches = []
+    current = []
+    bucket_floor = 0
+    for idx in order.tolist():
+        width = int(widths[idx])
+        if current:
+            size = len(current) + 1
+            if (width > bucket_floor * bucket_growth
+                    or size > max_batch_size
+                    or size * width > max_padded_width):
+                batches.append(current)
+                current = []
+        if not current:
+            bucket_floor = width
+        current.append(idx)
+    if current:
+        batches.append(current)
+    return batches
+
+
+def plan_naive_batches(count, batch_size=DEFAULT_MAX_BATCH_SIZE):
+    """按检测顺序切分批次（用于对比基准）"""
+    return [list(range(i, min(i + batch_size, count))) for i in range(0, count, batch_size)]
+
+
+def pad_rec_batch(crops, rec_image_shape=DEFAULT_REC_IMAGE_SHAPE):
+    """
+    将一批裁剪图缩放到识别高度，并右侧填充到批内统一宽度
+
+    填充值 127 归一化后约为 0，与识别模型内部的零填充等价，
+    因此模型看到的批次宽度正是分桶计划中的宽度。
+    """
+    _, rec_h, _ = rec_image_shape
+    widths = [rec_input_width(c, rec_image_shape) for c in crops]
+    batch_w = max(widths)
+    padded = []
+    for crop in crops:
+        h, w = crop.shape[:2]
+        resized_w = min(int(math.ceil(rec_h * w / max(h, 1))), batch_w)
+        resized = cv2.resize(crop, (max(resized_w, 1), rec_h))
+        canvas = np.full((rec_h, batch_w, 3), 127, dtype=np.uint8)
+        canvas[:, :resized.shape[1]] = resized
+        padded.append(canvas)
+    return padded
+
+
+def get_rotate_crop_image(img, points):
+    """
+    按四边形透视裁剪文本行（与 PaddleOCR 实现一致）
+
+    Args:
+        img: BGR 图像
+        points: 4×2 顶点坐标
+
+    Returns:
+        裁剪后的文本行图像
+    """
+    points = np.asarray(points, dtype=np.float32)
+    crop_w = int(max(np.linalg.norm(points[0] - points[1]),
+                     np.linalg.norm(points[2] - points[3])))
+    crop_h = int(max(np.linalg.norm(points[0] - points[3]),
+                     np.linalg.norm(points[1] - points[2])))
+    crop_w, crop_h = max(crop_w, 1), max(crop_h, 1)
+    pts_std = np.float32([[0, 0], [crop_w, 0], [crop_w, crop_h], [0, crop_h]])
+    M = cv2.getPerspectiveTransform(points, pts_std)
+    dst = cv2.warpPerspective(img, M, (crop_w, crop_h),
+                              borderMode=cv2.BORDER_REPLICATE, flags=cv2.INTER_CUBIC)
+    # 竖排文本旋转为横排
+    if dst.shape[0] / dst.shape[1] >= 1.5:
+        dst = np.rot90(dst)
+    return dst
+
+
+def sort_boxes(dt_polys):
+    """
+    将文本框按从上到下、从左到右排序（与 PaddleOCR 实现一致）
+
+    Args:
+        dt_polys: N×4×2 文本框数组
+
+    Returns:
+        排序后的文本框数组
+    """
+    if len(dt_polys) == 0:
+        return dt_polys
+    boxes = sorted(list(dt_polys), key=lambda b: (b[0][1], b[0][0]))
+    for i in range(len(boxes) - 1):
+        for j in range(i, -1, -1):
+            if (abs(boxes[j + 1][0][1] - boxes[j][0][1]) < 10
+                    and boxes[j + 1][0][0] < boxes[j][0][0]):
+                boxes[j], boxes[j + 1] = boxes[j + 1], boxes[j]
+            else:
+                break
+    return np.asarray(boxes)
+
+
+class PageResult(dict):
+    """
+    单页识别结果
+
+    字段与 PaddleOCR 结果保持一致：input_path, page_index, dt_polys,
+    rec_polys, rec_texts, rec_scores；另含 timing（各阶段耗时，毫秒）。
+    image 为可视化时绘制文本框的页面图像（不写入 JSON）。
+    """
+
+    def __init__(self, image=None, **fields):
+        super().__init__(**fields)
+        self.image = image
+
+    @property
+    def json(self):
+        """可 JSON 序列化的结果"""
+        return {'res': _to_jsonable({k: v for k, v in self.items()})}
+
+    def _base_name(self):
+        name = source_name(self.get('input_path')) if self.get('input_path') else 'array'
+        if self.get('page_index') is not None:
+            name = f"{name}_{self['page_index']}"
+        return name
+
+    def save_to_json(self, save_path):
+        """保存 JSON 结果（save_path 为目录时自动命名）"""
+        if not str(save_path).endswith('.json'):
+            save_path = os.path.join(save_path, f"{self._base_name()}_res.json")
+        with open(save_path, 'w', encoding='utf-8') as f:
+            json.dump(self.json, f, ensure_ascii=False, indent=4)
+
+    def save_to_img(self, save_path):
+        """保存带文本框标注的可视化图像（save_path 为目录时自动命名）"""
+        if self.image is None:
+            return
+        if not str(save_path).lower().endswith(('.png', '.jpg')):
+            save_path = os.path.join(save_path, f"{self._base_name()}_ocr_res_img.png")
+        vis = self.image.copy()
+        polys = [np.asarray(p, dtype=np.int32).reshape(-1, 1, 2) for p in self.get('rec_polys', [])]
+        cv2.polylines(vis, polys, True, (0, 0, 255), 2)
+        ok, buf = cv2.imencode(os.path.splitext(save_path)[1], vis)
+        if ok:
+            buf.tofile(save_path)
+
+    def print(self):
+        """打印识别结果"""
+        print(json.dumps(self.json, ensure_ascii=False, indent=2))
+
+
+def _to_jsonable(value):
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, (np.floating, np.integer)):
+        return value.item()
+    if isinstance(value, dict):
+        return {k: _to_jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_to_jsonable(v) for v in value]
+    return value
+
+
+class OCRPipeline:
+    """
+    检测 + 分桶批量识别流水线
+
+    Args:
+        det_model_path: 检测模型目录
+        rec_model_path: 识别模型目录
+        backend: 推理后端，'paddle' 或 'onnx'（见 ocr_backends.py）
+        max_padded_width: 每批填充后的总宽度上限
+        max_batch_size: 每批最多文本行数
+        bucket_growth: 桶内宽度比上限
+        bucketing: False 时按检测顺序固定批大小识别（对照组）
+        text_rec_score_thresh: 识别置信度阈值，低于阈值的文本行被丢弃
+        model_options: 传递给推理后端的参数（cpu_threads、enable_mkldnn 等）
+    """
+
+    def __init__(self, det_model_path, rec_model_path,
+                 backend='paddle',
+                 max_padded_width=DEFAULT_MAX_PADDED_WIDTH,
+                 max_batch_size=DEFAULT_MAX_BATCH_SIZE,
+                 bucket_growth=DEFAULT_BUCKET_GROWTH,
+                 bucketing=True,
+                 text_rec_score_thresh=0.0,
+                 **model_options):
+        from ocr_backends import create_backends
+
+        # 识别批大小由本流水线控制
+        batch_size = model_options.pop('text_recognition_batch_size', None)
+        if batch_size:
+            max_batch_size = batch_size
+
+        self.backend = backend
+        self.det_backend, self.rec_backend = create_backends(
+            backend, det_model_path, rec_model_path, **model_options)
+        self.rec_image_shape = load_rec_image_shape(rec_model_path)
+        self.max_padded_width = max_padded_width
+        self.max_batch_size = max_batch_size
+        self.bucket_growth = bucket_growth
+        self.bucketing = bucketing
+        self.text_rec_score_thresh = text_rec_score_thresh
+
+    def detect(self, img):
+        """检测文本框，返回排序后的 N×4×2 数组"""
+        return sort_boxes(self.det_backend.detect(img))
+
+    def plan_batches(self, crops):
+        """为裁剪图生成识别批次计划"""
+        if not self.bucketing:
+            return plan_naive_batches(len(crops), self.max_batch_size)
+        widths = [rec_input_width(c, self.rec_image_shape) for c in crops]
+        return plan_rec_batches(widths, self.max_padded_width,
+                                self.max_batch_size, self.bucket_growth)
+
+    def recognize(self, crops):
+        """
+        分批识别裁剪图，并按输入顺序返回结果
+
+        Returns:
+            (文本列表, 置信度列表)
+        """
+        texts = [''] * len(crops)
+        scores = [0.0] * len(crops)
+        for batch in self.plan_batches(crops):
+            padded = pad_rec_batch([crops[i] for i in batch], self.rec_image_shape)
+            for idx, (text, score) in zip(batch, self.rec_backend.recognize(padded)):
+                texts[idx] = text
+                scores[idx] = score
+        return texts, scores
+
+    def predict_image(self, img, input_path=None, page_index=None):
+        """
+        识别单页图像
+
+        Returns:
+            PageResult
+        """
+        t0 = time.perf_counter()
+        dt_polys = self.detect(img)
+        t1 = time.perf_counter()
+
+        crops = [get_rotate_crop_image(img, poly) for poly in dt_polys]
+        texts, scores = self.recognize(crops)
+        t2 = time.perf_counter()
+
+        keep = [i for i, s in enumerate(scores) if s >= self.text_rec_score_thresh]
+        rec_polys = dt_polys[keep] if len(keep) else np.zeros((0, 4, 2), dtype=np.int32)
+        return PageResult(
+            image=img,
+            input_path=input_path,
+            page_index=page_index,
+            dt_polys=dt_polys,
+            rec_polys=rec_polys,
+            rec_texts=[texts[i] for i in keep],
+            rec_scores=[scores[i] for i in keep],
+            timing={'det_ms': (t1 - t0) * 1000, 'rec_ms': (t2 - t1) * 1000},
+        )
+
+    def predict(self, input):
+        """
+        识别文件（PDF 或图片）或图像数组
+
+        Returns:
+            PageResult 列表（每页一个）
+        """
+        input_path = None if isinstance(input, np.ndarray) else input
+        paged = input_path is not None and is_pdf(input_path)
+        return [
+            self.predict_image(img, input_path=input_path,
+                               page_index=page_index if paged else None)
+            for page_index, img in iter_pages(input)
+        ]
+
+
+def _percent(a, b):
+    return (a / b - 1.0) * 100 if b else 0.0
+
+
+def benchmark_rec_stage(pipeline, corpus_dir, min_lines=80, repeats=3):
+    """
+    对比稠密页面上朴素批处理与分桶批处理的识别阶段耗时
+
+    Args:
+        pipeline: OCRPipeline 实例
+        corpus_dir: 基准语料目录（图片 / PDF）
+        min_lines: 文本行数不少于该值的页面视为稠密页面
+        repeats: 每页重复次数（取最小值）
+
+    Returns:
+        汇总结果字典
+    """
+    rows = []
+    for name in sorted(os.listdir(corpus_dir)):
+        path = os.path.join(corpus_dir, name)
+        if not os.path.isfile(path):
+            continue
+        try:
+            pages = list(iter_pages(path))
+        except Exception as e:
+            print(f"  跳过 {name}: {e}")
+            continue
+
+        for page_index, img in pages:
+            dt_polys = pipeline.detect(img)
+            if len(dt_polys) < min_lines:
+                continue
+            crops = [get_rotate_crop_image(img, poly) for poly in dt_polys]
+
+            timings = {}
+            outputs = {}
+            for mode in (False, True):
+                pipeline.bucketing = mode
+                best = float('inf')
+                for _ in range(repeats):
+                    start = time.perf_counter()
+                    outputs[mode] = pipeline.recognize(crops)
+                    best = min(best, time.perf_counter() - start)
+                timings[mode] = best * 1000
+
+            mismatches = sum(a != b for a, b in zip(outputs[False][0], outputs[True][0]))
+            rows.append({
+                'page': f"{name}#{page_index + 1}",
+                'lines': len(crops),
+                'naive_ms': timings[False],
+                'bucketed_ms': timings[True],
+                'speedup': timings[False] / timings[True] if timings[True] else 0.0,
+                'text_mismatches': mismatches,
+            })
+            print(f"  {name}#{page_index + 1}: {len(crops)} 行  朴素 {timings[False]:.1f} ms"
+                  f"  分桶 {timings[True]:.1f} ms  加速 {rows[-1]['speedup']:.2f}x")
+
+    pipeline.bucketing = True
+    naive_total = sum(r['naive_ms'] for r in rows)
+    bucketed_total = sum(r['bucketed_ms'] for r in rows)
+    return {
+        'dense_pages': len(rows),
+        'naive_ms': naive_total,
+        'bucketed_ms': bucketed_total,
+        'speedup': naive_total / bucketed_total if bucketed_total else 0.0,
+        'text_mismatches': sum(r['text_mismatches'] for r in rows),
+        'pages': rows,
+    }
+
+
+def main():
+    """主函数"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='分桶批量识别流水线基准测试')
+    parser.add_argument('--bench', required=True, help='基准语料目录（图片 / PDF）')
+    parser.add_argument('--min-lines', type=int, default=80, help='稠密页面的最少文本行数 (默认: 80)')
+    parser.add_argument('--max-padded-width', type=int, default=DEFAULT_MAX_PADDED_WIDTH,
+                        help=f'每批填充后的总宽度上限 (默认: {DEFAULT_MAX_PADDED_WIDTH})')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_MAX_BATCH_SIZE,
+                        help=f'每批最多文本行数 (默认: {DEFAULT_MAX_BATCH_SIZE})')
+    parser.add_argument('--backend', choices=['paddle', 'onnx'], default='paddle',
+                        help='推理后端 (默认: paddle)')
+    parser.add_argument('--output', help='将结果保存为 JSON')
+    parser.add_argument('--det', default=os.path.join(BASE_DIR, "testmodel", "PP-OCRv5_mobile_det_infer"))
+    parser.add_argument('--rec', default=os.path.join(BASE_DIR, "testmodel", "PP-OCRv5_mobile_rec_infer"))
+
+    args = parser.parse_args()
+
+    pipeline = OCRPipeline(args.det, args.rec,
+                           backend=args.backend,
+                           max_padded_width=args.max_padded_width,
+                           max_batch_size=args.batch_size)
+
+    print("=" * 60)
+    print("识别阶段基准测试：朴素批处理 vs 宽度分桶")
+    print("=" * 60)
+    summary = benchmark_rec_stage(pipeline, args.bench, args.min_lines)
+
+    print("\n" + "=" * 60)
+    if not summary['dense_pages']:
+        print(f"没有文本行数 >= {args.min_lines} 的稠密页面")
+        return 1
+    print(f"稠密页面: {summary['dense_pages']}")
+    print(f"识别耗时: 朴素 {summary['naive_ms']:.1f} ms / 分桶 {summary['bucketed_ms']:.1f} ms"
+          f"  ({_percent(summary['bucketed_ms'], summary['naive_ms']):+.1f}%)")
+    print(f"识别阶段加速: {summary['speedup']:.2f}x")
+    print(f"文本不一致行数: {summary['text_mismatches']}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        print(f"结果已保存: {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,408 @@
+"""
+========================================================
+页级 OCR 作业调度器
+========================================================
+
+功能说明：
+    process_file 一次处理完整个文档，大文档会让随后提交的单页请求一直等待。
+    本模块把文档拆成页级任务，由固定数量的工作线程按以下规则调度：
+        - 严格优先级：interactive > normal > batch，高优先级有任务时先执行
+        - 同一优先级内，按提交者加权公平分享（虚拟时间公平队列）：
+          每执行一页，提交者的虚拟时间增加 1/权重，总是先调度虚拟时间最小的提交者
+        - 同一提交者内，剩余页数少的作业优先
+        - 未指定优先级时按大小分类：不超过 SMALL_JOB_PAGES 页的作业为 interactive
+        - 每页结束后重新调度，小作业/高优先级作业在页边界抢占大文档
+
+    统计每个优先级的排队等待时间（提交 → 第一页开始）和
+    周转时间（提交 → 全部完成）的分位数。
+
+用法：
+    scheduler = OCRScheduler(det_model_path, rec_model_path, workers=1).start()
+    big = scheduler.submit('500页.pdf', submitter='alice', output_dir='output/big')
+    small = scheduler.submit('单页.png', submitter='bob')
+    small.wait()                # 不必等 big 完成
+    print(scheduler.stats())
+    scheduler.shutdown()
+
+运行方式：
+    python ocr_scheduler.py batch:alice:大文档.pdf interactive:bob:图片.png --delay 2
+========================================================
+"""
+
+import os
+import sys
+import time
+import itertools
+import threading
+from collections import defaultdict, deque
+
+from page_source import (DEFAULT_PDF_DPI, PDFIUM_LOCK, count_pages, is_pdf, iter_pages,
+                         render_pdf_page)
+from watch_folder import latency_summary
+
+
+PRIORITY_CLASSES = ('interactive', 'normal', 'batch')
+# 未指定优先级时，不超过该页数的作业视为交互式作业
+SMALL_JOB_PAGES = 4
+# 每个优先级保留的统计样本数
+STATS_WINDOW = 1000
+
+class OCRJob:
+    """
+    一个文档的识别作业
+
+    属性：
+        results: 按页索引排列的识别结果（未完成的页为 None）
+        error: 任一页失败（或作业被取消）时的异常
+    """
+
+    _ids = itertools.count(1)
+
+    def __init__(self, source, submitter, priority, output_dir=None, dpi=DEFAULT_PDF_DPI):
+        self.job_id = next(self._ids)
+        self.source = source
+        self.submitter = submitter
+        self.priority = priority
+        self.output_dir = output_dir
+        self.dpi = dpi
+        self.total_pages = count_pages(source)
+        self.results = [None] * self.total_pages
+        self.error = None
+
+        self.submitted_at = time.monotonic()
+        self.started_at = None
+        self.finished_at = None
+        self.next_page = 0        # 下一个待调度的页
+        self.pages_done = 0
+        self.cancelled = False
+        self._done = threading.Event()
+        self._pdf = None
+
+    @property
+    def remaining(self):
+        """尚未调度的页数"""
+        return 0 if self.cancelled else self.total_pages - self.next_page
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        """
+        等待作业完成
+
+        Returns:
+            各页识别结果列表；作业失败时抛出异常
+        """
+        if not self._done.wait(timeout):
+            raise TimeoutError(f"作业 {self.job_id} 未在 {timeout}s 内完成")
+        if self.error is not None:
+            raise self.error
+        return self.results
+
+    def render(self, page_index):
+        """渲染指定页（PDF 页、TIFF / GIF 帧或页图像数组列表中的一页）"""
+        if not isinstance(self.source, str) or not is_pdf(self.source):
+            for _, img in iter_pages(self.source, self.dpi,
+                                     page_range=(page_index, page_index + 1)):
+                return img
+            raise IndexError(f"页索引超出范围: {page_index}")
+        # PDF 在作业内只打开一次；pdfium 调用与其他线程共用 page_source 的锁
+        with PDFIUM_LOCK:
+            if self._pdf is None:
+                import pypdfium2 as pdfium
+                self._pdf = pdfium.PdfDocument(self.source)
+            return render_pdf_page(self._pdf, page_index, self.dpi)
+
+    def _close(self):
+        if self._pdf is not None:
+            with PDFIUM_LOCK:
+                self._pdf.close()
+            self._pdf = None
+
+
+class FairQueue:
+    """
+    页级任务队列：严格优先级 + 提交者加权公平分享
+
+    调用方负责加锁（OCRScheduler 在条件变量下调用）。
+    """
+
+    def __init__(self):
+        # 优先级 → 提交者 → 作业列表
+        self.jobs = {cls: defaultdict(list) for cls in PRIORITY_CLASSES}
+        # (优先级, 提交者) → 虚拟时间
+        self.vtime = {}
+        self.weights = {}
+
+    def set_weight(self, submitter, weight):
+        if weight <= 0:
+            raise ValueError("权重必须大于 0")
+        self.weights[submitter] = weight
+
+    def _active(self, cls):
+        return [s for s, jobs in self.jobs[cls].items() if any(j.remaining for j in jobs)]
+
+    def add(self, job):
+        """加入作业；提交者重新变为活跃时，虚拟时间追平同级活跃提交者，不累积空闲期的额度"""
+        key = (job.priority, job.submitter)
+        active = self._active(job.priority)
+        if job.submitter not in active:
+            floor = min((self.vtime.get((job.priority, s), 0.0) for s in active), default=None)
+            if floor is None:
+                floor = max((v for (cls, _), v in self.vtime.items() if cls == job.priority),
+                            default=0.0)
+            self.vtime[key] = max(self.vtime.get(key, 0.0), floor)
+        self.jobs[job.priority][job.submitter].append(job)
+
+    def pop(self):
+        """
+        取出下一个页任务
+
+        Returns:
+            (作业, 页索引)，没有待调度任务时返回 None
+        """
+        for cls in PRIORITY_CLASSES:
+            active = self._active(cls)
+            if not active:
+                continue
+            submitter = min(active, key=lambda s: (self.vtime.get((cls, s), 0.0), s))
+            jobs = self.jobs[cls][submitter]
+            job = min((j for j in jobs if j.remaining), key=lambda j: (j.remaining, j.job_id))
+            page_index = job.next_page
+            job.next_page += 1
+            self.vtime[(cls, submitter)] = (self.vtime.get((cls, submitter), 0.0)
+                                            + 1.0 / self.weights.get(submitter, 1.0))
+            return job, page_index
+        return None
+
+    def remove(self, job):
+        """作业完成后移出队列"""
+        jobs = self.jobs[job.priority].get(job.submitter)
+        if jobs and job in jobs:
+            jobs.remove(job)
+            if not jobs:
+                del self.jobs[job.priority][job.submitter]
+
+    def depth(self):
+        """各优先级尚未调度的页数"""
+        return {cls: sum(j.remaining for jobs in self.jobs[cls].values() for j in jobs)
+                for cls in PRIORITY_CLASSES}
+
+
+class OCRScheduler:
+    """
+    页级 OCR 调度器
+
+    Args:
+        det_model_path: 检测模型路径
+        rec_model_path: 识别模型路径
+        workers: 工作线程数（每个线程持有独立的模型实例）
+        ocr_factory: 创建模型实例的函数，默认 ocr_engine.init_ocr_model
+        **ocr_options: 传给 ocr_factory 的参数
+    """
+
+    def __init__(self, det_model_path, rec_model_path, workers=1, ocr_factory=None, **ocr_options):
+        if ocr_factory is None:
+            from ocr_engine import init_ocr_model as ocr_factory
+        self._factory = lambda: ocr_factory(det_model_path, rec_model_path, **ocr_options)
+        self.workers = max(1, workers)
+        self.queue = FairQueue()
+        self._cond = threading.Condition()
+        self._threads = []
+        self._stopping = False
+        self._queue_wait = defaultdict(lambda: deque(maxlen=STATS_WINDOW))
+        self._turnaround = defaultdict(lambda: deque(maxlen=STATS_WINDOW))
+        self._completed = defaultdict(int)
+
+    def start(self):
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f'ocr-sched-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def set_weight(self, submitter, weight):
+        """设置提交者的公平分享权重（默认 1）"""
+        with self._cond:
+            self.queue.set_weight(submitter, weight)
+
+    def submit(self, source, submitter='default', priority=None, output_dir=None,
+               dpi=DEFAULT_PDF_DPI):
+        """
+        提交识别作业
+
+        Args:
+            source: 文件路径或 BGR 图像数组
+            submitter: 提交者（公平分享的单位）
+            priority: 'interactive' / 'normal' / 'batch'，None 时按页数自动分类
+            output_dir: 提供时按 process_file 的目录结构保存每页结果
+            dpi: PDF 渲染分辨率
+
+        Returns:
+            OCRJob
+        """
+        if priority is not None and priority not in PRIORITY_CLASSES:
+            raise ValueError(f"未知优先级: {priority}，可选 {PRIORITY_CLASSES}")
+        job = OCRJob(source, submitter, priority, output_dir, dpi)
+        if job.priority is None:
+            job.priority = 'interactive' if job.total_pages <= SMALL_JOB_PAGES else 'normal'
+        if output_dir is not None:
+            os.makedirs(output_dir, exist_ok=True)
+        with self._cond:
+            if self._stopping:
+                raise RuntimeError("调度器已关闭")
+            if job.total_pages == 0:
+                # 没有页可调度（0 页 PDF、空页面列表），不会有工作线程调用 _finish
+                self._finish(job)
+                return job
+            self.queue.add(job)
+            self._cond.notify()
+        return job
+
+    def _worker(self):
+        """工作线程：每完成一页重新从队列取任务"""
+        from async_ocr import save_page_outputs
+
+        ocr = None
+        while True:
+            with self._cond:
+                task = self.queue.pop()
+                while task is None and not self._stopping:
+                    self._cond.wait()
+                    task = self.queue.pop()
+                if task is None:
+                    return
+                job, page_index = task
+                if job.started_at is None:
+                    job.started_at = time.monotonic()
+                    self._queue_wait[job.priority].append(job.started_at - job.submitted_at)
+
+            try:
+                if ocr is None:
+                    ocr = self._factory()
+                img = job.render(page_index)
+                res = ocr.predict(img)[0]
+                res['page_index'] = page_index if job.total_pages > 1 else None
+                if isinstance(job.source, str):
+                    res['input_path'] = job.source
+                if job.output_dir is not None:
+                    save_page_outputs(res, job.output_dir, page_index + 1)
+                job.results[page_index] = res
+            except Exception as e:
+                job.error = job.error or e
+                job.cancelled = True
+
+            with self._cond:
+                job.pages_done += 1
+                if job.pages_done == job.next_page and job.remaining == 0:
+                    self._finish(job)
+
+    def _finish(self, job):
+        """作业的全部已调度页完成（持有锁时调用）"""
+        job.finished_at = time.monotonic()
+        self.queue.remove(job)
+        if job.started_at is not None:
+            self._turnaround[job.priority].append(job.finished_at - job.submitted_at)
+            self._completed[job.priority] += 1
+        job._close()
+        job._done.set()
+
+    def cancel(self, job):
+        """取消作业尚未调度的页（正在执行的页会执行完）"""
+        with self._cond:
+            job.cancelled = True
+            if job.error is None:
+                job.error = RuntimeError(f"作业 {job.job_id} 已取消")
+            if not job.done and job.pages_done == job.next_page:
+                self._finish(job)
+
+    def stats(self):
+        """
+        各优先级统计
+
+        Returns:
+            {优先级: {'completed', 'pending_pages', 'queue_wait', 'turnaround'}}，时间单位为秒
+        """
+        with self._cond:
+            depth = self.queue.depth()
+            return {cls: {
+                'completed': self._completed[cls],
+                'pending_pages': depth[cls],
+                'queue_wait': latency_summary(list(self._queue_wait[cls])),
+                'turnaround': latency_summary(list(self._turnaround[cls])),
+            } for cls in PRIORITY_CLASSES}
+
+    def shutdown(self, wait=True):
+        """停止调度；wait=True 时先处理完已提交的作业，否则取消尚未调度的页"""
+        if not wait:
+            for cls in PRIORITY_CLASSES:
+                for jobs in list(self.queue.jobs[cls].values()):
+                    for job in list(jobs):
+                        self.cancel(job)
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join()
+
+
+def print_stats(stats):
+    """打印各优先级的统计表"""
+    print(f"\n{'优先级':<12} {'完成':>6} {'排队 p50':>10} {'排队 p99':>10} "
+          f"{'周转 p50':>10} {'周转 p99':>10}")
+    for cls, item in stats.items():
+        wait, turn = item['queue_wait'], item['turnaround']
+        if not turn['count']:
+            continue
+        print(f"{cls:<12} {item['completed']:>6} {wait['p50']:>10.2f} {wait['p99']:>10.2f} "
+              f"{turn['p50']:>10.2f} {turn['p99']:>10.2f}")
+
+
+def main():
+    """主函数"""
+    import argparse
+    from ocr_tuner import DEFAULT_DET_MODEL, DEFAULT_REC_MODEL
+
+    parser = argparse.ArgumentParser(description='页级 OCR 调度演示')
+    parser.add_argument('jobs', nargs='+',
+                        help='作业，格式为 [优先级:][提交者:]文件路径，优先级可省略（按页数自动分类）')
+    parser.add_argument('--workers', type=int, default=1, help='工作线程数')
+    parser.add_argument('--delay', type=float, default=0.0, help='相邻作业的提交间隔（秒）')
+    parser.add_argument('--output', default=None, help='结果输出根目录（默认不保存）')
+
+    args = parser.parse_args()
+
+    scheduler = OCRScheduler(DEFAULT_DET_MODEL, DEFAULT_REC_MODEL, workers=args.workers).start()
+    jobs = []
+    for spec in args.jobs:
+        parts = spec.split(':')
+        priority = parts.pop(0) if len(parts) > 1 and parts[0] in PRIORITY_CLASSES else None
+        submitter = parts.pop(0) if len(parts) > 1 and not os.path.exists(spec) else 'default'
+        path = ':'.join(parts)
+        output_dir = None
+        if args.output:
+            output_dir = os.path.join(args.output, os.path.splitext(os.path.basename(path))[0])
+        job = scheduler.submit(path, submitter, priority, output_dir)
+        print(f"[提交] #{job.job_id} {os.path.basename(path)} ({job.total_pages} 页, "
+              f"{job.priority}, 提交者 {submitter})")
+        jobs.append(job)
+        time.sleep(args.delay)
+
+    for job in jobs:
+        try:
+            job.wait()
+            status = "完成"
+        except Exception as e:
+            status = f"失败: {e}"
+        print(f"[{status}] #{job.job_id} {os.path.basename(job.source)} "
+              f"排队 {job.started_at - job.submitted_at:.2f}s, "
+              f"周转 {job.finished_at - job.submitted_at:.2f}s")
+
+    scheduler.shutdown()
+    print_stats(scheduler.stats())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,483 @@
+"""
+========================================================
+PaddleOCR 推理参数自动调优工具
+========================================================
+
+功能说明：
+    在本机上运行一段简短的校准负载，对以下参数进行扫描：
+        - CPU 线程数 (cpu_threads)
+        - 是否启用 MKLDNN (enable_mkldnn)
+        - 识别批大小 (text_recognition_batch_size)
+        - 进程数 × 线程数 的拆分方式
+    并把结果写入按主机名区分的调优档案：单进程最优配置由
+    init_ocr_model 启动时自动读取；进程数 × 线程数 拆分单独保存，
+    由多进程识别（watch_folder / soak_test / job_queue run）
+    在未指定 --workers 时采用。
+
+调优档案：
+    ./tuning/<主机名>.json
+    可通过环境变量 PPOCR_TUNING_PROFILE 指定其他路径，
+    设置为 "off" 时禁用自动加载。
+
+运行方式：
+    python ocr_tuner.py
+    python ocr_tuner.py --corpus ./samples --pages 20
+    python ocr_tuner.py --show
+========================================================
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import tempfile
+import multiprocessing as mp
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DET_MODEL = os.path.join(BASE_DIR, "testmodel", "PP-OCRv5_mobile_det_infer")
+DEFAULT_REC_MODEL = os.path.join(BASE_DIR, "testmodel", "PP-OCRv5_mobile_rec_infer")
+TUNING_DIR = os.path.join(BASE_DIR, "tuning")
+
+# 档案中会被传递给 PaddleOCR 的参数
+TUNABLE_OCR_OPTIONS = ('cpu_threads', 'enable_mkldnn', 'text_recognition_batch_size')
+
+# 默认扫描取值
+BATCH_SIZE_CHOICES = [1, 6, 16, 32]
+IMAGE_EXTS = ('.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff')
+
+
+def get_profile_path(hostname=None):
+    """
+    获取调优档案路径
+
+    Args:
+        hostname: 主机名，默认为当前主机
+
+    Returns:
+        档案文件路径
+    """
+    env_path = os.environ.get('PPOCR_TUNING_PROFILE')
+    if env_path and hostname is None:
+        return env_path
+    hostname = hostname or socket.gethostname()
+    return os.path.join(TUNING_DIR, f"{hostname}.json")
+
+
+def _read_profile(det_model_path=None, rec_model_path=None):
+    """
+    读取本机调优档案
+
+    档案不存在、已禁用或与当前模型不匹配时返回 None。
+    """
+    if os.environ.get('PPOCR_TUNING_PROFILE', '').lower() == 'off':
+        return None
+
+    profile_path = get_profile_path()
+    if not os.path.exists(profile_path):
+        return None
+
+    try:
+        with open(profile_path, 'r', encoding='utf-8') as f:
+            profile = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"警告: 无法读取调优档案 {profile_path}: {e}")
+        return None
+
+    # 模型不一致时档案不适用
+    models = profile.get('models', {})
+    for key, path in (('det', det_model_path), ('rec', rec_model_path)):
+        if path and models.get(key) and models[key] != os.path.basename(os.path.normpath(path)):
+            print(f"警告: 调优档案针对的模型为 {models[key]}，与当前模型不一致，已忽略")
+            return None
+    return profile
+
+
+def load_tuning_profile(det_model_path=None, rec_model_path=None):
+    """
+    读取本机调优档案，返回可直接传给 PaddleOCR 的参数
+
+    返回的是单进程最优配置（GUI、pdf.py 等单进程调用方直接使用）；
+    多进程拆分见 resolve_workers。档案不存在、已禁用或与当前模型
+    不匹配时返回空字典。
+
+    Args:
+        det_model_path: 检测模型路径（用于校验档案是否适用）
+        rec_model_path: 识别模型路径
+
+    Returns:
+        参数字典，例如 {'cpu_threads': 8, 'enable_mkldnn': True, ...}
+    """
+    profile = _read_profile(det_model_path, rec_model_path)
+    if profile is None:
+        return {}
+    best = profile.get('best', {})
+    options = {key: best[key] for key in TUNABLE_OCR_OPTIONS if key in best}
+    # 旧版档案的 best 是多进程拆分，其线程数不适用于单进程
+    if best.get('processes', 1) > 1:
+        options.pop('cpu_threads', None)
+    return options
+
+
+def resolve_workers(workers=None, det_model_path=None, rec_model_path=None, default=1):
+    """
+    确定多进程识别的工作进程数和每个进程的 OCR 参数
+
+    未指定进程数时采用调优档案中的 进程数 × 线程数 拆分；指定了进程数时
+    按调优时的总线程数平分线程，避免每个进程都按单进程最优线程数运行而
+    超额占用 CPU。没有档案时保持原样（进程数取 default，参数为空）。
+
+    Args:
+        workers: 命令行指定的进程数，None 表示采用档案推荐
+        det_model_path / rec_model_path: 模型路径（用于校验档案是否适用）
+        default: 无档案时的进程数
+
+    Returns:
+        (进程数, 追加给 init_ocr_model 的参数字典)
+    """
+    profile = _read_profile(det_model_path, rec_model_path)
+    parallel = (profile or {}).get('parallel')
+    if not parallel:
+        return (default if workers is None else workers), {}
+    if workers is None:
+        workers = parallel['processes']
+    # 调优时的总线程数（进程数 × 线程数，不超过参与调优的核数）按进程平分
+    budget = parallel['processes'] * parallel['cpu_threads']
+    return workers, {'cpu_threads': max(1, budget // max(1, workers))}
+
+
+def generate_calibration_pages(target_dir, count=8, size=(1240, 1754)):
+    """
+    生成合成校准页面（稠密的多行文字）
+
+    Args:
+        target_dir: 输出目录
+        count: 页数
+        size: 页面尺寸 (宽, 高)，默认约为 A4 150DPI
+
+    Returns:
+        图片路径列表
+    """
+    from PIL import Image, ImageDraw, ImageFont
+
+    os.makedirs(target_dir, exist_ok=True)
+    try:
+        font = ImageFont.truetype("DejaVuSans.ttf", 22)
+    except OSError:
+        font = ImageFont.load_default()
+
+    words = ("PaddleOCR benchmark calibration invoice total amount date "
+             "2025 page section report summary figure table 0123456789").split()
+    paths = []
+    for page in range(count):
+        img = Image.new('RGB', size, 'white')
+        draw = ImageDraw.Draw(img)
+        y = 60
+        line = 0
+        while y < size[1] - 80:
+            n_words = 3 + (page * 7 + line * 5) % 9
+            text = ' '.join(words[(page + line + i * 3) % len(words)] for i in range(n_words))
+            draw.text((60, y), text, fill='black', font=font)
+            y += 36
+            line += 1
+        path = os.path.join(target_dir, f"calib_{page + 1:03d}.png")
+        img.save(path)
+        paths.append(path)
+    return paths
+
+
+def collect_corpus(corpus_dir):
+    """收集校准目录中的图片文件"""
+    paths = []
+    for name in sorted(os.listdir(corpus_dir)):
+        if name.lower().endswith(IMAGE_EXTS):
+            paths.append(os.path.join(corpus_dir, name))
+    return paths
+
+
+def _worker_run(det_model_path, rec_model_path, ocr_options, pages, barrier, result_queue):
+    """
+    校准子进程：加载模型、预热，等待所有进程就绪后统一开始计时
+    """
+    try:
+        from ocr_engine import init_ocr_model
+
+        ocr = init_ocr_model(det_model_path, rec_model_path, **ocr_options)
+        # 预热（首次推理包含大量一次性初始化开销）
+        if pages:
+            ocr.predict(input=pages[0])
+    except Exception as e:
+        barrier.abort()
+        result_queue.put({'error': str(e)})
+        return
+
+    try:
+        barrier.wait()
+    except mp.BrokenBarrierError:
+        return
+
+    start = time.perf_counter()
+    for page in pages:
+        ocr.predict(input=page)
+    end = time.perf_counter()
+    result_queue.put({'start': start, 'end': end, 'pages': len(pages)})
+
+
+def benchmark_config(det_model_path, rec_model_path, config, pages, timeout=1800):
+    """
+    对一组配置进行计时
+
+    Args:
+        det_model_path: 检测模型路径
+        rec_model_path: 识别模型路径
+        config: 配置字典（包含 processes 与 TUNABLE_OCR_OPTIONS）
+        pages: 校准页面列表（会在各进程间均分）
+        timeout: 单组配置的超时时间（秒）
+
+    Returns:
+        每秒页数，失败时返回 None
+    """
+    processes = config.get('processes', 1)
+    ocr_options = {key: config[key] for key in TUNABLE_OCR_OPTIONS if key in config}
+
+    # 各进程处理相同数量的页面，保证总负载与进程数无关
+    shards = [pages[i::processes] for i in range(processes)]
+
+    ctx = mp.get_context('spawn')
+    barrier = ctx.Barrier(processes)
+    result_queue = ctx.Queue()
+    workers = [
+        ctx.Process(target=_worker_run,
+                    args=(det_model_path, rec_model_path, ocr_options, shard, barrier, result_queue))
+        for shard in shards
+    ]
+    for w in workers:
+        w.start()
+
+    results = []
+    deadline = time.time() + timeout
+    while len(results) < processes and time.time() < deadline:
+        try:
+            results.append(result_queue.get(timeout=1))
+        except Exception:
+            if not any(w.is_alive() for w in workers) and result_queue.empty():
+                break
+
+    for w in workers:
+        w.join(timeout=5)
+        if w.is_alive():
+            w.terminate()
+
+    errors = [r['error'] for r in results if 'error' in r]
+    if errors or len(results) < processes:
+        print(f"    [失败] {errors[0] if errors else '超时或进程异常退出'}")
+        return None
+
+    # perf_counter 在同一主机的进程间使用同一单调时钟
+    wall = max(r['end'] for r in results) - min(r['start'] for r in results)
+    total_pages = sum(r['pages'] for r in results)
+    return total_pages / wall if wall > 0 else None
+
+
+def _thread_choices(cpu_count):
+    """线程数候选：1, 2, 4, ... 直到 CPU 核数"""
+    choices = []
+    n = 1
+    while n < cpu_count:
+        choices.append(n)
+        n *= 2
+    choices.append(cpu_count)
+    return choices
+
+
+def _format_config(config):
+    return (f"proc={config['processes']:<3d} threads={config['cpu_threads']:<3d} "
+            f"mkldnn={str(config['enable_mkldnn']):<5s} batch={config['text_recognition_batch_size']:<3d}")
+
+
+def run_tuning(det_model_path, rec_model_path, pages, cpu_count=None):
+    """
+    分阶段扫描配置空间
+
+    1. 单进程下扫描 线程数 × MKLDNN
+    2. 固定最优线程配置，扫描识别批大小
+    3. 固定单进程参数，扫描 进程数 × 线程数 拆分（总线程数不超过核数）
+
+    前两步的结果供单进程调用方使用，第 3 步的结果只用于多进程识别，
+    两者分开返回。
+
+    Returns:
+        (单进程最优配置, 最优 进程数 × 线程数 拆分, 全部结果列表)
+    """
+    cpu_count = cpu_count or os.cpu_count() or 1
+    results = []
+    tested = {}
+
+    def measure(config):
+        key = tuple(sorted(config.items()))
+        if key in tested:
+            return tested[key]
+        print(f"  测试 {_format_config(config)} ...")
+        pps = benchmark_config(det_model_path, rec_model_path, config, pages)
+        tested[key] = pps
+        results.append(dict(config, pages_per_sec=pps))
+        if pps is not None:
+            print(f"    -> {pps:.2f} 页/秒")
+        return pps
+
+    def best_of(candidates):
+        scored = [(measure(c), c) for c in candidates]
+        scored = [(pps, c) for pps, c in scored if pps is not None]
+        if not scored:
+            return None
+        return max(scored, key=lambda item: item[0])[1]
+
+    default_batch = BATCH_SIZE_CHOICES[1]
+
+    print("\n[1/3] 扫描线程数与 MKLDNN")
+    best = best_of([
+        {'processes': 1, 'cpu_threads': t, 'enable_mkldnn': m,
+         'text_recognition_batch_size': default_batch}
+        for m in (True, False)
+        for t in _thread_choices(cpu_count)
+    ])
+    if best is None:
+        raise RuntimeError("所有配置均运行失败，请检查模型路径和 PaddleOCR 安装")
+
+    print("\n[2/3] 扫描识别批大小")
+    best = best_of([dict(best, text_recognition_batch_size=b) for b in BATCH_SIZE_CHOICES])
+
+    print("\n[3/3] 扫描进程数 × 线程数")
+    splits = []
+    for threads in _thread_choices(cpu_count):
+        processes = cpu_count // threads
+        if processes >= 1:
+            splits.append(dict(best, processes=processes, cpu_threads=threads))
+    parallel = best_of(splits + [best]) or best
+
+    return best, parallel, results
+
+
+def save_profile(best, results, det_model_path, rec_model_path, num_pages, profile_path=None,
+                 parallel=None):
+    """
+    写入调优档案
+
+    best 为单进程最优配置（init_ocr_model 自动加载），parallel 为多进程
+    拆分（resolve_workers 读取）。
+
+    Returns:
+        档案路径
+    """
+    profile_path = profile_path or get_profile_path()
+    os.makedirs(os.path.dirname(os.path.abspath(profile_path)), exist_ok=True)
+
+    def pps_of(config):
+        return next((r['pages_per_sec'] for r in results
+                     if all(r.get(k) == config.get(k) for k in ('processes',) + TUNABLE_OCR_OPTIONS)),
+                    None)
+
+    profile = {
+        'host': socket.gethostname(),
+        'cpu_count': os.cpu_count(),
+        'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'models': {
+            'det': os.path.basename(os.path.normpath(det_model_path)),
+            'rec': os.path.basename(os.path.normpath(rec_model_path)),
+        },
+        'calibration_pages': num_pages,
+        'best': dict(best, pages_per_sec=pps_of(best)),
+        'parallel': ({'processes': parallel['processes'], 'cpu_threads': parallel['cpu_threads'],
+                      'pages_per_sec': pps_of(parallel)} if parallel else None),
+        'results': results,
+    }
+
+    tmp_path = profile_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(profile, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, profile_path)
+    return profile_path
+
+
+def print_report(results, best=None):
+    """打印所有配置的吞吐量，按速度降序"""
+    print("\n" + "=" * 60)
+    print("调优结果（页/秒）")
+    print("=" * 60)
+    ranked = sorted(results, key=lambda r: r['pages_per_sec'] or 0, reverse=True)
+    for r in ranked:
+        pps = f"{r['pages_per_sec']:.2f}" if r['pages_per_sec'] else "失败"
+        mark = " *" if best and all(r.get(k) == best.get(k) for k in
+                                    ('processes',) + TUNABLE_OCR_OPTIONS) else ""
+        print(f"  {_format_config(r)}  {pps:>8s}{mark}")
+    print("=" * 60)
+
+
+def main():
+    """主函数"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='PaddleOCR 推理参数自动调优工具')
+    parser.add_argument('--det', default=DEFAULT_DET_MODEL, help='检测模型路径')
+    parser.add_argument('--rec', default=DEFAULT_REC_MODEL, help='识别模型路径')
+    parser.add_argument('--corpus', help='校准图片目录（默认生成合成页面）')
+    parser.add_argument('--pages', type=int, default=16, help='每组配置处理的页数 (默认: 16)')
+    parser.add_argument('--cpus', type=int, help='参与调优的 CPU 核数 (默认: 全部)')
+    parser.add_argument('--output', help='调优档案输出路径 (默认: tuning/<主机名>.json)')
+    parser.add_argument('--show', action='store_true', help='显示当前主机的调优档案')
+
+    args = parser.parse_args()
+
+    if args.show:
+        profile_path = args.output or get_profile_path()
+        if not os.path.exists(profile_path):
+            print(f"调优档案不存在: {profile_path}")
+            return 1
+        with open(profile_path, 'r', encoding='utf-8') as f:
+            profile = json.load(f)
+        print(f"档案: {profile_path}  (生成于 {profile.get('created')})")
+        print_report(profile.get('results', []), profile.get('best'))
+        parallel = profile.get('parallel')
+        if parallel:
+            print(f"多进程最优拆分: {parallel['processes']} 个进程 × {parallel['cpu_threads']} 线程")
+        return 0
+
+    for path in (args.det, args.rec):
+        if not os.path.exists(path):
+            print(f"错误: 模型不存在: {path}")
+            return 1
+
+    with tempfile.TemporaryDirectory(prefix='ppocr_tune_') as tmp_dir:
+        if args.corpus:
+            base_pages = collect_corpus(args.corpus)
+            if not base_pages:
+                print(f"错误: 校准目录中没有图片: {args.corpus}")
+                return 1
+        else:
+            print("正在生成合成校准页面...")
+            base_pages = generate_calibration_pages(tmp_dir)
+
+        # 循环填充到指定页数
+        pages = [base_pages[i % len(base_pages)] for i in range(args.pages)]
+
+        print("=" * 60)
+        print("PaddleOCR 推理参数自动调优")
+        print("=" * 60)
+        print(f"主机: {socket.gethostname()}  CPU: {args.cpus or os.cpu_count()}  校准页数: {len(pages)}")
+
+        best, parallel, results = run_tuning(args.det, args.rec, pages, cpu_count=args.cpus)
+
+    profile_path = save_profile(best, results, args.det, args.rec, len(pages), args.output,
+                                parallel=parallel)
+    print_report(results, best)
+    print(f"\n单进程最优配置: {_format_config(best)}")
+    print(f"多进程最优拆分: {parallel['processes']} 个进程 × {parallel['cpu_threads']} 线程")
+    print(f"调优档案已保存: {profile_path}")
+    print("init_ocr_model 将在下次启动时自动使用单进程配置；")
+    print("watch_folder / soak_test / job_queue run 未指定 --workers 时采用多进程拆分")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
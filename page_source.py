@@ -0,0 +1,532 @@
+"""
+========================================================
+页面输入模块
+========================================================
+
+功能说明：
+    将 PDF 或图片文件统一转换为逐页的 BGR 图像（numpy 数组），
+    供自定义识别流水线按页处理。
+        - PDF 逐页渲染，多帧 TIFF / GIF 逐帧解码，任意时刻只持有一页
+        - 超大图片在解码阶段降采样（JPEG 按 DCT 缩放解码，其余格式解码后立即缩小）
+        - 除文件路径外也接受内存输入，无需先写临时文件：
+          bytes / bytearray / memoryview、mmap、文件对象（有文件描述符时映射文件）、
+          BGR 图像数组或逐页图像数组列表；按文件头识别 PDF / TIFF / GIF，
+          PDF 缓冲区直接交给 pdfium 解析，图片直接从缓冲区解码，均不复制数据
+        - pdfium 不是线程安全的（不同文档之间也不行）：本模块的 PDF 打开、渲染、
+          关闭都在 PDFIUM_LOCK 下执行，其他直接调用 pypdfium2 的模块也应使用这把锁
+
+依赖：
+    - PDF 渲染：pypdfium2（随 PaddleOCR 3.x 一同安装）
+    - 图片解码：opencv-python，多帧 TIFF / GIF：Pillow
+========================================================
+"""
+
+import io
+import os
+import sys
+import math
+import mmap
+import ctypes
+import threading
+
+import cv2
+import numpy as np
+
+
+PDF_EXTS = ('.pdf',)
+
+MULTI_FRAME_EXTS = ('.tif', '.tiff', '.gif')
+
+# PDF 默认渲染分辨率（与 PaddleOCR 内置 PDF 读取保持一致）
+DEFAULT_PDF_DPI = 144
+
+# 图片解码的默认像素上限：检测模型会把最长边缩放到 4000 以内，更高的分辨率只占用内存
+LARGE_IMAGE_PIXELS = 4000 * 4000
+
+# 进程内所有 pdfium 调用共用的锁（可重入：持锁时可再调用本模块的渲染函数）
+PDFIUM_LOCK = threading.RLock()
+
+
+def is_pdf(path):
+    """判断文件是否为 PDF"""
+    return str(path).lower().endswith(PDF_EXTS)
+
+
+def is_path(source):
+    """判断输入是否为文件路径（而不是内存数据或图像数组）"""
+    return isinstance(source, (str, os.PathLike))
+
+
+def as_page_source(source):
+    """
+    把文件对象转换为可重复读取的内存输入，不复制文件内容
+
+    - 有文件描述符的文件对象：映射整个文件（写时复制映射，只读使用时不产生副本）
+    - io.BytesIO：直接取其内部缓冲区
+    - 其他可读对象（如网络流）：读出全部内容（唯一的一次复制）
+
+    路径、bytes / bytearray / memoryview / mmap、图像数组原样返回。
+    count_pages 与 iter_pages 需要读取两次输入，调用方应先转换一次再分别传入。
+    """
+    if is_path(source) or isinstance(source, (np.ndarray, list, tuple, bytes, bytearray,
+                                              memoryview, mmap.mmap)):
+        return source
+    if isinstance(source, io.BytesIO):
+        return source.getbuffer()
+    try:
+        fd = source.fileno()
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        fd = None
+    if fd is not None and os.fstat(fd).st_size > 0:
+        return mmap.mmap(fd, 0, access=mmap.ACCESS_COPY)
+    return source.read()
+
+
+class _BufferReader(io.RawIOBase):
+    """缓冲区的只读文件对象视图：按需返回片段，不复制整个缓冲区（供 Pillow / pdfium 读取）"""
+
+    def __init__(self, buffer):
+        super().__init__()
+        self._view = memoryview(buffer).cast('B')
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, b):
+        n = max(0, min(len(b), len(self._view) - self._pos))
+        b[:n] = self._view[self._pos:self._pos + n]
+        self._pos += n
+        return n
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        base = (0, self._pos, len(self._view))[whence]
+        self._pos = max(0, base + offset)
+        return self._pos
+
+    def tell(self):
+        return self._pos
+
+    def close(self):
+        if not self.closed:
+            self._view.release()
+        super().close()
+
+
+def _open_file(source):
+    """
+    Pillow 可读取的文件：路径原样返回，缓冲区包装为文件对象
+
+    Pillow 解码 TIFF 时按条带做大量小块读取，外加一层 C 实现的缓冲，
+    避免每次读取都经过 Python 层的 readinto。
+    """
+    if is_path(source):
+        return source
+    return io.BufferedReader(_BufferReader(source), buffer_size=1 << 16)
+
+
+def _source_kind(source):
+    """
+    判断输入类型：'pdf' / 'multi'（TIFF、GIF，可能多帧）/ 'image'
+
+    路径按扩展名判断，内存输入按文件头判断。
+    """
+    if is_path(source):
+        if is_pdf(source):
+            return 'pdf'
+        return 'multi' if is_multi_frame(source) else 'image'
+    head = bytes(memoryview(source).cast('B')[:1024])
+    # PDF 规范允许文件头前有少量其他字节
+    if b'%PDF-' in head:
+        return 'pdf'
+    if head.startswith((b'II*\x00', b'MM\x00*', b'GIF87a', b'GIF89a')):
+        return 'multi'
+    return 'image'
+
+
+def _open_pdf(source):
+    """
+    用 pdfium 打开 PDF 路径或内存缓冲区（调用方持有 PDFIUM_LOCK）
+
+    bytes 与可写缓冲区（bytearray、写时复制 mmap、BytesIO 缓冲区）直接交给 pdfium
+    在原内存上解析；只读缓冲区（只读 mmap 等）通过文件对象接口按需读取。
+    """
+    import pypdfium2 as pdfium
+
+    if is_path(source) or isinstance(source, bytes):
+        return pdfium.PdfDocument(source)
+    view = memoryview(source)
+    if view.readonly:
+        return pdfium.PdfDocument(_BufferReader(source), autoclose=True)
+    return pdfium.PdfDocument((ctypes.c_char * view.nbytes).from_buffer(source))
+
+
+# 解码时可直接降采样的倍数（OpenCV IMREAD_REDUCED_*，由 JPEG DCT 缩放实现）
+_REDUCED_READ_FLAGS = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+)
+
+
+def is_multi_frame(path):
+    """判断文件是否为可能包含多帧的图片格式（TIFF / GIF）"""
+    return str(path).lower().endswith(MULTI_FRAME_EXTS)
+
+
+def _resolve_max_pixels(max_pixels):
+    """max_pixels 可以是整数或无参可调用对象（每页重新计算）"""
+    if callable(max_pixels):
+        return max_pixels()
+    return max_pixels
+
+
+def read_image(path, max_pixels=None):
+    """
+    读取图片为 BGR 数组（支持中文路径）
+
+    Args:
+        path: 图片路径，或图片文件内容的缓冲区（bytes / memoryview / mmap 等，直接解码不复制）
+        max_pixels: 像素数上限（整数或可调用对象），超出时在解码阶段降采样
+
+    Returns:
+        BGR 图像数组
+    """
+    max_pixels = _resolve_max_pixels(max_pixels)
+    flag = cv2.IMREAD_COLOR
+    if max_pixels:
+        from PIL import Image
+
+        # 只读取文件头获取尺寸，不解码像素
+        with Image.open(_open_file(path)) as header:
+            width, height = header.size
+        if width * height > max_pixels:
+            # 选取结果不低于上限的最大降采样倍数，余下部分再用 resize 缩小
+            for factor, reduced_flag in _REDUCED_READ_FLAGS:
+                if width * height / (factor * factor) >= max_pixels:
+                    flag = reduced_flag
+                    break
+
+    data = np.fromfile(path, dtype=np.uint8) if is_path(path) else np.frombuffer(path, np.uint8)
+    img = cv2.imdecode(data, flag)
+    del data
+    if img is None:
+        raise ValueError(f"无法解码图片: {path if is_path(path) else '内存数据'}")
+    if max_pixels and img.shape[0] * img.shape[1] > max_pixels:
+        scale = (max_pixels / (img.shape[0] * img.shape[1])) ** 0.5
+        img = cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    return img
+
+
+def fit_pdf_scale(width_pt, height_pt, dpi, max_pixels=None):
+    """
+    计算 PDF 页的渲染缩放系数
+
+    Args:
+        width_pt: 页宽（pt）
+        height_pt: 页高（pt）
+        dpi: 期望渲染分辨率
+        max_pixels: 像素数上限，超出时降低分辨率
+
+    Returns:
+        pdfium 渲染缩放系数（1.0 对应 72 dpi）
+    """
+    scale = dpi / 72.0
+    if max_pixels and width_pt * height_pt * scale * scale > max_pixels:
+        scale = (max_pixels / (width_pt * height_pt)) ** 0.5
+    return scale
+
+
+def _page_indices(total, page_range):
+    """把 (起始页, 结束页) 半开区间限制在 [0, total) 内"""
+    if page_range is None:
+        return range(total)
+    start, stop = page_range
+    return range(max(0, start), min(total, stop))
+
+
+def iter_pdf_pages(path, dpi=DEFAULT_PDF_DPI, max_pixels=None, page_range=None):
+    """
+    逐页渲染 PDF
+
+    Args:
+        path: PDF 文件路径或内存缓冲区
+        dpi: 渲染分辨率
+        max_pixels: 每页像素数上限（整数或可调用对象），超出时降低该页渲染分辨率
+        page_range: (起始页, 结束页) 页索引半开区间，None 表示全部页
+
+    Yields:
+        (页索引, BGR 图像数组)
+    """
+    # 只在打开、渲染、关闭时持锁，yield 期间不持锁
+    with PDFIUM_LOCK:
+        pdf = _open_pdf(path)
+        total = len(pdf)
+    try:
+        for index in _page_indices(total, page_range):
+            yield index, render_pdf_page(pdf, index, dpi, max_pixels)
+    finally:
+        with PDFIUM_LOCK:
+            pdf.close()
+
+
+def render_pdf_page(pdf, index, dpi=DEFAULT_PDF_DPI, max_pixels=None):
+    """
+    渲染已打开 PDF 的指定页（在 PDFIUM_LOCK 下执行）
+
+    Args:
+        pdf: pypdfium2.PdfDocument
+        index: 页索引
+        dpi: 渲染分辨率
+        max_pixels: 像素数上限（整数或可调用对象）
+
+    Returns:
+        BGR 图像数组
+    """
+    max_pixels = _resolve_max_pixels(max_pixels)
+    with PDFIUM_LOCK:
+        page = pdf[index]
+        try:
+            width_pt, height_pt = page.get_size()
+            scale = fit_pdf_scale(width_pt, height_pt, dpi, max_pixels)
+            bitmap = page.render(scale=scale, rev_byteorder=False)
+            # pdfium 默认输出 BGR(A) 字节序
+            img = bitmap.to_numpy()[:, :, :3].copy()
+            bitmap.close()
+        finally:
+            page.close()
+    return img
+
+
+def _frame_to_bgr(frame, max_pixels=None):
+    """
+    将 PIL 帧转换为 BGR 数组，超出像素上限时先降采样再转换颜色
+    （传真 TIFF 多为 1 位二值图，先缩小可避免生成整幅 RGB 副本）
+    """
+    if frame.mode in ('1', 'P', 'LA', 'PA', 'I;16'):
+        frame = frame.convert('RGB' if frame.mode in ('P', 'PA') else 'L')
+    if max_pixels and frame.width * frame.height > max_pixels:
+        factor = math.ceil(math.sqrt(frame.width * frame.height / max_pixels))
+        frame = frame.reduce(factor)
+    if frame.mode == 'L':
+        return cv2.cvtColor(np.asarray(frame), cv2.COLOR_GRAY2BGR)
+    return cv2.cvtColor(np.asarray(frame.convert('RGB')), cv2.COLOR_RGB2BGR)
+
+
+def iter_image_frames(path, max_pixels=None, page_range=None):
+    """
+    逐帧读取多帧图片（TIFF / GIF），每次只解码当前帧
+
+    Args:
+        path: 图片路径或内存缓冲区
+        max_pixels: 每帧像素数上限（整数或可调用对象）
+        page_range: (起始帧, 结束帧) 帧索引半开区间，None 表示全部帧
+
+    Yields:
+        (帧索引, BGR 图像数组)
+    """
+    from PIL import Image
+
+    start, stop = page_range if page_range is not None else (0, None)
+    with Image.open(_open_file(path)) as img:
+        index = max(0, start)
+        while stop is None or index < stop:
+            try:
+                img.seek(index)
+            except EOFError:
+                break
+            yield index, _frame_to_bgr(img, _resolve_max_pixels(max_pixels))
+            index += 1
+
+
+def iter_pages(source, dpi=DEFAULT_PDF_DPI, max_pixels=None, page_range=None):
+    """
+    逐页读取输入
+
+    Args:
+        source: 文件路径、内存输入（见 as_page_source）、BGR 图像数组或逐页图像数组列表
+        dpi: PDF 渲染分辨率
+        max_pixels: 每页像素数上限（整数或可调用对象），None 表示不限制
+        page_range: (起始页, 结束页) 页索引半开区间，None 表示全部页；
+            只渲染 / 解码区间内的页
+
+    Yields:
+        (页索引, BGR 图像数组)
+    """
+    if isinstance(source, np.ndarray):
+        if 0 in _page_indices(1, page_range):
+            yield 0, source
+        return
+    if isinstance(source, (list, tuple)):
+        for index in _page_indices(len(source), page_range):
+            yield index, source[index]
+        return
+    source = as_page_source(source)
+    kind = _source_kind(source)
+    if kind == 'pdf':
+        yield from iter_pdf_pages(source, dpi, max_pixels, page_range)
+    elif kind == 'multi':
+        yield from iter_image_frames(source, max_pixels, page_range)
+    elif 0 in _page_indices(1, page_range):
+        yield 0, read_image(source, max_pixels)
+
+
+def count_pages(source):
+    """
+    获取输入的页数
+
+    Args:
+        source: 文件路径、内存输入、图像数组或逐页图像数组列表
+
+    Returns:
+        页数
+    """
+    if isinstance(source, np.ndarray):
+        return 1
+    if isinstance(source, (list, tuple)):
+        return len(source)
+    source = as_page_source(source)
+    kind = _source_kind(source)
+    if kind == 'multi':
+        from PIL import Image
+
+        with Image.open(_open_file(source)) as img:
+            return getattr(img, 'n_frames', 1)
+    if kind == 'image':
+        return 1
+    with PDFIUM_LOCK:
+        pdf = _open_pdf(source)
+        try:
+            return len(pdf)
+        finally:
+            pdf.close()
+
+
+def source_path(source):
+    """输入对应的文件路径：路径原样返回，文件对象取其 name，其他内存输入返回 None"""
+    if is_path(source):
+        return os.fspath(source)
+    name = getattr(source, 'name', None)
+    return name if isinstance(name, str) else None
+
+
+def source_name(source):
+    """获取输入的显示名称（不含扩展名）"""
+    if isinstance(source, (np.ndarray, list, tuple)):
+        return "array"
+    path = source_path(source)
+    if path is None:
+        return "memory"
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+# ----------------------------------------------------------------------
+# 基准测试：内存输入与临时文件
+# ----------------------------------------------------------------------
+
+def _consume(source, max_pixels):
+    """读取全部页面（模拟一次识别请求的输入阶段），返回页数"""
+    source = as_page_source(source)
+    count_pages(source)
+    pages = 0
+    for _, img in iter_pages(source, max_pixels=max_pixels):
+        pages += 1
+        del img
+    return pages
+
+
+def _via_temp_file(data, suffix, tmp_dir, max_pixels):
+    """旧做法：把上传内容写入临时文件，再按路径读取"""
+    import tempfile
+
+    fd, path = tempfile.mkstemp(suffix=suffix, dir=tmp_dir)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        return _consume(path, max_pixels)
+    finally:
+        os.remove(path)
+
+
+def _via_mmap(path, max_pixels):
+    """已落盘的上传（如 Web 框架的缓存文件）：以文件对象传入，映射而不读取"""
+    with open(path, 'rb') as f:
+        return _consume(f, max_pixels)
+
+
+def benchmark_inputs(paths, repeat=5, tmp_dir=None, max_pixels=LARGE_IMAGE_PIXELS):
+    """
+    比较同一份上传内容经临时文件、bytes、mmap 三种方式读取的延迟与内存
+
+    延迟为读取全部页面（解码 / 渲染）的耗时中位数；内存为 tracemalloc 统计的
+    Python / NumPy 分配峰值（pdfium 的原生分配不在其中）。
+
+    Returns:
+        [{'file', 'pages', 'bytes', 'mode', 'ms', 'peak_mb'}, ...]
+    """
+    import time
+    import tracemalloc
+
+    rows = []
+    for path in paths:
+        with open(path, 'rb') as f:
+            data = f.read()
+        suffix = os.path.splitext(path)[1]
+        modes = (
+            ('临时文件', lambda: _via_temp_file(data, suffix, tmp_dir, max_pixels)),
+            ('bytes', lambda: _consume(data, max_pixels)),
+            ('mmap', lambda: _via_mmap(path, max_pixels)),
+        )
+        for mode, run in modes:
+            run()
+            times = []
+            peak = 0
+            for _ in range(repeat):
+                tracemalloc.start()
+                t0 = time.perf_counter()
+                pages = run()
+                times.append(time.perf_counter() - t0)
+                peak = max(peak, tracemalloc.get_traced_memory()[1])
+                tracemalloc.stop()
+            rows.append({'file': os.path.basename(path), 'pages': pages, 'bytes': len(data),
+                         'mode': mode, 'ms': float(np.median(times)) * 1000,
+                         'peak_mb': peak / 1048576})
+    return rows
+
+
+def main():
+    import argparse
+    import tempfile
+
+    parser = argparse.ArgumentParser(description="内存输入与临时文件的读取延迟 / 内存对比")
+    parser.add_argument('paths', nargs='*', help="测试文件（缺省生成 PNG / JPEG / TIFF / PDF 合成语料）")
+    parser.add_argument('--repeat', type=int, default=5, help="每种方式重复次数")
+    parser.add_argument('--tmp-dir', help="临时文件目录（默认系统临时目录）")
+    args = parser.parse_args()
+
+    paths = args.paths
+    corpus_dir = None
+    if not paths:
+        from soak_test import make_corpus
+
+        corpus_dir = tempfile.mkdtemp(prefix='page_source_bench_')
+        paths = make_corpus(corpus_dir, documents=4)
+
+    rows = benchmark_inputs(paths, args.repeat, args.tmp_dir)
+    print(f"{'文件':<20}{'页数':>5}{'大小KB':>9}  {'方式':<8}{'延迟ms':>9}{'峰值MB':>9}")
+    for r in rows:
+        print(f"{r['file'][:19]:<20}{r['pages']:>5}{r['bytes'] / 1024:>9.0f}  {r['mode']:<8}"
+              f"{r['ms']:>9.1f}{r['peak_mb']:>9.1f}")
+
+    if corpus_dir:
+        import shutil
+
+        shutil.rmtree(corpus_dir, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -21,20 +21,28 @@ PaddleOCR PDF 文字识别测试脚本
 
 import os
 from paddleocr import PaddleOCR
+from compact_result import DocumentResult
+from layout import analyze_layout, layout_text, save_ordered_outputs
+from ocr_tuner import load_tuning_profile
 
 
-def init_ocr_model(det_model_path, rec_model_path):
+def init_ocr_model(det_model_path, rec_model_path, **ocr_options):
     """
     初始化 PaddleOCR 模型，使用本地下载的模型
 
+    会自动读取本机调优档案（由 ocr_tuner.py 生成），ocr_options 中的参数优先。
+
     Args:
         det_model_path: 检测模型路径
         rec_model_path: 识别模型路径
+        ocr_options: 额外的 PaddleOCR 参数（如 cpu_threads、enable_mkldnn）
 
     Returns:
         PaddleOCR 实例
     """
     print("正在初始化 OCR 模型...")
+    options = load_tuning_profile(det_model_path, rec_model_path)
+    options.update(ocr_options)
     ocr = PaddleOCR(
         text_detection_model_name="PP-OCRv5_mobile_det",
         text_recognition_model_name="PP-OCRv5_mobile_rec",
@@ -42,7 +50,8 @@ def init_ocr_model(det_model_path, rec_model_path):
         text_recognition_model_dir=rec_model_path,
         use_doc_orientation_classify=False,  # 是否使用文档方向分类
         use_doc_unwarping=False,            # 是否使用文档展平
-        use_textline_orientation=False      # 是否使用文字行方向检测
+        use_textline_orientation=False,     # 是否使用文字行方向检测
+        **options                           # 调优档案 / 调用方指定的推理参数
     )
     print("OCR 模型初始化完成")
     return ocr
@@ -56,6 +65,9 @@ def process_pdf(pdf_path, ocr, output_dir="output"):
         pdf_path: PDF 文件路径
         ocr: PaddleOCR 实例
         output_dir: 输出目录
+
+    Returns:
+        DocumentResult（各页文本、文本框和分数，不保留页面图像）
     """
     # 创建输出目录
     os.makedirs(output_dir, exist_ok=True)
@@ -63,13 +75,11 @@ def process_pdf(pdf_path, ocr, output_dir="output"):
     print(f"正在处理 PDF: {pdf_path}")
 
     # 直接对 PDF 文件进行 OCR 识别（PaddleOCR 原生支持）
-    result = ocr.predict(input=pdf_path)
-
-    # 保存结果
+    # 逐页取结果，只把文本 / 文本框 / 分数存入紧凑的 DocumentResult，页结果对象用完即释放
+    document = DocumentResult(pdf_path)
     page_num = 1
-    all_text = []
 
-    for res in result:
+    for res in ocr.predict_iter(input=pdf_path):
         # 打印识别结果
         print(f"\n=== 第 {page_num} 页识别结果 ===")
         res.print()
@@ -85,24 +95,27 @@ def process_pdf(pdf_path, ocr, output_dir="output"):
         res.save_to_json(page_dir)
         print(f"JSON 结果已保存: {page_dir}")
 
-        # 保存文本结果（手动指定文件名）
-        texts = res.get('rec_texts', [])
+        # 保存文本结果（手动指定文件名，按阅读顺序，版面结构写入 JSON）
         txt_path = os.path.join(page_dir, f"page_{page_num:03d}_result.txt")
-        with open(txt_path, 'w', encoding='utf-8') as f:
-            f.write('\n'.join(texts))
+        save_ordered_outputs(res, page_dir, txt_path)
         print(f"文本已保存: {txt_path}")
 
-        # 收集所有文本用于汇总显示
-        all_text.extend(texts)
+        # 收集结果用于汇总显示
+        document.add_result(res, page_index=page_num - 1)
+        del res
         page_num += 1
 
+    document.save(os.path.join(output_dir, "document_result.npz"))
+
     print("\n" + "="*50)
     print("所有页面的文本内容汇总:")
     print("="*50)
-    for line in all_text:
-        print(line)
+    for page in document:
+        texts = page.texts
+        for line in layout_text(analyze_layout(page.polys, texts), texts):
+            print(line)
 
-    return result
+    return document
 
 
 def main():
@@ -139,7 +152,7 @@ def main():
     ocr = init_ocr_model(DET_MODEL_PATH, REC_MODEL_PATH)
 
     # 处理 PDF
-    results = process_pdf(PDF_PATH, ocr)
+    document = process_pdf(PDF_PATH, ocr)
 
     print("\n处理完成！")
 
@@ -0,0 +1,729 @@
+"""
+========================================================
+可搜索 PDF 输出
+========================================================
+
+功能说明：
+    将每页的 rec_polys / rec_texts 作为不可见文字层（文字渲染模式 3）
+    叠加到原始页面上，生成可搜索、可复制文字的 PDF：
+        - 图片输入：逐页流式写入 PDF，每页识别完成即写出图像、文字和页面对象，
+          内存中只保留对象偏移表
+        - 页面图像尽量原样嵌入，不重新编码：
+            JPEG → DCTDecode 直接复制文件数据
+            PNG（非隔行、无透明通道）→ 复制 IDAT 数据，FlateDecode + PNG 预测器
+            TIFF（CCITT G4）→ CCITTFaxDecode 逐条带直接复制
+          其余情况（透明 PNG、非 G4 TIFF、BMP 等）按无损 Flate 压缩像素
+        - PDF 输入：识别过程中流式写出只含文字层的叠加 PDF，结束时用 pdfium
+          把每个叠加页作为表单 XObject 放到原页面上；原页面的内容和图像原样复制
+        - 文字使用 Type0 / Identity-H 字体，CID 按出现顺序分配，
+          ToUnicode 映射保证复制和搜索得到正确的 Unicode 文本（支持中文）
+
+    字体不嵌入字形（文字不可见，只需 ToUnicode 和宽度），
+    每个文字框通过水平缩放 (Tz) 使文字宽度与文本框一致，选中高亮与原文对齐。
+
+运行方式：
+    python pdf_writer.py 扫描件.pdf -o 扫描件_searchable.pdf
+    python pdf_writer.py 传真.tif 照片.jpg
+========================================================
+"""
+
+import os
+import sys
+import math
+import time
+import zlib
+import struct
+
+import numpy as np
+
+from page_source import (DEFAULT_PDF_DPI, LARGE_IMAGE_PIXELS, PDFIUM_LOCK, count_pages,
+                         is_pdf, iter_pages)
+
+
+# 图片没有分辨率信息时按此 DPI 计算页面尺寸
+DEFAULT_IMAGE_DPI = 300
+MIN_IMAGE_DPI = 36
+FONT_NAME = b'/F0'
+IMAGE_NAME = b'/Im'
+
+_PDF_HEADER = b'%PDF-1.5\n%\xe2\xe3\xcf\xd3\n'
+
+# TIFF 标签
+_TIFF_COMPRESSION = 259
+_TIFF_PHOTOMETRIC = 262
+_TIFF_FILL_ORDER = 266
+_TIFF_STRIP_OFFSETS = 273
+_TIFF_ROWS_PER_STRIP = 278
+_TIFF_STRIP_BYTE_COUNTS = 279
+_TIFF_GROUP4 = 4
+
+
+def _fmt(value):
+    """格式化 PDF 数值（去掉多余的 0）"""
+    text = f"{value:.4f}".rstrip('0').rstrip('.')
+    return text if text not in ('', '-0') else '0'
+
+
+# ---------------------------------------------------------------------------
+# 图像 XObject
+# ---------------------------------------------------------------------------
+
+def _jpeg_xobject(path, header):
+    """JPEG 文件原样嵌入"""
+    color_spaces = {'L': b'/DeviceGray', 'RGB': b'/DeviceRGB', 'CMYK': b'/DeviceCMYK'}
+    if header.mode not in color_spaces:
+        return None
+    entries = [b'/ColorSpace ' + color_spaces[header.mode], b'/BitsPerComponent 8',
+               b'/Filter /DCTDecode']
+    if header.mode == 'CMYK' and 'adobe' in header.info:
+        # Adobe 软件写出的 CMYK JPEG 数值取反
+        entries.append(b'/Decode [1 0 1 0 1 0 1 0]')
+    with open(path, 'rb') as f:
+        data = f.read()
+    return [(entries, data, header.height)]
+
+
+def _png_xobject(path):
+    """PNG 的 IDAT 数据原样嵌入（PDF 的 Flate + PNG 预测器与 PNG 编码一致）"""
+    with open(path, 'rb') as f:
+        if f.read(8) != b'\x89PNG\r\n\x1a\n':
+            return None
+        idat = []
+        palette = None
+        ihdr = None
+        while True:
+            head = f.read(8)
+            if len(head) < 8:
+                return None
+            length, chunk_type = struct.unpack('>I4s', head)
+            body = f.read(length)
+            f.read(4)  # CRC
+            if chunk_type == b'IHDR':
+                ihdr = struct.unpack('>IIBBBBB', body)
+            elif chunk_type == b'PLTE':
+                palette = body
+            elif chunk_type == b'tRNS':
+                return None
+            elif chunk_type == b'IDAT':
+                idat.append(body)
+            elif chunk_type == b'IEND':
+                break
+
+    width, height, bit_depth, color_type, _, _, interlace = ihdr
+    if interlace or bit_depth == 16:
+        return None
+    if color_type == 0:
+        colors, color_space = 1, b'/DeviceGray'
+    elif color_type == 2:
+        colors, color_space = 3, b'/DeviceRGB'
+    elif color_type == 3 and palette:
+        colors = 1
+        color_space = (b'[/Indexed /DeviceRGB ' + str(len(palette) // 3 - 1).encode()
+                       + b' <' + palette.hex().encode() + b'>]')
+    else:
+        # 带 alpha 通道
+        return None
+    entries = [b'/ColorSpace ' + color_space, b'/BitsPerComponent ' + str(bit_depth).encode(),
+               b'/Filter /FlateDecode',
+               b'/DecodeParms << /Predictor 15 /Colors %d /BitsPerComponent %d /Columns %d >>'
+               % (colors, bit_depth, width)]
+    return [(entries, b''.join(idat), height)]
+
+
+def _tiff_g4_xobject(path, frame):
+    """CCITT G4 压缩的 TIFF 帧按条带原样嵌入（每个条带独立编码，各自作为一个图像）"""
+    tags = frame.tag_v2
+    if tags.get(_TIFF_COMPRESSION) != _TIFF_GROUP4 or tags.get(_TIFF_FILL_ORDER, 1) != 1:
+        return None
+    offsets = tags.get(_TIFF_STRIP_OFFSETS)
+    counts = tags.get(_TIFF_STRIP_BYTE_COUNTS)
+    if offsets is None or counts is None:
+        return None
+    offsets = offsets if isinstance(offsets, tuple) else (offsets,)
+    counts = counts if isinstance(counts, tuple) else (counts,)
+    rows_per_strip = min(tags.get(_TIFF_ROWS_PER_STRIP, frame.height), frame.height)
+    # G4 编码中的"白"游程对应 0 位；Photometric 1 (BlackIsZero) 时 0 位是黑色，需反转
+    black_is_1 = b'true' if tags.get(_TIFF_PHOTOMETRIC, 0) == 1 else b'false'
+
+    bands = []
+    with open(path, 'rb') as f:
+        for strip, (offset, count) in enumerate(zip(offsets, counts)):
+            rows = min(rows_per_strip, frame.height - strip * rows_per_strip)
+            f.seek(offset)
+            entries = [b'/ColorSpace /DeviceGray', b'/BitsPerComponent 1',
+                       b'/Filter /CCITTFaxDecode',
+                       b'/DecodeParms << /K -1 /Columns %d /Rows %d /BlackIs1 %s >>'
+                       % (frame.width, rows, black_is_1)]
+            bands.append((entries, f.read(count), rows))
+    return bands
+
+
+def _pil_xobject(img):
+    """无法直接复制时，按无损 Flate 压缩像素（1 位图保持 1 位）"""
+    if img.mode == '1':
+        entries = [b'/ColorSpace /DeviceGray', b'/BitsPerComponent 1']
+        data = img.tobytes()
+    elif img.mode in ('L', 'I;16'):
+        entries = [b'/ColorSpace /DeviceGray', b'/BitsPerComponent 8']
+        data = img.convert('L').tobytes()
+    else:
+        if img.mode in ('RGBA', 'LA', 'PA') or 'transparency' in img.info:
+            # 透明区域铺白底
+            from PIL import Image
+
+            background = Image.new('RGB', img.size, (255, 255, 255))
+            background.paste(img.convert('RGBA'), mask=img.convert('RGBA').getchannel('A'))
+            img = background
+        entries = [b'/ColorSpace /DeviceRGB', b'/BitsPerComponent 8']
+        data = img.convert('RGB').tobytes()
+    entries.append(b'/Filter /FlateDecode')
+    return [(entries, zlib.compress(data, 6), img.height)]
+
+
+def _orientation_cm(orientation, width, height):
+    """
+    EXIF 方向 → 把按存储方向绘制的图像（宽 width、高 height，单位 pt）
+    变换为显示方向的 cm 矩阵
+
+    Returns:
+        (cm 矩阵 (a, b, c, d, e, f), 显示方向的页宽, 页高)
+    """
+    w, h = width, height
+    matrix = {
+        2: (-1, 0, 0, 1, w, 0),     # 水平镜像
+        3: (-1, 0, 0, -1, w, h),    # 旋转 180°
+        4: (1, 0, 0, -1, 0, h),     # 垂直镜像
+        5: (0, -1, -1, 0, h, w),    # 转置
+        6: (0, -1, 1, 0, 0, w),     # 顺时针 90°
+        7: (0, 1, 1, 0, 0, 0),      # 反转置
+        8: (0, 1, -1, 0, h, 0),     # 逆时针 90°
+    }.get(orientation, (1, 0, 0, 1, 0, 0))
+    if orientation in (5, 6, 7, 8):
+        return matrix, h, w
+    return matrix, w, h
+
+
+def image_xobject(path, frame_index=0):
+    """
+    生成图片页的图像 XObject 数据（优先原样复制压缩数据）
+
+    Args:
+        path: 图片路径
+        frame_index: 多帧 TIFF / GIF 的帧索引
+
+    Returns:
+        (图像条带列表 [(字典条目, 流数据, 行数), ...], 宽, 高, DPI, 嵌入方式, EXIF 方向)
+        通常只有一个条带；多条带 G4 TIFF 每个条带单独嵌入。宽高为存储方向
+        的像素尺寸；EXIF 方向与 page_source 读图时一致：单张图片由 cv2 解码
+        时已按方向旋转，多帧 TIFF / GIF 逐帧读取不旋转（返回 1）
+    """
+    from PIL import Image
+    from page_source import is_multi_frame
+
+    with Image.open(path) as img:
+        if frame_index:
+            img.seek(frame_index)
+        width, height = img.size
+        orientation = 1 if is_multi_frame(path) else img.getexif().get(0x0112, 1)
+        dpi = img.info.get('dpi')
+        dpi = float(dpi[0]) if dpi else 0.0
+        if dpi < MIN_IMAGE_DPI:
+            # 无分辨率信息（Pillow 对缺少分辨率标签的 TIFF 报告 1 DPI）
+            dpi = DEFAULT_IMAGE_DPI
+
+        result = None
+        if img.format == 'JPEG':
+            result, method = _jpeg_xobject(path, img), 'jpeg'
+        elif img.format == 'PNG':
+            result, method = _png_xobject(path), 'png'
+        elif img.format == 'TIFF':
+            result, method = _tiff_g4_xobject(path, img), 'ccitt'
+        if result is None:
+            result, method = _pil_xobject(img), 'flate'
+    return result, width, height, dpi, method, orientation
+
+
+# ---------------------------------------------------------------------------
+# 文字层
+# ---------------------------------------------------------------------------
+
+def _quad(poly):
+    """多边形转为 (左上, 右上, 右下, 左下) 四点"""
+    pts = np.asarray(poly, dtype=np.float64).reshape(-1, 2)
+    if len(pts) == 4:
+        return pts
+    x0, y0 = pts.min(axis=0)
+    x1, y1 = pts.max(axis=0)
+    return np.array([[x0, y0], [x1, y0], [x1, y1], [x0, y1]])
+
+
+class _CIDMap:
+    """字符 → CID 分配（CID 0 保留给 .notdef）"""
+
+    def __init__(self):
+        self.cids = {}
+
+    def encode(self, text):
+        out = []
+        for ch in text:
+            cid = self.cids.get(ch)
+            if cid is None:
+                cid = len(self.cids) + 1
+                if cid > 0xFFFF:
+                    continue
+                self.cids[ch] = cid
+            out.append(cid)
+        return ''.join(f'{cid:04X}' for cid in out).encode('ascii'), len(out)
+
+    def to_unicode_cmap(self):
+        lines = [b'/CIDInit /ProcSet findresource begin', b'12 dict begin', b'begincmap',
+                 b'/CIDSystemInfo << /Registry (Adobe) /Ordering (UCS) /Supplement 0 >> def',
+                 b'/CMapName /Adobe-Identity-UCS def', b'/CMapType 2 def',
+                 b'1 begincodespacerange', b'<0000> <FFFF>', b'endcodespacerange']
+        items = sorted(self.cids.items(), key=lambda item: item[1])
+        for start in range(0, len(items), 100):
+            block = items[start:start + 100]
+            lines.append(b'%d beginbfchar' % len(block))
+            for ch, cid in block:
+                lines.append(b'<%04X> <%s>' % (cid, ch.encode('utf-16-be').hex().upper().encode()))
+            lines.append(b'endbfchar')
+        lines += [b'endcmap', b'CMapName currentdict /CMap defineresource pop', b'end', b'end']
+        return b'\n'.join(lines)
+
+
+def text_layer_ops(cid_map, texts, polys, scale_x, scale_y, page_height):
+    """
+    生成不可见文字层的内容流
+
+    Args:
+        cid_map: _CIDMap
+        texts: 文本行
+        polys: 文本框多边形（识别图像的像素坐标）
+        scale_x, scale_y: 像素 → pt 缩放系数
+        page_height: 页高（pt），用于翻转 y 轴
+
+    Returns:
+        内容流字节
+    """
+    ops = [b'BT', b'3 Tr']
+    for text, poly in zip(texts, polys):
+        text = str(text).strip()
+        if not text:
+            continue
+        pts = _quad(poly)
+        pts[:, 0] *= scale_x
+        pts[:, 1] = page_height - pts[:, 1] * scale_y
+        (x0, y0), (x1, y1), _, (x3, y3) = pts
+        width = math.hypot(x1 - x0, y1 - y0)
+        height = math.hypot(x3 - x0, y3 - y0)
+        if width <= 0 or height <= 0:
+            continue
+        encoded, n_glyphs = cid_map.encode(text)
+        if not n_glyphs:
+            continue
+        cos, sin = (x1 - x0) / width, (y1 - y0) / width
+        # 字宽为 1 em（DW 1000），水平缩放使整行宽度等于文本框宽度
+        scale = 100.0 * width / (n_glyphs * height)
+        ops.append(b'%s %s Tf %s Tz %s %s %s %s %s %s Tm <%s> Tj' % (
+            FONT_NAME, _fmt(height).encode(), _fmt(scale).encode(),
+            _fmt(cos).encode(), _fmt(sin).encode(), _fmt(-sin).encode(), _fmt(cos).encode(),
+            _fmt(x3).encode(), _fmt(y3).encode(), encoded))
+    ops.append(b'ET')
+    return b'\n'.join(ops)
+
+
+# ---------------------------------------------------------------------------
+# 流式 PDF 写入
+# ---------------------------------------------------------------------------
+
+class SearchablePDFWriter:
+    """
+    流式 PDF 写入器：每页的对象立即写入文件，关闭时写字体映射、页树和交叉引用表
+
+    用法：
+        with SearchablePDFWriter('out.pdf') as writer:
+            writer.add_image_page('scan.jpg', ocr_size, texts, polys)
+            writer.add_text_page(595, 842, ocr_size, texts, polys)
+    """
+
+    CATALOG, PAGES, FONT, CID_FONT, DESCRIPTOR, TO_UNICODE = range(1, 7)
+
+    def __init__(self, output_path):
+        self.output_path = output_path
+        self._tmp_path = output_path + '.part'
+        self._file = open(self._tmp_path, 'wb')
+        self._offsets = {}
+        self._next_obj = self.TO_UNICODE + 1
+        self._page_refs = []
+        self._cid_map = _CIDMap()
+        self.write_seconds = 0.0
+        self.image_methods = {}
+
+        self._file.write(_PDF_HEADER)
+        self._write_obj(self.FONT, b'<< /Type /Font /Subtype /Type0 /BaseFont /GlyphLessFont '
+                        b'/Encoding /Identity-H /DescendantFonts [%d 0 R] /ToUnicode %d 0 R >>'
+                        % (self.CID_FONT, self.TO_UNICODE))
+        self._write_obj(self.CID_FONT, b'<< /Type /Font /Subtype /CIDFontType2 '
+                        b'/BaseFont /GlyphLessFont '
+                        b'/CIDSystemInfo << /Registry (Adobe) /Ordering (Identity) /Supplement 0 >> '
+                        b'/FontDescriptor %d 0 R /DW 1000 /CIDToGIDMap /Identity >>'
+                        % self.DESCRIPTOR)
+        self._write_obj(self.DESCRIPTOR, b'<< /Type /FontDescriptor /FontName /GlyphLessFont '
+                        b'/Flags 5 /FontBBox [0 0 1000 1000] /ItalicAngle 0 /Ascent 1000 '
+                        b'/Descent 0 /CapHeight 1000 /StemV 80 >>')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    @property
+    def page_count(self):
+        return len(self._page_refs)
+
+    def _new_obj(self):
+        num = self._next_obj
+        self._next_obj += 1
+        return num
+
+    def _write_obj(self, num, body, stream=None):
+        self._offsets[num] = self._file.tell()
+        self._file.write(b'%d 0 obj\n' % num)
+        if stream is None:
+            self._file.write(body)
+        else:
+            self._file.write(body[:-2] + b' /Length %d >>\nstream\n' % len(stream))
+            self._file.write(stream)
+            self._file.write(b'\nendstream')
+        self._file.write(b'\nendobj\n')
+
+    def _write_page(self, width, height, content, xobjects=()):
+        content_num = self._new_obj()
+        page_num = self._new_obj()
+        self._write_obj(content_num, b'<< /Filter /FlateDecode >>', zlib.compress(content, 6))
+        resources = b'/Font << %s %d 0 R >>' % (FONT_NAME, self.FONT)
+        if xobjects:
+            resources += b' /XObject << %s >>' % b' '.join(b'%s %d 0 R' % (name, num)
+                                                           for name, num in xobjects)
+        self._write_obj(page_num, b'<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %s %s] '
+                        b'/Resources << %s >> /Contents %d 0 R >>'
+                        % (self.PAGES, _fmt(width).encode(), _fmt(height).encode(),
+                           resources, content_num))
+        self._page_refs.append(page_num)
+        # 每页写完即落盘，不在内存中累积
+        self._file.flush()
+
+    def add_image_page(self, image_path, ocr_size, texts, polys, frame_index=0):
+        """
+        写入一个图片页：原图作为背景，叠加不可见文字层
+
+        Args:
+            image_path: 原始图片路径
+            ocr_size: 识别所用图像的 (宽, 高)，文本框坐标基于该尺寸
+            texts: rec_texts
+            polys: rec_polys
+            frame_index: 多帧图片的帧索引
+        """
+        start = time.perf_counter()
+        bands, width_px, height_px, dpi, method, orientation = image_xobject(image_path,
+                                                                             frame_index)
+        self.image_methods[method] = self.image_methods.get(method, 0) + 1
+        width, height = width_px * 72.0 / dpi, height_px * 72.0 / dpi
+        # 带 EXIF 方向的图片（手机照片）原样嵌入，整体变换到显示方向；
+        # 识别看到的是旋转后的图像，文字层按显示方向的页面尺寸缩放
+        matrix, page_width, page_height = _orientation_cm(orientation, width, height)
+
+        # 图像条带自上而下排列
+        ops = b'q %s cm\n' % b' '.join(_fmt(v).encode() for v in matrix)
+        xobjects = []
+        top = height
+        for band, (entries, data, rows) in enumerate(bands):
+            image_num = self._new_obj()
+            self._write_obj(image_num, b'<< /Type /XObject /Subtype /Image /Width %d /Height %d '
+                            b'%s >>' % (width_px, rows, b' '.join(entries)), data)
+            band_height = rows * 72.0 / dpi
+            top -= band_height
+            name = b'%s_%d' % (IMAGE_NAME, band)
+            ops += b'q %s 0 0 %s 0 %s cm %s Do Q\n' % (_fmt(width).encode(),
+                                                       _fmt(band_height).encode(),
+                                                       _fmt(top).encode(), name)
+            xobjects.append((name, image_num))
+        del bands
+        ops += b'Q\n'
+
+        ops += text_layer_ops(self._cid_map, texts, polys, page_width / ocr_size[0],
+                              page_height / ocr_size[1], page_height)
+        self._write_page(page_width, page_height, ops, xobjects)
+        self.write_seconds += time.perf_counter() - start
+
+    def add_text_page(self, width, height, ocr_size, texts, polys):
+        """
+        写入只有不可见文字层的页（PDF 输入的叠加层）
+
+        Args:
+            width, height: 页面尺寸（pt）
+            ocr_size: 识别所用图像的 (宽, 高)
+            texts: rec_texts
+            polys: rec_polys
+        """
+        start = time.perf_counter()
+        ops = text_layer_ops(self._cid_map, texts, polys, width / ocr_size[0],
+                             height / ocr_size[1], height)
+        self._write_page(width, height, ops)
+        self.write_seconds += time.perf_counter() - start
+
+    def close(self):
+        """写入字体映射、页树、交叉引用表并原子替换输出文件"""
+        start = time.perf_counter()
+        self._write_obj(self.TO_UNICODE, b'<< >>', self._cid_map.to_unicode_cmap())
+        kids = b' '.join(b'%d 0 R' % num for num in self._page_refs)
+        self._write_obj(self.PAGES, b'<< /Type /Pages /Kids [%s] /Count %d >>'
+                        % (kids, len(self._page_refs)))
+        self._write_obj(self.CATALOG, b'<< /Type /Catalog /Pages %d 0 R >>' % self.PAGES)
+
+        xref_offset = self._file.tell()
+        count = self._next_obj
+        self._file.write(b'xref\n0 %d\n0000000000 65535 f \n' % count)
+        for num in range(1, count):
+            self._file.write(b'%010d 00000 n \n' % self._offsets[num])
+        self._file.write(b'trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n'
+                         % (count, self.CATALOG, xref_offset))
+        self._file.close()
+        os.replace(self._tmp_path, self.output_path)
+        self.write_seconds += time.perf_counter() - start
+
+    def abort(self):
+        """放弃写入并删除临时文件"""
+        self._file.close()
+        if os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+
+
+# ---------------------------------------------------------------------------
+# PDF 输入：叠加文字层
+# ---------------------------------------------------------------------------
+
+def _overlay_matrix(rotation, width, height, origin):
+    """
+    叠加页（按显示方向）→ 原页面用户空间的变换矩阵
+
+    Args:
+        rotation: 页面 /Rotate（0/90/180/270）
+        width, height: 未旋转的页面尺寸（裁剪框）
+        origin: 裁剪框左下角
+    """
+    import pypdfium2 as pdfium
+
+    ox, oy = origin
+    if rotation == 90:
+        return pdfium.PdfMatrix(0, 1, -1, 0, width + ox, oy)
+    if rotation == 180:
+        return pdfium.PdfMatrix(-1, 0, 0, -1, width + ox, height + oy)
+    if rotation == 270:
+        return pdfium.PdfMatrix(0, -1, 1, 0, ox, height + oy)
+    return pdfium.PdfMatrix(1, 0, 0, 1, ox, oy)
+
+
+def merge_text_overlay(source_pdf, overlay_pdf, output_path, page_indices):
+    """
+    将叠加 PDF 的每一页作为表单 XObject 放到原 PDF 对应页上
+
+    Args:
+        source_pdf: 原 PDF 路径
+        overlay_pdf: 叠加层 PDF 路径（第 i 页对应原 PDF 的 page_indices[i] 页）
+        output_path: 输出路径
+        page_indices: 叠加页对应的原页索引
+    """
+    import pypdfium2 as pdfium
+
+    tmp_path = output_path + '.part'
+    with PDFIUM_LOCK:
+        dest = pdfium.PdfDocument(source_pdf)
+        overlay = pdfium.PdfDocument(overlay_pdf)
+        try:
+            for overlay_index, page_index in enumerate(page_indices):
+                page = dest[page_index]
+                left, bottom, right, top = page.get_cropbox()
+                xobject = overlay.page_as_xobject(overlay_index, dest)
+                form = xobject.as_pageobject()
+                form.transform(_overlay_matrix(page.get_rotation(), right - left, top - bottom,
+                                               (left, bottom)))
+                page.insert_obj(form)
+                page.gen_content()
+                page.close()
+            dest.save(tmp_path)
+        finally:
+            overlay.close()
+            dest.close()
+    os.replace(tmp_path, output_path)
+
+
+class SearchablePDFBuilder:
+    """
+    按识别顺序逐页生成可搜索 PDF（process_file 在每页识别完成后调用 add_page）
+
+    用法：
+        builder = SearchablePDFBuilder(file_path, 'out.pdf')
+        for page_index, img in iter_pages(file_path):
+            res = ocr.predict(img)[0]
+            builder.add_page(page_index, img.shape[1::-1], res['rec_texts'], res['rec_polys'])
+        stats = builder.close()
+    """
+
+    def __init__(self, source_path, output_path):
+        self.source_path = source_path
+        self.output_path = output_path
+        self.is_pdf = is_pdf(source_path)
+        self._page_indices = []
+        self._source = None
+        if self.is_pdf:
+            import pypdfium2 as pdfium
+
+            with PDFIUM_LOCK:
+                self._source = pdfium.PdfDocument(source_path)
+            self._overlay_path = output_path + '.overlay.pdf'
+            self.writer = SearchablePDFWriter(self._overlay_path)
+        else:
+            self.writer = SearchablePDFWriter(output_path)
+
+    def add_page(self, page_index, ocr_size, texts, polys):
+        """
+        写入一页
+
+        Args:
+            page_index: 页 / 帧索引
+            ocr_size: 识别所用图像的 (宽, 高)
+            texts: rec_texts
+            polys: rec_polys
+        """
+        if polys is None:
+            polys = []
+        if self.is_pdf:
+            with PDFIUM_LOCK:
+                page = self._source[page_index]
+                width, height = page.get_size()
+                page.close()
+            self.writer.add_text_page(width, height, ocr_size, texts, polys)
+        else:
+            self.writer.add_image_page(self.source_path, ocr_size, texts, polys, page_index)
+        self._page_indices.append(page_index)
+
+    def close(self):
+        """
+        完成输出
+
+        Returns:
+            统计信息 {'pages', 'input_bytes', 'output_bytes', 'write_seconds', 'image_methods'}
+        """
+        self.writer.close()
+        write_seconds = self.writer.write_seconds
+        if self.is_pdf:
+            with PDFIUM_LOCK:
+                self._source.close()
+            start = time.perf_counter()
+            try:
+                merge_text_overlay(self.source_path, self._overlay_path, self.output_path,
+                                   self._page_indices)
+            finally:
+                os.remove(self._overlay_path)
+            write_seconds += time.perf_counter() - start
+        return {
+            'pages': len(self._page_indices),
+            'input_bytes': os.path.getsize(self.source_path),
+            'output_bytes': os.path.getsize(self.output_path),
+            'write_seconds': write_seconds,
+            'image_methods': dict(self.writer.image_methods),
+        }
+
+    def abort(self):
+        self.writer.abort()
+        if self._source is not None:
+            with PDFIUM_LOCK:
+                self._source.close()
+            if os.path.exists(self._overlay_path):
+                os.remove(self._overlay_path)
+
+
+def default_output_path(file_path, output_dir):
+    """可搜索 PDF 的默认输出路径"""
+    stem = os.path.splitext(os.path.basename(file_path))[0]
+    return os.path.join(output_dir, f"{stem}_searchable.pdf")
+
+
+def make_searchable_pdf(file_path, ocr, output_path, dpi=DEFAULT_PDF_DPI, progress_callback=None):
+    """
+    识别文件并直接生成可搜索 PDF
+
+    Returns:
+        统计信息（见 SearchablePDFBuilder.close），另含 'ocr_seconds'
+    """
+    total = count_pages(file_path)
+    builder = SearchablePDFBuilder(file_path, output_path)
+    ocr_seconds = 0.0
+    try:
+        for page_index, img in iter_pages(file_path, dpi, max_pixels=LARGE_IMAGE_PIXELS):
+            if progress_callback:
+                progress_callback(f"正在处理第 {page_index + 1}/{total} 页...")
+            start = time.perf_counter()
+            res = ocr.predict(img)[0]
+            ocr_seconds += time.perf_counter() - start
+            builder.add_page(page_index, (img.shape[1], img.shape[0]),
+                             res.get('rec_texts', []), res.get('rec_polys', []))
+            del img, res
+    except BaseException:
+        builder.abort()
+        raise
+    stats = builder.close()
+    stats['ocr_seconds'] = ocr_seconds
+    return stats
+
+
+def print_stats(file_path, output_path, stats):
+    """打印输出大小和写入耗时"""
+    ratio = stats['output_bytes'] / max(stats['input_bytes'], 1)
+    print(f"[成功] {os.path.basename(file_path)} → {output_path}")
+    print(f"  页数:     {stats['pages']}")
+    print(f"  大小:     {stats['input_bytes'] / 1024:.1f} KB → "
+          f"{stats['output_bytes'] / 1024:.1f} KB ({ratio:.2f}x)")
+    print(f"  写入耗时: {stats['write_seconds'] * 1000:.1f} ms"
+          + (f"（识别 {stats['ocr_seconds']:.2f}s）" if 'ocr_seconds' in stats else ""))
+    if stats['image_methods']:
+        methods = ', '.join(f"{k} {v}" for k, v in stats['image_methods'].items())
+        print(f"  图像嵌入: {methods}")
+
+
+def main():
+    """主函数"""
+    import argparse
+    from ocr_tuner import DEFAULT_DET_MODEL, DEFAULT_REC_MODEL
+
+    parser = argparse.ArgumentParser(description='生成可搜索 PDF（不可见文字层）')
+    parser.add_argument('inputs', nargs='+', help='PDF 或图片路径')
+    parser.add_argument('-o', '--output', default=None,
+                        help='输出路径（单个输入时）或输出目录，默认 output/')
+    parser.add_argument('--dpi', type=int, default=DEFAULT_PDF_DPI, help='PDF 识别渲染分辨率')
+
+    args = parser.parse_args()
+
+    from ocr_engine import init_ocr_model
+
+    ocr = init_ocr_model(DEFAULT_DET_MODEL, DEFAULT_REC_MODEL)
+    for file_path in args.inputs:
+        if args.output and args.output.lower().endswith('.pdf') and len(args.inputs) == 1:
+            output_path = args.output
+        else:
+            output_dir = args.output or 'output'
+            os.makedirs(output_dir, exist_ok=True)
+            output_path = default_output_path(file_path, output_dir)
+        stats = make_searchable_pdf(file_path, ocr, output_path, args.dpi,
+                                    progress_callback=print)
+        print_stats(file_path, output_path, stats)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -18,94 +18,11 @@ PaddleOCR 图形化识别工具
 
 import os
 import sys
-import subprocess
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
-from paddleocr import PaddleOCR
-
-
-def open_file(file_path):
-    """跨平台打开文件"""
-    try:
-        if sys.platform == 'win32':
-            os.startfile(file_path)
-        elif sys.platform == 'darwin':  # macOS
-            subprocess.call(['open', file_path])
-        else:  # Linux
-            subprocess.call(['xdg-open', file_path])
-    except Exception as e:
-        print(f"无法打开文件 {file_path}: {e}")
-
-
-def init_ocr_model(det_model_path, rec_model_path):
-    """初始化 PaddleOCR 模型"""
-    print("正在初始化 OCR 模型...")
-    ocr = PaddleOCR(
-        text_detection_model_name="PP-OCRv5_mobile_det",
-        text_recognition_model_name="PP-OCRv5_mobile_rec",
-        text_detection_model_dir=det_model_path,
-        text_recognition_model_dir=rec_model_path,
-        use_doc_orientation_classify=False,
-        use_doc_unwarping=False,
-        use_textline_orientation=False
-    )
-    print("OCR 模型初始化完成")
-    return ocr
-
-
-def process_file(file_path, ocr, output_dir="output", progress_callback=None):
-    """
-    处理文件（PDF 或图片），进行 OCR 识别
-
-    Args:
-        file_path: 文件路径
-        ocr: PaddleOCR 实例
-        output_dir: 输出目录
-        progress_callback: 进度回调函数
-    """
-    os.makedirs(output_dir, exist_ok=True)
-
-    print(f"正在处理文件: {file_path}")
-
-    if progress_callback:
-        progress_callback("正在加载文件...")
-
-    # 执行 OCR 识别
-    result = ocr.predict(input=file_path)
-
-    # 保存结果
-    page_num = 1
-    all_text = []
-    first_result_dir = None
-
-    for res in result:
-        if progress_callback:
-            progress_callback(f"正在处理第 {page_num}/{len(result)} 页...")
-
-        # 为每页创建单独的文件夹
-        page_dir = os.path.join(output_dir, f"page_{page_num:03d}_result")
-        os.makedirs(page_dir, exist_ok=True)
-
-        # 保存第一次的结果目录（用于后续自动打开）
-        if first_result_dir is None:
-            first_result_dir = page_dir
-
-        # 保存可视化图像
-        res.save_to_img(page_dir)
-
-        # 保存 JSON 结果
-        res.save_to_json(page_dir)
-
-        # 保存文本结果
-        texts = res.get('rec_texts', [])
-        txt_path = os.path.join(page_dir, f"page_{page_num:03d}_result.txt")
-        with open(txt_path, 'w', encoding='utf-8') as f:
-            f.write('\n'.join(texts))
-
-        all_text.extend(texts)
-        page_num += 1
-
-    return first_result_dir, all_text
+from ocr_index import OCRIndex, default_index_path
+# 识别核心在 ocr_engine.py（无界面服务直接从该模块导入，不依赖 tkinter）
+from ocr_engine import init_ocr_model, open_file, process_file
 
 
 class OCRApp:
@@ -114,7 +31,7 @@ class OCRApp:
     def __init__(self, root):
         self.root = root
         self.root.title("PaddleOCR 文字识别工具")
-        self.root.geometry("600x450")
+        self.root.geometry("600x510")
 
         # 模型路径
         self.base_dir = os.path.dirname(os.path.abspath(__file__))
@@ -122,6 +39,7 @@ class OCRApp:
         self.rec_model_path = os.path.join(self.base_dir, "testmodel", "PP-OCRv5_mobile_rec_infer")
 
         self.ocr = None
+        self.index = None
         self.selected_file = None
 
         self.setup_ui()
@@ -185,6 +103,33 @@ class OCRApp:
         )
         self.file_label.pack(pady=10)
 
+        # 可搜索 PDF 输出
+        self.searchable_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(
+            self.root,
+            text="同时生成可搜索 PDF",
+            variable=self.searchable_var,
+            font=("Microsoft YaHei", 10)
+        ).pack()
+
+        # 预筛选：跳过照片、图表、空白页
+        self.prefilter_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(
+            self.root,
+            text="跳过无文字页（照片、图表、空白页）",
+            variable=self.prefilter_var,
+            font=("Microsoft YaHei", 10)
+        ).pack()
+
+        # 预处理：倾斜校正、对比度归一化（手机拍摄页）
+        self.preprocess_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(
+            self.root,
+            text="校正倾斜、增强对比度（手机拍摄页）",
+            variable=self.preprocess_var,
+            font=("Microsoft YaHei", 10)
+        ).pack()
+
         # 进度条
         self.progress_label = tk.Label(
             self.root,
@@ -281,10 +226,36 @@ class OCRApp:
             self.update_progress("正在识别文字，请稍候...")
             self.progress_bar.start(10)
 
+            if self.index is None:
+                self.index = OCRIndex(default_index_path())
+
+            searchable_pdf = None
+            if self.searchable_var.get():
+                from pdf_writer import default_output_path
+
+                os.makedirs("output", exist_ok=True)
+                searchable_pdf = default_output_path(self.selected_file, "output")
+
+            prefilter = None
+            if self.prefilter_var.get():
+                from text_prefilter import TextPrefilter
+
+                prefilter = TextPrefilter()
+
+            preprocess = None
+            if self.preprocess_var.get():
+                from preprocess import PagePreprocessor
+
+                preprocess = PagePreprocessor()
+
             result_dir, all_text = process_file(
                 self.selected_file,
                 self.ocr,
-                progress_callback=self.update_progress
+                progress_callback=self.update_progress,
+                index=self.index,
+                searchable_pdf=searchable_pdf,
+                prefilter=prefilter,
+                preprocess=preprocess
             )
 
             self.progress_bar.stop()
@@ -298,44 +269,20 @@ class OCRApp:
             self.root.after(0, lambda: self.start_button.config(state=tk.NORMAL))
 
     def _show_result(self, result_dir, all_text):
-        """显示结果并打开文件"""
-        self.update_progress("识别完成！")
-
-        # 显示统计信息
-        msg = f"识别完成！\n\n共识别 {len(all_text)} 行文字\n结果保存在: {result_dir}"
-        messagebox.showinfo("识别完成", msg)
-
-        # 自动打开结果文件夹
-        try:
-            # 打开文件夹
-            if sys.platform == 'win32':
-                subprocess.call(['explorer', os.path.dirname(result_dir)])
-            else:
-                open_file(result_dir)
-        except:
-            pass
-
-        # 尝试打开可视化图片和文本文件
+        """在程序内的结果查看器中逐页显示结果"""
+        self.update_progress(f"识别完成！共识别 {len(all_text)} 行文字")
+        self.start_button.config(state=tk.NORMAL)
+        if result_dir is None:
+            messagebox.showinfo("识别完成", "文件中没有可识别的页面")
+            return
         try:
-            # 查找图片文件
-            for file in os.listdir(result_dir):
-                if file.endswith('_ocr_res_img.png'):
-                    img_path = os.path.join(result_dir, file)
-                    open_file(img_path)
-                    break
-
-            # 查找文本文件
-            for file in os.listdir(result_dir):
-                if file.endswith('.txt'):
-                    txt_path = os.path.join(result_dir, file)
-                    open_file(txt_path)
-                    break
-        except Exception as e:
-            print(f"打开结果文件时出错: {e}")
+            from result_viewer import ResultViewer
 
-        # 重置界面
-        self.start_button.config(state=tk.NORMAL)
-        self.progress_label.config(text="")
+            ResultViewer(self.root, os.path.dirname(result_dir), source_path=self.selected_file)
+        except Exception as e:
+            print(f"打开结果查看器时出错: {e}")
+            messagebox.showinfo("识别完成", f"识别完成！\n\n共识别 {len(all_text)} 行文字\n"
+                                          f"结果保存在: {result_dir}")
 
 
 def main():
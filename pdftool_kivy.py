@@ -85,18 +85,67 @@ def get_user_data_dir():
         return os.path.join(os.path.dirname(os.path.abspath(__file__)), 'output')
 
 
-def init_ocr_model(det_model_path, rec_model_path):
+def get_model_dir():
+    """
+    获取 Android 上模型的解压目录
+
+    使用应用私有目录（App.user_data_dir），无需存储权限：启动时即开始解压，
+    此时 request_permissions 的授权可能尚未完成。
+
+    Returns:
+        模型解压目录路径
+    """
+    return os.path.join(App.get_running_app().user_data_dir, 'models')
+
+
+def use_low_memory_mode():
+    """
+    是否启用低内存模式（逐页识别，见 low_memory.py）
+
+    Android 默认启用；桌面端设置 PPOCR_LOW_MEMORY=1 或 PPOCR_MEMORY_CAP_MB 时启用，
+    PPOCR_LOW_MEMORY=0 可强制关闭。
+    """
+    from low_memory import MEMORY_CAP_ENV
+
+    flag = os.environ.get('PPOCR_LOW_MEMORY')
+    if flag is not None:
+        return flag.strip().lower() not in ('0', 'off', 'false', '')
+    return IS_ANDROID or bool(os.environ.get(MEMORY_CAP_ENV))
+
+
+def detect_model_backend(model_dir):
+    """
+    根据模型目录中的文件判断推理后端
+
+    INT8 量化模型只包含 inference.onnx（见 prepare_models.py --variant int8）。
+
+    Returns:
+        'onnx' 或 'paddle'
+    """
+    has_onnx = os.path.exists(os.path.join(model_dir, 'inference.onnx'))
+    has_paddle = os.path.exists(os.path.join(model_dir, 'inference.pdiparams'))
+    return 'onnx' if has_onnx and not has_paddle else 'paddle'
+
+
+def init_ocr_model(det_model_path, rec_model_path, backend='paddle'):
     """
     初始化 PaddleOCR 模型
 
     Args:
         det_model_path: 检测模型路径
         rec_model_path: 识别模型路径
+        backend: 推理后端，'paddle' 或 'onnx'
 
     Returns:
-        PaddleOCR 实例
+        PaddleOCR 实例（onnx 后端时为 OCRPipeline 实例）
     """
     print("正在初始化 OCR 模型...")
+    if backend == 'onnx':
+        from ocr_pipeline import OCRPipeline
+        ocr = OCRPipeline(det_model_path, rec_model_path, backend='onnx')
+        print("OCR 模型初始化完成（ONNX Runtime）")
+        return ocr
+
     from paddleocr import PaddleOCR
 
     ocr = PaddleOCR(
@@ -113,7 +162,7 @@ def init_ocr_model(det_model_path, rec_model_path):
     return ocr
 
 
-def process_file(file_path, ocr, output_dir, progress_callback=None):
+def process_file(file_path, ocr, output_dir, progress_callback=None, low_memory=None, index=None):
     """
     处理文件（PDF 或图片），进行 OCR 识别
 
@@ -121,7 +170,9 @@ def process_file(file_path, ocr, output_dir, progress_callback=None):
         file_path: 文件路径
         ocr: PaddleOCR 实例
         output_dir: 输出目录
-        progress_callback: 进度回调函数
+        progress_callback: 进度回调函数 (消息, 已完成页数, 总页数)
+        low_memory: 是否使用低内存模式，None 时由 use_low_memory_mode() 决定
+        index: OCRIndex 实例，提供时逐页写入全文索引（见 ocr_index.py）
 
     Returns:
         (结果目录, 所有文本行列表)
@@ -130,20 +181,38 @@ def process_file(file_path, ocr, output_dir, progress_callback=None):
 
     print(f"正在处理文件: {file_path}")
 
+    if low_memory is None:
+        low_memory = use_low_memory_mode()
+    if low_memory:
+        from low_memory import process_file_low_memory
+        result_dir, all_text, _ = process_file_low_memory(
+            file_path, ocr, output_dir, progress_callback=progress_callback, index=index)
+        return result_dir, all_text
+
+    from layout import save_ordered_outputs
+    from page_source import LARGE_IMAGE_PIXELS, count_pages, iter_pages
+
+    # 逐页（PDF 页 / TIFF、GIF 帧）读取并识别，任意时刻只持有一页图像
+    total = count_pages(file_path)
     if progress_callback:
-        progress_callback("正在加载文件...")
+        progress_callback("正在加载文件...", 0, total)
 
-    # 执行 OCR 识别
-    result = ocr.predict(input=file_path)
+    # 重新识别时替换该文件已有的索引记录
+    if index is not None:
+        index.remove_document(file_path)
 
-    # 保存结果
-    page_num = 1
     all_text = []
     first_result_dir = None
 
-    for res in result:
+    for page_index, img in iter_pages(file_path, max_pixels=LARGE_IMAGE_PIXELS):
+        page_num = page_index + 1
         if progress_callback:
-            progress_callback(f"正在处理第 {page_num}/{len(result)} 页...")
+            progress_callback(f"正在处理第 {page_num}/{total} 页...", page_index, total)
+
+        res = ocr.predict(img)[0]
+        res['input_path'] = file_path
+        res['page_index'] = page_index if total > 1 else None
+        del img
 
         # 为每页创建单独的文件夹
         page_dir = os.path.join(output_dir, f"page_{page_num:03d}_result")
@@ -159,14 +228,21 @@ def process_file(file_path, ocr, output_dir, progress_callback=None):
         # 保存 JSON 结果
         res.save_to_json(page_dir)
 
-        # 保存文本结果
+        # 保存文本结果（按阅读顺序，版面结构写入 JSON）
         texts = res.get('rec_texts', [])
         txt_path = os.path.join(page_dir, f"page_{page_num:03d}_result.txt")
-        with open(txt_path, 'w', encoding='utf-8') as f:
-            f.write('\n'.join(texts))
+        ordered = save_ordered_outputs(res, page_dir, txt_path)
+
+        if index is not None:
+            index.add_page(file_path, page_num, texts, res.get('rec_polys'), page_dir)
 
-        all_text.extend(texts)
-        page_num += 1
+        all_text.extend(ordered)
+
+    if progress_callback:
+        progress_callback("正在保存结果...", total, total)
+
+    if index is not None:
+        index.commit()
 
     return first_result_dir, all_text
 
@@ -183,21 +259,30 @@ class MainScreen(BoxLayout):
 
         # 应用状态
         self.ocr = None
+        self.index = None
         self.selected_file = None
 
         # 模型路径
+        self.model_extractor = None
         if IS_ANDROID:
-            # Android: 模型需要从 assets 复制到应用目录
-            self.det_model_path = None  # 将在初始化时设置
+            # Android: 模型在启动时于后台从 assets 解压到应用目录
+            self.det_model_path = None  # 解压完成后设置
             self.rec_model_path = None
         else:
-            # 桌面: 直接使用本地路径
+            # 桌面: 直接使用本地路径（PPOCR_MODEL_VARIANT=int8 时使用量化模型）
+            from prepare_models import get_default_variant, resolve_model_dir
             base_dir = os.path.dirname(os.path.abspath(__file__))
-            self.det_model_path = os.path.join(base_dir, "testmodel", "PP-OCRv5_mobile_det_infer")
-            self.rec_model_path = os.path.join(base_dir, "testmodel", "PP-OCRv5_mobile_rec_infer")
+            variant = get_default_variant()
+            self.det_model_path = resolve_model_dir(
+                os.path.join(base_dir, "testmodel", "PP-OCRv5_mobile_det_infer"), variant)
+            self.rec_model_path = resolve_model_dir(
+                os.path.join(base_dir, "testmodel", "PP-OCRv5_mobile_rec_infer"), variant)
 
         self._setup_ui()
 
+        if IS_ANDROID:
+            self._start_model_extraction()
+
     def _setup_ui(self):
         """设置界面"""
         # 标题
@@ -310,7 +395,7 @@ class MainScreen(BoxLayout):
             self._select_file_android(['image/*'])
         else:
             self._select_file_desktop([
-                ('图片文件', '*.jpg;*.jpeg;*.png;*.bmp;*.gif'),
+                ('图片文件', '*.jpg;*.jpeg;*.png;*.bmp;*.gif;*.tif;*.tiff'),
                 ('所有文件', '*.*')
             ])
 
@@ -375,26 +460,33 @@ class MainScreen(BoxLayout):
         try:
             # 初始化模型
             if self.ocr is None:
-                self._update_progress("正在初始化 OCR 模型，请稍候...", 10)
+                self._post_progress("正在初始化 OCR 模型，请稍候...", 0)
 
                 # 检查模型文件
                 if IS_ANDROID:
-                    # Android: 从 assets 复制模型文件
+                    # Android: 等待启动时开始的后台解压完成
                     self._setup_android_models()
 
-                self.ocr = init_ocr_model(self.det_model_path, self.rec_model_path)
+                self.ocr = init_ocr_model(self.det_model_path, self.rec_model_path,
+                                          backend=detect_model_backend(self.det_model_path))
 
-            # 处理文件
-            self._update_progress("正在识别文字，请稍候...", 50)
+            # 处理文件：进度条按已完成页数推进（模型初始化占前 10%）
+            self._post_progress("正在识别文字，请稍候...", 10)
+
+            def on_progress(msg, done, total):
+                self._post_progress(msg, 10 + 90 * done / max(total, 1))
 
             output_dir = get_user_data_dir()
+            if self.index is None:
+                from ocr_index import OCRIndex, default_index_path
+                self.index = OCRIndex(default_index_path(output_dir))
+
             result_dir, all_text = process_file(
                 self.selected_file,
                 self.ocr,
                 output_dir,
-                progress_callback=lambda msg: Clock.schedule_once(
-                    lambda dt: self._update_progress(msg, 70)
-                )
+                progress_callback=on_progress,
+                index=self.index
             )
 
             # 显示结果
@@ -406,44 +498,54 @@ class MainScreen(BoxLayout):
             Clock.schedule_once(lambda dt: self._show_popup('错误', error_msg))
             Clock.schedule_once(lambda dt: self._reset_ui(True))
 
-    def _setup_android_models(self):
-        """设置 Android 模型文件（从 assets 复制）"""
-        from kivy.utils import get_asset_path
-        import shutil
+    def _start_model_extraction(self):
+        """在后台线程中从 assets 解压模型文件（由 model_manifest.json 驱动）"""
+        from model_extract import ModelExtractor
 
-        # 目标目录
-        user_data_dir = get_user_data_dir()
-        det_model_dir = os.path.join(user_data_dir, 'PP-OCRv5_mobile_det_infer')
-        rec_model_dir = os.path.join(user_data_dir, 'PP-OCRv5_mobile_rec_infer')
+        def on_progress(model_name, filename, done, total):
+            Clock.schedule_once(lambda dt: setattr(
+                self.model_status_label, 'text', f'正在准备模型: {filename} ({done + 1}/{total})'))
 
-        # 如果已存在则跳过
-        if os.path.exists(det_model_dir) and os.path.exists(rec_model_dir):
-            self.det_model_path = det_model_dir
-            self.rec_model_path = rec_model_dir
-            return
+        def on_done(error):
+            text = '模型: PP-OCRv5 Mobile' if error is None else f'模型准备失败: {error}'
+            Clock.schedule_once(lambda dt: setattr(self.model_status_label, 'text', text))
 
-        # 复制检测模型
-        os.makedirs(det_model_dir, exist_ok=True)
-        for filename in ['inference.pdiparams', 'inference.pdmodel', 'inference.yml']:
-            src = get_asset_path(f'models/PP-OCRv5_mobile_det_infer/{filename}')
-            if os.path.exists(src):
-                shutil.copy(src, os.path.join(det_model_dir, filename))
+        self.model_extractor = ModelExtractor(
+            get_asset_path('models'),
+            get_model_dir(),
+            progress_callback=on_progress,
+            done_callback=on_done
+        ).start()
 
-        # 复制识别模型
-        os.makedirs(rec_model_dir, exist_ok=True)
-        for filename in ['inference.pdiparams', 'inference.pdmodel', 'inference.yml']:
-            src = get_asset_path(f'models/PP-OCRv5_mobile_rec_infer/{filename}')
-            if os.path.exists(src):
-                shutil.copy(src, os.path.join(rec_model_dir, filename))
+    def _setup_android_models(self):
+        """等待后台模型解压完成并设置模型路径"""
+        # 上次解压失败时重新解压（否则每次识别都会抛出同一个旧错误）
+        if self.model_extractor is not None and self.model_extractor.done \
+                and self.model_extractor.error is not None:
+            self.model_extractor = None
+        if self.model_extractor is None:
+            self._start_model_extraction()
+
+        if not self.model_extractor.done:
+            self._post_progress("正在准备模型文件，请稍候...", 0)
 
-        self.det_model_path = det_model_dir
-        self.rec_model_path = rec_model_dir
+        try:
+            model_dirs = self.model_extractor.wait()
+        except Exception:
+            self.model_extractor = None
+            raise
+        self.det_model_path = model_dirs['PP-OCRv5_mobile_det_infer']
+        self.rec_model_path = model_dirs['PP-OCRv5_mobile_rec_infer']
 
     def _update_progress(self, message, value):
         """更新进度"""
         self.progress_label.text = message
         self.progress_bar.value = value
 
+    def _post_progress(self, message, value):
+        """从后台线程更新进度（切换到 UI 线程执行）"""
+        Clock.schedule_once(lambda dt: self._update_progress(message, value))
+
     def _show_result(self, result_dir, all_text):
         """显示结果"""
         self._update_progress("识别完成！", 100)
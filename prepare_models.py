@@ -8,17 +8,28 @@
 
 使用方式：
     python prepare_models.py
+    python prepare_models.py --onnx     # 转换为 ONNX 模型（供 ONNX Runtime 后端使用）
+    python prepare_models.py --quantize --samples ./samples   # 生成并验证 INT8 量化模型
+    python prepare_models.py --variant int8                   # 打包 INT8 模型到 models/
+    python prepare_models.py --check                          # 按清单校验已部署的模型
 
 输出：
-    - 在 models/ 目录创建模型文件副本（用于 buildozer assets）
+    - 在 models/ 目录创建模型文件副本（用于 buildozer assets），
+      按 sha256 增量、并行复制，复制后校验
+    - 每个模型目录写入 model_manifest.json（模型版本 + 文件 sha256）
     - 验证模型文件完整性
+    - INT8 量化模型: testmodel/<模型名>_int8/，验证报告: testmodel/quantization_report.json
 ========================================================
 """
 
 import os
 import sys
+import json
 import shutil
+import hashlib
+import subprocess
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 
 # 必需的模型文件（PaddleOCR v5 新格式不需要 pdmodel）
@@ -27,19 +38,74 @@ REQUIRED_MODEL_FILES = [
     'inference.yml'
 ]
 
+# 存在时一并复制的模型结构文件（v5 为 inference.json，旧版本为 inference.pdmodel）
+OPTIONAL_MODEL_FILES = [
+    'inference.json',
+    'inference.pdmodel'
+]
+
+# ONNX Runtime 后端使用的模型文件（见 ocr_backends.py）
+ONNX_MODEL_FILE = 'inference.onnx'
+
 # 模型目录配置
 MODELS_CONFIG = {
     'PP-OCRv5_mobile_det_infer': 'PP-OCRv5_mobile_det_infer',
     'PP-OCRv5_mobile_rec_infer': 'PP-OCRv5_mobile_rec_infer'
 }
 
+# 模型版本（更新模型文件时递增，应用端据此判断是否需要重新解压）
+MODEL_VERSIONS = {
+    'PP-OCRv5_mobile_det_infer': '5.0.0',
+    'PP-OCRv5_mobile_rec_infer': '5.0.0'
+}
+
+# 清单与哈希缓存
+MANIFEST_FILE = 'model_manifest.json'
+MANIFEST_VERSION = 1
+HASH_CACHE_FILE = '.hash_cache.json'
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# 模型变体：float 为原始 Paddle 浮点模型，int8 为量化后的 ONNX 模型
+MODEL_VARIANTS = ('float', 'int8')
+INT8_DIR_SUFFIX = '_int8'
+VARIANT_REQUIRED_FILES = {
+    'float': REQUIRED_MODEL_FILES,
+    'int8': [ONNX_MODEL_FILE, 'inference.yml'],
+}
+QUANT_REPORT_FILE = 'quantization_report.json'
+
+
+def resolve_model_dir(model_dir, variant='float'):
+    """
+    获取指定变体的模型目录
+
+    Args:
+        model_dir: 浮点模型目录，如 testmodel/PP-OCRv5_mobile_det_infer
+        variant: 'float' 或 'int8'
 
-def verify_model_files(model_dir):
+    Returns:
+        变体模型目录
+    """
+    if variant not in MODEL_VARIANTS:
+        raise ValueError(f"未知的模型变体: {variant}（可选: {', '.join(MODEL_VARIANTS)}）")
+    if variant == 'int8':
+        return os.path.normpath(model_dir) + INT8_DIR_SUFFIX
+    return model_dir
+
+
+def get_default_variant():
+    """从环境变量 PPOCR_MODEL_VARIANT 读取默认模型变体"""
+    variant = os.environ.get('PPOCR_MODEL_VARIANT', 'float').lower()
+    return variant if variant in MODEL_VARIANTS else 'float'
+
+
+def verify_model_files(model_dir, required_files=REQUIRED_MODEL_FILES):
     """
     验证模型文件是否完整
 
     Args:
         model_dir: 模型目录路径
+        required_files: 必需文件列表
 
     Returns:
         (是否完整, 缺失文件列表)
@@ -48,7 +114,7 @@ def verify_model_files(model_dir):
         return False, [f"模型目录不存在: {model_dir}"]
 
     missing_files = []
-    for filename in REQUIRED_MODEL_FILES:
+    for filename in required_files:
         filepath = os.path.join(model_dir, filename)
         if not os.path.exists(filepath):
             missing_files.append(filename)
@@ -57,36 +123,337 @@ def verify_model_files(model_dir):
     return is_complete, missing_files
 
 
-def prepare_assets(source_dir='testmodel', target_dir='models'):
+# ==================== 清单与增量同步 ====================
+
+def sha256_file(path, chunk_size=HASH_CHUNK_SIZE):
+    """流式计算文件 sha256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def write_json_atomic(path, data):
+    """原子写入 JSON 文件（先写临时文件再重命名）"""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def load_manifest(model_dir):
+    """
+    读取模型目录的清单
+
+    Returns:
+        清单字典，不存在或损坏时返回 None
+    """
+    path = os.path.join(model_dir, MANIFEST_FILE)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+class HashCache:
+    """
+    文件哈希缓存
+
+    以 (大小, 修改时间) 作为文件未变化的依据，未变化的文件无需重新读取计算哈希。
+    缓存保存在模型目录下的 .hash_cache.json。
+    """
+
+    def __init__(self, model_dir):
+        self.path = os.path.join(model_dir, HASH_CACHE_FILE)
+        self.entries = {}
+        self.dirty = False
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            pass
+
+    def lookup(self, filename, st):
+        """返回缓存的 sha256（文件已变化时返回 None）"""
+        entry = self.entries.get(filename)
+        if entry and entry['size'] == st.st_size and entry['mtime_ns'] == st.st_mtime_ns:
+            return entry['sha256']
+        return None
+
+    def update(self, filename, st, sha256):
+        self.entries[filename] = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'sha256': sha256}
+        self.dirty = True
+
+    def hash(self, model_dir, filename):
+        """
+        获取文件 sha256，优先使用缓存
+
+        Returns:
+            (sha256, 是否实际读取了文件)
+        """
+        path = os.path.join(model_dir, filename)
+        st = os.stat(path)
+        cached = self.lookup(filename, st)
+        if cached:
+            return cached, False
+        sha256 = sha256_file(path)
+        self.update(filename, st, sha256)
+        return sha256, True
+
+    def save(self):
+        if self.dirty:
+            write_json_atomic(self.path, self.entries)
+            self.dirty = False
+
+
+def list_model_files(model_dir, variant='float'):
+    """获取需要同步的模型文件（必需文件 + 存在的可选文件）"""
+    files = list(VARIANT_REQUIRED_FILES[variant])
+    if variant == 'float':
+        files += [f for f in OPTIONAL_MODEL_FILES if os.path.exists(os.path.join(model_dir, f))]
+    return files
+
+
+def build_manifest(model_dir, model_name, variant='float', cache=None):
+    """
+    为模型目录生成清单
+
+    Args:
+        model_dir: 模型目录
+        model_name: 模型名（用于查找版本号）
+        variant: 模型变体
+        cache: HashCache 实例
+
+    Returns:
+        清单字典
+    """
+    cache = cache or HashCache(model_dir)
+    files = {}
+    for filename in list_model_files(model_dir, variant):
+        sha256, _ = cache.hash(model_dir, filename)
+        files[filename] = {
+            'size': os.path.getsize(os.path.join(model_dir, filename)),
+            'sha256': sha256,
+        }
+    cache.save()
+    return {
+        'manifest_version': MANIFEST_VERSION,
+        'model': model_name,
+        'version': MODEL_VERSIONS.get(model_name, '0'),
+        'variant': variant,
+        'files': files,
+    }
+
+
+def check_model_dir(model_dir, manifest=None):
+    """
+    按清单校验已部署的模型目录
+
+    大小和修改时间与上次校验一致的文件直接使用缓存的哈希，不重新读取。
+
+    Args:
+        model_dir: 模型目录
+        manifest: 清单（默认读取目录中的 model_manifest.json）
+
+    Returns:
+        (问题列表, 实际读取计算哈希的文件数)
+    """
+    manifest = manifest or load_manifest(model_dir)
+    if manifest is None:
+        return [f"缺少清单: {os.path.join(model_dir, MANIFEST_FILE)}"], 0
+
+    cache = HashCache(model_dir)
+    problems = []
+    hashed = 0
+    for filename, expected in manifest['files'].items():
+        path = os.path.join(model_dir, filename)
+        if not os.path.exists(path):
+            problems.append(f"{filename}: 缺失")
+            continue
+        if os.path.getsize(path) != expected['size']:
+            problems.append(f"{filename}: 大小不一致")
+            continue
+        sha256, did_read = cache.hash(model_dir, filename)
+        hashed += did_read
+        if sha256 != expected['sha256']:
+            problems.append(f"{filename}: 校验和不一致")
+    cache.save()
+    return problems, hashed
+
+
+def copy_verified(src_file, dst_file, expected_sha256):
+    """
+    复制单个文件：流式写入临时文件并同时计算哈希，校验通过后原子替换
+
+    Returns:
+        复制的字节数
+    """
+    tmp_file = dst_file + '.part'
+    digest = hashlib.sha256()
+    copied = 0
+    try:
+        with open(src_file, 'rb') as src, open(tmp_file, 'wb') as dst:
+            for chunk in iter(lambda: src.read(HASH_CHUNK_SIZE), b''):
+                digest.update(chunk)
+                dst.write(chunk)
+                copied += len(chunk)
+            dst.flush()
+            os.fsync(dst.fileno())
+        if digest.hexdigest() != expected_sha256:
+            raise IOError(f"复制后校验失败: {src_file}")
+        shutil.copystat(src_file, tmp_file)
+        os.replace(tmp_file, dst_file)
+    finally:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+    return copied
+
+
+def sync_model_dirs(jobs, workers=4):
+    """
+    增量、并行同步多个模型目录
+
+    Args:
+        jobs: [(源目录, 目标目录, 源清单), ...]
+        workers: 并行复制线程数
+
+    Returns:
+        (复制文件数, 跳过文件数, 复制字节数)
+    """
+    copies = []
+    skipped = 0
+    for source_path, target_path, manifest in jobs:
+        os.makedirs(target_path, exist_ok=True)
+        target_manifest = load_manifest(target_path)
+
+        # 目标清单与源一致时，只需按缓存校验目标文件
+        if target_manifest and target_manifest.get('files') == manifest['files']:
+            problems, _ = check_model_dir(target_path, manifest)
+            bad_files = {p.split(':')[0] for p in problems}
+        else:
+            bad_files = None
+
+        cache = HashCache(target_path)
+        for filename, expected in manifest['files'].items():
+            dst_file = os.path.join(target_path, filename)
+            if bad_files is not None:
+                needs_copy = filename in bad_files
+            elif os.path.exists(dst_file) and os.path.getsize(dst_file) == expected['size']:
+                needs_copy = cache.hash(target_path, filename)[0] != expected['sha256']
+            else:
+                needs_copy = True
+
+            if needs_copy:
+                copies.append((os.path.join(source_path, filename), dst_file, expected['sha256']))
+            else:
+                skipped += 1
+                print(f"    {os.path.basename(target_path)}/{filename} (校验通过，跳过)")
+        cache.save()
+
+    copied_bytes = 0
+    if copies:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            futures = {executor.submit(copy_verified, *job): job for job in copies}
+            for future in as_completed(futures):
+                src_file, dst_file, _ = futures[future]
+                size = future.result()
+                copied_bytes += size
+                print(f"    {os.path.basename(os.path.dirname(dst_file))}/"
+                      f"{os.path.basename(dst_file)} ({size / 1024:.1f} KB)")
+
+    # 写入目标清单，并记录已校验文件的哈希缓存
+    for source_path, target_path, manifest in jobs:
+        cache = HashCache(target_path)
+        for filename, expected in manifest['files'].items():
+            cache.update(filename, os.stat(os.path.join(target_path, filename)), expected['sha256'])
+        cache.save()
+        write_json_atomic(os.path.join(target_path, MANIFEST_FILE), manifest)
+
+    return len(copies), skipped, copied_bytes
+
+
+def check_model_tree(target_dir='models'):
+    """
+    按清单快速校验已部署的模型目录（--check）
+
+    Args:
+        target_dir: 已部署的模型根目录
+
+    Returns:
+        退出码（0 表示全部通过）
+    """
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    target_base = os.path.join(base_dir, target_dir)
+
+    print("=" * 60)
+    print(f"模型校验: {target_base}")
+    print("=" * 60)
+
+    all_ok = True
+    for model_name in MODELS_CONFIG.values():
+        model_dir = os.path.join(target_base, model_name)
+        manifest = load_manifest(model_dir)
+        problems, hashed = check_model_dir(model_dir, manifest)
+        version = manifest.get('version', '?') if manifest else '?'
+        if problems:
+            all_ok = False
+            print(f"\n{model_name} (版本 {version}): [错误]")
+            for problem in problems:
+                print(f"    {problem}")
+        else:
+            total = len(manifest['files'])
+            print(f"\n{model_name} (版本 {version}): [OK] "
+                  f"{total} 个文件，重新计算哈希 {hashed} 个")
+
+    print("\n" + "=" * 60)
+    print("[成功] 模型校验通过" if all_ok else "[失败] 模型校验未通过，请重新运行 prepare_models.py")
+    return 0 if all_ok else 1
+
+
+def prepare_assets(source_dir='testmodel', target_dir='models', variant='float', workers=4):
     """
     准备 Android assets 文件
 
+    无论选择哪个变体，目标目录名都保持为原模型名，应用端路径无需修改。
+    每个模型目录会写入 model_manifest.json（版本号 + 各文件 sha256），
+    只有内容变化的文件才会被复制。
+
     Args:
         source_dir: 源模型目录
         target_dir: 目标 assets 目录
+        variant: 模型变体，'float' 或 'int8'
+        workers: 并行复制线程数
     """
     base_dir = os.path.dirname(os.path.abspath(__file__))
     source_base = os.path.join(base_dir, source_dir)
     target_base = os.path.join(base_dir, target_dir)
 
+    required_files = VARIANT_REQUIRED_FILES[variant]
+
     print("=" * 60)
     print("PaddleOCR 模型文件准备工具")
     print("=" * 60)
+    print(f"模型变体: {variant}")
 
     # 创建目标目录
     os.makedirs(target_base, exist_ok=True)
 
-    # 验证并复制每个模型
+    # 验证每个模型并生成清单
     all_valid = True
+    jobs = []
     for model_name in MODELS_CONFIG.values():
-        source_path = os.path.join(source_base, model_name)
+        source_path = resolve_model_dir(os.path.join(source_base, model_name), variant)
         target_path = os.path.join(target_base, model_name)
 
         print(f"\n检查模型: {model_name}")
         print(f"源路径: {source_path}")
 
         # 验证模型文件
-        is_complete, missing = verify_model_files(source_path)
+        is_complete, missing = verify_model_files(source_path, required_files)
 
         if not is_complete:
             print(f"  [错误] 模型文件不完整!")
@@ -97,31 +464,31 @@ def prepare_assets(source_dir='testmodel', target_dir='models'):
 
         print(f"  [OK] 模型文件完整")
 
-        # 复制文件
-        os.makedirs(target_path, exist_ok=True)
-        for filename in REQUIRED_MODEL_FILES:
-            src_file = os.path.join(source_path, filename)
-            dst_file = os.path.join(target_path, filename)
+        # 生成源清单（未变化的文件使用哈希缓存）
+        manifest = build_manifest(source_path, model_name, variant)
+
+        # 切换变体后删除另一变体遗留的模型文件，避免一起打包进 APK
+        if os.path.isdir(target_path):
+            for filename in os.listdir(target_path):
+                if filename not in manifest['files'] and filename.startswith('inference.'):
+                    os.remove(os.path.join(target_path, filename))
+                    print(f"    {filename} (其他变体遗留，已删除)")
 
-            # 检查是否需要复制
-            if os.path.exists(dst_file):
-                src_size = os.path.getsize(src_file)
-                dst_size = os.path.getsize(dst_file)
-                if src_size == dst_size:
-                    print(f"    {filename} (已存在，跳过)")
-                    continue
+        jobs.append((source_path, target_path, manifest))
 
-            shutil.copy2(src_file, dst_file)
-            file_size = os.path.getsize(dst_file) / 1024  # KB
-            print(f"    {filename} ({file_size:.1f} KB)")
+    # 增量并行复制（按 sha256 判断是否需要复制，复制后校验）
+    if jobs:
+        print("\n同步模型文件...")
+        copied, skipped, copied_bytes = sync_model_dirs(jobs, workers)
+        print(f"  复制 {copied} 个文件 ({copied_bytes / 1024 / 1024:.2f} MB)，跳过 {skipped} 个")
 
     print("\n" + "=" * 60)
     if all_valid:
         print("[成功] 所有模型文件已准备完成!")
         print(f"目标目录: {target_base}")
         print("\nbuildozer.spec 配置:")
-        print("  android.assets = testmodel/PP-OCRv5_mobile_det_infer:models/PP-OCRv5_mobile_det_infer")
-        print("  android.assets = testmodel/PP-OCRv5_mobile_rec_infer:models/PP-OCRv5_mobile_rec_infer")
+        print("  android.assets = models/PP-OCRv5_mobile_det_infer:models/PP-OCRv5_mobile_det_infer")
+        print("  android.assets = models/PP-OCRv5_mobile_rec_infer:models/PP-OCRv5_mobile_rec_infer")
     else:
         print("[失败] 部分模型文件不完整，请检查!")
         return 1
@@ -129,6 +496,343 @@ def prepare_assets(source_dir='testmodel', target_dir='models'):
     return 0
 
 
+def convert_to_onnx(model_dir, opset_version=11):
+    """
+    使用 paddle2onnx 将 Paddle 推理模型转换为 inference.onnx
+
+    Args:
+        model_dir: 模型目录
+        opset_version: ONNX opset 版本
+
+    Returns:
+        是否转换成功
+    """
+    # PaddleOCR v5 模型结构保存在 inference.json，旧版本为 inference.pdmodel
+    model_filename = 'inference.json'
+    if not os.path.exists(os.path.join(model_dir, model_filename)):
+        model_filename = 'inference.pdmodel'
+
+    cmd = [
+        'paddle2onnx',
+        '--model_dir', model_dir,
+        '--model_filename', model_filename,
+        '--params_filename', 'inference.pdiparams',
+        '--save_file', os.path.join(model_dir, ONNX_MODEL_FILE),
+        '--opset_version', str(opset_version),
+    ]
+    try:
+        subprocess.run(cmd, check=True)
+    except FileNotFoundError:
+        print("  [错误] 未找到 paddle2onnx，请先安装: pip install paddle2onnx")
+        return False
+    except subprocess.CalledProcessError as e:
+        print(f"  [错误] 转换失败 (退出码 {e.returncode})")
+        return False
+    return True
+
+
+def convert_models_to_onnx(source_dir='testmodel'):
+    """
+    将所有模型转换为 ONNX 格式
+
+    Args:
+        source_dir: 源模型目录
+    """
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+
+    print("=" * 60)
+    print("ONNX 模型转换")
+    print("=" * 60)
+
+    all_ok = True
+    for model_name in MODELS_CONFIG.values():
+        model_dir = os.path.join(base_dir, source_dir, model_name)
+        print(f"\n转换模型: {model_name}")
+
+        is_complete, missing = verify_model_files(model_dir)
+        if not is_complete:
+            print(f"  [错误] 模型文件不完整: {', '.join(missing)}")
+            all_ok = False
+            continue
+
+        if convert_to_onnx(model_dir):
+            size = os.path.getsize(os.path.join(model_dir, ONNX_MODEL_FILE)) / 1024
+            print(f"  [OK] {ONNX_MODEL_FILE} ({size:.1f} KB)")
+        else:
+            all_ok = False
+
+    print("\n" + "=" * 60)
+    if not all_ok:
+        print("[失败] 部分模型转换失败，请检查!")
+        return 1
+    print("[成功] ONNX 模型已生成，可在 init_ocr_model 中使用 backend='onnx'")
+    return 0
+
+
+def _load_calibration_images(samples_dir, max_pages=16):
+    """
+    读取校准页面：优先使用标注样本集，否则生成合成页面
+
+    Returns:
+        (BGR 图像列表, 每页标注列表或 None)
+    """
+    from page_source import read_image
+
+    if samples_dir:
+        from ocr_metrics import load_labeled_samples
+
+        samples = load_labeled_samples(samples_dir)[:max_pages]
+        return [read_image(path) for path, _ in samples], [boxes for _, boxes in samples]
+
+    import tempfile
+    from ocr_tuner import generate_calibration_pages
+
+    with tempfile.TemporaryDirectory(prefix='ppocr_calib_') as tmp_dir:
+        paths = generate_calibration_pages(tmp_dir, count=min(max_pages, 8))
+        return [read_image(path) for path in paths], None
+
+
+def _calibration_tensors(images, labels, det_model_dir, max_crops=200):
+    """
+    生成检测 / 识别模型的校准输入
+
+    识别模型的文本行优先取自标注框，无标注时使用浮点检测模型的输出。
+    """
+    from ocr_backends import OnnxDetBackend, det_preprocess, rec_preprocess
+    from ocr_pipeline import get_rotate_crop_image, pad_rec_batch
+
+    det_inputs = [det_preprocess(img) for img in images]
+
+    if labels is None:
+        det_backend = OnnxDetBackend(det_model_dir)
+        labels = [[{'points': poly} for poly in det_backend.detect(img)] for img in images]
+
+    rec_inputs = []
+    for img, boxes in zip(images, labels):
+        for box in boxes:
+            if len(rec_inputs) >= max_crops:
+                break
+            crop = get_rotate_crop_image(img, box['points'])
+            rec_inputs.append(rec_preprocess(pad_rec_batch([crop])))
+    return det_inputs, rec_inputs
+
+
+def quantize_onnx_model(float_model, int8_model, calib_tensors=None, mode='static'):
+    """
+    将 ONNX 浮点模型量化为 INT8
+
+    Args:
+        float_model: 浮点 .onnx 文件
+        int8_model: 输出 .onnx 文件
+        calib_tensors: 静态量化的校准输入列表
+        mode: 'static'（QDQ 格式，逐通道权重，推荐）或 'dynamic'
+    """
+    import onnx
+    from onnxruntime.quantization import (CalibrationDataReader, QuantFormat, QuantType,
+                                          quantize_dynamic, quantize_static)
+
+    if mode == 'dynamic':
+        quantize_dynamic(float_model, int8_model, weight_type=QuantType.QInt8)
+        return
+
+    # 量化前做形状推断与图优化，可提升量化覆盖率
+    prepared_model = int8_model + '.prep.onnx'
+    try:
+        from onnxruntime.quantization.shape_inference import quant_pre_process
+        quant_pre_process(float_model, prepared_model)
+    except Exception:
+        shutil.copy2(float_model, prepared_model)
+
+    input_name = onnx.load(prepared_model, load_external_data=False).graph.input[0].name
+
+    class TensorCalibrationReader(CalibrationDataReader):
+        """向量化工具逐个提供校准输入"""
+
+        def __init__(self, tensors):
+            self._feeds = iter([{input_name: t} for t in tensors])
+
+        def get_next(self):
+            return next(self._feeds, None)
+
+    try:
+        quantize_static(prepared_model, int8_model, TensorCalibrationReader(calib_tensors or []),
+                        quant_format=QuantFormat.QDQ,
+                        per_channel=True,
+                        weight_type=QuantType.QInt8,
+                        activation_type=QuantType.QUInt8)
+    finally:
+        if os.path.exists(prepared_model):
+            os.remove(prepared_model)
+
+
+def _evaluate_onnx_variant(det_dir, rec_dir, samples):
+    """
+    在标注样本集上评估一组 ONNX 模型
+
+    Returns:
+        {'box_recall', 'cer', 'det_ms_per_page', 'rec_ms_per_line'}
+    """
+    import time
+    from ocr_metrics import edit_distance, match_boxes
+    from ocr_pipeline import OCRPipeline, get_rotate_crop_image
+    from page_source import read_image
+
+    pipeline = OCRPipeline(det_dir, rec_dir, backend='onnx')
+    gt_boxes = matched = 0
+    errors = chars = 0
+    det_time = rec_time = 0.0
+    lines = 0
+
+    for image_path, boxes in samples:
+        img = read_image(image_path)
+        pipeline.detect(img)  # 预热
+
+        start = time.perf_counter()
+        polys = pipeline.detect(img)
+        det_time += time.perf_counter() - start
+
+        gt_polys = [b['points'] for b in boxes]
+        gt_boxes += len(gt_polys)
+        matched += len(match_boxes(polys, gt_polys))
+
+        # 识别精度在标注框上评估，与检测结果无关
+        crops = [get_rotate_crop_image(img, p) for p in gt_polys]
+        if not crops:
+            continue
+        start = time.perf_counter()
+        texts, _ = pipeline.recognize(crops)
+        rec_time += time.perf_counter() - start
+        lines += len(crops)
+        for text, box in zip(texts, boxes):
+            errors += edit_distance(text, box['transcription'])
+            chars += len(box['transcription'])
+
+    return {
+        'box_recall': matched / gt_boxes if gt_boxes else 1.0,
+        'cer': errors / chars if chars else 0.0,
+        'det_ms_per_page': det_time * 1000 / len(samples) if samples else 0.0,
+        'rec_ms_per_line': rec_time * 1000 / lines if lines else 0.0,
+    }
+
+
+def _model_size(model_dir, filenames):
+    return sum(os.path.getsize(os.path.join(model_dir, f))
+               for f in filenames if os.path.exists(os.path.join(model_dir, f)))
+
+
+def quantize_models(source_dir='testmodel', samples_dir=None, mode='static',
+                    max_cer_increase=0.01, max_recall_drop=0.02):
+    """
+    生成 INT8 量化模型，并在标注样本集上与浮点模型对比精度、速度和体积
+
+    Args:
+        source_dir: 源模型目录
+        samples_dir: 标注样本集目录（Label.txt 格式，见 ocr_metrics.py）
+        mode: 量化方式，'static' 或 'dynamic'
+        max_cer_increase: 允许的 CER 最大增量
+        max_recall_drop: 允许的检测召回率最大降幅
+
+    Returns:
+        退出码（0 表示量化模型通过验证）
+    """
+    import json
+
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    source_base = os.path.join(base_dir, source_dir)
+    model_dirs = [os.path.join(source_base, name) for name in MODELS_CONFIG.values()]
+    det_dir, rec_dir = model_dirs
+
+    print("=" * 60)
+    print(f"INT8 模型量化 ({mode})")
+    print("=" * 60)
+
+    # 1. 确保浮点 ONNX 模型存在
+    for model_dir in model_dirs:
+        if not os.path.exists(os.path.join(model_dir, ONNX_MODEL_FILE)):
+            print(f"\n未找到 {ONNX_MODEL_FILE}，先转换: {os.path.basename(model_dir)}")
+            if not convert_to_onnx(model_dir):
+                return 1
+
+    # 2. 准备校准数据并量化
+    det_calib = rec_calib = None
+    if mode == 'static':
+        print("\n准备校准数据...")
+        images, labels = _load_calibration_images(samples_dir)
+        det_calib, rec_calib = _calibration_tensors(images, labels, det_dir)
+        print(f"  检测校准页数: {len(det_calib)}  识别校准行数: {len(rec_calib)}")
+
+    for model_dir, calib in ((det_dir, det_calib), (rec_dir, rec_calib)):
+        int8_dir = resolve_model_dir(model_dir, 'int8')
+        os.makedirs(int8_dir, exist_ok=True)
+        shutil.copy2(os.path.join(model_dir, 'inference.yml'), os.path.join(int8_dir, 'inference.yml'))
+        print(f"\n量化模型: {os.path.basename(model_dir)}")
+        quantize_onnx_model(os.path.join(model_dir, ONNX_MODEL_FILE),
+                            os.path.join(int8_dir, ONNX_MODEL_FILE), calib, mode)
+        print(f"  [OK] {int8_dir}")
+
+    # 3. 体积对比
+    report = {'mode': mode, 'size_bytes': {}, 'accuracy': {}, 'passed': None}
+    for model_dir in model_dirs:
+        name = os.path.basename(model_dir)
+        report['size_bytes'][name] = {
+            'paddle_float': _model_size(model_dir, ['inference.pdiparams', 'inference.json', 'inference.pdmodel']),
+            'onnx_float': _model_size(model_dir, [ONNX_MODEL_FILE]),
+            'onnx_int8': _model_size(resolve_model_dir(model_dir, 'int8'), [ONNX_MODEL_FILE]),
+        }
+
+    # 4. 精度与速度对比
+    passed = True
+    if samples_dir:
+        from ocr_metrics import load_labeled_samples
+
+        samples = load_labeled_samples(samples_dir)
+        print(f"\n在 {len(samples)} 张标注样本上验证...")
+        float_res = _evaluate_onnx_variant(det_dir, rec_dir, samples)
+        int8_res = _evaluate_onnx_variant(resolve_model_dir(det_dir, 'int8'),
+                                          resolve_model_dir(rec_dir, 'int8'), samples)
+        report['accuracy'] = {'float': float_res, 'int8': int8_res, 'samples': len(samples)}
+        passed = (int8_res['cer'] - float_res['cer'] <= max_cer_increase
+                  and float_res['box_recall'] - int8_res['box_recall'] <= max_recall_drop)
+        report['passed'] = passed
+    else:
+        print("\n[警告] 未指定 --samples，跳过精度验证")
+
+    # 5. 报告
+    print("\n" + "=" * 60)
+    print("体积对比")
+    print("=" * 60)
+    for name, sizes in report['size_bytes'].items():
+        ratio = sizes['onnx_int8'] / sizes['onnx_float'] if sizes['onnx_float'] else 0
+        print(f"  {name}:")
+        print(f"    Paddle 浮点: {sizes['paddle_float'] / 1024 / 1024:.2f} MB"
+              f"  ONNX 浮点: {sizes['onnx_float'] / 1024 / 1024:.2f} MB"
+              f"  ONNX INT8: {sizes['onnx_int8'] / 1024 / 1024:.2f} MB ({ratio:.0%})")
+
+    if report['accuracy']:
+        print("\n" + "=" * 60)
+        print("精度与速度对比")
+        print("=" * 60)
+        print(f"  {'变体':<6s} {'检测召回':>8s} {'CER':>8s} {'检测 ms/页':>10s} {'识别 ms/行':>10s}")
+        for variant in ('float', 'int8'):
+            r = report['accuracy'][variant]
+            print(f"  {variant:<6s} {r['box_recall']:>8.4f} {r['cer']:>8.4f}"
+                  f" {r['det_ms_per_page']:>10.1f} {r['rec_ms_per_line']:>10.2f}")
+
+    report_path = os.path.join(source_base, QUANT_REPORT_FILE)
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    print("\n" + "=" * 60)
+    print(f"验证报告: {report_path}")
+    if not passed:
+        print(f"[失败] INT8 模型精度下降超出阈值 (CER +{max_cer_increase}, 召回 -{max_recall_drop})")
+        return 1
+    print("[成功] INT8 模型已生成")
+    print("  桌面端: 设置 PPOCR_MODEL_VARIANT=int8 或 init_ocr_model(..., variant='int8')")
+    print("  Android: python prepare_models.py --variant int8 后编译 APK")
+    return 0
+
+
 def print_model_info():
     """打印模型信息"""
     base_dir = os.path.dirname(os.path.abspath(__file__))
@@ -165,6 +869,20 @@ def main():
     parser = argparse.ArgumentParser(description='PaddleOCR 模型文件准备工具')
     parser.add_argument('--info', action='store_true',
                         help='显示模型文件信息')
+    parser.add_argument('--onnx', action='store_true',
+                        help='将模型转换为 ONNX 格式 (需要 paddle2onnx)')
+    parser.add_argument('--quantize', action='store_true',
+                        help='生成 INT8 量化模型并与浮点模型对比 (需要 onnxruntime)')
+    parser.add_argument('--samples',
+                        help='标注样本集目录 (Label.txt 格式)，用于量化校准和精度验证')
+    parser.add_argument('--quant-mode', choices=['static', 'dynamic'], default='static',
+                        help='量化方式 (默认: static)')
+    parser.add_argument('--variant', choices=MODEL_VARIANTS, default=get_default_variant(),
+                        help='打包到 assets 的模型变体 (默认: float，可用 PPOCR_MODEL_VARIANT 设置)')
+    parser.add_argument('--check', action='store_true',
+                        help='按清单校验已部署的模型目录 (默认校验 --target)')
+    parser.add_argument('--workers', type=int, default=4,
+                        help='并行复制线程数 (默认: 4)')
     parser.add_argument('--source', default='testmodel',
                         help='源模型目录 (默认: testmodel)')
     parser.add_argument('--target', default='models',
@@ -176,7 +894,16 @@ def main():
         print_model_info()
         return 0
 
-    return prepare_assets(args.source, args.target)
+    if args.check:
+        return check_model_tree(args.target)
+
+    if args.onnx:
+        return convert_models_to_onnx(args.source)
+
+    if args.quantize:
+        return quantize_models(args.source, args.samples, args.quant_mode)
+
+    return prepare_assets(args.source, args.target, args.variant, args.workers)
 
 
 if __name__ == "__main__":
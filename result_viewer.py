@@ -0,0 +1,561 @@
+"""
+========================================================
+识别结果查看器（桌面版，tkinter）
+========================================================
+
+功能说明：
+    在程序内逐页浏览一个文档的识别结果，不再调用外部程序打开结果目录、
+    可视化 PNG 和文本文件：
+        - 左侧缩略图列表只为可见的行解码缩略图（滚动时按需加载）
+        - 中间只渲染当前页，按窗口大小渲染（PDF 按显示尺寸换算 DPI 渲染，
+          图片用 cv2 降采样解码），不解码整幅原图
+        - 文本框从每页 *_res.json 读取后叠加在原文档页面上，不依赖
+          预先生成的可视化 PNG；点击文本框在状态栏显示识别文字
+        - 右侧显示按阅读顺序排列的文本
+        - 后台线程预取前后页，已渲染的页面保存在 LRU 缓存中，翻页即时显示
+
+    原文档不可用时（已移动或识别的是内存数据），在空白页上只显示文本框。
+
+运行方式：
+    python result_viewer.py output/            # process_file 的输出目录
+    python result_viewer.py output/page_001_result
+
+用法：
+    from result_viewer import ResultViewer
+    ResultViewer(root, output_dir)             # 打开 Toplevel 窗口
+========================================================
+"""
+
+import os
+import re
+import sys
+import json
+import glob
+import time
+import queue
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+PAGE_DIR_PATTERN = re.compile(r'^page_(\d+)_result$')
+THUMB_SIZE = (110, 150)
+THUMB_ROW_HEIGHT = 180
+# 当前页前后各预取的页数
+PREFETCH_PAGES = 2
+# 已渲染页面的 LRU 缓存容量（按页）
+PAGE_CACHE_SIZE = 8
+# 当前页请求的优先级高于预取，预取高于缩略图
+PRIORITY_PAGE, PRIORITY_PREFETCH, PRIORITY_THUMB = 0, 1, 2
+POLL_MS = 30
+RESIZE_DELAY_MS = 150
+
+
+def find_page_dirs(output_dir):
+    """
+    列出输出目录中的页结果目录
+
+    Args:
+        output_dir: process_file 的输出目录（或其中任一 page_NNN_result 目录）
+
+    Returns:
+        [(页号, 页目录), ...]（按页号排序）
+    """
+    output_dir = os.path.abspath(output_dir)
+    if PAGE_DIR_PATTERN.match(os.path.basename(output_dir)):
+        output_dir = os.path.dirname(output_dir)
+    pages = []
+    for name in os.listdir(output_dir):
+        match = PAGE_DIR_PATTERN.match(name)
+        path = os.path.join(output_dir, name)
+        if match and os.path.isdir(path):
+            pages.append((int(match.group(1)), path))
+    return sorted(pages)
+
+
+def load_page_result(page_dir):
+    """
+    读取一页的识别结果
+
+    Returns:
+        {'input_path', 'page_index', 'page_size', 'polys', 'texts', 'lines', 'prefilter'}
+    """
+    res = {}
+    json_paths = glob.glob(os.path.join(page_dir, '*_res.json'))
+    if json_paths:
+        with open(json_paths[0], 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        res = data['res'] if isinstance(data.get('res'), dict) else data
+    lines = []
+    for txt_path in glob.glob(os.path.join(page_dir, '*.txt')):
+        with open(txt_path, 'r', encoding='utf-8') as f:
+            lines = f.read().split('\n')
+        break
+    return {
+        'input_path': res.get('input_path'),
+        'page_index': res.get('page_index') or 0,
+        'page_size': res.get('page_size'),
+        'polys': [np.asarray(p, dtype=np.float32).reshape(-1, 2)
+                  for p in res.get('rec_polys', [])],
+        'texts': list(res.get('rec_texts', [])),
+        'lines': lines,
+        'prefilter': res.get('prefilter'),
+    }
+
+
+def render_source_page(path, page_index, max_size):
+    """
+    按显示尺寸渲染原文档的一页
+
+    Args:
+        path: 原文档路径
+        page_index: 页索引
+        max_size: (最大宽度, 最大高度)
+
+    Returns:
+        RGB 图像数组（不超过 max_size，保持宽高比）
+    """
+    import cv2
+    from page_source import iter_pages
+
+    max_w, max_h = max_size
+    # 像素上限取显示面积：PDF 据此换算渲染 DPI，图片在解码阶段降采样
+    for _, img in iter_pages(path, dpi=600, max_pixels=max_w * max_h,
+                             page_range=(page_index, page_index + 1)):
+        scale = min(max_w / img.shape[1], max_h / img.shape[0], 1.0)
+        if scale < 1.0:
+            img = cv2.resize(img, (max(1, round(img.shape[1] * scale)),
+                                   max(1, round(img.shape[0] * scale))),
+                             interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+    raise IndexError(f"页索引超出范围: {page_index}")
+
+
+def blank_page(page_size, max_size):
+    """原文档不可用时的空白页（按识别尺寸的宽高比）"""
+    width, height = page_size or (1240, 1754)
+    scale = min(max_size[0] / width, max_size[1] / height)
+    return np.full((max(1, round(height * scale)), max(1, round(width * scale)), 3),
+                   250, dtype=np.uint8)
+
+
+class _Loader(threading.Thread):
+    """
+    单个后台解码线程
+
+    PDF 渲染经 page_source 执行，与识别线程共用 page_source.PDFIUM_LOCK，
+    查看器打开时重新开始识别也不会并发调用 pdfium。
+    请求按 (优先级, 提交顺序) 处理；翻页时撤销不再需要的请求，
+    快速连续翻页不会积压渲染任务。
+    """
+
+    def __init__(self):
+        super().__init__(daemon=True, name='viewer-loader')
+        self._cond = threading.Condition()
+        self._wanted = {}             # key → (优先级, 序号, 函数)
+        self._seq = 0
+        self._closed = False
+        self.done = queue.Queue()
+
+    def request(self, key, priority, func):
+        with self._cond:
+            if key in self._wanted and self._wanted[key][0] <= priority:
+                return
+            self._seq += 1
+            self._wanted[key] = (priority, self._seq, func)
+            self._cond.notify()
+
+    def cancel(self, keep):
+        """撤销 keep(key) 为 False 的待处理请求"""
+        with self._cond:
+            for key in [k for k in self._wanted if not keep(k)]:
+                del self._wanted[key]
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._wanted.clear()
+            self._cond.notify()
+
+    def run(self):
+        while True:
+            with self._cond:
+                while not self._wanted and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                key = min(self._wanted, key=lambda k: self._wanted[k][:2])
+                _, _, func = self._wanted.pop(key)
+            start = time.perf_counter()
+            try:
+                value, error = func(), None
+            except Exception as e:
+                value, error = None, f"{type(e).__name__}: {e}"
+            self.done.put((key, value, error, time.perf_counter() - start))
+
+
+class ResultViewer:
+    """
+    识别结果查看窗口
+
+    Args:
+        master: 父窗口
+        output_dir: process_file 的输出目录（或其中任一 page_NNN_result 目录）
+        source_path: 原文档路径（默认取结果 JSON 中的 input_path）
+    """
+
+    def __init__(self, master, output_dir, source_path=None):
+        import tkinter as tk
+
+        self.pages = find_page_dirs(output_dir)
+        if not self.pages:
+            raise FileNotFoundError(f"没有识别结果: {output_dir}")
+        self.output_dir = os.path.dirname(self.pages[0][1])
+        self._results = {}
+        first = self._result(0)
+        self.source_path = source_path or first['input_path']
+        if self.source_path and not os.path.isfile(self.source_path):
+            self.source_path = None
+        if self.source_path:
+            # 输出目录被多次复用时，忽略超出原文档页数的旧结果
+            from page_source import count_pages
+
+            total = count_pages(self.source_path)
+            self.pages = [(num, path) for num, path in self.pages if num <= total]
+
+        self.current = 0
+        self._page_cache = OrderedDict()      # (页, 宽, 高) → RGB 数组
+        self._thumb_images = {}               # 页 → PhotoImage
+        self._thumb_drawn = set()
+        self._photo = None
+        self._display = None                  # (页, 缩放比例, 偏移 x, 偏移 y)
+        self._resize_job = None
+        self._loader = _Loader()
+        self._loader.start()
+
+        self.window = tk.Toplevel(master)
+        self.window.title(f"识别结果 - {os.path.basename(self.source_path or self.output_dir)}")
+        self.window.geometry("1200x820")
+        self.show_boxes = tk.BooleanVar(value=True)
+        self._build_ui()
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+        self.window.after(POLL_MS, self._poll)
+        self.window.after_idle(lambda: self.go_to(0))
+
+    # ------------------------------------------------------------------
+    # 界面
+    # ------------------------------------------------------------------
+
+    def _build_ui(self):
+        import tkinter as tk
+
+        toolbar = tk.Frame(self.window)
+        toolbar.pack(side=tk.TOP, fill=tk.X, padx=6, pady=4)
+        tk.Button(toolbar, text="◀ 上一页", command=lambda: self.go_to(self.current - 1),
+                  font=("Microsoft YaHei", 10)).pack(side=tk.LEFT)
+        self.page_label = tk.Label(toolbar, font=("Microsoft YaHei", 10), width=16)
+        self.page_label.pack(side=tk.LEFT, padx=6)
+        tk.Button(toolbar, text="下一页 ▶", command=lambda: self.go_to(self.current + 1),
+                  font=("Microsoft YaHei", 10)).pack(side=tk.LEFT)
+        tk.Checkbutton(toolbar, text="显示文本框", variable=self.show_boxes,
+                       command=self._redraw, font=("Microsoft YaHei", 10)).pack(side=tk.LEFT, padx=12)
+        tk.Button(toolbar, text="打开结果文件夹", command=self._open_folder,
+                  font=("Microsoft YaHei", 10)).pack(side=tk.RIGHT)
+
+        self.status = tk.Label(self.window, anchor='w', font=("Microsoft YaHei", 9), fg="gray")
+        self.status.pack(side=tk.BOTTOM, fill=tk.X, padx=6)
+
+        body = tk.PanedWindow(self.window, orient=tk.HORIZONTAL, sashwidth=4)
+        body.pack(fill=tk.BOTH, expand=True)
+
+        thumb_frame = tk.Frame(body)
+        self.thumbs = tk.Canvas(thumb_frame, width=THUMB_SIZE[0] + 30, bg="#e8e8e8",
+                                highlightthickness=0)
+        thumb_bar = tk.Scrollbar(thumb_frame, command=self._scroll_thumbs)
+        self.thumbs.configure(yscrollcommand=lambda *a: (thumb_bar.set(*a), self._draw_thumbs()),
+                              scrollregion=(0, 0, THUMB_SIZE[0] + 30,
+                                            THUMB_ROW_HEIGHT * len(self.pages)))
+        thumb_bar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.thumbs.pack(side=tk.LEFT, fill=tk.Y, expand=True)
+        self.thumbs.bind('<Configure>', lambda e: self._draw_thumbs())
+        self.thumbs.bind('<Button-1>', self._on_thumb_click)
+        for sequence in ('<MouseWheel>', '<Button-4>', '<Button-5>'):
+            self.thumbs.bind(sequence, self._on_thumb_wheel)
+        body.add(thumb_frame)
+
+        self.canvas = tk.Canvas(body, bg="#808080", highlightthickness=0)
+        self.canvas.bind('<Configure>', self._on_resize)
+        self.canvas.bind('<Button-1>', self._on_page_click)
+        body.add(self.canvas, stretch='always')
+
+        self.text = tk.Text(body, width=40, wrap=tk.WORD, font=("Microsoft YaHei", 10))
+        self.text.tag_configure('hit', background="#fff3a0")
+        body.add(self.text)
+
+        for sequence, step in (('<Left>', -1), ('<Prior>', -1), ('<Right>', 1), ('<Next>', 1)):
+            self.window.bind(sequence, lambda e, s=step: self.go_to(self.current + s))
+        self.window.bind('<Home>', lambda e: self.go_to(0))
+        self.window.bind('<End>', lambda e: self.go_to(len(self.pages) - 1))
+
+    def _open_folder(self):
+        from ocr_engine import open_file
+
+        open_file(self.output_dir)
+
+    # ------------------------------------------------------------------
+    # 数据
+    # ------------------------------------------------------------------
+
+    def _result(self, page):
+        if page not in self._results:
+            self._results[page] = load_page_result(self.pages[page][1])
+        return self._results[page]
+
+    def _page_size(self, page):
+        """识别时的图像尺寸（文本框坐标系）"""
+        result = self._result(page)
+        if result['page_size']:
+            return tuple(result['page_size'])
+        # 旧版本结果没有 page_size，用文本框范围近似
+        polys = result['polys']
+        if polys:
+            pts = np.concatenate(polys)
+            return (int(pts[:, 0].max()) + 1, int(pts[:, 1].max()) + 1)
+        return None
+
+    def _render_func(self, page, size):
+        result = self._result(page)
+        source, page_size = self.source_path, self._page_size(page)
+        if source is None:
+            return lambda: blank_page(page_size, size)
+        return lambda: render_source_page(source, result['page_index'], size)
+
+    def _view_size(self):
+        return (max(50, self.canvas.winfo_width() - 20), max(50, self.canvas.winfo_height() - 20))
+
+    # ------------------------------------------------------------------
+    # 翻页与渲染
+    # ------------------------------------------------------------------
+
+    def go_to(self, page):
+        """显示指定页（从 0 开始）"""
+        if not self.pages:
+            return
+        page = max(0, min(page, len(self.pages) - 1))
+        self.current = page
+        self.page_label.config(text=f"第 {self.pages[page][0]} / {self.pages[-1][0]} 页")
+        self._show_text(page)
+        self._scroll_thumb_into_view(page)
+        if self.canvas.winfo_width() <= 1:
+            # 窗口尚未显示，等 <Configure> 事件按实际尺寸渲染
+            return
+
+        size = self._view_size()
+        wanted = {(p, size) for p in range(page - PREFETCH_PAGES, page + PREFETCH_PAGES + 1)
+                  if 0 <= p < len(self.pages)}
+        # 撤销已翻过的页面的渲染请求（缩略图请求保留）
+        self._loader.cancel(lambda key: key[0] == 'thumb' or key[1:] in wanted)
+
+        key = (page, *size)
+        if key in self._page_cache:
+            self._page_cache.move_to_end(key)
+            self._draw_page(page, self._page_cache[key])
+            self.status.config(text="（缓存）")
+        else:
+            self._loader.request(('page', page, size), PRIORITY_PAGE, self._render_func(page, size))
+            self.status.config(text="正在渲染...")
+        for p, _ in sorted(wanted, key=lambda item: abs(item[0] - page)):
+            if p != page and (p, *size) not in self._page_cache:
+                self._loader.request(('page', p, size), PRIORITY_PREFETCH,
+                                     self._render_func(p, size))
+
+    def _poll(self):
+        """在主线程中接收后台线程的渲染结果"""
+        if not self.window.winfo_exists():
+            return
+        try:
+            while True:
+                key, value, error, seconds = self._loader.done.get_nowait()
+                if key[0] == 'thumb':
+                    self._set_thumb(key[1], value)
+                    continue
+                _, page, size = key
+                if error is not None:
+                    if page == self.current:
+                        self.status.config(text=f"渲染失败: {error}")
+                    continue
+                self._page_cache[(page, *size)] = value
+                while len(self._page_cache) > PAGE_CACHE_SIZE:
+                    self._page_cache.popitem(last=False)
+                if page == self.current and size == self._view_size():
+                    self._draw_page(page, value)
+                    self.status.config(text=f"渲染 {seconds * 1000:.0f} ms")
+        except queue.Empty:
+            pass
+        self.window.after(POLL_MS, self._poll)
+
+    def _draw_page(self, page, rgb):
+        from PIL import Image, ImageTk
+
+        self._photo = ImageTk.PhotoImage(Image.fromarray(rgb))
+        width, height = self.canvas.winfo_width(), self.canvas.winfo_height()
+        x0 = max(0, (width - rgb.shape[1]) // 2)
+        y0 = max(0, (height - rgb.shape[0]) // 2)
+        page_size = self._page_size(page)
+        scale = rgb.shape[1] / page_size[0] if page_size else 1.0
+        self._display = (page, scale, x0, y0)
+        self._redraw()
+
+    def _redraw(self):
+        self.canvas.delete('all')
+        if self._display is None or self._photo is None:
+            return
+        page, scale, x0, y0 = self._display
+        self.canvas.create_image(x0, y0, image=self._photo, anchor='nw')
+        result = self._result(page)
+        if result['prefilter'] and result['prefilter'].get('skipped'):
+            self.canvas.create_text(x0 + 10, y0 + 10, anchor='nw', fill="#c00000",
+                                    text=f"预筛选判定无文字，未识别（{result['prefilter'].get('reason')}）")
+        if not self.show_boxes.get():
+            return
+        for i, poly in enumerate(result['polys']):
+            coords = (poly * scale + (x0, y0)).ravel().tolist()
+            self.canvas.create_polygon(*coords, outline="#00a000", fill='', width=1,
+                                       tags=('box', f'box{i}'))
+
+    def _on_page_click(self, event):
+        """点击文本框：状态栏显示识别文字，并在右侧文本中高亮"""
+        if self._display is None:
+            return
+        page, scale, x0, y0 = self._display
+        result = self._result(page)
+        x, y = (event.x - x0) / scale, (event.y - y0) / scale
+        for i, poly in enumerate(result['polys']):
+            if (poly[:, 0].min() <= x <= poly[:, 0].max()
+                    and poly[:, 1].min() <= y <= poly[:, 1].max()):
+                text = result['texts'][i] if i < len(result['texts']) else ''
+                self.status.config(text=f"文本框 {i + 1}: {text}")
+                self._highlight(text)
+                return
+
+    def _on_resize(self, event):
+        # 拖动窗口时只在停止变化后按新尺寸重新渲染
+        if self._resize_job is not None:
+            self.window.after_cancel(self._resize_job)
+        self._resize_job = self.window.after(RESIZE_DELAY_MS, lambda: self.go_to(self.current))
+
+    # ------------------------------------------------------------------
+    # 文本面板
+    # ------------------------------------------------------------------
+
+    def _show_text(self, page):
+        import tkinter as tk
+
+        self.text.config(state=tk.NORMAL)
+        self.text.delete('1.0', tk.END)
+        self.text.insert('1.0', '\n'.join(self._result(page)['lines']))
+        self.text.config(state=tk.DISABLED)
+
+    def _highlight(self, text):
+        self.text.tag_remove('hit', '1.0', 'end')
+        if not text:
+            return
+        start = self.text.search(text, '1.0', stopindex='end')
+        if start:
+            self.text.tag_add('hit', start, f"{start}+{len(text)}c")
+            self.text.see(start)
+
+    # ------------------------------------------------------------------
+    # 缩略图（只为可见行解码）
+    # ------------------------------------------------------------------
+
+    def _visible_thumb_rows(self):
+        top = self.thumbs.canvasy(0)
+        bottom = self.thumbs.canvasy(self.thumbs.winfo_height())
+        first = max(0, int(top // THUMB_ROW_HEIGHT))
+        last = min(len(self.pages) - 1, int(bottom // THUMB_ROW_HEIGHT))
+        return range(first, last + 1)
+
+    def _draw_thumbs(self):
+        rows = self._visible_thumb_rows()
+        # 滚出可见范围的缩略图请求不再需要
+        self._loader.cancel(lambda key: key[0] != 'thumb' or key[1] in rows
+                            or key[1] in self._thumb_images)
+        for page in rows:
+            if page in self._thumb_drawn:
+                continue
+            self._thumb_drawn.add(page)
+            y = page * THUMB_ROW_HEIGHT
+            self.thumbs.create_rectangle(15, y + 8, 15 + THUMB_SIZE[0], y + 8 + THUMB_SIZE[1],
+                                         fill="white", outline="#b0b0b0", tags=(f'thumb{page}',))
+            self.thumbs.create_text(15 + THUMB_SIZE[0] // 2, y + THUMB_SIZE[1] + 18,
+                                    text=str(self.pages[page][0]), font=("Microsoft YaHei", 9))
+        for page in rows:
+            if page not in self._thumb_images:
+                self._loader.request(('thumb', page), PRIORITY_THUMB,
+                                     self._render_func(page, THUMB_SIZE))
+
+    def _set_thumb(self, page, rgb):
+        from PIL import Image, ImageTk
+
+        if rgb is None or page in self._thumb_images:
+            return
+        photo = ImageTk.PhotoImage(Image.fromarray(rgb))
+        self._thumb_images[page] = photo
+        y = page * THUMB_ROW_HEIGHT
+        x = 15 + (THUMB_SIZE[0] - rgb.shape[1]) // 2
+        self.thumbs.create_image(x, y + 8, image=photo, anchor='nw')
+
+    def _scroll_thumbs(self, *args):
+        self.thumbs.yview(*args)
+        self._draw_thumbs()
+
+    def _on_thumb_wheel(self, event):
+        if getattr(event, 'num', None) == 4 or getattr(event, 'delta', 0) > 0:
+            self.thumbs.yview_scroll(-1, 'units')
+        else:
+            self.thumbs.yview_scroll(1, 'units')
+        self._draw_thumbs()
+
+    def _on_thumb_click(self, event):
+        page = int(self.thumbs.canvasy(event.y) // THUMB_ROW_HEIGHT)
+        if 0 <= page < len(self.pages):
+            self.go_to(page)
+
+    def _scroll_thumb_into_view(self, page):
+        self.thumbs.delete('current_marker')
+        y = page * THUMB_ROW_HEIGHT
+        self.thumbs.create_rectangle(10, y + 3, 20 + THUMB_SIZE[0], y + THUMB_SIZE[1] + 13,
+                                     outline="#2060d0", width=2, tags=('current_marker',))
+        if page not in self._visible_thumb_rows():
+            total = THUMB_ROW_HEIGHT * len(self.pages)
+            self.thumbs.yview_moveto(max(0.0, (y - THUMB_ROW_HEIGHT) / total))
+            self._draw_thumbs()
+
+    def close(self):
+        self._loader.close()
+        self.window.destroy()
+
+
+def main():
+    """主函数"""
+    import tkinter as tk
+
+    if len(sys.argv) < 2:
+        print("用法: python result_viewer.py <输出目录>")
+        return 1
+    root = tk.Tk()
+    root.withdraw()
+    try:
+        viewer = ResultViewer(root, sys.argv[1])
+    except FileNotFoundError as e:
+        print(f"错误: {e}")
+        return 1
+    viewer.window.protocol("WM_DELETE_WINDOW", lambda: (viewer.close(), root.destroy()))
+    root.mainloop()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,532 @@
+"""
+========================================================
+长时间运行（浸泡）测试
+========================================================
+
+功能说明：
+    识别进程连续运行数天时，RSS 可能随 ocr.predict 调用次数缓慢增长直至换页。
+    本脚本用合成语料反复调用 process_file，持续数小时，并检测增长趋势：
+        - 定期采样 RSS、打开的文件描述符数（进程内模式采样本进程，
+          进程池模式采样全部工作进程之和）
+        - 记录每页推理延迟和每个文档的端到端耗时
+        - 结束时对预热后的数据做线性拟合，RSS、文件描述符或延迟持续增长时标记
+    --workers N 时通过 RecyclingPool 运行，可同时验证 --max-pages-per-worker /
+    --max-worker-rss-mb 的回收效果（RSS 呈锯齿状而不是持续上升）。
+
+    采样随运行写入 JSONL，运行中断也能保留数据；结束时写出报告 JSON。
+
+运行方式：
+    python soak_test.py --hours 8
+    python soak_test.py --hours 4 --workers 2 --max-pages-per-worker 2000
+    python soak_test.py --analyze soak_output/soak_samples.jsonl   # 重新分析已有数据
+========================================================
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import threading
+
+import numpy as np
+
+from low_memory import read_process_rss
+
+
+SAMPLES_FILE = 'soak_samples.jsonl'
+REPORT_FILE = 'soak_report.json'
+
+DEFAULT_SAMPLE_INTERVAL = 10.0
+# 趋势分析忽略开头这部分时间（模型预热、分配器缓存填充）
+WARMUP_FRACTION = 0.1
+# 增长判定阈值
+RSS_GROWTH_MB_PER_HOUR = 20.0
+FD_GROWTH = 5
+LATENCY_GROWTH_RATIO = 0.1
+
+
+def count_open_fds(pid=None):
+    """
+    进程打开的文件描述符数（仅 Linux / macOS 的 /dev/fd）
+
+    Returns:
+        数量，无法读取时返回 None
+    """
+    path = f"/proc/{pid}/fd" if pid else ('/proc/self/fd' if os.path.isdir('/proc/self/fd')
+                                          else '/dev/fd')
+    try:
+        return len(os.listdir(path))
+    except OSError:
+        return None
+
+
+# ---------------------------------------------------------------------------
+# 合成语料
+# ---------------------------------------------------------------------------
+
+_WORDS = ('invoice', 'total', 'amount', 'date', 'customer', 'order', 'number', 'price',
+          'quantity', 'address', 'payment', 'account', 'balance', 'report', 'summary',
+          '2024', '1,280.00', 'No.', 'ID', 'page')
+
+
+def _text_page(rng, width=1240, height=1754):
+    """生成一页随机文字的灰度图（A4，150 DPI）"""
+    import cv2
+
+    img = np.full((height, width), 255, dtype=np.uint8)
+    columns = int(rng.integers(1, 3))
+    col_width = (width - 160) // columns
+    for col in range(columns):
+        y = 120
+        while y < height - 100:
+            words = rng.choice(_WORDS, int(rng.integers(2, 7)))
+            scale = float(rng.uniform(0.7, 1.2))
+            cv2.putText(img, ' '.join(words)[:col_width // 14], (80 + col * col_width, y),
+                        cv2.FONT_HERSHEY_SIMPLEX, scale, 0, 2, cv2.LINE_AA)
+            y += int(40 * scale) + int(rng.integers(0, 3)) * 25
+    return img
+
+
+def make_corpus(corpus_dir, documents=12, seed=0):
+    """
+    生成合成语料：单页 PNG / JPEG、多帧 TIFF、多页 PDF 混合
+
+    Returns:
+        文件路径列表
+    """
+    from PIL import Image
+
+    os.makedirs(corpus_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    paths = []
+    for i in range(documents):
+        kind = ('png', 'jpg', 'tif', 'pdf')[i % 4]
+        pages = 1 if kind in ('png', 'jpg') else int(rng.integers(2, 6))
+        images = [Image.fromarray(_text_page(rng)) for _ in range(pages)]
+        path = os.path.join(corpus_dir, f"soak_{i:03d}.{kind}")
+        if kind == 'tif':
+            images[0].save(path, save_all=True, append_images=images[1:], compression='tiff_lzw')
+        elif kind == 'pdf':
+            images[0].save(path, save_all=True, append_images=images[1:], resolution=150)
+        else:
+            images[0].save(path)
+        paths.append(path)
+    return paths
+
+
+# ---------------------------------------------------------------------------
+# 识别任务（进程内或工作进程中执行）
+# ---------------------------------------------------------------------------
+
+_soak_state = {}
+
+
+class _TimedOCR:
+    """记录每次 predict 耗时的包装"""
+
+    def __init__(self, ocr):
+        self.ocr = ocr
+        self.timings = []
+
+    def predict(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return self.ocr.predict(*args, **kwargs)
+        finally:
+            self.timings.append((time.perf_counter() - start) * 1000)
+
+
+def _init_soak_worker(det_model_path, rec_model_path, ocr_options):
+    """加载模型（工作进程初始化，进程内模式也调用一次）"""
+    from ocr_engine import init_ocr_model
+
+    _soak_state['ocr'] = _TimedOCR(init_ocr_model(det_model_path, rec_model_path, **ocr_options))
+
+
+def _soak_document(path, output_root, keep_output=False):
+    """
+    识别一个文档
+
+    Returns:
+        {'pages', 'seconds', 'predict_ms': [每页推理毫秒]}
+    """
+    from ocr_engine import process_file
+
+    ocr = _soak_state['ocr']
+    ocr.timings = []
+    output_dir = os.path.join(output_root, f"{os.getpid()}_{os.path.basename(path)}")
+    start = time.perf_counter()
+    try:
+        process_file(path, ocr, output_dir)
+    finally:
+        if not keep_output:
+            shutil.rmtree(output_dir, ignore_errors=True)
+    return {'pages': len(ocr.timings), 'seconds': time.perf_counter() - start,
+            'predict_ms': list(ocr.timings)}
+
+
+# ---------------------------------------------------------------------------
+# 采样与趋势分析
+# ---------------------------------------------------------------------------
+
+class _Recorder:
+    """把采样和延迟逐条追加到 JSONL"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'w', encoding='utf-8')
+        self._lock = threading.Lock()
+
+    def write(self, record):
+        with self._lock:
+            self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+            self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def _sample(pids):
+    rss = fds = 0
+    for pid in pids:
+        value = read_process_rss(pid)
+        count = count_open_fds(pid)
+        rss += value or 0
+        fds += count or 0
+    return rss, fds
+
+
+def _fit(times, values):
+    """线性拟合：返回 (每小时斜率, 拟合起点值, 拟合终点值)"""
+    if len(values) < 3 or times[-1] - times[0] <= 0:
+        return 0.0, float(values[0]), float(values[-1])
+    hours = (times - times[0]) / 3600.0
+    slope, intercept = np.polyfit(hours, values, 1)
+    return float(slope), float(intercept), float(intercept + slope * hours[-1])
+
+
+def _trend(times, values, warmup=WARMUP_FRACTION):
+    """预热后数据的趋势：斜率 + 前后四分之一中位数"""
+    times = np.asarray(times, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64)
+    if not len(times):
+        return None
+    keep = times >= times[0] + (times[-1] - times[0]) * warmup
+    times, values = times[keep], values[keep]
+    slope, fit_start, fit_end = _fit(times, values)
+    quarter = max(1, len(values) // 4)
+    return {
+        'samples': int(len(values)),
+        'slope_per_hour': round(slope, 3),
+        'fit_start': round(fit_start, 3),
+        'fit_end': round(fit_end, 3),
+        'early_median': round(float(np.median(values[:quarter])), 3),
+        'late_median': round(float(np.median(values[-quarter:])), 3),
+    }
+
+
+def analyze(records, warmup=WARMUP_FRACTION, rss_mb_per_hour=RSS_GROWTH_MB_PER_HOUR,
+            fd_growth=FD_GROWTH, latency_growth=LATENCY_GROWTH_RATIO):
+    """
+    分析采样记录，标记持续增长的指标
+
+    两个条件同时满足才标记：拟合斜率超过阈值，且后四分之一的中位数高于前四分之一
+    （避免单次尖峰或回收造成的锯齿被误判）。
+
+    Returns:
+        报告字典
+    """
+    samples = [r for r in records if r['type'] == 'sample']
+    pages = [r for r in records if r['type'] == 'page']
+    documents = [r for r in records if r['type'] == 'document']
+    report = {'samples': len(samples), 'pages': len(pages), 'documents': len(documents),
+              'flags': []}
+    if samples:
+        report['duration_hours'] = round((samples[-1]['t'] - samples[0]['t']) / 3600, 3)
+
+    rss = _trend([s['t'] for s in samples], [s['rss_mb'] for s in samples], warmup)
+    if rss:
+        rss['growing'] = (rss['slope_per_hour'] > rss_mb_per_hour
+                          and rss['late_median'] > rss['early_median'])
+        report['rss_mb'] = rss
+        if rss['growing']:
+            report['flags'].append(f"RSS 持续增长 {rss['slope_per_hour']:.1f} MB/小时")
+
+    fds = _trend([s['t'] for s in samples], [s['fds'] for s in samples], warmup)
+    if fds:
+        growth = fds['fit_end'] - fds['fit_start']
+        fds['growing'] = growth >= fd_growth and fds['late_median'] > fds['early_median']
+        report['open_fds'] = fds
+        if fds['growing']:
+            report['flags'].append(f"文件描述符持续增长（约 +{growth:.0f}，可能泄漏）")
+
+    latency = _trend([p['t'] for p in pages], [p['ms'] for p in pages], warmup)
+    if latency:
+        base = max(latency['fit_start'], 1e-6)
+        growth = (latency['fit_end'] - latency['fit_start']) / base
+        latency['growth_ratio'] = round(growth, 3)
+        latency['growing'] = (growth > latency_growth
+                              and latency['late_median'] > latency['early_median'])
+        values = np.asarray([p['ms'] for p in pages])
+        latency['p50'], latency['p99'] = (round(float(v), 1)
+                                          for v in np.percentile(values, [50, 99]))
+        report['predict_ms'] = latency
+        if latency['growing']:
+            report['flags'].append(f"每页延迟上升 {growth * 100:.0f}%")
+
+    recycles = [r for r in records if r['type'] == 'recycle']
+    if recycles:
+        report['recycled_workers'] = len(recycles)
+    return report
+
+
+def load_records(path):
+    """读取 JSONL 采样记录"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+# ---------------------------------------------------------------------------
+# 运行
+# ---------------------------------------------------------------------------
+
+class SoakTest:
+    """
+    浸泡测试
+
+    Args:
+        corpus: 语料文件路径列表（循环使用）
+        det_model_path / rec_model_path: 模型路径
+        output_dir: 采样、报告和临时识别结果目录
+        workers: 0 表示在本进程内识别；> 0 时使用 RecyclingPool
+        sample_interval: 采样间隔（秒）
+        max_pages_per_worker / max_worker_rss_mb: 进程池回收阈值
+        keep_output: 保留每次的识别结果（默认识别后删除，避免磁盘写满）
+    """
+
+    def __init__(self, corpus, det_model_path, rec_model_path, output_dir='soak_output',
+                 workers=0, sample_interval=DEFAULT_SAMPLE_INTERVAL,
+                 max_pages_per_worker=None, max_worker_rss_mb=None, keep_output=False,
+                 **ocr_options):
+        self.corpus = list(corpus)
+        self.det_model_path = det_model_path
+        self.rec_model_path = rec_model_path
+        self.output_dir = os.path.abspath(output_dir)
+        self.workers = workers
+        self.sample_interval = sample_interval
+        self.max_pages_per_worker = max_pages_per_worker
+        self.max_worker_rss_mb = max_worker_rss_mb
+        self.keep_output = keep_output
+        self.ocr_options = ocr_options
+
+        self.pages = 0
+        self.documents = 0
+        self.failures = 0
+        self._stop = threading.Event()
+        self._pool = None
+        self._recorder = None
+        self._start = None
+
+    def stop(self):
+        self._stop.set()
+
+    def _pids(self):
+        if self._pool is None:
+            return [None]
+        return self._pool.pids()
+
+    def _sampler(self):
+        last_recycled = 0
+        while not self._stop.wait(self.sample_interval):
+            rss, fds = _sample(self._pids())
+            now = time.time()
+            self._recorder.write({'type': 'sample', 't': now, 'rss_mb': round(rss / 1048576, 1),
+                                  'fds': fds, 'pages': self.pages})
+            if self._pool is not None and self._pool.recycled > last_recycled:
+                for _ in range(self._pool.recycled - last_recycled):
+                    self._recorder.write({'type': 'recycle', 't': now})
+                last_recycled = self._pool.recycled
+            print(f"[{(now - self._start) / 60:7.1f} 分钟] 已识别 {self.documents} 个文档 / "
+                  f"{self.pages} 页，RSS {rss / 1048576:.0f} MB，文件描述符 {fds}")
+
+    def _record_document(self, result):
+        now = time.time()
+        for ms in result['predict_ms']:
+            self._recorder.write({'type': 'page', 't': now, 'ms': round(ms, 2)})
+        self._recorder.write({'type': 'document', 't': now, 'pages': result['pages'],
+                              'seconds': round(result['seconds'], 3)})
+        self.pages += result['pages']
+        self.documents += 1
+
+    def _record_failure(self, error):
+        self.failures += 1
+        print(f"[失败] {error}")
+
+    def run(self, hours=1.0, max_pages=None):
+        """
+        运行指定时长（或页数）后分析
+
+        Returns:
+            报告字典
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        scratch = os.path.join(self.output_dir, 'results')
+        samples_path = os.path.join(self.output_dir, SAMPLES_FILE)
+        self._recorder = _Recorder(samples_path)
+        self._start = time.time()
+        deadline = self._start + hours * 3600
+
+        def finished():
+            return (self._stop.is_set() or time.time() >= deadline
+                    or (max_pages is not None and self.pages >= max_pages))
+
+        if self.workers <= 0:
+            _init_soak_worker(self.det_model_path, self.rec_model_path, self.ocr_options)
+        else:
+            from worker_pool import RecyclingPool
+
+            self._pool = RecyclingPool(self.workers, initializer=_init_soak_worker,
+                                       initargs=(self.det_model_path, self.rec_model_path,
+                                                 self.ocr_options),
+                                       max_pages=self.max_pages_per_worker,
+                                       max_rss_mb=self.max_worker_rss_mb)
+        sampler = threading.Thread(target=self._sampler, daemon=True)
+        sampler.start()
+
+        try:
+            cursor = 0
+            if self._pool is None:
+                while not finished():
+                    path = self.corpus[cursor % len(self.corpus)]
+                    cursor += 1
+                    try:
+                        self._record_document(_soak_document(path, scratch, self.keep_output))
+                    except Exception as e:
+                        self._record_failure(f"{os.path.basename(path)}: {e}")
+            else:
+                in_flight = threading.Semaphore(self.workers)
+
+                def done(result):
+                    self._record_document(result)
+                    in_flight.release()
+
+                def failed(error):
+                    self._record_failure(error)
+                    in_flight.release()
+
+                while not finished():
+                    if not in_flight.acquire(timeout=0.5):
+                        continue
+                    path = self.corpus[cursor % len(self.corpus)]
+                    cursor += 1
+                    self._pool.apply_async(_soak_document, (path, scratch, self.keep_output),
+                                           callback=done, error_callback=failed)
+        finally:
+            if self._pool is not None:
+                self._pool.close()
+                self._pool.join()
+            self._stop.set()
+            sampler.join()
+            self._recorder.close()
+            if not self.keep_output:
+                shutil.rmtree(scratch, ignore_errors=True)
+
+        report = analyze(load_records(samples_path))
+        report['failures'] = self.failures
+        if self._pool is not None:
+            report['pool'] = self._pool.stats()
+        with open(os.path.join(self.output_dir, REPORT_FILE), 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        return report
+
+
+def print_report(report):
+    """打印分析结果"""
+    print("\n" + "=" * 60)
+    print(f"浸泡测试: {report.get('duration_hours', 0):.2f} 小时，{report['documents']} 个文档，"
+          f"{report['pages']} 页")
+    for key, label, unit in (('rss_mb', 'RSS', 'MB'), ('open_fds', '文件描述符', ''),
+                             ('predict_ms', '每页推理', 'ms')):
+        trend = report.get(key)
+        if trend:
+            print(f"  {label:<8} {trend['early_median']:>10.1f} → {trend['late_median']:<10.1f}"
+                  f"{unit:<3} 斜率 {trend['slope_per_hour']:+.2f}/小时"
+                  + ("  ← 增长" if trend['growing'] else ""))
+    if report.get('recycled_workers'):
+        print(f"  回收工作进程: {report['recycled_workers']} 次")
+    if report['flags']:
+        print("\n[警告] " + "\n[警告] ".join(report['flags']))
+    else:
+        print("\n未发现持续增长")
+    print("=" * 60)
+
+
+def main():
+    """主函数"""
+    import signal
+    import argparse
+    from ocr_tuner import DEFAULT_DET_MODEL, DEFAULT_REC_MODEL, resolve_workers
+
+    parser = argparse.ArgumentParser(description='长时间运行（浸泡）测试')
+    parser.add_argument('--hours', type=float, default=1.0, help='运行时长（小时）')
+    parser.add_argument('--max-pages', type=int, default=None, help='识别页数达到后提前结束')
+    parser.add_argument('--corpus', default=None, help='语料目录（默认生成合成语料）')
+    parser.add_argument('--documents', type=int, default=12, help='合成语料文档数')
+    parser.add_argument('--output', default='soak_output', help='采样和报告输出目录')
+    parser.add_argument('--interval', type=float, default=DEFAULT_SAMPLE_INTERVAL,
+                        help='采样间隔（秒）')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='工作进程数（0 表示在本进程内识别；默认采用调优档案的拆分，'
+                             '无档案时为 0）')
+    parser.add_argument('--max-pages-per-worker', type=int, default=None,
+                        help='工作进程累计识别多少页后替换')
+    parser.add_argument('--max-worker-rss-mb', type=float, default=None,
+                        help='工作进程 RSS 超过多少 MB 后替换')
+    parser.add_argument('--keep-output', action='store_true', help='保留识别结果')
+    parser.add_argument('--analyze', default=None, help='只分析已有的 JSONL 采样文件')
+    parser.add_argument('--det', default=DEFAULT_DET_MODEL, help='检测模型路径')
+    parser.add_argument('--rec', default=DEFAULT_REC_MODEL, help='识别模型路径')
+
+    args = parser.parse_args()
+
+    if args.analyze:
+        print_report(analyze(load_records(args.analyze)))
+        return 0
+
+    for model_path in (args.det, args.rec):
+        if not os.path.exists(model_path):
+            print(f"错误: 模型不存在: {model_path}")
+            return 1
+
+    if args.corpus:
+        from watch_folder import WATCH_EXTS
+
+        corpus = sorted(os.path.join(args.corpus, name) for name in os.listdir(args.corpus)
+                        if name.lower().endswith(WATCH_EXTS))
+    else:
+        corpus = make_corpus(os.path.join(args.output, 'corpus'), args.documents)
+    if not corpus:
+        print("错误: 语料为空")
+        return 1
+    print(f"语料: {len(corpus)} 个文件，运行 {args.hours} 小时")
+
+    workers, ocr_options = resolve_workers(args.workers, args.det, args.rec, default=0)
+    if workers <= 1 and args.workers is None:
+        # 档案推荐单进程时在本进程内识别，线程数沿用单进程最优配置
+        workers, ocr_options = 0, {}
+    soak = SoakTest(corpus, args.det, args.rec, args.output, workers=workers,
+                    sample_interval=args.interval,
+                    max_pages_per_worker=args.max_pages_per_worker,
+                    max_worker_rss_mb=args.max_worker_rss_mb, keep_output=args.keep_output,
+                    **ocr_options)
+    signal.signal(signal.SIGINT, lambda *_: soak.stop())
+    signal.signal(signal.SIGTERM, lambda *_: soak.stop())
+
+    report = soak.run(args.hours, args.max_pages)
+    print_report(report)
+    return 1 if report['flags'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,410 @@
+"""
+========================================================
+文字页预筛选：跳过照片、图表和空白页
+========================================================
+
+功能说明：
+    扫描报告中有不少整页照片、图表和空白背面，它们同样要经过完整的
+    检测 + 识别，结果却是零行或一堆乱码。本模块在缩小后的页面上用
+    笔画 / 边缘统计快速判断页面是否含有文字行，几毫秒即可完成：
+        1. 缩放到长边 PREFILTER_LONG_SIDE 像素，转灰度
+        2. 黑帽（浅底）/ 顶帽（深底）形态学提取细笔画
+        3. 灰度标准差极低且没有任何笔画 → 空白页（只有一行页码、标题或
+           签名线的页面标准差同样很低，有笔画时照常统计）；否则笔画
+           连通域中高度、填充率像字符（或粘连成词）的保留
+        4. 片段水平膨胀连成行，统计"文字行"：足够扁长、笔画密度适中、
+           逐行扫描的笔画起点足够密、上下有行距留白（区别于横线、色块和纹理）
+        5. 一行都没有时再补两遍：转置后统计（竖排文字的列），以及缩放到
+           LARGE_TEXT_LONG_SIDE 后统计（封面等大字号文字，笔画粗于结构元素、
+           行高超过 MAX_CHAR_HEIGHT，在常规尺寸下数不到）
+        6. 无文字置信度 = exp(-文字行数 / LINE_SCALE)，
+           达到阈值即判为无文字页，跳过识别
+    阈值越低越激进（0.9 只跳过一行文字都没有的页面；0.5 允许跳过只有
+    一行疑似文字的页面）。判断结果写入每页 JSON 的 prefilter 字段。
+
+运行方式：
+    # 对文件 / 目录中的页面做判断，并与完整识别对比，报告跳过率和节省时间
+    python text_prefilter.py scans/ --with-ocr
+    # 不指定文件时使用合成页面（文字 / 照片 / 图表 / 空白）
+    python text_prefilter.py --threshold 0.8
+========================================================
+"""
+
+import os
+import sys
+import math
+import time
+
+import cv2
+import numpy as np
+
+
+# 预筛选时页面缩放到的长边像素
+PREFILTER_LONG_SIDE = 768
+# 默认阈值：无文字置信度不低于此值时跳过识别
+DEFAULT_THRESHOLD = 0.9
+# 灰度标准差低于此值且没有笔画时视为空白页
+BLANK_STD = 6.0
+# 笔画与背景的最小灰度差
+STROKE_CONTRAST = 40
+# 缩小后字符（行）的最大高度
+MAX_CHAR_HEIGHT = 40
+# 大字号文字补充检测时缩放到的长边像素（常规尺寸下字高约 5%~20% 页高的文字落入字符范围）
+LARGE_TEXT_LONG_SIDE = 192
+# 补充检测中每行至少包含的笔画片段数（字符）
+SUPPLEMENT_MIN_CHARS = 3
+# 文字行内每像素的笔画起点数下限
+MIN_STROKE_RATE = 0.05
+# 置信度衰减尺度（文字行数）
+LINE_SCALE = 2.0
+
+
+def _gray_small(img, long_side=PREFILTER_LONG_SIDE):
+    """转灰度并缩放到指定长边（只缩小不放大）"""
+    if img.ndim == 3:
+        code = cv2.COLOR_BGRA2GRAY if img.shape[2] == 4 else cv2.COLOR_BGR2GRAY
+        img = cv2.cvtColor(img, code)
+    h, w = img.shape[:2]
+    scale = long_side / max(h, w)
+    if scale < 1:
+        img = cv2.resize(img, (max(1, round(w * scale)), max(1, round(h * scale))),
+                         interpolation=cv2.INTER_AREA)
+    return img
+
+
+def _stroke_mask(gray):
+    """
+    提取比结构元素细的笔画：浅色背景用黑帽（深色字），深色背景用顶帽（浅色字）
+
+    两者不能同时取：浅底页面上字母之间的白色间隙本身就是"细亮结构"，
+    顶帽会把整行填实。缩小后字母间隙呈灰色，固定阈值同样会把整行
+    连成实心条，因此取 Otsu 阈值（不低于 STROKE_CONTRAST）。
+    """
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (9, 9))
+    op = cv2.MORPH_BLACKHAT if np.median(gray) >= 128 else cv2.MORPH_TOPHAT
+    strokes = cv2.morphologyEx(gray, op, kernel)
+    otsu, _ = cv2.threshold(strokes, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    _, mask = cv2.threshold(strokes, max(otsu, STROKE_CONTRAST), 255, cv2.THRESH_BINARY)
+    return mask
+
+
+def _text_lines(mask, min_chars=1):
+    """
+    统计像文字行的区域
+
+    缩小后字母、单词常粘连成整行，因此不数字符个数，而看行内结构：
+    高度在字符范围内的笔画片段水平膨胀连成行，行需足够扁长、笔画密度
+    适中（排除实心条块），每行像素扫描到的笔画起点足够密
+    （文字每隔几个像素就有一笔，横线 / 色块几乎没有），且上下有行距留白
+    （纹理中偶然连成行的片段上下同样密集）。
+
+    Args:
+        mask: 笔画二值图
+        min_chars: 每行至少包含的笔画片段数。补充检测（转置、大字号）
+            只在常规检测一行都没有时运行，面对的多是照片纹理，要求更严
+
+    Returns:
+        (文字行数, 笔画片段数, 连通域总数)
+    """
+    n, labels, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+    if n <= 1:
+        return 0, 0, 0
+    w = stats[1:, cv2.CC_STAT_WIDTH]
+    h = stats[1:, cv2.CC_STAT_HEIGHT]
+    area = stats[1:, cv2.CC_STAT_AREA]
+    fill = area / (w * h)
+    is_char = (h >= 3) & (h <= MAX_CHAR_HEIGHT) & (fill >= 0.1) & (fill <= 0.9) & (area >= 4)
+    chars = int(is_char.sum())
+    if not chars:
+        return 0, 0, n - 1
+
+    char_mask = np.concatenate(([False], is_char))[labels]
+    char_h = float(np.median(h[is_char]))
+
+    # 片段水平膨胀连成行
+    gap = max(3, int(round(char_h * 1.2)))
+    joined = cv2.dilate(char_mask.astype(np.uint8),
+                        cv2.getStructuringElement(cv2.MORPH_RECT, (gap, 1)))
+    m, line_labels, line_stats, _ = cv2.connectedComponentsWithStats(joined, connectivity=8)
+
+    # 每行的笔画像素数和笔画起点（水平方向 0→1 跳变）数
+    ink = np.bincount(line_labels[char_mask], minlength=m)
+    starts = np.zeros_like(char_mask)
+    starts[:, 1:] = char_mask[:, 1:] & ~char_mask[:, :-1]
+    strokes = np.bincount(line_labels[starts], minlength=m)
+    # 每行包含的笔画片段数（片段整体落在膨胀后的同一行内，任取一像素即可）
+    char_line = np.zeros(n, dtype=line_labels.dtype)
+    char_line[labels[char_mask]] = line_labels[char_mask]
+    pieces = np.bincount(char_line[1:][is_char], minlength=m)
+
+    x = line_stats[:, cv2.CC_STAT_LEFT]
+    y = line_stats[:, cv2.CC_STAT_TOP]
+    lw = line_stats[:, cv2.CC_STAT_WIDTH]
+    lh = line_stats[:, cv2.CC_STAT_HEIGHT]
+    box = (lw * lh).astype(np.float64)
+    density = ink / box
+    stroke_rate = strokes / box
+
+    # 行上下各 1/3 行高的条带应基本空白（行距）；纹理中"连成行"的片段上下同样密集
+    integral = cv2.integral(char_mask.astype(np.uint8))
+    rows = char_mask.shape[0]
+    band = np.maximum(1, lh // 3)
+    x1 = x + lw
+    top0, top1 = np.maximum(0, y - band), y
+    bottom0, bottom1 = y + lh, np.minimum(rows, y + lh + band)
+    margin_ink = (integral[top1, x1] - integral[top0, x1] - integral[top1, x] + integral[top0, x]
+                  + integral[bottom1, x1] - integral[bottom0, x1]
+                  - integral[bottom1, x] + integral[bottom0, x])
+    margin_area = np.maximum(1, (top1 - top0 + bottom1 - bottom0) * lw)
+    margin = margin_ink / margin_area
+
+    is_line = (lw >= 4 * lh) & (lh >= 3) & (lh <= MAX_CHAR_HEIGHT) \
+        & (density >= 0.15) & (density <= 0.85) & (stroke_rate >= MIN_STROKE_RATE) \
+        & (margin < 0.5 * density) & (pieces >= min_chars)
+    is_line[0] = False
+    return int(is_line.sum()), chars, n - 1
+
+
+def analyze_page(img, threshold=DEFAULT_THRESHOLD):
+    """
+    判断页面是否含有文字
+
+    Args:
+        img: BGR / 灰度图像
+        threshold: 无文字置信度不低于此值时判为无文字页
+
+    Returns:
+        {'has_text', 'confidence', 'reason', 'text_lines', 'threshold', 'ms',
+         'features'}，confidence 为无文字置信度（0~1）
+    """
+    t0 = time.perf_counter()
+    gray = _gray_small(img)
+    std = float(gray.std())
+    mask = _stroke_mask(gray)
+    vertical = large = 0
+    if std < BLANK_STD and not cv2.countNonZero(mask):
+        # 整页只有一行页码、标题或签名线时灰度标准差同样很低，
+        # 因此只有同时没有任何笔画时才直接判为空白页
+        lines, chars, components = 0, 0, 0
+        confidence = 1.0
+        reason = 'blank'
+    else:
+        lines, chars, components = _text_lines(mask)
+        if lines == 0:
+            # 竖排文字列在转置后成为横行；大字号文字缩得更小后落入字符尺度
+            vertical = _text_lines(np.ascontiguousarray(mask.T), SUPPLEMENT_MIN_CHARS)[0]
+            large = _text_lines(_stroke_mask(_gray_small(gray, LARGE_TEXT_LONG_SIDE)),
+                                SUPPLEMENT_MIN_CHARS)[0]
+            lines = vertical + large
+        confidence = math.exp(-lines / LINE_SCALE)
+        reason = 'no_text_lines' if lines == 0 else 'text_lines'
+    has_text = confidence < threshold
+    return {
+        'has_text': has_text,
+        'confidence': round(confidence, 4),
+        'reason': reason,
+        'text_lines': lines,
+        'threshold': threshold,
+        'ms': round((time.perf_counter() - t0) * 1000, 2),
+        'features': {'gray_std': round(std, 2), 'char_components': chars,
+                     'components': components, 'vertical_lines': vertical,
+                     'large_lines': large},
+    }
+
+
+class TextPrefilter:
+    """
+    可调阈值的文字页预筛选器，累计跳过统计
+
+    Args:
+        threshold: 无文字置信度阈值，None 时读取环境变量
+            PPOCR_PREFILTER_THRESHOLD，再缺省为 DEFAULT_THRESHOLD
+    """
+
+    def __init__(self, threshold=None):
+        if threshold is None:
+            threshold = float(os.environ.get('PPOCR_PREFILTER_THRESHOLD', DEFAULT_THRESHOLD))
+        self.threshold = threshold
+        self.pages = 0
+        self.skipped = 0
+        self.total_ms = 0.0
+
+    def check(self, img):
+        """判断一页，返回 analyze_page 的结果并累计统计"""
+        decision = analyze_page(img, self.threshold)
+        self.pages += 1
+        self.total_ms += decision['ms']
+        if not decision['has_text']:
+            self.skipped += 1
+        return decision
+
+    def skipped_result(self, img, decision, **fields):
+        """为跳过的页面构造空结果（与识别结果字段一致，可直接保存）"""
+        from ocr_pipeline import PageResult
+
+        decision = dict(decision, skipped=True)
+        return PageResult(image=img, dt_polys=[], rec_polys=[], rec_texts=[],
+                          rec_scores=[], prefilter=decision, **fields)
+
+    def summary(self):
+        return {'pages': self.pages, 'skipped': self.skipped,
+                'skip_rate': round(self.skipped / self.pages, 4) if self.pages else 0.0,
+                'prefilter_ms': round(self.total_ms, 1)}
+
+
+# ----------------------------------------------------------------------
+# 基准测试
+# ----------------------------------------------------------------------
+
+def _synthetic_pages(seed=0):
+    """合成测试页面：[(名称, 是否含文字, 图像)]"""
+    from soak_test import _text_page
+
+    rng = np.random.default_rng(seed)
+    pages = []
+    for i in range(4):
+        pages.append((f'text_{i}', True, _text_page(rng)))
+
+    for i in range(3):
+        blank = np.full((1754, 1240, 3), 235 + i * 5, np.uint8)
+        noise = rng.normal(0, 2, blank.shape[:2])
+        blank = np.clip(blank + noise[..., None], 0, 255).astype(np.uint8)
+        pages.append((f'blank_{i}', False, blank))
+
+    for i in range(4):
+        # 低频噪声 + 圆形 / 矩形，模拟照片
+        base = rng.random((12, 9, 3)).astype(np.float32) * 255
+        photo = cv2.resize(base, (1240, 1754), interpolation=cv2.INTER_CUBIC)
+        photo += rng.normal(0, 8 + 4 * i, photo.shape).astype(np.float32)
+        photo = np.clip(photo, 0, 255).astype(np.uint8)
+        for _ in range(12):
+            center = tuple(int(v) for v in rng.integers(0, (1240, 1754)))
+            color = tuple(int(v) for v in rng.integers(0, 255, 3))
+            cv2.circle(photo, center, int(rng.integers(40, 300)), color, -1)
+        photo = cv2.GaussianBlur(photo, (5, 5), 0)
+        pages.append((f'photo_{i}', False, photo))
+
+    for i in range(2):
+        # 无文字的柱状图
+        chart = np.full((1240, 1754, 3), 255, np.uint8)
+        cv2.line(chart, (150, 1100), (1650, 1100), (0, 0, 0), 4)
+        cv2.line(chart, (150, 1100), (150, 120), (0, 0, 0), 4)
+        for k in range(8):
+            top = int(rng.integers(200, 1000))
+            x = 220 + k * 175
+            cv2.rectangle(chart, (x, top), (x + 110, 1100), (60, 90 + 15 * k, 200), -1)
+        pages.append((f'chart_{i}', False, chart))
+    return pages
+
+
+def _load_pages(paths):
+    """从文件 / 目录读取页面：[(名称, None, 图像)]"""
+    from page_source import iter_pages, count_pages, source_name
+
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(os.path.join(path, f) for f in os.listdir(path)))
+        else:
+            files.append(path)
+    for file_path in files:
+        try:
+            total = count_pages(file_path)
+            for page_index, img in iter_pages(file_path):
+                name = source_name(file_path)
+                yield (f"{name}_{page_index}" if total > 1 else name), None, img
+        except Exception as e:
+            print(f"[警告] 跳过 {file_path}: {e}")
+
+
+def benchmark(pages, threshold=DEFAULT_THRESHOLD, ocr=None):
+    """
+    统计预筛选的跳过率和节省时间
+
+    Args:
+        pages: [(名称, 是否含文字或 None, 图像)]
+        threshold: 阈值
+        ocr: PaddleOCR 实例；提供时对每页做完整识别，测量被跳过页面的
+            实际识别耗时，并检查被跳过页面是否识别出了文字（误跳过）
+
+    Returns:
+        统计字典，rows 为逐页判断
+    """
+    prefilter = TextPrefilter(threshold)
+    rows = []
+    for name, expected, img in pages:
+        decision = prefilter.check(img)
+        row = {'name': name, 'expected': expected, 'has_text': decision['has_text'],
+               'confidence': decision['confidence'], 'text_lines': decision['text_lines'],
+               'ms': decision['ms']}
+        if ocr is not None:
+            t0 = time.perf_counter()
+            res = ocr.predict(img)[0]
+            row['ocr_ms'] = (time.perf_counter() - t0) * 1000
+            row['ocr_lines'] = sum(1 for t, s in zip(res.get('rec_texts', []),
+                                                     res.get('rec_scores', []))
+                                   if t.strip() and s >= 0.8)
+        rows.append(row)
+
+    skipped = [r for r in rows if not r['has_text']]
+    stats = dict(prefilter.summary(), rows=rows, threshold=threshold)
+    stats['prefilter_ms_per_page'] = round(prefilter.total_ms / max(1, len(rows)), 2)
+    labelled = [r for r in rows if r['expected'] is not None]
+    if labelled:
+        stats['false_skips'] = sum(1 for r in labelled if r['expected'] and not r['has_text'])
+        stats['missed_skips'] = sum(1 for r in labelled if not r['expected'] and r['has_text'])
+    if ocr is not None:
+        ocr_ms = sum(r['ocr_ms'] for r in rows)
+        saved = sum(r['ocr_ms'] for r in skipped)
+        stats['ocr_ms'] = round(ocr_ms, 1)
+        stats['saved_ms'] = round(saved - prefilter.total_ms, 1)
+        stats['saved_ratio'] = round(stats['saved_ms'] / ocr_ms, 4) if ocr_ms else 0.0
+        stats['skipped_with_text'] = sum(1 for r in skipped if r['ocr_lines'])
+    return stats
+
+
+def print_benchmark(stats):
+    print(f"{'页面':<28}{'预期':>6}{'判断':>6}{'置信度':>8}{'文字行':>7}{'耗时ms':>8}"
+          + (f"{'识别ms':>9}{'识别行':>7}" if 'ocr_ms' in stats else ''))
+    for r in stats['rows']:
+        expected = '-' if r['expected'] is None else ('文字' if r['expected'] else '无')
+        line = (f"{r['name'][:27]:<28}{expected:>6}{'文字' if r['has_text'] else '跳过':>6}"
+                f"{r['confidence']:>8.3f}{r['text_lines']:>7}{r['ms']:>8.1f}")
+        if 'ocr_ms' in r:
+            line += f"{r['ocr_ms']:>9.0f}{r['ocr_lines']:>7}"
+        print(line)
+    print(f"\n阈值 {stats['threshold']}: 跳过 {stats['skipped']}/{stats['pages']} 页 "
+          f"({stats['skip_rate']:.1%})，预筛选 {stats['prefilter_ms_per_page']:.1f} ms/页")
+    if 'false_skips' in stats:
+        print(f"误跳过文字页 {stats['false_skips']}，漏跳过无文字页 {stats['missed_skips']}")
+    if 'ocr_ms' in stats:
+        print(f"完整识别 {stats['ocr_ms'] / 1000:.1f}s，节省 {stats['saved_ms'] / 1000:.1f}s "
+              f"({stats['saved_ratio']:.1%})，被跳过页面中识别出文字的 "
+              f"{stats['skipped_with_text']} 页")
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="文字页预筛选基准测试")
+    parser.add_argument('paths', nargs='*', help="图片 / PDF 文件或目录（缺省使用合成页面）")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help=f"无文字置信度阈值（默认 {DEFAULT_THRESHOLD}）")
+    parser.add_argument('--with-ocr', action='store_true',
+                        help="同时做完整识别，测量节省时间并检查误跳过")
+    args = parser.parse_args()
+
+    pages = _load_pages(args.paths) if args.paths else _synthetic_pages()
+    ocr = None
+    if args.with_ocr:
+        from ocr_engine import init_ocr_model
+
+        base_dir = os.path.dirname(os.path.abspath(__file__))
+        ocr = init_ocr_model(os.path.join(base_dir, "testmodel", "PP-OCRv5_mobile_det_infer"),
+                         os.path.join(base_dir, "testmodel", "PP-OCRv5_mobile_rec_infer"))
+    print_benchmark(benchmark(pages, args.threshold, ocr))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,543 @@
+"""
+========================================================
+热文件夹监控模式（持续识别）
+========================================================
+
+功能说明：
+    监控扫描仪共享目录，新文件写入完成后自动识别：
+        - Linux 上使用 inotify 监听新文件，其余平台或 inotify 不可用时
+          退化为 os.scandir 轮询（网络共享上 inotify 收不到远端写入，
+          inotify 模式下也会定期补扫一次目录）
+        - 文件大小和修改时间在 settle 秒内不再变化才视为写入完成，
+          同一文件的连续事件合并处理（防抖）
+        - 固定数量的工作进程，每个进程只加载一次模型并持续处理；
+          可设置单进程页数 / RSS 上限，越过后在文档之间替换进程（见 worker_pool.py）
+        - --fork-server 时由主进程加载模型，工作进程从主进程 fork 并共享权重
+          （见 fork_server.py，仅 Linux / macOS）
+        - 识别成功的文件移动到 done/，失败的移动到 failed/（附错误信息）
+        - 定期原子写入状态文件：积压数量、处理数、识别延迟分位数
+
+输出：
+    - 识别结果：<输出目录>/<文件名>_<时间戳>/page_NNN_result/
+    - 全文索引：<输出目录>/ocr_index.db（见 ocr_index.py）
+    - 状态文件：<监控目录>/watch_status.json
+
+运行方式：
+    python watch_folder.py /mnt/scans --output output --workers 2
+    python watch_folder.py /mnt/scans --once    # 处理现有文件后退出
+    python watch_folder.py /mnt/scans --max-pages-per-worker 5000 --max-worker-rss-mb 3000
+    python watch_folder.py /mnt/scans --workers 4 --fork-server
+========================================================
+"""
+
+import os
+import sys
+import time
+import shutil
+import signal
+import struct
+import threading
+from collections import deque
+
+import numpy as np
+
+from prepare_models import write_json_atomic
+from worker_pool import RecyclingPool
+
+
+WATCH_EXTS = ('.pdf', '.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff')
+# 扫描仪/复制工具写入过程中使用的临时文件后缀
+TEMP_SUFFIXES = ('.part', '.tmp', '.crdownload', '.partial', '~')
+
+DONE_DIR = 'done'
+FAILED_DIR = 'failed'
+STATUS_FILE = 'watch_status.json'
+
+DEFAULT_SETTLE_SECONDS = 2.0
+DEFAULT_POLL_INTERVAL = 1.0
+# inotify 模式下的补扫间隔（秒）
+RESCAN_INTERVAL = 30.0
+DEFAULT_STATUS_INTERVAL = 2.0
+# 延迟统计保留最近的样本数
+LATENCY_WINDOW = 1000
+
+# inotify 常量（见 <sys/inotify.h>）
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+_EVENT_HEADER = struct.Struct('iIII')
+
+
+def is_candidate(name):
+    """判断文件名是否需要识别"""
+    lower = name.lower()
+    return (not name.startswith('.') and lower.endswith(WATCH_EXTS)
+            and not lower.endswith(TEMP_SUFFIXES))
+
+
+class _Inotify:
+    """基于 ctypes 的最小 inotify 封装"""
+
+    def __init__(self, path):
+        import ctypes
+
+        self._libc = ctypes.CDLL(None, use_errno=True)
+        self.fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 失败')
+        mask = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_MODIFY
+        if self._libc.inotify_add_watch(self.fd, os.fsencode(path), mask) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, 'inotify_add_watch 失败')
+
+    def read(self, timeout):
+        """
+        等待并读取事件
+
+        Returns:
+            [(文件名, mask), ...]；队列溢出时返回 None（需要全量补扫）
+        """
+        import select
+
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            buf = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(buf):
+            _, mask, _, name_len = _EVENT_HEADER.unpack_from(buf, offset)
+            offset += _EVENT_HEADER.size
+            name = buf[offset:offset + name_len].rstrip(b'\0')
+            offset += name_len
+            if mask & IN_Q_OVERFLOW:
+                return None
+            if name:
+                events.append((os.fsdecode(name), mask))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+class FolderWatcher:
+    """
+    目录监控：检测新文件并在写入完成后返回
+
+    用法：
+        watcher = FolderWatcher('/mnt/scans')
+        while True:
+            for first_seen, path in watcher.poll(timeout=1.0):
+                ...
+    """
+
+    def __init__(self, watch_dir, settle_seconds=DEFAULT_SETTLE_SECONDS,
+                 poll_interval=DEFAULT_POLL_INTERVAL, use_inotify=True):
+        self.watch_dir = os.path.abspath(watch_dir)
+        self.settle_seconds = settle_seconds
+        self.poll_interval = poll_interval
+        # 路径 → [首次发现时间, 最近变化时间, 大小, 修改时间]
+        self.pending = {}
+        # 已交付但尚未移走的文件，避免重复交付
+        self.claimed = set()
+        self._inotify = None
+        if use_inotify and sys.platform.startswith('linux'):
+            try:
+                self._inotify = _Inotify(self.watch_dir)
+            except (OSError, AttributeError) as e:
+                print(f"警告: inotify 不可用，改用轮询 ({e})")
+        self.mode = 'inotify' if self._inotify else 'poll'
+        self._last_scan = 0.0
+        self._scan()
+
+    def _touch(self, path, now):
+        """记录文件的一次变化"""
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            self.pending.pop(path, None)
+            return
+        entry = self.pending.get(path)
+        if entry is None:
+            self.pending[path] = [now, now, st.st_size, st.st_mtime_ns]
+        elif (entry[2], entry[3]) != (st.st_size, st.st_mtime_ns):
+            entry[1:] = [now, st.st_size, st.st_mtime_ns]
+
+    def _scan(self):
+        """全量扫描目录（轮询模式的主要检测方式，inotify 模式下用于补扫）"""
+        now = time.monotonic()
+        self._last_scan = now
+        with os.scandir(self.watch_dir) as it:
+            for entry in it:
+                if not entry.is_file() or not is_candidate(entry.name):
+                    continue
+                if entry.path in self.claimed:
+                    continue
+                self._touch(entry.path, now)
+
+    def poll(self, timeout=None):
+        """
+        等待新文件
+
+        Args:
+            timeout: 最长等待秒数
+
+        Returns:
+            写入完成、可以处理的 [(首次发现时间, 文件路径), ...]（按发现顺序）
+        """
+        timeout = self.poll_interval if timeout is None else timeout
+        now = time.monotonic()
+        if self._inotify is not None:
+            events = self._inotify.read(min(timeout, self.settle_seconds))
+            now = time.monotonic()
+            if events is None or now - self._last_scan >= RESCAN_INTERVAL:
+                self._scan()
+            else:
+                for name, _ in events:
+                    path = os.path.join(self.watch_dir, name)
+                    if is_candidate(name) and path not in self.claimed:
+                        self._touch(path, now)
+        else:
+            time.sleep(timeout)
+            self._scan()
+            now = time.monotonic()
+
+        ready = []
+        for path, entry in list(self.pending.items()):
+            if now - entry[1] < self.settle_seconds:
+                continue
+            # 交付前再确认一次大小未变化（inotify 模式下未收到事件的文件不会重新 stat）
+            self._touch(path, now)
+            entry = self.pending.get(path)
+            if entry is None or now - entry[1] < self.settle_seconds:
+                continue
+            ready.append((entry[0], path))
+        ready.sort()
+        for _, path in ready:
+            del self.pending[path]
+            self.claimed.add(path)
+        return ready
+
+    @property
+    def settling(self):
+        """已发现但尚未写入完成的文件数"""
+        return len(self.pending)
+
+    def release(self, path):
+        """文件已移走，不再需要防重复"""
+        self.claimed.discard(path)
+
+    def close(self):
+        if self._inotify is not None:
+            self._inotify.close()
+
+
+def move_aside(path, dest_dir):
+    """
+    将文件移动到 dest_dir，重名时追加序号
+
+    Returns:
+        移动后的路径
+    """
+    os.makedirs(dest_dir, exist_ok=True)
+    stem, ext = os.path.splitext(os.path.basename(path))
+    dest = os.path.join(dest_dir, stem + ext)
+    n = 1
+    while os.path.exists(dest):
+        dest = os.path.join(dest_dir, f"{stem}_{n}{ext}")
+        n += 1
+    shutil.move(path, dest)
+    return dest
+
+
+def latency_summary(samples):
+    """延迟样本的分位数统计（秒）"""
+    if not samples:
+        return {'count': 0}
+    values = np.asarray(samples, dtype=np.float64)
+    p50, p90, p99 = np.percentile(values, [50, 90, 99])
+    return {
+        'count': int(values.size),
+        'p50': round(float(p50), 3),
+        'p90': round(float(p90), 3),
+        'p99': round(float(p99), 3),
+        'max': round(float(values.max()), 3),
+    }
+
+
+# 工作进程内的持久状态（每个进程初始化一次）
+_worker_state = {}
+
+
+def _init_worker(det_model_path, rec_model_path, output_root, ocr_options):
+    """工作进程初始化：加载模型并打开索引"""
+    # 由主进程统一处理 Ctrl+C
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    from ocr_engine import init_ocr_model
+    from ocr_index import OCRIndex, default_index_path
+    from fork_server import preloaded_ocr
+
+    # fork 模式下模型已由主进程加载，直接使用继承的共享副本
+    ocr = preloaded_ocr()
+    if ocr is None:
+        ocr = init_ocr_model(det_model_path, rec_model_path, **ocr_options)
+    _worker_state['ocr'] = ocr
+    _worker_state['index'] = OCRIndex(default_index_path(output_root))
+    _worker_state['output_root'] = output_root
+
+
+def _process_one(path, watch_dir):
+    """
+    在工作进程中识别一个文件，并移动到 done/ 或 failed/
+
+    Returns:
+        结果字典
+    """
+    from ocr_engine import process_file
+    from page_source import count_pages
+
+    index = _worker_state['index']
+    stem = os.path.splitext(os.path.basename(path))[0]
+    output_dir = os.path.join(_worker_state['output_root'],
+                              f"{stem}_{time.strftime('%Y%m%d_%H%M%S')}")
+    start = time.perf_counter()
+    try:
+        pages = count_pages(path)
+        _, all_text = process_file(path, _worker_state['ocr'], output_dir, index=index)
+        dest = move_aside(path, os.path.join(watch_dir, DONE_DIR))
+        index.rename_document(path, dest)
+        index.commit()
+        return {'path': path, 'status': 'done', 'dest': dest, 'output_dir': output_dir,
+                'pages': pages, 'lines': len(all_text), 'seconds': time.perf_counter() - start}
+    except Exception as e:
+        import traceback
+
+        # 已逐页提交的部分结果随文件一起作废
+        index.conn.rollback()
+        index.remove_document(path)
+        index.commit()
+        error = f"{type(e).__name__}: {e}"
+        dest = None
+        if os.path.exists(path):
+            dest = move_aside(path, os.path.join(watch_dir, FAILED_DIR))
+            with open(dest + '.error.txt', 'w', encoding='utf-8') as f:
+                f.write(traceback.format_exc())
+        return {'path': path, 'status': 'failed', 'dest': dest, 'error': error,
+                'seconds': time.perf_counter() - start}
+
+
+class WatchService:
+    """
+    热文件夹识别服务：FolderWatcher 检测文件，进程池持续识别
+
+    用法：
+        service = WatchService('/mnt/scans', det, rec, workers=2)
+        service.run()          # 直到 stop() 或 Ctrl+C
+
+    max_pages_per_worker / max_worker_rss_mb 设置后，工作进程越过阈值即在
+    文档之间被替换（None 表示不限）。fork_server=True 时改用 ForkServer，
+    主进程加载一次模型，工作进程 fork 后共享权重；fork 后的工作进程未能就绪时
+    退回 spawn 方式。
+    """
+
+    def __init__(self, watch_dir, det_model_path, rec_model_path, output_root='output',
+                 workers=1, settle_seconds=DEFAULT_SETTLE_SECONDS,
+                 poll_interval=DEFAULT_POLL_INTERVAL, use_inotify=True,
+                 status_path=None, status_interval=DEFAULT_STATUS_INTERVAL,
+                 max_pages_per_worker=None, max_worker_rss_mb=None, fork_server=False,
+                 **ocr_options):
+        self.watch_dir = os.path.abspath(watch_dir)
+        self.det_model_path = det_model_path
+        self.rec_model_path = rec_model_path
+        self.output_root = os.path.abspath(output_root)
+        self.workers = max(1, workers)
+        self.status_path = status_path or os.path.join(self.watch_dir, STATUS_FILE)
+        self.status_interval = status_interval
+        self.max_pages_per_worker = max_pages_per_worker
+        self.max_worker_rss_mb = max_worker_rss_mb
+        self.fork_server = fork_server
+        self.ocr_options = ocr_options
+        self.pool = None
+
+        self.watcher = FolderWatcher(self.watch_dir, settle_seconds, poll_interval, use_inotify)
+        self.queue = deque()          # [(首次发现时间, 路径)]
+        self.in_flight = {}           # 路径 → 首次发现时间
+        self.results = deque()        # 工作进程回调写入，主循环消费
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.processed = 0
+        self.failed = 0
+        self.last_result = None
+        self.started_at = time.time()
+        self._stop = threading.Event()
+        self._last_status = 0.0
+
+    def stop(self):
+        self._stop.set()
+
+    def _submit(self, pool):
+        """按并发上限把排队的文件交给工作进程"""
+        while self.queue and len(self.in_flight) < self.workers:
+            seen, path = self.queue.popleft()
+            self.in_flight[path] = seen
+            pool.apply_async(_process_one, (path, self.watch_dir),
+                             callback=self.results.append,
+                             error_callback=lambda e, p=path: self.results.append(
+                                 {'path': p, 'status': 'failed', 'error': repr(e)}))
+
+    def _collect(self):
+        """处理已完成的结果"""
+        while self.results:
+            result = self.results.popleft()
+            seen = self.in_flight.pop(result['path'], None)
+            self.watcher.release(result['path'])
+            if seen is not None:
+                self.latencies.append(time.monotonic() - seen)
+            if result['status'] == 'done':
+                self.processed += 1
+                print(f"[完成] {os.path.basename(result['path'])} "
+                      f"({result['lines']} 行, {result['seconds']:.1f}s)")
+            else:
+                self.failed += 1
+                print(f"[失败] {os.path.basename(result['path'])}: {result['error']}")
+            self.last_result = result
+
+    def status(self):
+        """当前状态"""
+        return {
+            'watch_dir': self.watch_dir,
+            'mode': self.watcher.mode,
+            'workers': self.workers,
+            'backlog': {
+                'settling': self.watcher.settling,
+                'queued': len(self.queue),
+                'in_flight': len(self.in_flight),
+            },
+            'backlog_depth': self.watcher.settling + len(self.queue) + len(self.in_flight),
+            'processed': self.processed,
+            'failed': self.failed,
+            'latency_seconds': latency_summary(list(self.latencies)),
+            'pool': self.pool.stats() if self.pool is not None else None,
+            'last_result': self.last_result,
+            'started_at': self.started_at,
+            'updated_at': time.time(),
+        }
+
+    def _write_status(self, force=False):
+        now = time.monotonic()
+        if force or now - self._last_status >= self.status_interval:
+            write_json_atomic(self.status_path, self.status())
+            self._last_status = now
+
+    def _start_pool(self):
+        """启动工作进程池（fork_server=True 时优先使用 ForkServer）"""
+        initargs = (self.det_model_path, self.rec_model_path, self.output_root,
+                    self.ocr_options)
+        if self.fork_server:
+            from fork_server import ForkServer
+            from worker_pool import WorkerError
+
+            try:
+                server = ForkServer(self.det_model_path, self.rec_model_path, self.workers,
+                                    initializer=_init_worker, initargs=initargs,
+                                    max_pages=self.max_pages_per_worker,
+                                    max_rss_mb=self.max_worker_rss_mb, **self.ocr_options)
+                server.wait_ready()
+                return server
+            except (RuntimeError, WorkerError) as e:
+                print(f"[警告] fork 工作进程不可用，改用 spawn 方式: {e}")
+        return RecyclingPool(self.workers, initializer=_init_worker, initargs=initargs,
+                             max_pages=self.max_pages_per_worker,
+                             max_rss_mb=self.max_worker_rss_mb)
+
+    def run(self, once=False):
+        """
+        运行监控循环
+
+        Args:
+            once: 为 True 时处理完当前已有的文件后退出
+        """
+        pool = self._start_pool()
+        self.pool = pool
+        print(f"正在监控: {self.watch_dir} （{self.watcher.mode} 模式，{self.workers} 个工作进程）")
+        try:
+            while not self._stop.is_set():
+                for seen, path in self.watcher.poll():
+                    self.queue.append((seen, path))
+                self._submit(pool)
+                self._collect()
+                self._write_status()
+                if once and not (self.watcher.settling or self.queue or self.in_flight):
+                    break
+        finally:
+            # 停止接收新文件，等待正在处理的文件完成
+            pool.close()
+            pool.join()
+            self._collect()
+            self._write_status(force=True)
+            self.watcher.close()
+        return self.status()
+
+
+def main():
+    """主函数"""
+    import argparse
+    from ocr_tuner import DEFAULT_DET_MODEL, DEFAULT_REC_MODEL, resolve_workers
+
+    parser = argparse.ArgumentParser(description='热文件夹监控识别')
+    parser.add_argument('watch_dir', help='监控目录（扫描仪共享目录）')
+    parser.add_argument('--output', default='output', help='识别结果输出目录')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='并发识别的工作进程数（默认采用调优档案的拆分，无档案时为 1）')
+    parser.add_argument('--settle', type=float, default=DEFAULT_SETTLE_SECONDS,
+                        help='文件多少秒内不再变化视为写入完成')
+    parser.add_argument('--poll-interval', type=float, default=DEFAULT_POLL_INTERVAL,
+                        help='轮询间隔（秒）')
+    parser.add_argument('--no-inotify', action='store_true', help='强制使用轮询')
+    parser.add_argument('--status', default=None, help=f'状态文件路径（默认 <监控目录>/{STATUS_FILE}）')
+    parser.add_argument('--once', action='store_true', help='处理完现有文件后退出')
+    parser.add_argument('--max-pages-per-worker', type=int, default=None,
+                        help='工作进程累计识别多少页后替换（在文档之间）')
+    parser.add_argument('--max-worker-rss-mb', type=float, default=None,
+                        help='工作进程 RSS 超过多少 MB 后替换（在文档之间）')
+    parser.add_argument('--fork-server', action='store_true',
+                        help='主进程加载模型，工作进程 fork 后共享权重（Linux / macOS）')
+    parser.add_argument('--det', default=DEFAULT_DET_MODEL, help='检测模型路径')
+    parser.add_argument('--rec', default=DEFAULT_REC_MODEL, help='识别模型路径')
+
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.watch_dir):
+        print(f"错误: 监控目录不存在: {args.watch_dir}")
+        return 1
+    # 模型缺失时工作进程会反复初始化失败，启动前先检查
+    for model_path in (args.det, args.rec):
+        if not os.path.exists(model_path):
+            print(f"错误: 模型不存在: {model_path}")
+            return 1
+
+    workers, ocr_options = resolve_workers(args.workers, args.det, args.rec)
+    service = WatchService(args.watch_dir, args.det, args.rec, args.output,
+                           workers=workers, settle_seconds=args.settle,
+                           poll_interval=args.poll_interval, use_inotify=not args.no_inotify,
+                           status_path=args.status,
+                           max_pages_per_worker=args.max_pages_per_worker,
+                           max_worker_rss_mb=args.max_worker_rss_mb,
+                           fork_server=args.fork_server, **ocr_options)
+    signal.signal(signal.SIGINT, lambda *_: service.stop())
+    signal.signal(signal.SIGTERM, lambda *_: service.stop())
+
+    status = service.run(once=args.once)
+    print(f"\n已处理 {status['processed']} 个文件，失败 {status['failed']} 个")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,373 @@
+"""
+========================================================
+可回收的工作进程池
+========================================================
+
+功能说明：
+    长时间运行的识别服务中，推理框架的缓存和内存碎片会让工作进程的 RSS
+    随调用次数缓慢增长。RecyclingPool 在文档之间按阈值替换工作进程：
+        - max_pages：一个进程累计识别的页数达到上限后退出
+        - max_rss_mb：处理完一个文档后 RSS 超过上限即退出
+    进程只在两个任务之间退出（不会中断正在处理的文档），池随即启动新进程，
+    新进程重新执行 initializer（加载模型）。工作进程意外退出（如被 OOM 杀掉）时，
+    它正在处理的任务以失败回调，并同样补充新进程。
+
+    接口与 multiprocessing.Pool.apply_async 一致（callback / error_callback），
+    任务函数返回字典时，其中的 'pages' 字段计入页数（否则按 1 页计）。
+
+用法：
+    pool = RecyclingPool(2, initializer=_init_worker, initargs=(...),
+                         max_pages=5000, max_rss_mb=3000)
+    pool.apply_async(_process_one, (path,), callback=on_done, error_callback=on_error)
+    pool.close()
+    pool.join()
+========================================================
+"""
+
+import os
+import time
+import queue
+import signal
+import threading
+import traceback
+from collections import deque
+
+from low_memory import read_process_rss
+
+
+# 工作进程连续初始化失败达到此次数后放弃补充进程
+MAX_INIT_FAILURES = 3
+
+
+class WorkerError(RuntimeError):
+    """任务在工作进程中失败或工作进程异常退出"""
+
+
+def _worker_main(slot, task_queue, result_queue, initializer, initargs, max_pages, max_rss):
+    """工作进程主循环：执行任务，越过阈值时在任务之间退出"""
+    # 由主进程统一处理 Ctrl+C
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    try:
+        if initializer is not None:
+            initializer(*initargs)
+    except Exception:
+        result_queue.put(('init_failed', slot, os.getpid(), traceback.format_exc()))
+        return
+    result_queue.put(('ready', slot, os.getpid(), None))
+
+    pages = 0
+    tasks = 0
+    while True:
+        task = task_queue.get()
+        if task is None:
+            break
+        task_id, func, args = task
+        try:
+            value = func(*args)
+            ok = True
+        except Exception as e:
+            value = f"{type(e).__name__}: {e}\n{traceback.format_exc()}"
+            ok = False
+        tasks += 1
+        pages += int(value.get('pages', 1)) if ok and isinstance(value, dict) else 1
+        rss = read_process_rss() or 0
+
+        reason = None
+        if max_pages and pages >= max_pages:
+            reason = f"pages {pages} >= {max_pages}"
+        elif max_rss and rss >= max_rss:
+            reason = f"rss {rss / 1048576:.0f}MB >= {max_rss / 1048576:.0f}MB"
+        stats = {'pid': os.getpid(), 'pages': pages, 'tasks': tasks, 'rss': rss,
+                 'recycle': reason}
+        result_queue.put(('result', slot, task_id, (ok, value, stats)))
+        if reason:
+            break
+
+
+class RecyclingPool:
+    """
+    按页数 / RSS 阈值回收工作进程的进程池
+
+    Args:
+        processes: 工作进程数
+        initializer: 工作进程初始化函数（每个新进程执行一次）
+        initargs: initializer 参数
+        max_pages: 单个进程累计页数上限，None 表示不限
+        max_rss_mb: 单个进程 RSS 上限（MB），None 表示不限
+        context: multiprocessing 启动方式，默认 spawn（不继承父进程的推理框架状态）
+    """
+
+    def __init__(self, processes, initializer=None, initargs=(), max_pages=None,
+                 max_rss_mb=None, context='spawn'):
+        import multiprocessing
+
+        self._ctx = multiprocessing.get_context(context)
+        self.processes = max(1, processes)
+        self._initializer = initializer
+        self._initargs = initargs
+        self.max_pages = max_pages
+        self.max_rss = int(max_rss_mb * 1048576) if max_rss_mb else None
+
+        self._result_queue = self._ctx.Queue()
+        self._lock = threading.Lock()
+        self._pending = deque()       # [(task_id, func, args)]
+        self._callbacks = {}          # task_id → (callback, error_callback)
+        self._slots = [None] * self.processes
+        self._next_task = 0
+        self._closed = False
+        self._broken = None
+        self._init_failures = 0
+
+        self.recycled = 0
+        self.crashed = 0
+        self.recycle_log = deque(maxlen=50)
+        self.spawn_log = deque(maxlen=50)
+
+        for slot in range(self.processes):
+            self._spawn(slot)
+        self._handler = threading.Thread(target=self._handle_results, daemon=True,
+                                         name='pool-results')
+        self._handler.start()
+
+    # ------------------------------------------------------------------
+    # 进程管理
+    # ------------------------------------------------------------------
+
+    def _spawn(self, slot):
+        task_queue = self._ctx.SimpleQueue()
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(slot, task_queue, self._result_queue, self._initializer, self._initargs,
+                  self.max_pages, self.max_rss),
+            daemon=True)
+        process.start()
+        self._slots[slot] = {'process': process, 'tasks': task_queue, 'task': None,
+                             'ready': False, 'stats': None, 'started': time.time(),
+                             'retiring': False, 'spawn_seconds': None}
+
+    def _retire(self, slot):
+        """等待已决定退出的进程结束，并按需补充新进程"""
+        worker = self._slots[slot]
+        worker['process'].join()
+        worker['tasks'].close()
+        if not self._closed or self._pending:
+            self._spawn(slot)
+        else:
+            self._slots[slot] = None
+
+    def _dispatch(self):
+        """把排队任务交给空闲进程（需持有锁）"""
+        for slot, worker in enumerate(self._slots):
+            if not self._pending:
+                return
+            if worker is None or worker['task'] is not None or worker['retiring']:
+                continue
+            task = self._pending.popleft()
+            worker['task'] = task[0]
+            worker['tasks'].put(task)
+
+    def _fail(self, task_id, error):
+        _, error_callback = self._callbacks.pop(task_id, (None, None))
+        if error_callback is not None:
+            error_callback(error)
+
+    def _check_workers(self):
+        """检查意外退出的工作进程（需持有锁）"""
+        for slot, worker in enumerate(self._slots):
+            if worker is None or worker['retiring'] or worker['process'].is_alive():
+                continue
+            exitcode = worker['process'].exitcode
+            if exitcode == 0:
+                # 正常退出（回收 / 初始化失败）：退出前发出的消息随后由结果线程处理
+                continue
+            task_id = worker['task']
+            if task_id is not None:
+                self.crashed += 1
+                self._fail(task_id, WorkerError(
+                    f"工作进程 {worker['process'].pid} 异常退出 (exitcode={exitcode})"))
+            worker['tasks'].close()
+            if self._closed and not self._pending:
+                self._slots[slot] = None
+            else:
+                self._spawn(slot)
+
+    def _handle_results(self):
+        """结果线程：分发回调、回收进程、补充进程"""
+        while True:
+            try:
+                message = self._result_queue.get(timeout=0.5)
+            except queue.Empty:
+                message = None
+            except (EOFError, OSError):
+                break
+
+            with self._lock:
+                if message is not None:
+                    self._handle_message(message)
+                self._check_workers()
+                self._dispatch()
+                done = self._closed and not self._callbacks and not self._pending
+                if done:
+                    for worker in self._slots:
+                        if worker is not None and worker['process'].is_alive():
+                            worker['tasks'].put(None)
+            if done:
+                break
+
+    def _handle_message(self, message):
+        kind, slot, key, payload = message
+        worker = self._slots[slot]
+        if kind == 'ready':
+            self._init_failures = 0
+            if worker is not None:
+                worker['ready'] = True
+                worker['spawn_seconds'] = time.time() - worker['started']
+                self.spawn_log.append({'pid': key, 'seconds': round(worker['spawn_seconds'], 3),
+                                       'at': time.time()})
+            return
+        if kind == 'init_failed':
+            self._init_failures += 1
+            print(f"[警告] 工作进程初始化失败:\n{payload}")
+            if worker is not None:
+                worker['retiring'] = True
+                worker['process'].join()
+                worker['tasks'].close()
+                self._slots[slot] = None
+            if self._init_failures >= MAX_INIT_FAILURES:
+                self._broken = payload
+                while self._pending:
+                    self._fail(self._pending.popleft()[0],
+                               WorkerError(f"工作进程无法初始化:\n{payload}"))
+            elif not self._closed or self._pending:
+                self._spawn(slot)
+            return
+
+        ok, value, stats = payload
+        callback, error_callback = self._callbacks.pop(key, (None, None))
+        if worker is not None and worker['task'] == key:
+            worker['task'] = None
+            worker['stats'] = stats
+        if stats['recycle']:
+            self.recycled += 1
+            self.recycle_log.append({'pid': stats['pid'], 'reason': stats['recycle'],
+                                     'pages': stats['pages'], 'tasks': stats['tasks'],
+                                     'at': time.time()})
+            print(f"[回收] 工作进程 {stats['pid']}（{stats['recycle']}），启动新进程")
+            if worker is not None:
+                worker['retiring'] = True
+                self._retire(slot)
+        if ok:
+            if callback is not None:
+                callback(value)
+        elif error_callback is not None:
+            error_callback(WorkerError(value))
+
+    # ------------------------------------------------------------------
+    # 公共接口
+    # ------------------------------------------------------------------
+
+    def apply_async(self, func, args=(), callback=None, error_callback=None):
+        """
+        提交任务（func 需可在子进程中按名称导入）
+
+        Args:
+            func: 任务函数
+            args: 参数
+            callback: 成功回调（在结果线程中调用）
+            error_callback: 失败回调，参数为 WorkerError
+        """
+        with self._lock:
+            if self._closed:
+                raise ValueError("进程池已关闭")
+            if self._broken is not None:
+                raise WorkerError(f"工作进程无法初始化:\n{self._broken}")
+            task_id = self._next_task
+            self._next_task += 1
+            self._callbacks[task_id] = (callback, error_callback)
+            self._pending.append((task_id, func, args))
+            self._dispatch()
+
+    def wait_ready(self, timeout=None):
+        """
+        等待全部工作进程完成初始化
+
+        Args:
+            timeout: 最长等待秒数，None 表示一直等待
+
+        Returns:
+            全部就绪返回 True，超时返回 False
+
+        Raises:
+            WorkerError: 工作进程连续初始化失败
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                if self._broken is not None:
+                    raise WorkerError(f"工作进程无法初始化:\n{self._broken}")
+                workers = [w for w in self._slots if w is not None]
+                if workers and all(w['ready'] for w in workers):
+                    return True
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+
+    def pids(self):
+        """当前存活的工作进程 PID"""
+        with self._lock:
+            return [w['process'].pid for w in self._slots
+                    if w is not None and w['process'].is_alive()]
+
+    def stats(self):
+        """各进程的页数 / RSS / 启动耗时（启动到 initializer 完成）和回收统计"""
+        with self._lock:
+            workers = []
+            for worker in self._slots:
+                if worker is None:
+                    continue
+                stats = worker['stats'] or {}
+                workers.append({
+                    'pid': worker['process'].pid,
+                    'ready': worker['ready'],
+                    'busy': worker['task'] is not None,
+                    'pages': stats.get('pages', 0),
+                    'tasks': stats.get('tasks', 0),
+                    'rss_mb': round(stats.get('rss', 0) / 1048576, 1),
+                    'uptime': round(time.time() - worker['started'], 1),
+                    'spawn_ms': (round(worker['spawn_seconds'] * 1000, 1)
+                                 if worker['spawn_seconds'] is not None else None),
+                })
+            return {
+                'workers': workers,
+                'max_pages': self.max_pages,
+                'max_rss_mb': round(self.max_rss / 1048576) if self.max_rss else None,
+                'recycled': self.recycled,
+                'crashed': self.crashed,
+                'recent_recycles': list(self.recycle_log)[-5:],
+                'recent_spawns': list(self.spawn_log)[-5:],
+            }
+
+    def close(self):
+        """不再接收新任务；已提交的任务继续完成"""
+        with self._lock:
+            self._closed = True
+
+    def join(self):
+        """等待全部任务完成、工作进程退出"""
+        self._handler.join()
+        for worker in self._slots:
+            if worker is not None:
+                worker['process'].join()
+        self._result_queue.close()
+
+    def terminate(self):
+        """立即结束全部工作进程（未完成的任务不会回调）"""
+        with self._lock:
+            self._closed = True
+            self._pending.clear()
+            self._callbacks.clear()
+            for worker in self._slots:
+                if worker is not None:
+                    worker['retiring'] = True
+                    worker['process'].terminate()
+        self._handler.join()